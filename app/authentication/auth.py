@@ -1,10 +1,14 @@
 import time
 import uuid
+from threading import Lock
 
+import cachetools
+import jwt
 from flask import current_app, g, request
 from gds_metrics import Histogram
 from notifications_python_client.authentication import (
     decode_jwt_token,
+    decode_token,
     get_token_issuer,
 )
 from notifications_python_client.errors import (
@@ -26,6 +30,22 @@ AUTH_DB_CONNECTION_DURATION_SECONDS = Histogram(
     "Time taken to get DB connection and fetch service from database",
 )
 
+# notifications-python-client rejects tokens with an `iat` more than this many seconds in the past
+TOKEN_VALIDITY_SECONDS = 30
+
+# Tokens we've already verified, mapped to the id and secret of the key that signed them. Clients often reuse a token
+# for several requests, and a repeat can skip verification until the token would expire anyway.
+verified_tokens = cachetools.TLRUCache(
+    maxsize=10_000,
+    ttu=lambda token, verified_token, now: verified_token.valid_until,
+    timer=time.time,
+)
+
+# The key each issuer last signed a token with, which is usually the one it will use next, so it is tried first
+last_used_api_key_ids = cachetools.TTLCache(maxsize=10_000, ttl=300)
+
+token_caches_lock = Lock()
+
 
 class AuthError(Exception):
     def __init__(self, message, code, service_id=None, api_key_id=None):
@@ -45,6 +65,13 @@ class AuthError(Exception):
         return {"status_code": self.code, "errors": [{"error": "AuthError", "message": self.short_message}]}
 
 
+class VerifiedToken:
+    def __init__(self, api_key_id, secret, valid_until):
+        self.api_key_id = api_key_id
+        self.secret = secret
+        self.valid_until = valid_until
+
+
 class InternalApiKey:
     def __init__(self, client_id, secret):
         self.secret = secret
@@ -123,6 +150,47 @@ def requires_auth():
 
 
 def _decode_jwt_token(auth_token, api_keys, service_id=None):
+    with token_caches_lock:
+        verified_token = verified_tokens.get(auth_token)
+
+    if verified_token:
+        api_key = next(
+            (
+                api_key
+                for api_key in api_keys
+                if api_key.id == verified_token.api_key_id and api_key.secret == verified_token.secret
+            ),
+            None,
+        )
+        if api_key:
+            return _check_api_key_not_revoked(api_key, service_id)
+
+    api_key = _verify_jwt_token(auth_token, _api_keys_most_likely_first(auth_token, api_keys, service_id), service_id)
+
+    valid_until = decode_token(auth_token)["iat"] + TOKEN_VALIDITY_SECONDS
+    with token_caches_lock:
+        last_used_api_key_ids[service_id] = api_key.id
+        verified_tokens[auth_token] = VerifiedToken(api_key.id, api_key.secret, valid_until=valid_until)
+
+    return _check_api_key_not_revoked(api_key, service_id)
+
+
+def _api_keys_most_likely_first(auth_token, api_keys, service_id):
+    try:
+        # our clients don't set `kid`, but if someone does it tells us exactly which key to try
+        likely_api_key_id = jwt.get_unverified_header(auth_token).get("kid")
+    except jwt.InvalidTokenError:
+        likely_api_key_id = None
+
+    if not likely_api_key_id:
+        with token_caches_lock:
+            likely_api_key_id = last_used_api_key_ids.get(service_id)
+
+    # sorting is stable, so apart from the likely key this is the order we were given them in
+    return sorted(api_keys, key=lambda api_key: str(api_key.id) != str(likely_api_key_id))
+
+
+def _verify_jwt_token(auth_token, api_keys, service_id):
     for api_key in api_keys:
         try:
             decode_jwt_token(auth_token, api_key.secret)
@@ -150,15 +218,19 @@ def _decode_jwt_token(auth_token, api_keys, service_id=None):
             # General error when trying to decode and validate the token
             raise AuthError(GENERAL_TOKEN_ERROR_MESSAGE, 403, service_id=service_id, api_key_id=api_key.id) from e
 
-        if api_key.expiry_date:
-            raise AuthError("Invalid token: API key revoked", 403, service_id=service_id, api_key_id=api_key.id)
-
         return api_key
     else:
         # service has API keys, but none matching the one the user provided
         raise AuthError("Invalid token: API key not found", 403, service_id=service_id)
 
 
+def _check_api_key_not_revoked(api_key, service_id):
+    if api_key.expiry_date:
+        raise AuthError("Invalid token: API key revoked", 403, service_id=service_id, api_key_id=api_key.id)
+
+    return api_key
+
+
 def _get_auth_token(req):
     auth_header = req.headers.get("Authorization", None)
     if not auth_header:
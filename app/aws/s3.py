@@ -1,3 +1,5 @@
+import codecs
+
 import botocore
 from boto3 import client, resource
 from flask import current_app
@@ -41,8 +43,17 @@ def get_contact_list_location(service_id, contact_list_id):
 
 
 def get_job_and_metadata_from_s3(service_id, job_id):
-    obj = get_s3_object(*get_job_location(service_id, job_id))
-    return obj.get()["Body"].read().decode("utf-8"), obj.get()["Metadata"]
+    response = get_s3_object(*get_job_location(service_id, job_id)).get()
+    return response["Body"].read().decode("utf-8"), response["Metadata"]
+
+
+def stream_job_and_metadata_from_s3(service_id, job_id):
+    """
+    Returns the lines of the job file, decoded as they are downloaded rather than all at once, and its metadata
+    """
+    response = get_s3_object(*get_job_location(service_id, job_id)).get()
+    lines = codecs.iterdecode(response["Body"].iter_lines(keepends=True), "utf-8")
+    return lines, response["Metadata"]
 
 
 def get_job_from_s3(service_id, job_id):
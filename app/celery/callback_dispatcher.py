@@ -0,0 +1,316 @@
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from threading import Lock
+from time import monotonic, time
+from urllib.parse import urlparse
+
+import cachetools
+import requests
+from flask import current_app
+from requests import RequestException
+from requests.adapters import HTTPAdapter
+
+from app import redis_store
+from app.config import QueueNames
+
+SERVICE_CALLBACK_TIMEOUT_SECONDS = 5
+
+# client certificates only change when we deploy one, so there's no need to look on disk before every callback
+CLIENT_CERTIFICATE_CACHE_SECONDS = 300
+
+# a callback holds its slot for at most SERVICE_CALLBACK_TIMEOUT_SECONDS, so a slot older than this was never given
+# back (because the worker died) and is freed up for another callback
+HOST_SLOTS_EXPIRY_SECONDS = 60
+
+# Takes a slot for callbacks to a host, if there's one free. Each slot is a member of a sorted set scored by when it
+# was taken, so slots that are never given back stop counting once they're HOST_SLOTS_EXPIRY_SECONDS old.
+#
+# KEYS: the host's sorted set of slots
+# ARGV: now, HOST_SLOTS_EXPIRY_SECONDS, the most slots there can be, a unique token for the slot
+TAKE_HOST_SLOT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local expiry = tonumber(ARGV[2])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - expiry)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+    return 0
+end
+
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('EXPIRE', KEYS[1], expiry)
+return 1
+"""
+
+# a callback API that keeps failing stops getting callbacks for a while, doubling each time it fails again after that
+CIRCUIT_OPEN_MAX_SECONDS = 3600
+# callbacks that weren't sent because their callback API was failing are kept for this long
+DEFERRED_CALLBACKS_EXPIRY_SECONDS = 86400
+DEFERRED_CALLBACK_URLS_KEY = "service-callbacks-deferred-urls"
+
+_sessions = {}
+_sessions_lock = Lock()
+_take_host_slot_script = None
+_client_certificates = cachetools.TTLCache(maxsize=1024, ttl=CLIENT_CERTIFICATE_CACHE_SECONDS)
+
+
+class CallbackHostBusy(Exception):
+    pass
+
+
+class CallbackCircuitOpen(Exception):
+    pass
+
+
+def post_to_service_callback_api(url, data, token):
+    """
+    POST `data` as JSON to a service's callback API, reusing an open connection to its host if there is one.
+
+    Raises, without sending anything:
+    * CallbackCircuitOpen if the callback API has been failing recently. The callback should be given to
+      `defer_callback` to send once it has recovered.
+    * CallbackHostBusy if SERVICE_CALLBACK_MAX_CONCURRENCY_PER_HOST callbacks are already being sent to the same host
+    """
+    if callback_circuit_is_open(url):
+        raise CallbackCircuitOpen(url)
+
+    hostname = urlparse(url).hostname
+
+    with _host_slot(hostname):
+        start = monotonic()
+        try:
+            response = _get_session(hostname).post(
+                url,
+                data=json.dumps(data),
+                headers={"Content-Type": "application/json", "Authorization": f"Bearer {token}"},
+                timeout=SERVICE_CALLBACK_TIMEOUT_SECONDS,
+                cert=get_client_certificate(hostname),
+            )
+        except RequestException:
+            _record_callback_result(url, failed=True)
+            raise
+
+    _record_callback_result(
+        url,
+        failed=(
+            response.status_code >= 500
+            or response.status_code == 429
+            or monotonic() - start > current_app.config["SERVICE_CALLBACK_SLOW_RESPONSE_SECONDS"]
+        ),
+    )
+    return response
+
+
+def callback_circuit_is_open(url):
+    if not current_app.config["REDIS_ENABLED"]:
+        return False
+
+    try:
+        return bool(redis_store.redis_store.exists(_circuit_open_key(url)))
+    except Exception:
+        current_app.logger.exception("Failed to check health of callback API %s", url)
+        return False
+
+
+def defer_callback(url, task_name, args, kwargs):
+    """
+    Keep a callback task's arguments in Redis, to be run again by `take_deferred_callbacks` once its callback API has
+    recovered. Returns False if that's not possible, in which case the caller should retry as normal.
+    """
+    if not current_app.config["REDIS_ENABLED"]:
+        return False
+
+    try:
+        pipe = redis_store.redis_store.pipeline()
+        pipe.rpush(_deferred_callbacks_key(url), json.dumps({"task": task_name, "args": args, "kwargs": kwargs}))
+        pipe.expire(_deferred_callbacks_key(url), DEFERRED_CALLBACKS_EXPIRY_SECONDS)
+        pipe.sadd(DEFERRED_CALLBACK_URLS_KEY, url)
+        pipe.execute()
+    except Exception:
+        current_app.logger.exception("Failed to defer callback to %s", url)
+        return False
+
+    return True
+
+
+def get_urls_with_deferred_callbacks():
+    return [url.decode() for url in redis_store.redis_store.smembers(DEFERRED_CALLBACK_URLS_KEY)]
+
+
+def take_deferred_callbacks(url, count):
+    """
+    Remove up to `count` deferred callbacks for a callback API, oldest first, and return them as dicts of `task`,
+    `args` and `kwargs`. Returns nothing while the callback API's circuit is open.
+
+    A callback API that failed recently and hasn't succeeded since only gets one callback back at a time, to find
+    out whether it has recovered. If it has, the rest are replayed straight away.
+    """
+    if callback_circuit_is_open(url):
+        return []
+
+    if redis_store.redis_store.exists(_circuit_trips_key(url)):
+        count = 1
+
+    pipe = redis_store.redis_store.pipeline()
+    pipe.lrange(_deferred_callbacks_key(url), 0, count - 1)
+    pipe.ltrim(_deferred_callbacks_key(url), count, -1)
+    pipe.llen(_deferred_callbacks_key(url))
+    deferred, _, remaining = pipe.execute()
+
+    if not remaining:
+        redis_store.redis_store.srem(DEFERRED_CALLBACK_URLS_KEY, url)
+
+    return [json.loads(callback) for callback in deferred]
+
+
+def get_client_certificate(hostname):
+    try:
+        return _client_certificates[hostname]
+    except KeyError:
+        pass
+
+    certificate_name = f"{hostname.replace('.', '-')}.pem"
+    certificate_path = f"{current_app.config['SSL_CERT_DIR']}/{certificate_name}"
+
+    if os.path.exists(certificate_path):
+        current_app.logger.info(
+            "Certificate [%s] found for [%s] , using as client certificate.", certificate_name, hostname
+        )
+    else:
+        current_app.logger.warning(
+            "Certificate [%s] not found for [%s], no client certificate used.", certificate_name, hostname
+        )
+        certificate_path = None
+
+    _client_certificates[hostname] = certificate_path
+    return certificate_path
+
+
+def _get_session(hostname):
+    try:
+        return _sessions[hostname]
+    except KeyError:
+        pass
+
+    with _sessions_lock:
+        if hostname not in _sessions:
+            session = requests.Session()
+            # one pool per session, since each session only talks to one host. It needs to be as big as the number of
+            # callbacks we let through to the host at once, which with the eventlet worker can all be in one process.
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=current_app.config["SERVICE_CALLBACK_MAX_CONCURRENCY_PER_HOST"]
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[hostname] = session
+
+    return _sessions[hostname]
+
+
+@contextmanager
+def _host_slot(hostname):
+    global _take_host_slot_script
+
+    if not current_app.config["REDIS_ENABLED"]:
+        yield
+        return
+
+    key = f"service-callback-host-{hostname}-slots"
+    token = str(uuid.uuid4())
+    try:
+        if _take_host_slot_script is None:
+            _take_host_slot_script = redis_store.redis_store.register_script(TAKE_HOST_SLOT_SCRIPT)
+        taken = _take_host_slot_script(
+            keys=[key],
+            args=[
+                time(),
+                HOST_SLOTS_EXPIRY_SECONDS,
+                current_app.config["SERVICE_CALLBACK_MAX_CONCURRENCY_PER_HOST"],
+                token,
+            ],
+        )
+    except Exception:
+        # if we can't count, we send the callback rather than hold it up
+        current_app.logger.exception("Failed to take a slot for callbacks to %s", hostname)
+        yield
+        return
+
+    if not taken:
+        raise CallbackHostBusy(hostname)
+
+    try:
+        yield
+    finally:
+        try:
+            redis_store.redis_store.zrem(key, token)
+        except Exception:
+            current_app.logger.exception("Failed to give back a slot for callbacks to %s", hostname)
+
+
+def _record_callback_result(url, failed):
+    if not current_app.config["REDIS_ENABLED"]:
+        return
+
+    try:
+        if failed:
+            _record_callback_failure(url)
+        else:
+            _record_callback_success(url)
+    except Exception:
+        current_app.logger.exception("Failed to record health of callback API %s", url)
+
+
+def _record_callback_failure(url):
+    pipe = redis_store.redis_store.pipeline()
+    pipe.incr(_recent_failures_key(url))
+    pipe.expire(_recent_failures_key(url), current_app.config["SERVICE_CALLBACK_FAILURE_WINDOW_SECONDS"])
+    pipe.get(_circuit_trips_key(url))
+    failures, _, trips = pipe.execute()
+
+    # after the circuit has been open, one failure is enough to show the callback API hasn't recovered
+    if not trips and failures < current_app.config["SERVICE_CALLBACK_FAILURE_THRESHOLD"]:
+        return
+
+    trips = int(trips or 0) + 1
+    open_seconds = min(
+        current_app.config["SERVICE_CALLBACK_CIRCUIT_OPEN_SECONDS"] * 2 ** (trips - 1), CIRCUIT_OPEN_MAX_SECONDS
+    )
+
+    pipe = redis_store.redis_store.pipeline()
+    pipe.set(_circuit_open_key(url), 1, ex=open_seconds)
+    pipe.set(_circuit_trips_key(url), trips, ex=CIRCUIT_OPEN_MAX_SECONDS * 2)
+    pipe.delete(_recent_failures_key(url))
+    pipe.execute()
+
+    current_app.logger.warning("Callback API %s is failing, deferring its callbacks for %s seconds", url, open_seconds)
+
+
+def _record_callback_success(url):
+    pipe = redis_store.redis_store.pipeline()
+    pipe.delete(_recent_failures_key(url))
+    pipe.delete(_circuit_trips_key(url))
+    _, recovered = pipe.execute()
+
+    if recovered:
+        current_app.logger.info("Callback API %s has recovered, replaying its deferred callbacks", url)
+
+        from app.celery.service_callback_tasks import replay_deferred_service_callbacks
+
+        replay_deferred_service_callbacks.apply_async([url], queue=QueueNames.CALLBACKS)
+
+
+def _recent_failures_key(url):
+    return f"service-callback-{url}-recent-failures"
+
+
+def _circuit_open_key(url):
+    return f"service-callback-{url}-circuit-open"
+
+
+def _circuit_trips_key(url):
+    return f"service-callback-{url}-circuit-trips"
+
+
+def _deferred_callbacks_key(url):
+    return f"service-callback-{url}-deferred"
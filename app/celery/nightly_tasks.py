@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+from time import monotonic
 
 import pytz
 from flask import current_app
@@ -14,7 +15,7 @@ from notifications_utils.timezones import convert_utc_to_bst
 from sqlalchemy import func
 from sqlalchemy.exc import SQLAlchemyError
 
-from app import notify_celery, statsd_client, zendesk_client
+from app import notify_celery, redis_store, statsd_client, zendesk_client
 from app.aws import s3
 from app.config import QueueNames
 from app.constants import (
@@ -34,10 +35,20 @@ from app.dao.jobs_dao import (
 from app.dao.notification_history_dao import (
     delete_notification_history_between_two_datetimes,
 )
+from app.dao.notification_partitions_dao import (
+    PARTITIONED_TABLES,
+    dao_archive_and_drop_detached_notifications_partition,
+    dao_create_daily_partitions,
+    dao_detach_notifications_partition,
+    dao_get_detached_partitions,
+    dao_get_expired_notifications_partitions,
+    dao_is_partitioned,
+)
 from app.dao.notifications_dao import (
     dao_get_notifications_processing_time_stats,
     dao_timeout_notifications,
     get_service_ids_with_notifications_before,
+    insert_notification_history_delete_notifications_past_retention,
     move_notifications_to_notification_history,
 )
 from app.dao.service_data_retention_dao import (
@@ -47,7 +58,11 @@ from app.models import FactProcessingTime, Notification
 from app.notifications.notifications_ses_callback import (
     check_and_queue_callback_task,
 )
-from app.utils import get_london_midnight_in_utc
+from app.utils import (
+    decode_pagination_cursor,
+    encode_pagination_cursor,
+    get_london_midnight_in_utc,
+)
 
 
 @notify_celery.task(name="remove_sms_email_jobs")
@@ -72,11 +87,39 @@ def _remove_csv_files(job_types):
 
 @notify_celery.task(name="delete-notifications-older-than-retention")
 def delete_notifications_older_than_retention():
+    if dao_is_partitioned("notifications"):
+        _drop_notifications_partitions_older_than_retention()
+
     delete_email_notifications_older_than_retention.apply_async(queue=QueueNames.REPORTING)
     delete_sms_notifications_older_than_retention.apply_async(queue=QueueNames.REPORTING)
     delete_letter_notifications_older_than_retention.apply_async(queue=QueueNames.REPORTING)
 
 
+def _drop_notifications_partitions_older_than_retention():
+    seven_days_ago = get_london_midnight_in_utc(convert_utc_to_bst(datetime.utcnow()).date() - timedelta(days=7))
+
+    for partition in dao_get_expired_notifications_partitions(seven_days_ago):
+        dao_detach_notifications_partition(partition.name)
+
+    # includes any partitions detached on a previous night that didn't get as far as being dropped
+    for name in dao_get_detached_partitions("notifications"):
+        kept, archived = dao_archive_and_drop_detached_notifications_partition(name)
+        current_app.logger.info(
+            "delete-notifications-older-than-retention: dropped partition %s, archived %s notifications and kept %s",
+            name,
+            archived,
+            kept,
+        )
+
+
+@notify_celery.task(name="create-notification-partitions")
+def create_notification_partitions():
+    for table in PARTITIONED_TABLES:
+        if dao_is_partitioned(table):
+            created = dao_create_daily_partitions(table, current_app.config["NOTIFICATION_PARTITIONS_DAYS_AHEAD"])
+            current_app.logger.info("Created partitions %s of %s", created, table)
+
+
 @notify_celery.task(name="delete-sms-notifications")
 @cronitor("delete-sms-notifications")
 def delete_sms_notifications_older_than_retention():
@@ -96,6 +139,11 @@ def delete_letter_notifications_older_than_retention():
 
 
 def _delete_notifications_older_than_retention_by_type(notification_type):
+    # letters have to be deleted from S3 as well, so are still deleted a service at a time
+    if current_app.config["DELETE_NOTIFICATIONS_IN_ONE_PASS"] and notification_type != LETTER_TYPE:
+        _delete_notifications_older_than_retention_in_one_pass(notification_type)
+        return
+
     flexible_data_retention = fetch_service_data_retention_for_all_services_by_notification_type(notification_type)
 
     for f in flexible_data_retention:
@@ -147,6 +195,63 @@ def _delete_notifications_older_than_retention_by_type(notification_type):
     )
 
 
+def _delete_notifications_older_than_retention_in_one_pass(notification_type):
+    today = convert_utc_to_bst(datetime.utcnow()).date()
+    shortest_retention = min(
+        [7]
+        + [
+            f.days_of_retention
+            for f in fetch_service_data_retention_for_all_services_by_notification_type(notification_type)
+        ]
+    )
+    # nothing created after this is past retention for any service
+    scan_until = get_london_midnight_in_utc(today - timedelta(days=shortest_retention))
+
+    # if the task is restarted part way through, it carries on after the last batch it finished rather than looking
+    # at all the notifications it has already kept again
+    checkpoint_key = f"delete-{notification_type}-notifications-older-than-retention-{today}-checkpoint"
+    checkpoint = redis_store.get(checkpoint_key)
+    after = decode_pagination_cursor(checkpoint.decode()) if checkpoint else None
+
+    total_deleted = 0
+    start = monotonic()
+    while True:
+        batch_start = monotonic()
+        deleted, after = insert_notification_history_delete_notifications_past_retention(
+            notification_type,
+            today,
+            scan_until,
+            after=after,
+            qry_limit=current_app.config["DELETE_NOTIFICATIONS_BATCH_SIZE"],
+        )
+        if not after:
+            break
+
+        redis_store.set(checkpoint_key, encode_pagination_cursor(*after), ex=86400)
+        total_deleted += deleted
+        current_app.logger.info(
+            "delete-notifications-older-than-retention: deleted %s %s notifications up to %s in %.1f seconds",
+            deleted,
+            notification_type,
+            after[0],
+            monotonic() - batch_start,
+        )
+
+    duration = monotonic() - start
+    current_app.logger.info(
+        (
+            "delete-notifications-older-than-retention: deleted %(num_deleted)s %(type)s notifications for all "
+            "services in %(duration)s seconds (%(rate)s per second)"
+        ),
+        dict(
+            type=notification_type,
+            num_deleted=total_deleted,
+            duration=int(duration),
+            rate=int(total_deleted / duration) if duration else total_deleted,
+        ),
+    )
+
+
 @notify_celery.task(name="delete-notifications-for-service-and-type")
 def delete_notifications_for_service_and_type(service_id, notification_type, datetime_to_delete_before):
     start = datetime.utcnow()
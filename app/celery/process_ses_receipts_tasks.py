@@ -1,3 +1,4 @@
+from collections import defaultdict
 from datetime import datetime, timedelta
 
 import iso8601
@@ -6,6 +7,7 @@ from flask import current_app, json
 from sqlalchemy.orm.exc import NoResultFound
 
 from app import notify_celery, statsd_client
+from app.celery.receipt_buffer import buffer_receipt, take_buffered_receipts
 from app.clients.email.aws_ses import get_aws_responses
 from app.config import QueueNames
 from app.constants import NOTIFICATION_PENDING, NOTIFICATION_SENDING
@@ -19,7 +21,15 @@ from app.notifications.notifications_ses_callback import (
 
 
 @notify_celery.task(bind=True, name="process-ses-result", max_retries=5, default_retry_delay=300)
-def process_ses_results(self, response):
+def process_ses_results(self, response, allow_batching=True):
+    if (
+        allow_batching
+        and self.request.retries == 0
+        and current_app.config["SES_RECEIPT_BATCHING_ENABLED"]
+        and buffer_receipt("ses", response, process_ses_results_batch, QueueNames.SES_CALLBACKS)
+    ):
+        return True
+
     try:
         ses_message = json.loads(response["Message"])
         notification_type = ses_message["notificationType"]
@@ -39,32 +49,12 @@ def process_ses_results(self, response):
         try:
             notification = notifications_dao.dao_get_notification_or_history_by_reference(reference=reference)
         except NoResultFound:
-            message_time = iso8601.parse_date(ses_message["mail"]["timestamp"]).replace(tzinfo=None)
-            if datetime.utcnow() - message_time < timedelta(minutes=5):
-                current_app.logger.info(
-                    "notification not found for reference: %s (update to %s). "
-                    "Callback may have arrived before notification was persisted to the DB. Adding task to retry queue",
-                    reference,
-                    notification_status,
-                )
-                self.retry(queue=QueueNames.RETRY)
-            else:
-                current_app.logger.warning(
-                    "notification not found for reference: %s (update to %s)", reference, notification_status
-                )
+            _handle_missing_notification(
+                ses_message, notification_status, retry=lambda: self.retry(queue=QueueNames.RETRY)
+            )
             return
 
-        if bounce_message:
-            current_app.logger.info(
-                "SES bounce for notification ID %s",
-                notification.id,
-                extra=dict(bounce_message=json.dumps(bounce_message)),
-            )
-        else:
-            current_app.logger.info(
-                "SES successful delivery for notification ID %s",
-                notification.id,
-            )
+        _log_ses_result(notification, bounce_message)
 
         if notification.status not in [NOTIFICATION_SENDING, NOTIFICATION_PENDING]:
             notifications_dao._duplicate_update_warning(notification=notification, status=notification_status)
@@ -91,3 +81,176 @@ def process_ses_results(self, response):
     except Exception as e:
         current_app.logger.exception("Error processing SES results: %s", type(e))
         self.retry(queue=QueueNames.RETRY)
+
+
+@notify_celery.task(name="process-ses-results-batch")
+def process_ses_results_batch():
+    with take_buffered_receipts("ses", process_ses_results_batch, QueueNames.SES_CALLBACKS) as responses:
+        if not responses:
+            return
+
+        processed = set()
+        try:
+            _process_ses_results_in_bulk(responses, processed)
+        except Exception:
+            unprocessed = [response for i, response in enumerate(responses) if i not in processed]
+            current_app.logger.exception(
+                "Error processing a batch of %s SES results, retrying the %s not yet processed one at a time",
+                len(responses),
+                len(unprocessed),
+            )
+            for response in unprocessed:
+                process_ses_results.apply_async([response], {"allow_batching": False}, queue=QueueNames.RETRY)
+
+
+def _process_ses_results_in_bulk(responses, processed):
+    """
+    Does the same as process_ses_results for many receipts at once, with one query to find their notifications and
+    one UPDATE for each status they move to.
+
+    Adds the index of each response to `processed` once it's been dealt with (or its status update has been committed),
+    so that if this fails part way through, only the rest need to be processed again.
+    """
+    results = _parse_ses_results(responses, processed)
+    notifications = notifications_dao.dao_get_notifications_or_history_by_references(
+        {ses_message["mail"]["messageId"] for _, _, ses_message, _, _ in results}
+    )
+
+    new_statuses = {}
+    indexes_by_status = defaultdict(list)
+    for i, response, ses_message, notification_status, bounce_message in results:
+        reference = ses_message["mail"]["messageId"]
+
+        if not (notification := notifications.get(reference)):
+            _handle_missing_notification(
+                ses_message,
+                notification_status,
+                retry=lambda response=response: process_ses_results.apply_async(
+                    [response], {"allow_batching": False}, queue=QueueNames.RETRY, countdown=300
+                ),
+            )
+            processed.add(i)
+            continue
+
+        _log_ses_result(notification, bounce_message)
+
+        # a second receipt for the same email in this batch is a duplicate of the first, which has already moved the
+        # notification on from sending
+        if reference in new_statuses or notification.status not in [NOTIFICATION_SENDING, NOTIFICATION_PENDING]:
+            notifications_dao._duplicate_update_warning(notification=notification, status=notification_status)
+            processed.add(i)
+            continue
+
+        new_statuses[reference] = notification_status
+        indexes_by_status[notification_status].append((i, reference))
+
+    updated = set()
+    try:
+        for notification_status, indexes_and_references in indexes_by_status.items():
+            references = [reference for _, reference in indexes_and_references]
+            notifications_dao.dao_update_notifications_by_reference(
+                references=references, update_dict={"status": notification_status}
+            )
+            processed.update(i for i, _ in indexes_and_references)
+            updated.update(references)
+    finally:
+        # even if a later update failed, the ones that were committed still need their callbacks
+        _after_ses_status_updates(
+            {reference: status for reference, status in new_statuses.items() if reference in updated}
+        )
+
+
+def _after_ses_status_updates(new_statuses):
+    """
+    The statuses have been committed, so a failure from here on only affects the notification it happens for - the
+    receipt can't be processed again, as the notification has moved on from sending
+    """
+    if not new_statuses:
+        return
+
+    try:
+        # the updates expired the notifications, so load them again in one go rather than one at a time as they're used
+        notifications = notifications_dao.dao_get_notifications_or_history_by_references(new_statuses.keys())
+    except Exception:
+        current_app.logger.exception("Failed to reload %s notifications updated by SES results", len(new_statuses))
+        notifications = {}
+
+    for reference, notification_status in new_statuses.items():
+        try:
+            _after_ses_status_update(
+                notifications.get(reference)
+                or notifications_dao.dao_get_notification_or_history_by_reference(reference=reference),
+                notification_status,
+            )
+        except Exception:
+            current_app.logger.exception(
+                "Failed to finish processing SES result for reference %s (updated to %s)",
+                reference,
+                notification_status,
+            )
+
+
+def _after_ses_status_update(notification, notification_status):
+    statsd_client.incr(f"callback.ses.{notification_status}")
+
+    if notification.sent_at:
+        statsd_client.timing_with_dates(
+            f"callback.ses.{notification_status}.elapsed-time", datetime.utcnow(), notification.sent_at
+        )
+
+    check_and_queue_callback_task(notification)
+
+
+def _parse_ses_results(responses, processed):
+    """
+    Returns (index, response, ses_message, notification_status, bounce_message) for each delivery or bounce.
+    Complaints don't change the notification's status, so they're dealt with here, and added to `processed`.
+    """
+    results = []
+    for i, response in enumerate(responses):
+        ses_message = json.loads(response["Message"])
+        notification_type = ses_message["notificationType"]
+        bounce_message = None
+
+        if notification_type == "Bounce":
+            notification_type, bounce_message = determine_notification_bounce_type(notification_type, ses_message)
+        elif notification_type == "Complaint":
+            _check_and_queue_complaint_callback_task(*handle_complaint(ses_message))
+            processed.add(i)
+            continue
+
+        notification_status = get_aws_responses(notification_type)["notification_status"]
+        results.append((i, response, ses_message, notification_status, bounce_message))
+
+    return results
+
+
+def _handle_missing_notification(ses_message, notification_status, retry):
+    reference = ses_message["mail"]["messageId"]
+    message_time = iso8601.parse_date(ses_message["mail"]["timestamp"]).replace(tzinfo=None)
+    if datetime.utcnow() - message_time < timedelta(minutes=5):
+        current_app.logger.info(
+            "notification not found for reference: %s (update to %s). "
+            "Callback may have arrived before notification was persisted to the DB. Adding task to retry queue",
+            reference,
+            notification_status,
+        )
+        retry()
+    else:
+        current_app.logger.warning(
+            "notification not found for reference: %s (update to %s)", reference, notification_status
+        )
+
+
+def _log_ses_result(notification, bounce_message):
+    if bounce_message:
+        current_app.logger.info(
+            "SES bounce for notification ID %s",
+            notification.id,
+            extra=dict(bounce_message=json.dumps(bounce_message)),
+        )
+    else:
+        current_app.logger.info(
+            "SES successful delivery for notification ID %s",
+            notification.id,
+        )
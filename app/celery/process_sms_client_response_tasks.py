@@ -5,11 +5,13 @@ from flask import current_app
 from notifications_utils.template import SMSMessageTemplate
 
 from app import notify_celery, statsd_client
+from app.celery.receipt_buffer import buffer_receipt, take_buffered_receipts
 from app.clients import ClientException
 from app.clients.sms.firetext import get_firetext_responses
 from app.clients.sms.mmg import get_mmg_responses
 from app.clients.sms.spryng import get_spryng_responses
-from app.constants import NOTIFICATION_PENDING
+from app.config import QueueNames
+from app.constants import NOTIFICATION_PENDING, NOTIFICATION_TECHNICAL_FAILURE
 from app.dao import notifications_dao
 from app.dao.templates_dao import dao_get_template_by_id
 from app.notifications.notifications_ses_callback import (
@@ -20,7 +22,28 @@ sms_response_mapper = {"MMG": get_mmg_responses, "Firetext": get_firetext_respon
 
 
 @notify_celery.task(bind=True, name="process-sms-client-response", max_retries=5, default_retry_delay=300)
-def process_sms_client_response(self, status, provider_reference, client_name, detailed_status_code=None):
+def process_sms_client_response(
+    self, status, provider_reference, client_name, detailed_status_code=None, recipient=None, allow_batching=True
+):
+    if (
+        allow_batching
+        and self.request.retries == 0
+        and current_app.config["SMS_RECEIPT_BATCHING_ENABLED"]
+        and buffer_receipt(
+            "sms",
+            {
+                "status": status,
+                "provider_reference": provider_reference,
+                "client_name": client_name,
+                "detailed_status_code": detailed_status_code,
+                "recipient": recipient,
+            },
+            process_sms_client_responses_batch,
+            QueueNames.SMS_CALLBACKS,
+        )
+    ):
+        return
+
     # validate reference
     try:
         uuid.UUID(provider_reference, version=4)
@@ -44,7 +67,10 @@ def process_sms_client_response(self, status, provider_reference, client_name, d
         )
     except KeyError as e:
         _process_for_status(
-            notification_status="technical-failure", client_name=client_name, provider_reference=provider_reference
+            notification_status="technical-failure",
+            client_name=client_name,
+            provider_reference=provider_reference,
+            recipient=recipient,
         )
         raise ClientException(f"{client_name} callback failed: status {status} not found.") from e
 
@@ -53,13 +79,24 @@ def process_sms_client_response(self, status, provider_reference, client_name, d
         client_name=client_name,
         provider_reference=provider_reference,
         detailed_status_code=detailed_status_code,
+        recipient=recipient,
     )
 
 
-def _process_for_status(notification_status, client_name, provider_reference, detailed_status_code=None):
+def _process_for_status(
+    notification_status, client_name, provider_reference, detailed_status_code=None, recipient=None
+):
+    notification_id = provider_reference
+    if recipient:
+        # a message sent to several recipients in one request has its own reference rather than a notification id
+        notification_id = (
+            notifications_dao.dao_get_sms_notification_id_by_reference_and_recipient(provider_reference, recipient)
+            or provider_reference
+        )
+
     # record stats
     notification = notifications_dao.update_notification_status_by_id(
-        notification_id=provider_reference,
+        notification_id=notification_id,
         status=notification_status,
         sent_by=client_name.lower(),
         detailed_status_code=detailed_status_code,
@@ -67,6 +104,10 @@ def _process_for_status(notification_status, client_name, provider_reference, de
     if not notification:
         return
 
+    _after_status_update(notification, notification_status, client_name)
+
+
+def _after_status_update(notification, notification_status, client_name):
     statsd_client.incr("callback.{}.{}".format(client_name.lower(), notification_status))
 
     if notification.sent_at:
@@ -93,3 +134,163 @@ def _process_for_status(notification_status, client_name, provider_reference, de
         check_and_queue_callback_task(notification)
         if notification.international:
             statsd_client.incr(f"international-sms.{notification_status}.{notification.phone_prefix}")
+
+
+@notify_celery.task(name="process-sms-client-responses-batch")
+def process_sms_client_responses_batch():
+    with take_buffered_receipts("sms", process_sms_client_responses_batch, QueueNames.SMS_CALLBACKS) as receipts:
+        if not receipts:
+            return
+
+        processed = set()
+        try:
+            _process_sms_client_responses_in_bulk(receipts, processed)
+        except Exception:
+            unprocessed = [receipt for i, receipt in enumerate(receipts) if i not in processed]
+            current_app.logger.exception(
+                "Error processing a batch of %s SMS delivery receipts, retrying the %s not yet processed one at a time",
+                len(receipts),
+                len(unprocessed),
+            )
+            for receipt in unprocessed:
+                process_sms_client_response.apply_async(
+                    kwargs={**receipt, "allow_batching": False}, queue=QueueNames.RETRY
+                )
+
+
+def _process_sms_client_responses_in_bulk(receipts, processed):
+    """
+    Does the same as process_sms_client_response for many receipts at once, updating their notifications with one
+    UPDATE. A notification can only be updated once per UPDATE, so any further receipts for a notification are
+    processed on their own afterwards.
+
+    Adds the index of each receipt to `processed` once it's been dealt with (or its status update has been committed),
+    so that if this fails part way through, only the rest need to be processed again.
+    """
+    receipts_and_statuses = _parse_sms_client_responses(receipts, processed)
+
+    notification_ids_for_batched_messages = notifications_dao.dao_get_sms_notification_ids_by_references_and_recipients(
+        {
+            (receipt["provider_reference"], receipt["recipient"])
+            for _, receipt, _ in receipts_and_statuses
+            if receipt["recipient"]
+        }
+    )
+
+    receipts_by_notification_id = {}
+    later_receipts = []
+    for i, receipt, notification_status in receipts_and_statuses:
+        # the same form as the ids the UPDATE returns, whatever case the provider sent the reference in
+        notification_id = str(uuid.UUID(receipt["provider_reference"]))
+        if receipt["recipient"]:
+            notification_id = notification_ids_for_batched_messages.get(
+                (receipt["provider_reference"], receipt["recipient"]), notification_id
+            )
+
+        if notification_id in receipts_by_notification_id:
+            later_receipts.append((i, receipt))
+        else:
+            receipts_by_notification_id[notification_id] = (i, receipt, notification_status)
+
+    updated = notifications_dao.dao_update_sms_notification_statuses(
+        [
+            (notification_id, notification_status, receipt["client_name"].lower(), receipt["detailed_status_code"])
+            for notification_id, (_, receipt, notification_status) in receipts_by_notification_id.items()
+        ]
+    )
+    processed.update(i for i, _, _ in receipts_by_notification_id.values())
+
+    for notification_id in receipts_by_notification_id.keys() - updated.keys():
+        current_app.logger.info(
+            "notification %s not updated (update to status %s): not found, already has a final status or has no "
+            "delivery receipts",
+            notification_id,
+            receipts_by_notification_id[notification_id][2],
+        )
+
+    _after_status_updates(
+        {
+            notification_id: receipts_by_notification_id[notification_id][1:]
+            for notification_id in receipts_by_notification_id
+            if notification_id in updated
+        }
+    )
+
+    for i, receipt in later_receipts:
+        process_sms_client_response.apply_async(
+            kwargs={**receipt, "allow_batching": False}, queue=QueueNames.SMS_CALLBACKS
+        )
+        processed.add(i)
+
+
+def _after_status_updates(receipts_by_notification_id):
+    """
+    The statuses have been committed, so a failure from here on only affects the notification it happens for - the
+    receipt can't be processed again, as the notification has already been updated
+    """
+    if not receipts_by_notification_id:
+        return
+
+    try:
+        notifications = {
+            str(notification.id): notification
+            for notification in notifications_dao.dao_get_notifications_by_ids(list(receipts_by_notification_id))
+        }
+    except Exception:
+        current_app.logger.exception(
+            "Failed to reload %s notifications updated by SMS delivery receipts", len(receipts_by_notification_id)
+        )
+        notifications = {}
+
+    for notification_id, (receipt, notification_status) in receipts_by_notification_id.items():
+        try:
+            _after_status_update(
+                notifications.get(notification_id) or notifications_dao.get_notification_by_id(notification_id),
+                notification_status,
+                receipt["client_name"],
+            )
+        except Exception:
+            current_app.logger.exception(
+                "Failed to finish processing %s delivery receipt for notification %s (updated to %s)",
+                receipt["client_name"],
+                notification_id,
+                notification_status,
+            )
+
+
+def _parse_sms_client_responses(receipts, processed):
+    """
+    Returns (index, receipt, notification_status) for each receipt with a valid reference. Receipts without one are
+    logged and added to `processed`.
+    """
+    receipts_and_statuses = []
+    for i, receipt in enumerate(receipts):
+        client_name, provider_reference = receipt["client_name"], receipt["provider_reference"]
+        try:
+            uuid.UUID(provider_reference, version=4)
+        except ValueError:
+            current_app.logger.exception("%s callback with invalid reference %s", client_name, provider_reference)
+            processed.add(i)
+            continue
+
+        try:
+            notification_status, detailed_status = sms_response_mapper[client_name](
+                receipt["status"], receipt["detailed_status_code"]
+            )
+        except KeyError:
+            current_app.logger.exception("%s callback failed: status %s not found.", client_name, receipt["status"])
+            notification_status = NOTIFICATION_TECHNICAL_FAILURE
+        else:
+            current_app.logger.info(
+                "%s callback returned status of %s(%s): %s(%s) for reference: %s",
+                client_name,
+                notification_status,
+                receipt["status"],
+                detailed_status,
+                receipt["detailed_status_code"],
+                provider_reference,
+            )
+
+        receipts_and_statuses.append((i, receipt, notification_status))
+
+    return receipts_and_statuses
@@ -89,6 +89,45 @@ def deliver_email(self, notification_id):
             raise NotificationTechnicalFailureException(message) from e
 
 
+@notify_celery.task(name="deliver_sms_batch")
+def deliver_sms_batch(notification_ids):
+    if current_app.config["SMS_PROVIDER_BATCHING_ENABLED"]:
+        notifications = notifications_dao.dao_get_notifications_by_ids(notification_ids)
+        not_batched, failed_notification_ids = send_to_providers.send_sms_to_provider_in_batches(notifications)
+
+        for notification_id in failed_notification_ids:
+            deliver_sms.apply_async([notification_id], queue=QueueNames.RETRY)
+
+        # anything we couldn't find will fail in _deliver_batch and be retried on its own
+        found_ids = {str(notification.id) for notification in notifications}
+        notification_ids = [str(notification.id) for notification in not_batched] + [
+            notification_id for notification_id in notification_ids if notification_id not in found_ids
+        ]
+
+    _deliver_batch(notification_ids, send_to_providers.send_sms_to_provider, deliver_sms)
+
+
+@notify_celery.task(name="deliver_email_batch")
+def deliver_email_batch(notification_ids):
+    _deliver_batch(notification_ids, send_to_providers.send_email_to_provider, deliver_email)
+
+
+def _deliver_batch(notification_ids, send_to_provider, deliver_task):
+    # Any notification we fail to send is handed over to the single notification task on the retry queue, so that
+    # it gets the same retry and technical-failure handling as if it had been queued on its own.
+    for notification_id in notification_ids:
+        try:
+            notification = notifications_dao.get_notification_by_id(notification_id)
+            if not notification:
+                raise NoResultFound()
+            send_to_provider(notification)
+        except Exception:
+            current_app.logger.warning(
+                "Batch delivery for notification id: %s failed, retrying it on its own", notification_id, exc_info=True
+            )
+            deliver_task.apply_async([notification_id], queue=QueueNames.RETRY)
+
+
 @notify_celery.task(bind=True, name="deliver_letter", max_retries=55, retry_backoff=True, retry_backoff_max=300)
 def deliver_letter(self, notification_id):
     # 55 retries with exponential backoff gives a retry time of approximately 4 hours
@@ -0,0 +1,133 @@
+import json
+import uuid
+from contextlib import contextmanager
+from time import time
+
+from flask import current_app
+
+from app import redis_store
+
+# how long a batch of receipts can be out of the buffer before we assume whatever took it has died, and put it back.
+# Longer than any batch takes to process, so receipts aren't processed twice.
+RECEIPT_BATCH_PROCESSING_TIMEOUT_SECONDS = 10 * 60
+
+# Puts back any batches taken more than the timeout ago, then moves up to a batch of receipts from the buffer to a list
+# of their own, recording when it was taken. Running it as one script means a receipt is always in one list or the
+# other.
+#
+# KEYS: the buffer, the sorted set of batches being processed, the list for this batch
+# ARGV: the most receipts to take, now, the timeout
+TAKE_RECEIPTS_SCRIPT = """
+local max_size = tonumber(ARGV[1])
+local now = tonumber(ARGV[2])
+
+for _, batch in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now - tonumber(ARGV[3]))) do
+    local receipts = redis.call('LRANGE', batch, 0, -1)
+    for i = #receipts, 1, -1 do
+        redis.call('LPUSH', KEYS[1], receipts[i])
+    end
+    redis.call('DEL', batch)
+    redis.call('ZREM', KEYS[2], batch)
+end
+
+local receipts = redis.call('LRANGE', KEYS[1], 0, max_size - 1)
+redis.call('LTRIM', KEYS[1], max_size, -1)
+for _, receipt in ipairs(receipts) do
+    redis.call('RPUSH', KEYS[3], receipt)
+end
+if #receipts > 0 then
+    redis.call('ZADD', KEYS[2], now, KEYS[3])
+end
+
+return {receipts, redis.call('LLEN', KEYS[1])}
+"""
+
+_take_script = None
+
+
+def buffer_receipt(name, receipt, flush_task, queue, flush_args=()):
+    """
+    Add a delivery receipt to a buffer in Redis, so that `flush_task` can process it along with the others that
+    arrive around the same time.
+
+    The first receipt in each window schedules `flush_task` to run when the window ends, and a receipt that fills a
+    batch schedules it straight away, so no receipt waits longer than RECEIPT_BATCH_MAX_WAIT_MS (plus the time to get
+    through the queue).
+
+    `flush_task` is called with `flush_args`, which should be enough for it to find the buffer by `name`.
+
+    Returns False if the receipt couldn't be buffered, in which case the caller should process it on its own.
+    """
+    if not current_app.config["REDIS_ENABLED"]:
+        return False
+
+    max_wait_ms = current_app.config["RECEIPT_BATCH_MAX_WAIT_MS"]
+
+    try:
+        pipe = redis_store.redis_store.pipeline()
+        pipe.rpush(_buffer_key(name), json.dumps(receipt))
+        pipe.set(_flush_scheduled_key(name), 1, nx=True, px=max_wait_ms)
+        buffered, first_in_window = pipe.execute()
+    except Exception:
+        current_app.logger.exception("Failed to buffer %s receipt", name)
+        return False
+
+    if first_in_window:
+        flush_task.apply_async(flush_args, queue=queue, countdown=max_wait_ms / 1000)
+    elif buffered % current_app.config["RECEIPT_BATCH_MAX_SIZE"] == 0:
+        flush_task.apply_async(flush_args, queue=queue)
+
+    return True
+
+
+@contextmanager
+def take_buffered_receipts(name, flush_task, queue, flush_args=()):
+    """
+    Take up to RECEIPT_BATCH_MAX_SIZE receipts from the buffer, oldest first, to process in the `with` block. If there
+    are more left, `flush_task` is scheduled again to deal with them.
+
+    The receipts aren't removed from Redis until the block finishes without an exception - until then they're kept in
+    a list of their own. If the worker dies (or the block fails) before then, they're put back at the front of the
+    buffer by a later take, once they've been out for RECEIPT_BATCH_PROCESSING_TIMEOUT_SECONDS.
+    """
+    global _take_script
+
+    # clear this first, so that a receipt buffered from now on schedules another flush rather than relying on us to
+    # take it
+    redis_store.redis_store.delete(_flush_scheduled_key(name))
+
+    if _take_script is None:
+        _take_script = redis_store.redis_store.register_script(TAKE_RECEIPTS_SCRIPT)
+
+    batch_key = f"{_buffer_key(name)}-batch-{uuid.uuid4()}"
+    receipts, remaining = _take_script(
+        keys=[_buffer_key(name), _batches_key(name), batch_key],
+        args=[current_app.config["RECEIPT_BATCH_MAX_SIZE"], time(), RECEIPT_BATCH_PROCESSING_TIMEOUT_SECONDS],
+    )
+
+    if remaining:
+        flush_task.apply_async(flush_args, queue=queue)
+
+    yield [json.loads(receipt) for receipt in receipts]
+
+    if receipts:
+        try:
+            pipe = redis_store.redis_store.pipeline()
+            pipe.zrem(_batches_key(name), batch_key)
+            pipe.delete(batch_key)
+            pipe.execute()
+        except Exception:
+            # they've been processed, so the worst that can happen is they're processed again once they time out
+            current_app.logger.exception("Failed to remove processed batch %s of %s receipts", batch_key, name)
+
+
+def _buffer_key(name):
+    return f"{name}-receipt-buffer"
+
+
+def _batches_key(name):
+    return f"{name}-receipt-buffer-batches"
+
+
+def _flush_scheduled_key(name):
+    return f"{name}-receipt-buffer-flush-scheduled"
@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+from time import monotonic
 
 import pytz
 from flask import current_app
@@ -10,12 +11,24 @@ from app.constants import EMAIL_TYPE, LETTER_TYPE, SMS_TYPE, CacheKeys
 from app.cronitor import cronitor
 from app.dao.fact_billing_dao import (
     fetch_billing_data_for_day,
+    fetch_service_ids_with_billing_changes_by_day,
     update_ft_billing,
     update_ft_billing_letter_despatch,
 )
-from app.dao.fact_notification_status_dao import update_fact_notification_status
+from app.dao.fact_notification_status_dao import (
+    update_fact_notification_status,
+    update_fact_notification_status_for_day,
+)
+from app.dao.fact_platform_stats_dao import update_fact_platform_stats_for_day
 from app.dao.notifications_dao import get_service_ids_with_notifications_on_date
 
+# how many days, counting back from today, ft_billing is kept up to date for. Older notifications don't change status.
+FT_BILLING_DAYS_TO_UPDATE = 10
+
+# changes are looked for from a little before the last update started, in case they were made in transactions that
+# hadn't committed when it looked
+FT_BILLING_CHANGES_OVERLAP = timedelta(minutes=5)
+
 
 @notify_celery.task(name="create-nightly-billing")
 @cronitor("create-nightly-billing")
@@ -24,16 +37,25 @@ def create_nightly_billing(day_start=None):
     # up to 4 days of data counting back from day_start is consolidated
     if day_start is None:
         day_start = convert_utc_to_bst(datetime.utcnow()).date() - timedelta(days=1)
+        update_all_days = not current_app.config["INCREMENTAL_FT_BILLING"] or not _update_ft_billing_for_changes()
+        if update_all_days and current_app.config["INCREMENTAL_FT_BILLING"]:
+            # the tasks below pick up everything up to when they run, so from now on only later changes are needed
+            _set_ft_billing_includes_changes_until(datetime.utcnow())
     else:
         # When calling the task its a string in the format of "YYYY-MM-DD"
         day_start = datetime.strptime(day_start, "%Y-%m-%d").date()
-    for i in range(0, 10):
+        update_all_days = True
+
+    for i in range(0, FT_BILLING_DAYS_TO_UPDATE):
         process_day = (day_start - timedelta(days=i)).isoformat()
 
-        create_or_update_ft_billing_for_day.apply_async(kwargs={"process_day": process_day}, queue=QueueNames.REPORTING)
-        current_app.logger.info(
-            "create-nightly-billing task: create-or-update-ft-billing-for-day task created for %s", process_day
-        )
+        if update_all_days:
+            create_or_update_ft_billing_for_day.apply_async(
+                kwargs={"process_day": process_day}, queue=QueueNames.REPORTING
+            )
+            current_app.logger.info(
+                "create-nightly-billing task: create-or-update-ft-billing-for-day task created for %s", process_day
+            )
 
         create_or_update_ft_billing_letter_despatch_for_day.apply_async(
             kwargs={"process_day": process_day}, queue=QueueNames.REPORTING
@@ -47,11 +69,49 @@ def create_nightly_billing(day_start=None):
 @notify_celery.task(name="update-ft-billing-for-today")
 @cronitor("update-ft-billing-for-today")
 def update_ft_billing_for_today():
-    process_day = convert_utc_to_bst(datetime.utcnow()).date().isoformat()
-    create_or_update_ft_billing_for_day(process_day=process_day)
+    if not (current_app.config["INCREMENTAL_FT_BILLING"] and _update_ft_billing_for_changes()):
+        process_day = convert_utc_to_bst(datetime.utcnow()).date().isoformat()
+        create_or_update_ft_billing_for_day(process_day=process_day)
     redis_store.set(CacheKeys.FT_BILLING_FOR_TODAY_UPDATED_AT_UTC_ISOFORMAT, datetime.now(tz=pytz.utc).isoformat())
 
 
+def _update_ft_billing_for_changes():
+    """
+    Update ft_billing for the days (out of the last FT_BILLING_DAYS_TO_UPDATE, including today) and services that have
+    had notifications created or change status since it was last updated.
+
+    Returns False, without updating anything, if we don't know when ft_billing was last updated.
+    """
+    includes_changes_until = redis_store.get(CacheKeys.FT_BILLING_INCLUDES_CHANGES_UNTIL_UTC_ISOFORMAT)
+    if not includes_changes_until:
+        return False
+
+    started_at = datetime.utcnow()
+    today = convert_utc_to_bst(started_at).date()
+    service_ids_by_day = fetch_service_ids_with_billing_changes_by_day(
+        since=datetime.fromisoformat(includes_changes_until.decode()) - FT_BILLING_CHANGES_OVERLAP,
+        start_day=today - timedelta(days=FT_BILLING_DAYS_TO_UPDATE - 1),
+        end_day=today,
+    )
+
+    for process_day, service_ids in sorted(service_ids_by_day.items()):
+        billing_data = fetch_billing_data_for_day(process_day=process_day, service_ids=list(service_ids))
+        update_ft_billing(billing_data, process_day)
+        current_app.logger.info(
+            "update-ft-billing-for-changes: %s rows updated for %s services on %s",
+            len(billing_data),
+            len(service_ids),
+            process_day,
+        )
+
+    _set_ft_billing_includes_changes_until(started_at)
+    return True
+
+
+def _set_ft_billing_includes_changes_until(timestamp):
+    redis_store.set(CacheKeys.FT_BILLING_INCLUDES_CHANGES_UNTIL_UTC_ISOFORMAT, timestamp.isoformat(), ex=86400)
+
+
 @notify_celery.task(name="create-or-update-ft-billing-for-day")
 def create_or_update_ft_billing_for_day(process_day: str):
     process_date = datetime.strptime(process_day, "%Y-%m-%d").date()
@@ -88,6 +148,24 @@ def create_or_update_ft_billing_letter_despatch_for_day(process_day: str):
     )
 
 
+@notify_celery.task(name="update-platform-stats")
+def update_platform_stats():
+    """
+    Add up the platform-wide totals in ft_platform_notification_status and ft_platform_billing for each day that
+    ft_billing and ft_notification_status are still being updated for
+    """
+    today = convert_utc_to_bst(datetime.utcnow()).date()
+
+    start = monotonic()
+    for i in range(FT_BILLING_DAYS_TO_UPDATE):
+        update_fact_platform_stats_for_day(today - timedelta(days=i))
+    redis_store.set(CacheKeys.PLATFORM_STATS_UPDATED_AT_UTC_ISOFORMAT, datetime.now(tz=pytz.utc).isoformat())
+
+    current_app.logger.info(
+        "update-platform-stats task: updated %s days in %.1f seconds", FT_BILLING_DAYS_TO_UPDATE, monotonic() - start
+    )
+
+
 @notify_celery.task(name="create-nightly-notification-status")
 @cronitor("create-nightly-notification-status")
 def create_nightly_notification_status():
@@ -122,6 +200,20 @@ def create_nightly_notification_status():
         for i in range(days):
             process_day = yesterday - timedelta(days=i)
 
+            if current_app.config["NIGHTLY_NOTIFICATION_STATUS_BY_DAY"]:
+                partitions = current_app.config["NIGHTLY_NOTIFICATION_STATUS_PARTITIONS"]
+                for partition in range(partitions):
+                    create_nightly_notification_status_for_day.apply_async(
+                        kwargs={
+                            "process_day": process_day.isoformat(),
+                            "notification_type": notification_type,
+                            "partition": partition,
+                            "partitions": partitions,
+                        },
+                        queue=QueueNames.REPORTING,
+                    )
+                continue
+
             relevant_service_ids = get_service_ids_with_notifications_on_date(notification_type, process_day)
 
             for service_id in relevant_service_ids:
@@ -135,6 +227,33 @@ def create_nightly_notification_status():
                 )
 
 
+@notify_celery.task(name="create-nightly-notification-status-for-day")
+def create_nightly_notification_status_for_day(process_day, notification_type, partition=0, partitions=1):
+    process_day = datetime.strptime(process_day, "%Y-%m-%d").date()
+
+    start = monotonic()
+    updated, deleted = update_fact_notification_status_for_day(
+        process_day, notification_type, partition=partition, partitions=partitions
+    )
+
+    current_app.logger.info(
+        (
+            "create-nightly-notification-status-for-day task update for %(type)s for %(date)s "
+            "(partition %(partition)s of %(partitions)s): %(updated)s row(s) created or updated and %(deleted)s "
+            "deleted in %(duration).1f seconds"
+        ),
+        dict(
+            type=notification_type,
+            date=process_day,
+            partition=partition + 1,
+            partitions=partitions,
+            updated=updated,
+            deleted=deleted,
+            duration=monotonic() - start,
+        ),
+    )
+
+
 @notify_celery.task(name="create-nightly-notification-status-for-service-and-day")
 def create_nightly_notification_status_for_service_and_day(process_day, service_id, notification_type):
     process_day = datetime.strptime(process_day, "%Y-%m-%d").date()
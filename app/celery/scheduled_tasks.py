@@ -40,6 +40,9 @@ from app.constants import (
 from app.cronitor import cronitor
 from app.dao.annual_billing_dao import set_default_free_allowance_for_service
 from app.dao.date_util import get_current_financial_year_start_year
+from app.dao.fact_notification_status_dao import (
+    fetch_notification_status_counts_for_day,
+)
 from app.dao.inbound_numbers_dao import dao_get_available_inbound_numbers
 from app.dao.invited_org_user_dao import (
     delete_org_invitations_created_more_than_two_days_ago,
@@ -82,6 +85,11 @@ from app.models import (
     User,
 )
 from app.notifications.process_notifications import send_notification_to_queue
+from app.notifications.status_counts import (
+    set_notification_status_counts,
+    start_notification_status_counts,
+    status_counts_enabled,
+)
 from app.utils import get_london_midnight_in_utc
 
 
@@ -312,6 +320,25 @@ def replay_created_notifications():
             get_pdf_for_templated_letter.apply_async([str(letter.id)], queue=QueueNames.CREATE_LETTERS_PDF)
 
 
+@notify_celery.task(name="reconcile-notification-status-counts")
+def reconcile_notification_status_counts():
+    if not status_counts_enabled():
+        return
+
+    today = convert_utc_to_bst(datetime.utcnow()).date()
+    status_counts = fetch_notification_status_counts_for_day(today)
+    set_notification_status_counts(today, status_counts)
+    current_app.logger.info("Recounted %s notification statuses for %s", len(status_counts), today)
+
+
+@notify_celery.task(name="start-notification-status-counts-for-tomorrow")
+def start_notification_status_counts_for_tomorrow():
+    if not status_counts_enabled():
+        return
+
+    start_notification_status_counts(convert_utc_to_bst(datetime.utcnow()).date() + timedelta(days=1))
+
+
 @notify_celery.task(name="check-if-letters-still-pending-virus-check")
 def check_if_letters_still_pending_virus_check():
     letters = []
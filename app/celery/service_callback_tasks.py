@@ -1,20 +1,141 @@
-import json
-import os
-from urllib.parse import urlparse
+from collections import defaultdict
 
 from flask import current_app
-from requests import HTTPError, RequestException, request
+from requests import HTTPError, RequestException
 
 from app import notify_celery, signing
+from app.celery.callback_dispatcher import (
+    CallbackCircuitOpen,
+    CallbackHostBusy,
+    defer_callback,
+    get_urls_with_deferred_callbacks,
+    post_to_service_callback_api,
+    take_deferred_callbacks,
+)
+from app.celery.receipt_buffer import buffer_receipt, take_buffered_receipts
 from app.config import QueueNames
+from app.constants import (
+    BATCHED_DELIVERY_STATUS_CALLBACKS,
+    COMPLAINT_CALLBACK_TYPE,
+    DELIVERY_STATUS_CALLBACK_TYPE,
+)
+from app.dao.service_callback_api_dao import get_service_callback_api
+from app.serialised_models import SerialisedService
 from app.utils import DATETIME_FORMAT
 
+DEFERRED_CALLBACKS_REPLAY_BATCH_SIZE = 1000
+
 
 @notify_celery.task(bind=True, name="send-delivery-status", max_retries=5, default_retry_delay=300)
 def send_delivery_status_to_service(self, notification_id, encoded_status_update):
     status_update = signing.decode(encoded_status_update)
 
-    data = {
+    if (
+        self.request.retries == 0
+        and _service_uses_batched_callbacks(status_update.get("service_id"))
+        and buffer_receipt(
+            _callback_buffer_name(status_update["service_id"]),
+            encoded_status_update,
+            flush_delivery_status_callbacks,
+            QueueNames.CALLBACKS,
+            flush_args=[status_update["service_id"]],
+        )
+    ):
+        return
+
+    _send_data_to_service_callback_api(
+        self,
+        _get_delivery_status_callback_data(notification_id, status_update),
+        status_update["service_callback_api_url"],
+        _get_bearer_token(status_update, DELIVERY_STATUS_CALLBACK_TYPE),
+        "send_delivery_status_to_service",
+        callbacks=[status_update],
+        make_task_args=lambda encoded_status_updates: [notification_id, *encoded_status_updates],
+    )
+
+
+@notify_celery.task(name="flush-delivery-status-callbacks")
+def flush_delivery_status_callbacks(service_id):
+    with take_buffered_receipts(
+        _callback_buffer_name(service_id), flush_delivery_status_callbacks, QueueNames.CALLBACKS, [service_id]
+    ) as encoded_status_updates:
+        # the service might have changed its callback while these were waiting, so send each to the callback it was
+        # meant for
+        by_callback_api = defaultdict(list)
+        for encoded_status_update in encoded_status_updates:
+            status_update = signing.decode(encoded_status_update)
+            callback_api = (
+                status_update["service_callback_api_url"],
+                status_update.get("service_callback_api_bearer_token"),
+                status_update.get("service_callback_api_id"),
+            )
+            by_callback_api[callback_api].append(encoded_status_update)
+
+        for encoded_status_updates_for_callback_api in by_callback_api.values():
+            send_delivery_statuses_to_service.apply_async(
+                [encoded_status_updates_for_callback_api], queue=QueueNames.CALLBACKS
+            )
+
+
+@notify_celery.task(bind=True, name="send-delivery-statuses", max_retries=5, default_retry_delay=300)
+def send_delivery_statuses_to_service(self, encoded_status_updates):
+    """
+    Send several status updates for a service in one callback, as a JSON list in the same format as a single update
+    """
+    status_updates = [signing.decode(encoded_status_update) for encoded_status_update in encoded_status_updates]
+
+    _send_data_to_service_callback_api(
+        self,
+        [
+            _get_delivery_status_callback_data(status_update["notification_id"], status_update)
+            for status_update in status_updates
+        ],
+        status_updates[0]["service_callback_api_url"],
+        _get_bearer_token(status_updates[0], DELIVERY_STATUS_CALLBACK_TYPE),
+        "send_delivery_statuses_to_service",
+        callbacks=status_updates,
+        make_task_args=lambda encoded_status_updates: [encoded_status_updates],
+    )
+
+
+@notify_celery.task(name="replay-deferred-service-callbacks")
+def replay_deferred_service_callbacks(url=None):
+    """
+    Send callbacks that were put aside while their callback API was failing. This runs every minute for all callback
+    APIs with deferred callbacks, and straight away for a callback API that has recovered.
+    """
+    if not current_app.config["REDIS_ENABLED"]:
+        return
+
+    for callback_url in [url] if url else get_urls_with_deferred_callbacks():
+        deferred_callbacks = take_deferred_callbacks(callback_url, DEFERRED_CALLBACKS_REPLAY_BATCH_SIZE)
+
+        for callback in deferred_callbacks:
+            notify_celery.tasks[callback["task"]].apply_async(
+                callback["args"], callback["kwargs"], queue=QueueNames.CALLBACKS
+            )
+
+        if len(deferred_callbacks) == DEFERRED_CALLBACKS_REPLAY_BATCH_SIZE:
+            replay_deferred_service_callbacks.apply_async([callback_url], queue=QueueNames.CALLBACKS)
+
+        if deferred_callbacks:
+            current_app.logger.info("Replayed %s deferred callbacks to %s", len(deferred_callbacks), callback_url)
+
+
+def _service_uses_batched_callbacks(service_id):
+    # status updates queued before we started adding the service id can't be batched
+    if not service_id:
+        return False
+
+    return BATCHED_DELIVERY_STATUS_CALLBACKS in SerialisedService.from_id(service_id).permissions
+
+
+def _callback_buffer_name(service_id):
+    return f"delivery-status-callbacks-{service_id}"
+
+
+def _get_delivery_status_callback_data(notification_id, status_update):
+    return {
         "id": str(notification_id),
         "reference": status_update["notification_client_reference"],
         "to": status_update["notification_to"],
@@ -27,14 +148,6 @@ def send_delivery_status_to_service(self, notification_id, encoded_status_update
         "template_version": status_update["template_version"],
     }
 
-    _send_data_to_service_callback_api(
-        self,
-        data,
-        status_update["service_callback_api_url"],
-        status_update["service_callback_api_bearer_token"],
-        "send_delivery_status_to_service",
-    )
-
 
 @notify_celery.task(bind=True, name="send-complaint", max_retries=5, default_retry_delay=300)
 def send_complaint_to_service(self, complaint_data):
@@ -52,40 +165,60 @@ def send_complaint_to_service(self, complaint_data):
         self,
         data,
         complaint["service_callback_api_url"],
-        complaint["service_callback_api_bearer_token"],
+        _get_bearer_token(complaint, COMPLAINT_CALLBACK_TYPE),
         "send_complaint_to_service",
+        callbacks=[complaint],
+        make_task_args=lambda encoded_complaints: encoded_complaints,
     )
 
 
-def _send_data_to_service_callback_api(self, data, service_callback_url, token, function_name):
-    notification_id = data["notification_id"] if "notification_id" in data else data["id"]
-    try:
-        request_kwargs = {
-            "method": "POST",
-            "url": service_callback_url,
-            "data": json.dumps(data),
-            "headers": {"Content-Type": "application/json", "Authorization": f"Bearer {token}"},
-            "timeout": 5,
-        }
+def _get_bearer_token(callback, callback_type):
+    # callbacks that were deferred are kept without their bearer token, so it's looked up again when they're sent
+    if "service_callback_api_bearer_token" in callback:
+        return callback["service_callback_api_bearer_token"]
 
-        converted_url = urlparse(service_callback_url).hostname.replace(".", "-")
-        certificate_name = f"{converted_url}.pem"
+    callback_api = get_service_callback_api(callback["service_callback_api_id"], callback["service_id"], callback_type)
+    return callback_api.bearer_token if callback_api else None
 
-        certificate_path = f"{current_app.config['SSL_CERT_DIR']}/{certificate_name}"
 
-        if os.path.exists(certificate_path):
-            current_app.logger.info(
-                "Certificate [%s] found for [%s] , using as client certificate.", certificate_name, service_callback_url
-            )
-            request_kwargs["cert"] = certificate_path
-        else:
-            current_app.logger.warning(
-                "Certificate [%s] not found for [%s], no client certificate used.",
-                certificate_name,
-                service_callback_url,
-            )
+def _without_bearer_tokens(callbacks):
+    """
+    `callbacks` encoded again without their bearer tokens, so they can be kept in Redis while their callback API is
+    failing. Returns None if any of them were queued before callbacks had their callback API's id, since their token
+    couldn't be looked up again.
+    """
+    if not all("service_callback_api_id" in callback for callback in callbacks):
+        return None
 
-        response = request(**request_kwargs)
+    return [
+        signing.encode({key: value for key, value in callback.items() if key != "service_callback_api_bearer_token"})
+        for callback in callbacks
+    ]
+
+
+def _send_data_to_service_callback_api(
+    self, data, service_callback_url, token, function_name, callbacks, make_task_args
+):
+    """
+    `callbacks` are the decoded callbacks the task was given, and `make_task_args` turns them (once they're encoded
+    without their bearer tokens) back into the task's arguments, to defer the task with if the callback API is failing
+    """
+    if isinstance(data, list):
+        notification_id = f"{data[0]['id']} (and {len(data) - 1} more)"
+    else:
+        notification_id = data["notification_id"] if "notification_id" in data else data["id"]
+
+    if token is None:
+        current_app.logger.info(
+            "%s not sending %s: the callback API for %s has been removed",
+            function_name,
+            notification_id,
+            service_callback_url,
+        )
+        return
+
+    try:
+        response = post_to_service_callback_api(service_callback_url, data, token)
 
         current_app.logger.info(
             "%s sending %s to %s, response %s",
@@ -95,6 +228,28 @@ def _send_data_to_service_callback_api(self, data, service_callback_url, token,
             response.status_code,
         )
         response.raise_for_status()
+    except CallbackCircuitOpen:
+        encoded_callbacks = _without_bearer_tokens(callbacks)
+        if encoded_callbacks is not None and defer_callback(
+            service_callback_url, self.name, make_task_args(encoded_callbacks), self.request.kwargs
+        ):
+            current_app.logger.info(
+                "%s deferring %s: callback url %s is failing", function_name, notification_id, service_callback_url
+            )
+        else:
+            self.retry(queue=QueueNames.CALLBACKS_RETRY)
+    except CallbackHostBusy:
+        current_app.logger.info(
+            "%s delaying %s: too many callbacks in flight to %s", function_name, notification_id, service_callback_url
+        )
+        # this isn't a failure, so it shouldn't use up one of the task's retries
+        self.apply_async(
+            self.request.args,
+            self.request.kwargs,
+            queue=QueueNames.CALLBACKS_RETRY,
+            countdown=current_app.config["SERVICE_CALLBACK_HOST_BUSY_RETRY_SECONDS"],
+            retries=self.request.retries,
+        )
     except RequestException as e:
         current_app.logger.warning(
             "%s request failed for notification_id: %s and url: %s. exception: %s",
@@ -135,6 +290,8 @@ def create_delivery_status_callback_data(notification, service_callback_api):
         ),
         "notification_sent_at": notification.sent_at.strftime(DATETIME_FORMAT) if notification.sent_at else None,
         "notification_type": notification.notification_type,
+        "service_id": str(notification.service_id),
+        "service_callback_api_id": str(service_callback_api.id),
         "service_callback_api_url": service_callback_api.url,
         "service_callback_api_bearer_token": service_callback_api.bearer_token,
         "template_id": str(notification.template_id),
@@ -150,6 +307,8 @@ def create_complaint_callback_data(complaint, notification, service_callback_api
         "reference": notification.client_reference,
         "to": recipient,
         "complaint_date": complaint.complaint_date.strftime(DATETIME_FORMAT),
+        "service_id": str(notification.service_id),
+        "service_callback_api_id": str(service_callback_api.id),
         "service_callback_api_url": service_callback_api.url,
         "service_callback_api_bearer_token": service_callback_api.bearer_token,
     }
@@ -1,4 +1,7 @@
+import csv
+import itertools
 import json
+import string
 from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime
@@ -49,11 +52,16 @@ from app.dao.service_sms_sender_dao import dao_get_service_sms_senders_by_id
 from app.dao.templates_dao import dao_get_template_by_id
 from app.exceptions import DVLAException
 from app.models import DailySortedLetter, LetterCostThreshold
-from app.notifications.process_notifications import persist_notification
+from app.notifications.process_notifications import (
+    build_notification,
+    persist_notification,
+    persist_notifications,
+    send_notifications_to_queue_in_batches,
+)
 from app.notifications.validators import check_service_over_daily_message_limit
 from app.serialised_models import SerialisedService, SerialisedTemplate
 from app.service.utils import service_allowed_to_send_to
-from app.utils import DATETIME_FORMAT
+from app.utils import DATETIME_FORMAT, chunks
 from app.v2.errors import TooManyRequestsError
 
 
@@ -81,12 +89,11 @@ def process_job(job_id, sender_id=None):
     if __sending_limits_for_job_exceeded(service, job, job_id):
         return
 
-    recipient_csv, template, sender_id = get_recipient_csv_and_template_and_sender_id(job)
+    rows, template, sender_id = get_recipient_rows_and_template_and_sender_id(job)
 
     current_app.logger.info("Starting job %s processing %s notifications", job_id, job.notification_count)
 
-    for row in recipient_csv.get_rows():
-        process_row(row, template, job, service, sender_id=sender_id)
+    process_rows(rows, template, job, service, sender_id=sender_id)
 
     job_complete(job, start=start)
 
@@ -116,20 +123,82 @@ def get_recipient_csv_and_template_and_sender_id(job):
     return recipient_csv, template, meta_data.get("sender_id")
 
 
+def get_recipient_rows_and_template_and_sender_id(job):
+    """
+    Like get_recipient_csv_and_template_and_sender_id, but the job file is streamed from S3 and its rows are
+    yielded as they are read, so the whole file is never held in memory
+    """
+    db_template = dao_get_template_by_id(job.template_id, job.template_version)
+    template = db_template._as_utils_template()
+
+    lines, meta_data = s3.stream_job_and_metadata_from_s3(service_id=str(job.service_id), job_id=str(job.id))
+
+    return get_recipient_rows(lines, template), template, meta_data.get("sender_id")
+
+
+def get_recipient_rows(lines, template):
+    # RecipientCSV needs the whole file as a string, so parse it a chunk of records at a time (each chunk with the
+    # header row in front). Each chunk's row numbers are shifted along by the number of rows the chunks before it gave,
+    # not their number of records, as RecipientCSV skips blank rows, so they match the row numbers for the whole file
+    lines = itertools.dropwhile(lambda line: not line.strip(string.whitespace + ","), lines)
+    records = _get_csv_records(lines)
+
+    header = next(records, None)
+    if header is None:
+        return
+
+    rows_before_chunk = 0
+    for chunk in chunks(records, current_app.config["JOB_CSV_STREAM_CHUNK_SIZE"]):
+        rows_in_chunk = 0
+        for row in RecipientCSV(header + "".join(chunk), template=template).get_rows():
+            row.index += rows_before_chunk
+            rows_in_chunk += 1
+            yield row
+        rows_before_chunk += rows_in_chunk
+
+
+def _get_csv_records(lines):
+    # a quoted field can contain newlines, so a record can span several lines. Let the csv module decide where each
+    # record ends (a quote only opens a quoted field at the start of a field) and give back the lines it read for it
+    record_lines = []
+
+    def read_lines():
+        for line in lines:
+            record_lines.append(line)
+            yield line
+
+    for _ in csv.reader(read_lines()):
+        yield "".join(record_lines)
+        record_lines.clear()
+    if record_lines:
+        yield "".join(record_lines)
+
+
+def process_rows(rows, template, job, service, sender_id=None):
+    if current_app.config["PROCESS_JOBS_IN_CHUNKS"] and template.template_type in (SMS_TYPE, EMAIL_TYPE):
+        for chunk in chunks(rows, current_app.config["JOB_CHUNK_SIZE"]):
+            process_row_chunk(chunk, template, job, service, sender_id=sender_id)
+    else:
+        for row in rows:
+            process_row(row, template, job, service, sender_id=sender_id)
+
+
+def _get_notification_data_for_row(row, template, job):
+    return {
+        "template": str(template.id),
+        "template_version": job.template_version,
+        "job": str(job.id),
+        "to": row.recipient,
+        "row_number": row.index,
+        "personalisation": dict(row.personalisation),
+        # row.recipient_and_personalisation gets all columns for the row, even those not in template placeholders
+        "client_reference": dict(row.recipient_and_personalisation).get("reference", None),
+    }
+
+
 def process_row(row, template, job, service, sender_id=None):
     template_type = template.template_type
-    encoded = signing.encode(
-        {
-            "template": str(template.id),
-            "template_version": job.template_version,
-            "job": str(job.id),
-            "to": row.recipient,
-            "row_number": row.index,
-            "personalisation": dict(row.personalisation),
-            # row.recipient_and_personalisation gets all columns for the row, even those not in template placeholders
-            "client_reference": dict(row.recipient_and_personalisation).get("reference", None),
-        }
-    )
+    encoded = signing.encode(_get_notification_data_for_row(row, template, job))
 
     send_fns = {SMS_TYPE: save_sms, EMAIL_TYPE: save_email, LETTER_TYPE: save_letter}
 
@@ -152,6 +221,24 @@ def process_row(row, template, job, service, sender_id=None):
     return notification_id
 
 
+def process_row_chunk(rows, template, job, service, sender_id=None):
+    """
+    Send a chunk of CSV rows to the database queue as a single task. Each row is given its notification id here, so
+    if the task is replayed the same notifications are skipped rather than created twice.
+    """
+    encoded = signing.encode(
+        [{**_get_notification_data_for_row(row, template, job), "id": create_uuid()} for row in rows]
+    )
+
+    send_fn = save_sms_chunk if template.template_type == SMS_TYPE else save_email_chunk
+
+    task_kwargs = {}
+    if sender_id:
+        task_kwargs["sender_id"] = sender_id
+
+    send_fn.apply_async((str(service.id), encoded), task_kwargs, queue=QueueNames.DATABASE)
+
+
 def __sending_limits_for_job_exceeded(service, job, job_id):
     try:
         check_service_over_daily_message_limit(
@@ -278,6 +365,89 @@ def save_email(self, service_id, notification_id, encoded_notification, sender_i
         handle_exception(self, notification, notification_id, e)
 
 
+@notify_celery.task(bind=True, name="save-sms-chunk", max_retries=5, default_retry_delay=300)
+def save_sms_chunk(self, service_id, encoded_notifications, sender_id=None):
+    save_email_or_sms_chunk(self, service_id, encoded_notifications, SMS_TYPE, sender_id=sender_id)
+
+
+@notify_celery.task(bind=True, name="save-email-chunk", max_retries=5, default_retry_delay=300)
+def save_email_chunk(self, service_id, encoded_notifications, sender_id=None):
+    save_email_or_sms_chunk(self, service_id, encoded_notifications, EMAIL_TYPE, sender_id=sender_id)
+
+
+def save_email_or_sms_chunk(self, service_id, encoded_notifications, notification_type, sender_id=None):
+    rows = signing.decode(encoded_notifications)
+    service = SerialisedService.from_id(service_id)
+    # all rows in a chunk come from the same job, so share a template version
+    template = SerialisedTemplate.from_id_and_service_id(
+        rows[0]["template"],
+        service_id=service.id,
+        version=rows[0]["template_version"],
+    )
+
+    if sender_id and notification_type == SMS_TYPE:
+        reply_to_text = dao_get_service_sms_senders_by_id(service_id, sender_id).sms_sender
+    elif sender_id:
+        reply_to_text = dao_get_reply_to_by_id(reply_to_id=sender_id, service_id=service_id).email_address
+    else:
+        reply_to_text = template.reply_to_text
+
+    created_at = datetime.utcnow()
+    notifications = []
+    for row in rows:
+        if not service_allowed_to_send_to(row["to"], service, KEY_TYPE_NORMAL):
+            current_app.logger.info("%s %s failed as restricted service", notification_type, row["id"])
+            continue
+
+        notifications.append(
+            build_notification(
+                template_id=row["template"],
+                template_version=row["template_version"],
+                recipient=row["to"],
+                service=service,
+                personalisation=row.get("personalisation"),
+                notification_type=notification_type,
+                api_key_id=None,
+                key_type=KEY_TYPE_NORMAL,
+                created_at=created_at,
+                job_id=row["job"],
+                job_row_number=row["row_number"],
+                notification_id=row["id"],
+                reply_to_text=reply_to_text,
+                client_reference=row.get("client_reference", None),
+            )
+        )
+
+    try:
+        notification_ids = persist_notifications(
+            notifications,
+            service=service,
+            notification_type=notification_type,
+            key_type=KEY_TYPE_NORMAL,
+            ignore_duplicates=True,
+        )
+    except SQLAlchemyError as e:
+        retry_msg = "{task} chunk for job {job} rows {first} to {last}".format(
+            task=self.__name__, job=rows[0]["job"], first=rows[0]["row_number"], last=rows[-1]["row_number"]
+        )
+        current_app.logger.exception("Retry %s", retry_msg)
+        try:
+            self.retry(queue=QueueNames.RETRY, exc=e)
+        except self.MaxRetriesExceededError:
+            current_app.logger.error("Max retry failed %s", retry_msg)
+        return
+
+    send_notifications_to_queue_in_batches(KEY_TYPE_NORMAL, notification_type, notification_ids)
+
+    current_app.logger.debug(
+        "%s %s created for job %s (%s rows in chunk)",
+        len(notification_ids),
+        notification_type,
+        rows[0]["job"],
+        len(rows),
+    )
+
+
 @notify_celery.task(bind=True, name="save-api-email", max_retries=5, default_retry_delay=300)
 def save_api_email(self, encoded_notification):
     save_api_email_or_sms(self, encoded_notification)
@@ -619,11 +789,10 @@ def process_incomplete_job(job_id):
 
     current_app.logger.info("Resuming job %s from row %s", job_id, resume_from_row)
 
-    recipient_csv, template, sender_id = get_recipient_csv_and_template_and_sender_id(job)
+    rows, template, sender_id = get_recipient_rows_and_template_and_sender_id(job)
 
-    for row in recipient_csv.get_rows():
-        if row.index > resume_from_row:
-            process_row(row, template, job, job.service, sender_id=sender_id)
+    rows = (row for row in rows if row.index > resume_from_row)
+    process_rows(rows, template, job, job.service, sender_id=sender_id)
 
     job_complete(job, resumed=True)
 
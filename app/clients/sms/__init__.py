@@ -1,7 +1,21 @@
+from functools import partial
 from time import monotonic
 
+import requests
+from gds_metrics.metrics import Counter
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
 from app.clients import Client, ClientException
 
+SMS_PROVIDER_REQUESTS = Counter("sms_provider_requests", "HTTP requests made to SMS providers", ["provider"])
+SMS_PROVIDER_CONNECTIONS_OPENED = Counter(
+    "sms_provider_connections_opened",
+    "New connections (and TLS handshakes) made to SMS providers, rather than reusing one from the pool",
+    ["provider"],
+)
+
 
 class SmsClientResponseException(ClientException):
     """
@@ -15,14 +29,83 @@ class SmsClientResponseException(ClientException):
         return f"SMS client error ({self.message})"
 
 
+def _instrumented_pool_class(pool_class):
+    class InstrumentedConnectionPool(pool_class):
+        def __init__(self, *args, provider, **kwargs):
+            self.provider = provider
+            super().__init__(*args, **kwargs)
+
+        def _new_conn(self):
+            SMS_PROVIDER_CONNECTIONS_OPENED.labels(self.provider).inc()
+            return super()._new_conn()
+
+    return InstrumentedConnectionPool
+
+
+_InstrumentedHTTPConnectionPool = _instrumented_pool_class(HTTPConnectionPool)
+_InstrumentedHTTPSConnectionPool = _instrumented_pool_class(HTTPSConnectionPool)
+
+
+class _SmsProviderAdapter(HTTPAdapter):
+    """
+    An HTTPAdapter that counts requests and new connections for a provider, so we can see how often connections are
+    reused
+    """
+
+    def __init__(self, provider, *args, **kwargs):
+        self.provider = provider
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": partial(_InstrumentedHTTPConnectionPool, provider=self.provider),
+            "https": partial(_InstrumentedHTTPSConnectionPool, provider=self.provider),
+        }
+
+    def send(self, *args, **kwargs):
+        SMS_PROVIDER_REQUESTS.labels(self.provider).inc()
+        return super().send(*args, **kwargs)
+
+
 class SmsClient(Client):
     """
     Base Sms client for sending smss.
     """
 
+    # whether the provider takes a list of recipients for one message, and matches delivery receipts to them by
+    # recipient rather than by reference
+    supports_batch_sending = False
+
     def init_app(self, current_app, statsd_client):
         self.current_app = current_app
         self.statsd_client = statsd_client
+        self.timeout = (
+            current_app.config["SMS_PROVIDER_CONNECT_TIMEOUT_SECONDS"],
+            current_app.config["SMS_PROVIDER_READ_TIMEOUT_SECONDS"],
+        )
+
+        # Keep connections to the provider open between messages, so that we only pay for the TCP and TLS handshakes
+        # once per connection rather than once per message. Only failures to connect are retried: once the request has
+        # been sent we can't tell whether the provider has accepted the message, and retrying could send it twice.
+        adapter = _SmsProviderAdapter(
+            self.name,
+            pool_connections=1,
+            pool_maxsize=current_app.config["SMS_PROVIDER_CONNECTION_POOL_SIZE"],
+            max_retries=Retry(
+                total=None,
+                connect=current_app.config["SMS_PROVIDER_CONNECT_RETRIES"],
+                read=0,
+                status=0,
+                other=0,
+                redirect=0,
+                backoff_factor=0.1,
+                raise_on_status=False,
+            ),
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def record_outcome(self, success):
         if success:
@@ -35,10 +118,22 @@ class SmsClient(Client):
             )
 
     def send_sms(self, to, content, reference, international, sender):
+        return self._send(self.try_send_sms, to, content, reference, international, sender)
+
+    def send_sms_batch(self, recipients, content, reference, international, sender):
+        """
+        Send the same message to several recipients in one request. Only for clients with `supports_batch_sending`,
+        which implement `try_send_sms_batch`.
+        """
+        if not self.supports_batch_sending:
+            raise ClientException(f"{self.name} can't send a message to several recipients in one request")
+        return self._send(self.try_send_sms_batch, recipients, content, reference, international, sender)
+
+    def _send(self, try_send, to, content, reference, international, sender):
         start_time = monotonic()
 
         try:
-            response = self.try_send_sms(to, content, reference, international, sender)
+            response = try_send(to, content, reference, international, sender)
             self.record_outcome(True)
         except SmsClientResponseException as e:
             self.record_outcome(False)
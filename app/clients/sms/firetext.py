@@ -1,7 +1,7 @@
 import json
 import logging
 
-from requests import RequestException, request
+from requests import RequestException
 
 from app.clients.sms import SmsClient, SmsClientResponseException
 
@@ -66,7 +66,7 @@ class FiretextClient(SmsClient):
         }
 
         try:
-            response = request("POST", self.url, data=data, timeout=60)
+            response = self.session.request("POST", self.url, data=data, timeout=self.timeout)
             response.raise_for_status()
             try:
                 json.loads(response.text)
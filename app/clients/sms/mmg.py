@@ -1,6 +1,6 @@
 import json
 
-from requests import RequestException, request
+from requests import RequestException
 
 from app.clients.sms import SmsClient, SmsClientResponseException
 
@@ -91,12 +91,12 @@ class MMGClient(SmsClient):
         data = {"reqType": "BULK", "MSISDN": to, "msg": content, "sender": sender, "cid": reference, "multi": True}
 
         try:
-            response = request(
+            response = self.session.request(
                 "POST",
                 self.mmg_url,
                 data=json.dumps(data),
                 headers={"Content-Type": "application/json", "Authorization": "Basic {}".format(self.api_key)},
-                timeout=60,
+                timeout=self.timeout,
             )
 
             response.raise_for_status()
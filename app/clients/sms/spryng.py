@@ -1,7 +1,7 @@
 import json
 import logging
 
-from requests import RequestException, request
+from requests import RequestException
 
 from app.clients.sms import SmsClient, SmsClientResponseException
 
@@ -34,6 +34,8 @@ class SpryngClient(SmsClient):
     Spryng sms client.
     """
 
+    supports_batch_sending = True
+
     def init_app(self, *args, **kwargs):
         super().init_app(*args, **kwargs)
         self.api_key = self.current_app.config.get("SPRYNG_API_KEY")
@@ -44,9 +46,12 @@ class SpryngClient(SmsClient):
         return "spryng"
 
     def try_send_sms(self, to, content, reference, international, sender):
+        return self.try_send_sms_batch([to], content, reference, international, sender)
+
+    def try_send_sms_batch(self, recipients, content, reference, international, sender):
         data = {
             "originator": sender,
-            "recipients": [to.replace("+", "")],
+            "recipients": [to.replace("+", "") for to in recipients],
             "body": content,
             "reference": reference,
             "route": "business",
@@ -54,11 +59,11 @@ class SpryngClient(SmsClient):
         }
 
         try:
-            response = request(
+            response = self.session.request(
                 "POST",
                 self.url,
                 data=json.dumps(data),
-                timeout=60,
+                timeout=self.timeout,
                 headers={"Content-Type": "application/json", "Authorization": "Bearer {}".format(self.api_key)},
             )
 
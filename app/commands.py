@@ -38,7 +38,12 @@ from app.dao.fact_billing_dao import (
     fetch_billing_data_for_day,
     update_ft_billing,
 )
+from app.dao.fact_platform_stats_dao import update_fact_platform_stats_for_day
 from app.dao.jobs_dao import dao_get_job_by_id
+from app.dao.notification_partitions_dao import (
+    PARTITIONED_TABLES,
+    dao_partition_table_by_day,
+)
 from app.dao.notifications_dao import move_notifications_to_notification_history
 from app.dao.organisation_dao import (
     dao_add_service_to_organisation,
@@ -737,6 +742,31 @@ def fix_billable_units():
     print("End fix_billable_units")
 
 
+@notify_command(name="partition-notifications-by-day")
+@click.option("-t", "--table", type=click.Choice(PARTITIONED_TABLES), required=True)
+def partition_notifications_by_day(table):
+    """
+    Convert notifications or notification_history into a table partitioned by day. Takes an exclusive lock on the table
+    for as long as it takes to swap it for the partitioned table, which doesn't depend on how big it is.
+    """
+    created = dao_partition_table_by_day(table, current_app.config["NOTIFICATION_PARTITIONS_DAYS_AHEAD"])
+    current_app.logger.info("Partitioned %s by day, created partitions %s", table, created)
+
+
+@notify_command(name="populate-platform-stats")
+@click.option("-s", "--start_date", required=True, help="start date inclusive", type=click_dt(format="%Y-%m-%d"))
+@click.option("-e", "--end_date", required=True, help="end date inclusive", type=click_dt(format="%Y-%m-%d"))
+def populate_platform_stats(start_date, end_date):
+    """
+    Fill ft_platform_notification_status and ft_platform_billing from ft_notification_status and ft_billing, a day at
+    a time. The `update-platform-stats` task keeps the most recent days up to date after that.
+    """
+    for day in rrule.rrule(rrule.DAILY, dtstart=start_date, until=end_date):
+        start = monotonic()
+        update_fact_platform_stats_for_day(day.date())
+        current_app.logger.info("Populated platform stats for %s in %.1f seconds", day.date(), monotonic() - start)
+
+
 @notify_command(name="process-row-from-job")
 @click.option("-j", "--job_id", required=True, help="Job id")
 @click.option("-n", "--job_row_number", type=int, required=True, help="Job id")
@@ -149,8 +149,42 @@ class Config(object):
     }
     PAGE_SIZE = 50
     API_PAGE_SIZE = 250
+    # number of notification ids in each deliver task published by the batch endpoints
+    NOTIFICATION_BATCH_DELIVERY_CHUNK_SIZE = 100
+    # sms and email jobs can save their rows in chunks (one task and one INSERT per chunk) rather than a task per row
+    PROCESS_JOBS_IN_CHUNKS = os.getenv("PROCESS_JOBS_IN_CHUNKS") == "1"
+    JOB_CHUNK_SIZE = int(os.getenv("JOB_CHUNK_SIZE", 500))
+    # number of rows of a job file that are parsed at a time while it is streamed from S3
+    JOB_CSV_STREAM_CHUNK_SIZE = 1_000
+    # delivery receipts can be collected in Redis and processed in batches of up to RECEIPT_BATCH_MAX_SIZE, each
+    # waiting at most RECEIPT_BATCH_MAX_WAIT_MS for others to join it
+    SES_RECEIPT_BATCHING_ENABLED = os.getenv("SES_RECEIPT_BATCHING_ENABLED") == "1"
+    SMS_RECEIPT_BATCHING_ENABLED = os.getenv("SMS_RECEIPT_BATCHING_ENABLED") == "1"
+    RECEIPT_BATCH_MAX_SIZE = int(os.getenv("RECEIPT_BATCH_MAX_SIZE", 500))
+    RECEIPT_BATCH_MAX_WAIT_MS = int(os.getenv("RECEIPT_BATCH_MAX_WAIT_MS", 200))
     TEST_MESSAGE_FILENAME = "Test message"
     ONE_OFF_MESSAGE_FILENAME = "Report"
+    # once notifications is partitioned by day (see `flask command partition-notifications-by-day`), partitions are
+    # created this many days ahead
+    NOTIFICATION_PARTITIONS_DAYS_AHEAD = 7
+    # notifications past retention can be deleted for every service at once, DELETE_NOTIFICATIONS_BATCH_SIZE at a
+    # time, rather than with a task for each service
+    DELETE_NOTIFICATIONS_IN_ONE_PASS = os.getenv("DELETE_NOTIFICATIONS_IN_ONE_PASS") == "1"
+    DELETE_NOTIFICATIONS_BATCH_SIZE = int(os.getenv("DELETE_NOTIFICATIONS_BATCH_SIZE", 10_000))
+    # ft_billing can be updated for only the days and services with notifications that have changed since it was last
+    # updated, rather than recalculated for every service for the last 10 days
+    INCREMENTAL_FT_BILLING = os.getenv("INCREMENTAL_FT_BILLING") == "1"
+    # ft_notification_status can be updated with a task for each day and notification type (or for each of
+    # NIGHTLY_NOTIFICATION_STATUS_PARTITIONS groups of services on that day), rather than a task for every service
+    NIGHTLY_NOTIFICATION_STATUS_BY_DAY = os.getenv("NIGHTLY_NOTIFICATION_STATUS_BY_DAY") == "1"
+    NIGHTLY_NOTIFICATION_STATUS_PARTITIONS = int(os.getenv("NIGHTLY_NOTIFICATION_STATUS_PARTITIONS", 1))
+    # today's notifications can be counted by service, template and status in Redis for the dashboard, rather than
+    # counted in the database every time (see app/notifications/status_counts.py)
+    NOTIFICATION_STATUS_COUNTS_IN_REDIS = os.getenv("NOTIFICATION_STATUS_COUNTS_IN_REDIS") == "1"
+    # platform-wide stats (the performance dashboard, platform stats and daily volumes reports) can be read from the
+    # daily ft_platform_* rollups rather than added up from ft_notification_status and ft_billing. Only turn this on
+    # once the rollups have been backfilled with `flask command populate-platform-stats`.
+    PLATFORM_STATS_FROM_ROLLUPS = os.getenv("PLATFORM_STATS_FROM_ROLLUPS") == "1"
     MAX_VERIFY_CODE_COUNT = 5
     MAX_FAILED_LOGIN_COUNT = 10
 
@@ -255,11 +289,28 @@ class Config(object):
                 "schedule": crontab(minute="0, 15, 30, 45"),
                 "options": {"queue": QueueNames.PERIODIC},
             },
+            "reconcile-notification-status-counts": {
+                "task": "reconcile-notification-status-counts",
+                "schedule": crontab(minute="*/10"),
+                "options": {"queue": QueueNames.PERIODIC},
+            },
+            "start-notification-status-counts-for-tomorrow": {
+                "task": "start-notification-status-counts-for-tomorrow",
+                # before midnight in London whether it's GMT or BST
+                "schedule": crontab(hour=22, minute=30),
+                "options": {"queue": QueueNames.PERIODIC},
+            },
             "run-populate-annual-billing": {
                 "task": "run-populate-annual-billing",
                 "schedule": crontab(minute=1, hour=2, day_of_month=1, month_of_year=4),
                 "options": {"queue": QueueNames.PERIODIC},
             },
+            # app/celery/service_callback_tasks.py
+            "replay-deferred-service-callbacks": {
+                "task": "replay-deferred-service-callbacks",
+                "schedule": crontab(),  # Every minute
+                "options": {"queue": QueueNames.PERIODIC},
+            },
             # app/celery/nightly_tasks.py
             "timeout-sending-notifications": {
                 "task": "timeout-sending-notifications",
@@ -276,6 +327,12 @@ class Config(object):
                 "schedule": crontab(hour="*", minute=0),
                 "options": {"queue": QueueNames.REPORTING},
             },
+            "update-platform-stats": {
+                "task": "update-platform-stats",
+                # between the hourly runs of 'update-ft-billing-for-today'
+                "schedule": crontab(hour="*", minute=30),
+                "options": {"queue": QueueNames.REPORTING},
+            },
             "create-nightly-notification-status": {
                 "task": "create-nightly-notification-status",
                 # after 'timeout-sending-notifications'
@@ -288,6 +345,11 @@ class Config(object):
                 "schedule": crontab(hour=3, minute=0),
                 "options": {"queue": QueueNames.REPORTING},
             },
+            "create-notification-partitions": {
+                "task": "create-notification-partitions",
+                "schedule": crontab(hour=1, minute=0),
+                "options": {"queue": QueueNames.PERIODIC},
+            },
             "delete-inbound-sms": {
                 "task": "delete-inbound-sms",
                 "schedule": crontab(hour=1, minute=40),
@@ -422,8 +484,30 @@ class Config(object):
     MMG_URL = os.environ.get("MMG_URL", "https://api.mmg.co.uk/jsonv2a/api.php")
     FIRETEXT_URL = os.environ.get("FIRETEXT_URL", "https://www.firetext.co.uk/api/sendsms/json")
     SPRYNG_URL = os.environ.get("SPRYNG_URL", "https://rest.spryngsms.com/v1/messages")
+
+    # connections to each SMS provider are kept open and reused. The pool should be at least as big as the number of
+    # threads or greenlets in a process that send SMS, or the extra ones will open a new connection for each message.
+    SMS_PROVIDER_CONNECTION_POOL_SIZE = int(os.environ.get("SMS_PROVIDER_CONNECTION_POOL_SIZE", 10))
+    SMS_PROVIDER_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("SMS_PROVIDER_CONNECT_TIMEOUT_SECONDS", 5))
+    SMS_PROVIDER_READ_TIMEOUT_SECONDS = float(os.environ.get("SMS_PROVIDER_READ_TIMEOUT_SECONDS", 60))
+    SMS_PROVIDER_CONNECT_RETRIES = int(os.environ.get("SMS_PROVIDER_CONNECT_RETRIES", 2))
+    # send SMS from the batch deliver tasks that share content and sender in one request to providers that support it
+    SMS_PROVIDER_BATCHING_ENABLED = os.environ.get("SMS_PROVIDER_BATCHING_ENABLED") == "1"
+    SMS_PROVIDER_BATCH_SIZE = int(os.environ.get("SMS_PROVIDER_BATCH_SIZE", 100))
     SES_STUB_URL = os.environ.get("SES_STUB_URL")
 
+    # callbacks to services reuse open connections to each host, and no more than this many are sent to one host at
+    # once across all workers. The rest wait SERVICE_CALLBACK_HOST_BUSY_RETRY_SECONDS and try again.
+    SERVICE_CALLBACK_MAX_CONCURRENCY_PER_HOST = int(os.environ.get("SERVICE_CALLBACK_MAX_CONCURRENCY_PER_HOST", 20))
+    SERVICE_CALLBACK_HOST_BUSY_RETRY_SECONDS = int(os.environ.get("SERVICE_CALLBACK_HOST_BUSY_RETRY_SECONDS", 5))
+    # a callback URL that fails (or takes longer than SERVICE_CALLBACK_SLOW_RESPONSE_SECONDS) this many times, without
+    # a gap of SERVICE_CALLBACK_FAILURE_WINDOW_SECONDS between failures, has its callbacks put aside for
+    # SERVICE_CALLBACK_CIRCUIT_OPEN_SECONDS (doubling each time it fails again) and replayed when it recovers
+    SERVICE_CALLBACK_FAILURE_THRESHOLD = int(os.environ.get("SERVICE_CALLBACK_FAILURE_THRESHOLD", 10))
+    SERVICE_CALLBACK_FAILURE_WINDOW_SECONDS = int(os.environ.get("SERVICE_CALLBACK_FAILURE_WINDOW_SECONDS", 60))
+    SERVICE_CALLBACK_CIRCUIT_OPEN_SECONDS = int(os.environ.get("SERVICE_CALLBACK_CIRCUIT_OPEN_SECONDS", 60))
+    SERVICE_CALLBACK_SLOW_RESPONSE_SECONDS = float(os.environ.get("SERVICE_CALLBACK_SLOW_RESPONSE_SECONDS", 4))
+
     AWS_REGION = "eu-west-1"
 
     CBC_PROXY_ENABLED = True
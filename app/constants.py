@@ -184,6 +184,7 @@ UPLOAD_LETTERS = "upload_letters"
 INTERNATIONAL_LETTERS = "international_letters"
 EXTRA_EMAIL_FORMATTING = "extra_email_formatting"
 EXTRA_LETTER_FORMATTING = "extra_letter_formatting"
+BATCHED_DELIVERY_STATUS_CALLBACKS = "batched_delivery_status_callbacks"
 SERVICE_PERMISSION_TYPES = [
     EMAIL_TYPE,
     SMS_TYPE,
@@ -200,6 +201,7 @@ SERVICE_PERMISSION_TYPES = [
     INTERNATIONAL_LETTERS,
     EXTRA_EMAIL_FORMATTING,
     EXTRA_LETTER_FORMATTING,
+    BATCHED_DELIVERY_STATUS_CALLBACKS,
 ]
 
 # List of available permissions
@@ -315,6 +317,8 @@ class Retention:
 # Redis cache keys
 class CacheKeys:
     FT_BILLING_FOR_TODAY_UPDATED_AT_UTC_ISOFORMAT = "update_ft_billing_for_today:updated-at-utc-isoformat"
+    FT_BILLING_INCLUDES_CHANGES_UNTIL_UTC_ISOFORMAT = "ft_billing:includes-changes-until-utc-isoformat"
+    PLATFORM_STATS_UPDATED_AT_UTC_ISOFORMAT = "update_platform_stats:updated-at-utc-isoformat"
     NUMBER_OF_TIMES_OVER_SLOW_SMS_DELIVERY_THRESHOLD = "slow-sms-delivery:number-of-times-over-threshold"
 
 
@@ -1,9 +1,12 @@
+import functools
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
 from datetime import date, datetime, timedelta
 from typing import Any, Optional
 
 from flask import current_app
 from notifications_utils.timezones import convert_utc_to_bst
-from sqlalchemy import Date, Integer, and_, desc, func, not_, union
+from sqlalchemy import Date, Integer, and_, desc, func, not_, or_, text, union
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.sql.expression import case, literal, tuple_
 
@@ -30,6 +33,7 @@ from app.models import (
     AnnualBilling,
     FactBilling,
     FactBillingLetterDespatch,
+    FactPlatformBilling,
     LetterRate,
     Notification,
     NotificationAllTimeView,
@@ -517,6 +521,33 @@ def fetch_billing_data_for_day(process_day: date, service_ids=None, check_permis
     return billing_data
 
 
+def fetch_service_ids_with_billing_changes_by_day(since: datetime, start_day: date, end_day: date):
+    """
+    The services that have had notifications created, or change status, since `since`, for each day from `start_day`
+    to `end_day` that the notifications were created on (in UK time). Only those days and services can have different
+    billing data to the last time it was worked out.
+
+    There's no index on updated_at - it would stop status updates being HOT updates - so this scans the notifications
+    created in the whole range of days.
+    """
+    bst_date = func.date(func.timezone("Europe/London", func.timezone("UTC", NotificationAllTimeView.created_at)))
+    query = (
+        db.session.query(bst_date.label("bst_date"), NotificationAllTimeView.service_id)
+        .filter(
+            NotificationAllTimeView.created_at >= get_london_midnight_in_utc(start_day),
+            NotificationAllTimeView.created_at < get_london_midnight_in_utc(end_day + timedelta(days=1)),
+            or_(NotificationAllTimeView.created_at >= since, NotificationAllTimeView.updated_at >= since),
+            NotificationAllTimeView.key_type.in_((KEY_TYPE_NORMAL, KEY_TYPE_TEAM)),
+        )
+        .distinct()
+    )
+
+    service_ids_by_day = defaultdict(set)
+    for row in query:
+        service_ids_by_day[row.bst_date].add(row.service_id)
+    return dict(service_ids_by_day)
+
+
 def _query_for_billing_data(notification_type, start_date, end_date, service_ids, check_permissions):
     base_query = db.session.query(NotificationAllTimeView).join(
         Service, NotificationAllTimeView.service_id == Service.id
@@ -635,40 +666,110 @@ def _query_for_billing_data(notification_type, start_date, end_date, service_ids
     return query.all()
 
 
+# plain copies of the rates, so they can be kept between tasks without being tied to a database session
+NonLetterRate = namedtuple("NonLetterRate", ["notification_type", "valid_from", "rate"])
+LetterRateForBilling = namedtuple("LetterRateForBilling", ["start_date", "crown", "sheet_count", "post_class", "rate"])
+
+# changes whenever anything in `rates` or `letter_rates` is added, changed or removed
+RATES_FINGERPRINT_SQL = """
+    SELECT
+        (SELECT md5(coalesce(string_agg(rates::text, ',' ORDER BY id), '')) FROM rates),
+        (SELECT md5(coalesce(string_agg(letter_rates::text, ',' ORDER BY id), '')) FROM letter_rates)
+"""
+
+# (fingerprint, non_letter_rates, letter_rates) from the last time the rates were read
+_rates_for_billing = None
+
+
 def get_rates_for_billing():
-    non_letter_rates = Rate.query.order_by(desc(Rate.valid_from)).all()
-    letter_rates = LetterRate.query.order_by(desc(LetterRate.start_date)).all()
+    """
+    All the rates, newest first. They're read once and kept until the rates tables change, so that every billing task
+    a worker runs can use the same RateIndex (see `get_rate`).
+    """
+    global _rates_for_billing
+
+    fingerprint = tuple(db.session.execute(text(RATES_FINGERPRINT_SQL)).one())
+    if _rates_for_billing and _rates_for_billing[0] == fingerprint:
+        return _rates_for_billing[1], _rates_for_billing[2]
+
+    non_letter_rates = [
+        NonLetterRate(r.notification_type, r.valid_from, r.rate)
+        for r in Rate.query.order_by(desc(Rate.valid_from)).all()
+    ]
+    letter_rates = [
+        LetterRateForBilling(r.start_date, r.crown, r.sheet_count, r.post_class, r.rate)
+        for r in LetterRate.query.order_by(desc(LetterRate.start_date)).all()
+    ]
+    _rates_for_billing = (fingerprint, non_letter_rates, letter_rates)
     return non_letter_rates, letter_rates
 
 
+class RateIndex:
+    """
+    Rates grouped by what they're for - notification type, or crown, sheet count and post class for letters - with each
+    group's start dates in order, so the rate for a day can be found by bisecting rather than by looking through every
+    rate. Lookups are memoised, as a day's billing rows only ever need a handful of different rates.
+    """
+
+    def __init__(self, non_letter_rates, letter_rates):
+        self.non_letter_rates = self._index(non_letter_rates, lambda r: r.notification_type, lambda r: r.valid_from)
+        self.letter_rates = self._index(
+            letter_rates, lambda r: (r.crown, r.sheet_count, r.post_class), lambda r: r.start_date
+        )
+        self.get = functools.lru_cache(maxsize=4096)(self._get)
+
+    @staticmethod
+    def _index(rates, key, start):
+        grouped = defaultdict(list)
+        # rates come newest first, and the first of any that start at the same time is the one to use, so add them in
+        # reverse to have it last once they're (stably) sorted oldest first
+        for rate in reversed(rates):
+            grouped[key(rate)].append(rate)
+
+        index = {}
+        for group_key, group in grouped.items():
+            group.sort(key=start)
+            index[group_key] = ([start(r) for r in group], [r.rate for r in group])
+        return index
+
+    @staticmethod
+    def _find(index, key, start_of_day):
+        starts, rates = index.get(key, ((), ()))
+        position = bisect_right(starts, start_of_day)
+        if not position:
+            # not StopIteration, which would become a RuntimeError in the generators that look up rates
+            raise LookupError(f"No rate for {key} on {start_of_day}")
+        return rates[position - 1]
+
+    def _get(self, notification_type, date, crown, letter_page_count, post_class):
+        if notification_type == LETTER_TYPE:
+            if letter_page_count == 0:
+                return 0
+            # if crown is not set default to true, this is okay because the rates are the same for both crown and
+            # non-crown.
+            crown = crown or True
+            return self._find(
+                self.letter_rates, (crown, letter_page_count, post_class), get_london_midnight_in_utc(date)
+            )
+        elif notification_type == SMS_TYPE:
+            return self._find(self.non_letter_rates, notification_type, get_london_midnight_in_utc(date))
+        else:
+            return 0
+
+
+# the RateIndex for the last rates `get_rate` was given, and those rates
+_rate_index = (None, None, None)
+
+
 def get_rate(
     non_letter_rates, letter_rates, notification_type, date, crown=None, letter_page_count=None, post_class="second"
 ):
-    start_of_day = get_london_midnight_in_utc(date)
+    global _rate_index
 
-    if notification_type == LETTER_TYPE:
-        if letter_page_count == 0:
-            return 0
-        # if crown is not set default to true, this is okay because the rates are the same for both crown and non-crown.
-        crown = crown or True
-        return next(
-            r.rate
-            for r in letter_rates
-            if (
-                start_of_day >= r.start_date
-                and crown == r.crown
-                and letter_page_count == r.sheet_count
-                and post_class == r.post_class
-            )
-        )
-    elif notification_type == SMS_TYPE:
-        return next(
-            r.rate
-            for r in non_letter_rates
-            if (notification_type == r.notification_type and start_of_day >= r.valid_from)
-        )
-    else:
-        return 0
+    if _rate_index[0] is not non_letter_rates or _rate_index[1] is not letter_rates:
+        _rate_index = (non_letter_rates, letter_rates, RateIndex(non_letter_rates, letter_rates))
+
+    return _rate_index[2].get(notification_type, date, crown, letter_page_count, post_class)
 
 
 def update_ft_billing(billing_data: list, process_day: date):
@@ -973,6 +1074,8 @@ def fetch_usage_for_organisation(organisation_id, year) -> tuple[Any, Optional[s
 
 def fetch_daily_volumes_for_platform(start_date, end_date):
     # query to return the total notifications sent per day for each channel. NB start and end dates are inclusive
+    if current_app.config["PLATFORM_STATS_FROM_ROLLUPS"]:
+        return _fetch_daily_volumes_for_platform_from_rollups(start_date, end_date)
 
     daily_volume_stats = (
         db.session.query(
@@ -1027,8 +1130,47 @@ def fetch_daily_volumes_for_platform(start_date, end_date):
     return aggregated_totals
 
 
+def _fetch_daily_volumes_for_platform_from_rollups(start_date, end_date):
+    def total(column, notification_type):
+        return func.sum(case([(FactPlatformBilling.notification_type == notification_type, column)], else_=0))
+
+    return (
+        db.session.query(
+            FactPlatformBilling.bst_date.cast(db.Text).label("bst_date"),
+            total(FactPlatformBilling.notifications_sent, SMS_TYPE).label("sms_totals"),
+            total(FactPlatformBilling.billable_units, SMS_TYPE).label("sms_fragment_totals"),
+            total(FactPlatformBilling.chargeable_units, SMS_TYPE).label("sms_chargeable_units"),
+            total(FactPlatformBilling.notifications_sent, EMAIL_TYPE).label("email_totals"),
+            total(FactPlatformBilling.notifications_sent, LETTER_TYPE).label("letter_totals"),
+            total(FactPlatformBilling.billable_units, LETTER_TYPE).label("letter_sheet_totals"),
+        )
+        .filter(FactPlatformBilling.bst_date >= start_date, FactPlatformBilling.bst_date <= end_date)
+        .group_by(FactPlatformBilling.bst_date)
+        .order_by(FactPlatformBilling.bst_date)
+        .all()
+    )
+
+
 def fetch_daily_sms_provider_volumes_for_platform(start_date, end_date):
     # query to return the total notifications sent per day for each channel. NB start and end dates are inclusive
+    if current_app.config["PLATFORM_STATS_FROM_ROLLUPS"]:
+        return (
+            db.session.query(
+                FactPlatformBilling.bst_date,
+                FactPlatformBilling.provider,
+                FactPlatformBilling.notifications_sent.label("sms_totals"),
+                FactPlatformBilling.billable_units.label("sms_fragment_totals"),
+                FactPlatformBilling.chargeable_units.label("sms_chargeable_units"),
+                FactPlatformBilling.cost.label("sms_cost"),
+            )
+            .filter(
+                FactPlatformBilling.notification_type == SMS_TYPE,
+                FactPlatformBilling.bst_date >= start_date,
+                FactPlatformBilling.bst_date <= end_date,
+            )
+            .order_by(FactPlatformBilling.bst_date, FactPlatformBilling.provider)
+            .all()
+        )
 
     daily_volume_stats = (
         db.session.query(
@@ -1,7 +1,9 @@
+import uuid
 from datetime import datetime, timedelta
 
-from sqlalchemy import Date, case, func
-from sqlalchemy.dialects.postgresql import insert
+from flask import current_app
+from sqlalchemy import Date, Text, case, column, func, text, values
+from sqlalchemy.dialects.postgresql import UUID, insert
 from sqlalchemy.sql.expression import extract, literal
 from sqlalchemy.types import DateTime, Integer
 
@@ -24,11 +26,13 @@ from app.constants import (
 from app.dao.dao_utils import autocommit
 from app.models import (
     FactNotificationStatus,
+    FactPlatformNotificationStatus,
     Notification,
     NotificationAllTimeView,
     Service,
     Template,
 )
+from app.notifications.status_counts import get_todays_notification_status_counts
 from app.utils import (
     get_london_midnight_in_utc,
     get_london_month_from_utc_column,
@@ -92,6 +96,100 @@ def update_fact_notification_status(process_day, notification_type, service_id):
     )
 
 
+@autocommit
+def update_fact_notification_status_for_day(process_day, notification_type, partition=0, partitions=1):
+    """
+    Update ft_notification_status for a type of notification on `process_day`, for every service at once, or for one
+    of `partitions` groups of services (by a hash of their id) so that the work can be shared between tasks.
+
+    Notifications are counted in one pass, and the counts compared with the rows already there: only rows whose count
+    has changed are updated, and only rows for counts that no longer exist are deleted. Returns the number of rows
+    created or updated, and the number deleted.
+    """
+    in_partition = "AND mod(abs(hashtext({}::text)), :partitions) = :partition" if partitions > 1 else ""
+    params = {
+        "process_day": process_day,
+        "notification_type": notification_type,
+        "start_date": get_london_midnight_in_utc(process_day),
+        "end_date": get_london_midnight_in_utc(process_day + timedelta(days=1)),
+        "partition": partition,
+        "partitions": partitions,
+        "now": datetime.utcnow(),
+    }
+
+    db.session.execute(
+        text(
+            f"""
+            CREATE TEMP TABLE NOTIFICATION_STATUS_COUNTS ON COMMIT DROP AS
+            SELECT
+                template_id,
+                service_id,
+                COALESCE(job_id, '00000000-0000-0000-0000-000000000000') AS job_id,
+                key_type,
+                notification_status,
+                count(*) AS notification_count
+            FROM notifications_all_time_view
+            WHERE created_at >= :start_date
+              AND created_at < :end_date
+              AND notification_type = :notification_type
+              AND key_type IN ('{KEY_TYPE_NORMAL}', '{KEY_TYPE_TEAM}')
+              {in_partition.format("service_id")}
+            GROUP BY template_id, service_id, 3, key_type, notification_status
+            """
+        ),
+        params,
+    )
+
+    upserted = db.session.execute(
+        text(
+            """
+            INSERT INTO ft_notification_status (
+                bst_date, template_id, service_id, job_id, notification_type, key_type, notification_status,
+                notification_count, created_at
+            )
+            SELECT
+                :process_day, template_id, service_id, job_id, :notification_type, key_type, notification_status,
+                notification_count, :now
+            FROM NOTIFICATION_STATUS_COUNTS
+            ON CONFLICT (bst_date, template_id, service_id, job_id, notification_type, key_type, notification_status)
+            DO UPDATE SET notification_count = excluded.notification_count, updated_at = :now
+            WHERE ft_notification_status.notification_count != excluded.notification_count
+            """
+        ),
+        params,
+    )
+
+    deleted = db.session.execute(
+        text(
+            f"""
+            DELETE FROM ft_notification_status
+            WHERE bst_date = :process_day
+              AND notification_type = :notification_type
+              {in_partition.format("ft_notification_status.service_id")}
+              AND NOT EXISTS (
+                SELECT 1 FROM NOTIFICATION_STATUS_COUNTS counts
+                WHERE (
+                        counts.template_id,
+                        counts.service_id,
+                        counts.job_id,
+                        counts.key_type,
+                        counts.notification_status
+                    ) = (
+                        ft_notification_status.template_id,
+                        ft_notification_status.service_id,
+                        ft_notification_status.job_id,
+                        ft_notification_status.key_type,
+                        ft_notification_status.notification_status
+                    )
+              )
+            """
+        ),
+        params,
+    )
+
+    return upserted.rowcount, deleted.rowcount
+
+
 def fetch_notification_status_for_service_by_month(start_date, end_date, service_id):
     return (
         db.session.query(
@@ -135,6 +233,35 @@ def fetch_notification_status_for_service_for_day(bst_day, service_id):
     )
 
 
+def fetch_notification_status_counts_for_day(bst_day):
+    """
+    Notifications created on `bst_day` by service, notification type, template, key type and status, for
+    `set_notification_status_counts`
+    """
+    return (
+        db.session.query(
+            Notification.service_id,
+            Notification.notification_type,
+            Notification.template_id,
+            Notification.key_type,
+            Notification.status,
+            func.count().label("count"),
+        )
+        .filter(
+            Notification.created_at >= get_london_midnight_in_utc(bst_day),
+            Notification.created_at < get_london_midnight_in_utc(bst_day + timedelta(days=1)),
+        )
+        .group_by(
+            Notification.service_id,
+            Notification.notification_type,
+            Notification.template_id,
+            Notification.key_type,
+            Notification.status,
+        )
+        .all()
+    )
+
+
 def fetch_notification_status_for_service_for_today_and_7_previous_days(service_id, by_template=False, limit_days=7):
     start_date = midnight_n_days_ago(limit_days)
     now = datetime.utcnow()
@@ -149,24 +276,35 @@ def fetch_notification_status_for_service_for_today_and_7_previous_days(service_
         FactNotificationStatus.key_type != KEY_TYPE_TEST,
     )
 
-    stats_for_today = (
-        db.session.query(
-            Notification.notification_type.cast(db.Text),
-            Notification.status,
-            *([Notification.template_id] if by_template else []),
-            func.count().label("count"),
-        )
-        .filter(
-            Notification.created_at >= get_london_midnight_in_utc(now),
-            Notification.service_id == service_id,
-            Notification.key_type != KEY_TYPE_TEST,
+    todays_counts = get_todays_notification_status_counts(service_id)
+    if todays_counts is None:
+        stats_for_today = (
+            db.session.query(
+                Notification.notification_type.cast(db.Text),
+                Notification.status,
+                *([Notification.template_id] if by_template else []),
+                func.count().label("count"),
+            )
+            .filter(
+                Notification.created_at >= get_london_midnight_in_utc(now),
+                Notification.service_id == service_id,
+                Notification.key_type != KEY_TYPE_TEST,
+            )
+            .group_by(
+                Notification.notification_type,
+                *([Notification.template_id] if by_template else []),
+                Notification.status,
+            )
         )
-        .group_by(
-            Notification.notification_type, *([Notification.template_id] if by_template else []), Notification.status
+    else:
+        stats_for_today = _query_status_counts(
+            [status_count for status_count in todays_counts if status_count.key_type != KEY_TYPE_TEST], by_template
         )
-    )
 
-    all_stats_table = stats_for_7_days.union_all(stats_for_today).subquery()
+    if stats_for_today is None:
+        all_stats_table = stats_for_7_days.subquery()
+    else:
+        all_stats_table = stats_for_7_days.union_all(stats_for_today).subquery()
 
     query = db.session.query(
         *(
@@ -189,19 +327,55 @@ def fetch_notification_status_for_service_for_today_and_7_previous_days(service_
     ).all()
 
 
+def _query_status_counts(status_counts, by_template):
+    """
+    A query with the same columns as the counts of today's notifications in
+    `fetch_notification_status_for_service_for_today_and_7_previous_days`, selecting `status_counts` from Redis rather
+    than counting notifications. None if there aren't any counts.
+    """
+    if not status_counts:
+        return None
+
+    counts = values(
+        column("notification_type", Text),
+        column("status", Text),
+        column("template_id", UUID(as_uuid=True)),
+        column("count", Integer),
+        name="todays_counts",
+    ).data(
+        [
+            (
+                status_count.notification_type,
+                status_count.status,
+                uuid.UUID(status_count.template_id),
+                status_count.count,
+            )
+            for status_count in status_counts
+        ]
+    )
+
+    return db.session.query(
+        counts.c.notification_type,
+        counts.c.status,
+        *([counts.c.template_id] if by_template else []),
+        counts.c.count,
+    )
+
+
 def fetch_notification_status_totals_for_all_services(start_date, end_date):
+    facts = _platform_notification_status_facts()
     stats = (
         db.session.query(
-            FactNotificationStatus.notification_type.label("notification_type"),
-            FactNotificationStatus.notification_status.label("status"),
-            FactNotificationStatus.key_type.label("key_type"),
-            func.sum(FactNotificationStatus.notification_count).label("count"),
+            facts.notification_type.label("notification_type"),
+            facts.notification_status.label("status"),
+            facts.key_type.label("key_type"),
+            func.sum(facts.notification_count).label("count"),
         )
-        .filter(FactNotificationStatus.bst_date >= start_date, FactNotificationStatus.bst_date <= end_date)
+        .filter(facts.bst_date >= start_date, facts.bst_date <= end_date)
         .group_by(
-            FactNotificationStatus.notification_type,
-            FactNotificationStatus.notification_status,
-            FactNotificationStatus.key_type,
+            facts.notification_type,
+            facts.notification_status,
+            facts.key_type,
         )
     )
     today = get_london_midnight_in_utc(datetime.utcnow())
@@ -236,7 +410,7 @@ def fetch_notification_status_totals_for_all_services(start_date, end_date):
             .order_by(all_stats_table.c.notification_type)
         )
     else:
-        query = stats.order_by(FactNotificationStatus.notification_type)
+        query = stats.order_by(facts.notification_type)
     return query.all()
 
 
@@ -429,39 +603,50 @@ def fetch_monthly_template_usage_for_service(start_date, end_date, service_id):
 
 
 def get_total_notifications_for_date_range(start_date, end_date):
+    facts = _platform_notification_status_facts()
     query = (
         db.session.query(
-            FactNotificationStatus.bst_date.cast(db.Text).label("bst_date"),
+            facts.bst_date.cast(db.Text).label("bst_date"),
             func.sum(
                 case(
-                    [(FactNotificationStatus.notification_type == "email", FactNotificationStatus.notification_count)],
+                    [(facts.notification_type == "email", facts.notification_count)],
                     else_=0,
                 )
             ).label("emails"),
             func.sum(
                 case(
-                    [(FactNotificationStatus.notification_type == "sms", FactNotificationStatus.notification_count)],
+                    [(facts.notification_type == "sms", facts.notification_count)],
                     else_=0,
                 )
             ).label("sms"),
             func.sum(
                 case(
-                    [(FactNotificationStatus.notification_type == "letter", FactNotificationStatus.notification_count)],
+                    [(facts.notification_type == "letter", facts.notification_count)],
                     else_=0,
                 )
             ).label("letters"),
         )
         .filter(
-            FactNotificationStatus.key_type != KEY_TYPE_TEST,
+            facts.key_type != KEY_TYPE_TEST,
         )
-        .group_by(FactNotificationStatus.bst_date)
-        .order_by(FactNotificationStatus.bst_date)
+        .group_by(facts.bst_date)
+        .order_by(facts.bst_date)
     )
     if start_date and end_date:
-        query = query.filter(FactNotificationStatus.bst_date >= start_date, FactNotificationStatus.bst_date <= end_date)
+        query = query.filter(facts.bst_date >= start_date, facts.bst_date <= end_date)
     return query.all()
 
 
+def _platform_notification_status_facts():
+    """
+    ft_platform_notification_status has the same columns as ft_notification_status without the service, template or
+    job, so platform-wide totals can be added up from either
+    """
+    if current_app.config["PLATFORM_STATS_FROM_ROLLUPS"]:
+        return FactPlatformNotificationStatus
+    return FactNotificationStatus
+
+
 def fetch_monthly_notification_statuses_per_service(start_date, end_date):
     return (
         db.session.query(
@@ -0,0 +1,89 @@
+from sqlalchemy import func, literal
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql.expression import case
+
+from app import db
+from app.constants import LETTER_TYPE
+from app.dao.dao_utils import autocommit
+from app.models import (
+    FactBilling,
+    FactNotificationStatus,
+    FactPlatformBilling,
+    FactPlatformNotificationStatus,
+)
+
+
+@autocommit
+def update_fact_platform_stats_for_day(bst_date):
+    """
+    Replace the platform-wide totals for `bst_date` with what's in ft_notification_status and ft_billing for that day
+    """
+    FactPlatformNotificationStatus.query.filter(FactPlatformNotificationStatus.bst_date == bst_date).delete()
+    FactPlatformBilling.query.filter(FactPlatformBilling.bst_date == bst_date).delete()
+
+    notification_status_totals = (
+        db.session.query(
+            literal(bst_date).label("bst_date"),
+            FactNotificationStatus.notification_type,
+            FactNotificationStatus.key_type,
+            FactNotificationStatus.notification_status,
+            func.sum(FactNotificationStatus.notification_count).label("notification_count"),
+        )
+        .filter(FactNotificationStatus.bst_date == bst_date)
+        .group_by(
+            FactNotificationStatus.notification_type,
+            FactNotificationStatus.key_type,
+            FactNotificationStatus.notification_status,
+        )
+    )
+    db.session.connection().execute(
+        insert(FactPlatformNotificationStatus.__table__).from_select(
+            [
+                FactPlatformNotificationStatus.bst_date,
+                FactPlatformNotificationStatus.notification_type,
+                FactPlatformNotificationStatus.key_type,
+                FactPlatformNotificationStatus.notification_status,
+                FactPlatformNotificationStatus.notification_count,
+            ],
+            notification_status_totals,
+        )
+    )
+
+    billing_totals = (
+        db.session.query(
+            literal(bst_date).label("bst_date"),
+            FactBilling.notification_type,
+            FactBilling.provider,
+            func.coalesce(func.sum(FactBilling.notifications_sent), 0).label("notifications_sent"),
+            func.coalesce(func.sum(FactBilling.billable_units), 0).label("billable_units"),
+            func.coalesce(func.sum(FactBilling.billable_units * FactBilling.rate_multiplier), 0).label(
+                "chargeable_units"
+            ),
+            func.coalesce(
+                func.sum(
+                    case(
+                        [(FactBilling.notification_type == LETTER_TYPE, FactBilling.notifications_sent)],
+                        else_=FactBilling.billable_units * FactBilling.rate_multiplier,
+                    )
+                    * FactBilling.rate
+                ),
+                0,
+            ).label("cost"),
+        )
+        .filter(FactBilling.bst_date == bst_date)
+        .group_by(FactBilling.notification_type, FactBilling.provider)
+    )
+    db.session.connection().execute(
+        insert(FactPlatformBilling.__table__).from_select(
+            [
+                FactPlatformBilling.bst_date,
+                FactPlatformBilling.notification_type,
+                FactPlatformBilling.provider,
+                FactPlatformBilling.notifications_sent,
+                FactPlatformBilling.billable_units,
+                FactPlatformBilling.chargeable_units,
+                FactPlatformBilling.cost,
+            ],
+            billing_totals,
+        )
+    )
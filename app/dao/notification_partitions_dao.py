@@ -0,0 +1,322 @@
+"""
+`notifications` and `notification_history` can be range-partitioned by `created_at`, with one partition per day
+(midnight to midnight, UK time) plus a default partition. `dao_partition_table_by_day` converts an existing table.
+
+Once `notifications` is partitioned, notifications past the standard 7 day retention are deleted a day at a time by
+detaching and dropping that day's partition, rather than row by row. Notifications in it that have to stay for longer -
+letters, and those from services with their own data retention - are moved to the default partition first, where
+they're deleted row by row the same as before.
+"""
+
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from notifications_utils.timezones import convert_utc_to_bst
+from sqlalchemy import text
+
+from app import db
+from app.dao import DAOException
+from app.dao.dao_utils import autocommit
+from app.dao.notifications_dao import FIELDS_TO_TRANSFER_TO_NOTIFICATION_HISTORY
+from app.utils import get_london_midnight_in_utc
+
+PARTITIONED_TABLES = ("notifications", "notification_history")
+
+# `end` is the (exclusive) upper bound of the partition's created_at range, in UTC
+Partition = namedtuple("Partition", ["name", "end"])
+
+# when a table is partitioned, it's refused if the swap can't be done at least this long before the cutover, since from
+# the cutover nothing can be inserted into the table until it has been swapped
+PARTITION_CUTOVER_MARGIN = timedelta(hours=1)
+
+# rows of a notifications partition that can't be dropped with it when it reaches the standard retention
+KEPT_NOTIFICATIONS = """
+    notification_type = 'letter'
+    OR (service_id, notification_type) IN (SELECT service_id, notification_type FROM service_data_retention)
+"""
+
+
+def dao_is_partitioned(table):
+    return db.session.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": table},
+    ).scalar()
+
+
+def dao_get_partitions(table):
+    """
+    The partitions of `table` other than the default partition, oldest first
+    """
+    rows = db.session.execute(
+        text(
+            """
+            SELECT child.relname AS name, pg_get_expr(child.relpartbound, child.oid) AS bound
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(:table)
+            """
+        ),
+        {"table": table},
+    )
+
+    partitions = [
+        Partition(row.name, datetime.fromisoformat(re.search(r"TO \('([^']+)'\)", row.bound).group(1)))
+        for row in rows
+        if row.bound != "DEFAULT"
+    ]
+    return sorted(partitions, key=lambda partition: partition.end)
+
+
+def dao_get_detached_partitions(table):
+    """
+    Partitions of `table` that have been detached but not yet archived and dropped, because something went wrong in
+    between
+    """
+    rows = db.session.execute(
+        text(
+            """
+            SELECT relname
+            FROM pg_class
+            WHERE relkind = 'r'
+            AND relnamespace = 'public'::regnamespace
+            AND relname ~ :pattern
+            AND NOT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = pg_class.oid)
+            """
+        ),
+        {"pattern": f"^{table}_(p\\d{{8}}|legacy)$"},
+    )
+    return rows.scalars().all()
+
+
+def dao_create_daily_partitions(table, days_ahead):
+    """
+    Make sure `table` has a partition for every day from today until `days_ahead` days from now. Days before the end
+    of the newest existing partition are skipped, since their notifications already have a partition.
+    """
+    today = convert_utc_to_bst(datetime.utcnow()).date()
+    existing_partitions = dao_get_partitions(table)
+    covered_until = existing_partitions[-1].end if existing_partitions else None
+
+    created = []
+    for day in (today + timedelta(days=n) for n in range(days_ahead + 1)):
+        start, end = get_london_midnight_in_utc(day), get_london_midnight_in_utc(day + timedelta(days=1))
+        if covered_until and start < covered_until:
+            continue
+
+        name = f"{table}_p{day:%Y%m%d}"
+        _create_partition(table, name, start, end)
+        created.append(name)
+
+    return created
+
+
+@autocommit
+def _create_partition(table, name, start, end):
+    db.session.execute(
+        text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} FOR VALUES FROM ('{start}') TO ('{end}')")
+    )
+
+    if table == "notifications":
+        # a unique constraint on a partitioned table has to include created_at, so a job's rows are only kept unique
+        # within each day. dao_create_notifications looks for replayed rows in every partition before inserting them.
+        db.session.execute(
+            text(f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{name}_job_row_number ON {name} (job_id, job_row_number)")
+        )
+
+
+def dao_get_expired_notifications_partitions(cutoff):
+    """
+    Partitions of `notifications` that only hold notifications created before `cutoff`
+    """
+    return [partition for partition in dao_get_partitions("notifications") if partition.end <= cutoff]
+
+
+@autocommit
+def dao_detach_notifications_partition(name):
+    # detaching takes an exclusive lock on notifications (DETACH PARTITION CONCURRENTLY can't be used while there's a
+    # default partition), so give up rather than hold up every insert behind it while it waits for long queries. It's
+    # tried again the next night.
+    db.session.execute(text("SET LOCAL lock_timeout = '5s'"))
+    db.session.execute(text(f"ALTER TABLE notifications DETACH PARTITION {name}"))
+
+
+@autocommit
+def dao_archive_and_drop_detached_notifications_partition(name):
+    """
+    Move the notifications in a detached partition that have to be kept for longer into the default partition, copy the
+    rest (apart from those sent with test keys) to notification_history, and drop the partition.
+
+    Returns the number of notifications kept and the number archived.
+    """
+    fields = ", ".join(FIELDS_TO_TRANSFER_TO_NOTIFICATION_HISTORY)
+
+    kept = db.session.execute(text(f"INSERT INTO notifications SELECT * FROM {name} WHERE {KEPT_NOTIFICATIONS}"))
+    archived = db.session.execute(
+        text(
+            f"""
+            INSERT INTO notification_history ({fields})
+            SELECT {fields} FROM {name}
+            WHERE NOT ({KEPT_NOTIFICATIONS}) AND key_type IN ('normal', 'team')
+            ON CONFLICT ON CONSTRAINT notification_history_pkey DO NOTHING
+            """
+        )
+    )
+    db.session.execute(text(f"DROP TABLE {name}"))
+
+    return kept.rowcount, archived.rowcount
+
+
+def _get_dependent_views(table):
+    return db.session.execute(
+        text(
+            """
+            SELECT DISTINCT dependent.relname, pg_get_viewdef(dependent.oid)
+            FROM pg_depend
+            JOIN pg_rewrite ON pg_rewrite.oid = pg_depend.objid
+            JOIN pg_class dependent ON dependent.oid = pg_rewrite.ev_class
+            WHERE pg_depend.refobjid = to_regclass(:table)
+            AND dependent.oid != to_regclass(:table)
+            AND dependent.relkind = 'v'
+            """
+        ),
+        {"table": table},
+    ).all()
+
+
+def dao_partition_table_by_day(table, days_ahead):
+    """
+    Convert `table` into a table partitioned by day, without copying any rows.
+
+    The existing table becomes `{table}_legacy`, and is attached as the partition for everything created before the
+    cutover, so only the swap itself needs an exclusive lock. The steps that read the whole table - building a unique
+    index on (id, created_at) and checking no row is newer than the cutover - are done first without blocking writes.
+    Partitions are created for each day from the cutover until `days_ahead` days from now, plus a default partition.
+
+    The cutover is midnight at the start of the day after tomorrow, worked out once the index has been built. From
+    then until the swap, anything created after the cutover can't be inserted, so the swap is refused (and the table
+    left as it was) if it can't be done at least PARTITION_CUTOVER_MARGIN before it.
+
+    The legacy partition is dropped the same way as the daily partitions once everything in it is past retention.
+    """
+    legacy = f"{table}_legacy"
+    cutover = _prepare_to_partition(table)
+
+    indexes = db.session.execute(
+        text("SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = 'public' AND tablename = :table"),
+        {"table": table},
+    ).all()
+    foreign_keys = db.session.execute(
+        text(
+            """
+            SELECT conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = to_regclass(:table) AND contype = 'f'
+            """
+        ),
+        {"table": table},
+    ).all()
+
+    current_app.logger.info("Swapping %s for a partitioned table", table)
+    db.session.execute(text(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE"))
+    try:
+        # waiting for the lock can take a while
+        _check_cutover_is_far_enough_ahead(cutover)
+    except DAOException:
+        db.session.rollback()
+        db.session.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT ck_{table}_before_partitioning"))
+        db.session.commit()
+        raise
+
+    # views (like notifications_all_time_view) refer to the table itself rather than its name, so would otherwise
+    # stay pointing at the legacy partition - never seeing anything new, and stopping it being dropped
+    views = _get_dependent_views(table)
+    for view_name, _ in views:
+        db.session.execute(text(f"DROP VIEW {view_name}"))
+
+    db.session.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    for index_name, _ in indexes:
+        if index_name != f"uix_{table}_id_created_at":
+            db.session.execute(text(f"ALTER INDEX {index_name} RENAME TO {index_name}_legacy"))
+
+    db.session.execute(
+        text(
+            f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            "PARTITION BY RANGE (created_at)"
+        )
+    )
+    db.session.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT ck_{table}_before_partitioning"))
+    db.session.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)"))
+
+    for _, index_definition in indexes:
+        # a unique index on a partitioned table has to include created_at, so any others (including the primary key on
+        # id) stay on the legacy partition only. Daily partitions of notifications get their own unique index on job
+        # rows when they're created.
+        if not index_definition.startswith("CREATE UNIQUE INDEX"):
+            db.session.execute(text(index_definition))
+
+    for constraint_name, constraint_definition in foreign_keys:
+        db.session.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {constraint_name} {constraint_definition}"))
+
+    # the matching indexes, unique constraint and foreign keys on the legacy table are reused rather than rebuilt, and
+    # the check constraint means postgres doesn't have to scan it to make sure it fits the partition
+    db.session.execute(
+        text(f"ALTER TABLE {table} ATTACH PARTITION {legacy} FOR VALUES FROM (MINVALUE) TO ('{cutover}')")
+    )
+    db.session.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+
+    for view_name, view_definition in views:
+        db.session.execute(text(f"CREATE VIEW {view_name} AS {view_definition}"))
+    db.session.commit()
+
+    return dao_create_daily_partitions(table, days_ahead)
+
+
+def _prepare_to_partition(table):
+    """
+    The steps of `dao_partition_table_by_day` that read the whole table, which are done without blocking writes.
+    Returns the cutover.
+    """
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        current_app.logger.info("Indexing %s by (id, created_at)", table)
+        connection.execute(
+            text(
+                f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uix_{table}_id_created_at ON {table} (id, created_at)"
+            )
+        )
+        # it's already there if an earlier attempt was refused
+        if not connection.execute(
+            text("SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = :name)"),
+            {"name": f"uix_{table}_id_created_at"},
+        ).scalar():
+            connection.execute(
+                text(
+                    f"ALTER TABLE {table} ADD CONSTRAINT uix_{table}_id_created_at "
+                    f"UNIQUE USING INDEX uix_{table}_id_created_at"
+                )
+            )
+
+        cutover = get_london_midnight_in_utc(convert_utc_to_bst(datetime.utcnow()).date() + timedelta(days=2))
+        current_app.logger.info("Checking %s has nothing created after %s", table, cutover)
+        connection.execute(
+            text(
+                f"ALTER TABLE {table} ADD CONSTRAINT ck_{table}_before_partitioning "
+                f"CHECK (created_at < '{cutover}') NOT VALID"
+            )
+        )
+        try:
+            connection.execute(text(f"ALTER TABLE {table} VALIDATE CONSTRAINT ck_{table}_before_partitioning"))
+            _check_cutover_is_far_enough_ahead(cutover)
+        except Exception:
+            connection.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT ck_{table}_before_partitioning"))
+            raise
+
+    return cutover
+
+
+def _check_cutover_is_far_enough_ahead(cutover):
+    if datetime.utcnow() + PARTITION_CUTOVER_MARGIN > cutover:
+        raise DAOException(
+            f"Not partitioning: less than {PARTITION_CUTOVER_MARGIN} until the cutover at {cutover}. Try again later."
+        )
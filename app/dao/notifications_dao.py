@@ -1,21 +1,36 @@
+import uuid
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from itertools import groupby
 from operator import attrgetter
 
-from botocore.exceptions import ClientError
 from flask import current_app
 from notifications_utils.international_billing_rates import (
     INTERNATIONAL_BILLING_RATES,
 )
 from notifications_utils.recipients import (
     InvalidEmailError,
+    InvalidPhoneError,
     try_validate_and_format_phone_number,
     validate_and_format_email_address,
+    validate_and_format_phone_number,
 )
 from notifications_utils.timezones import convert_bst_to_utc, convert_utc_to_bst
-from sqlalchemy import and_, asc, desc, func, literal, or_, union
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import (
+    Text,
+    and_,
+    asc,
+    column,
+    desc,
+    func,
+    literal,
+    or_,
+    tuple_,
+    union,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import UUID, insert
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql import functions
@@ -43,15 +58,24 @@ from app.constants import (
     SMS_TYPE,
 )
 from app.dao.dao_utils import autocommit
-from app.letters.utils import LetterPDFNotFound, find_letter_pdf_in_s3
+from app.letters.utils import delete_letter_pdfs_from_s3
 from app.models import (
+    ApiKey,
     FactNotificationStatus,
+    Job,
     LetterCostThreshold,
     Notification,
     NotificationAllTimeView,
     NotificationHistory,
     NotificationLetterDespatch,
     ProviderDetails,
+    TemplateHistory,
+    User,
+)
+from app.notifications.status_counts import (
+    count_status_change,
+    count_status_changes,
+    status_counts_enabled,
 )
 from app.utils import (
     escape_special_characters,
@@ -120,6 +144,76 @@ def dao_create_notification(notification):
     db.session.add(notification)
 
 
+@autocommit
+def dao_create_notifications(notifications, ignore_duplicates=False):
+    """
+    Insert all of `notifications` with a single multi-row INSERT. The objects are not added to the session, so
+    (unlike `dao_create_notification`) they won't be refreshed from the database after commit.
+
+    With `ignore_duplicates`, notifications whose id or job row number already exist are skipped instead of raising an
+    IntegrityError, which makes replaying the same rows safe. Returns the ids of the notifications actually inserted.
+    """
+    if ignore_duplicates:
+        notifications = _without_existing_notifications(notifications)
+
+    if not notifications:
+        return []
+
+    stmt = insert(Notification).values(
+        [_get_notification_insert_values(notification) for notification in notifications]
+    )
+    if ignore_duplicates:
+        stmt = stmt.on_conflict_do_nothing()
+
+    return [row.id for row in db.session.execute(stmt.returning(Notification.id))]
+
+
+def _without_existing_notifications(notifications):
+    # once notifications is partitioned by day, ids and job rows are only unique within each day's partition, and a
+    # replayed chunk of a job is given a new created_at, so it can land in a different partition from the first time.
+    # ON CONFLICT only catches duplicates in the same partition, so look for them across all partitions first.
+    ids = [notification.id for notification in notifications if notification.id]
+    job_rows = [
+        (notification.job_id, notification.job_row_number)
+        for notification in notifications
+        if notification.job_id and notification.job_row_number is not None
+    ]
+    filters = []
+    if ids:
+        filters.append(Notification.id.in_(ids))
+    if job_rows:
+        filters.append(tuple_(Notification.job_id, Notification.job_row_number).in_(job_rows))
+    if not filters:
+        return notifications
+
+    existing = db.session.query(Notification.id, Notification.job_id, Notification.job_row_number).filter(or_(*filters))
+    existing_ids, existing_job_rows = set(), set()
+    for notification_id, job_id, job_row_number in existing:
+        existing_ids.add(str(notification_id))
+        existing_job_rows.add((str(job_id), job_row_number))
+
+    return [
+        notification
+        for notification in notifications
+        if str(notification.id) not in existing_ids
+        and (str(notification.job_id), notification.job_row_number) not in existing_job_rows
+    ]
+
+
+def _get_notification_insert_values(notification):
+    if not notification.id:
+        notification.id = create_uuid()
+
+    insert_values = {}
+    for table_column in Notification.__table__.columns:
+        value = getattr(notification, table_column.key)
+        if value is None and table_column.default is not None and table_column.default.is_scalar:
+            # session.add would apply these on flush, but a multi-row insert needs the same keys on every row
+            value = table_column.default.arg
+        insert_values[table_column.key] = value
+    return insert_values
+
+
 def _decide_permanent_temporary_failure(status, notification, detailed_status_code=None):
     # Firetext will send us a pending status, followed by a success or failure status.
     # When we get a failure status we need to look at the detailed_status_code to determine if the failure type
@@ -185,12 +279,189 @@ def update_notification_status_by_id(notification_id, status, sent_by=None, deta
     )
 
 
+@autocommit
+def dao_update_sms_notification_statuses(receipts):
+    """
+    Apply delivery receipts to many SMS notifications with one UPDATE, following the same rules as
+    update_notification_status_by_id. `receipts` is a list of (notification_id, status, sent_by, detailed_status_code)
+    with at most one receipt per notification.
+
+    Returns a dict of notification id to new status for the notifications that were updated. Notifications that don't
+    exist, already have a final status or are to countries that don't send delivery receipts are left alone.
+    """
+    if not receipts:
+        return {}
+
+    receipt_values = values(
+        column("id", UUID(as_uuid=True)),
+        column("status", Text),
+        column("sent_by", Text),
+        column("firetext_status", Text),
+        name="receipts",
+    ).data(
+        [
+            (
+                uuid.UUID(str(notification_id)),
+                status,
+                sent_by,
+                _get_firetext_failure_status(notification_id, status, detailed_status_code),
+            )
+            for notification_id, status, sent_by, detailed_status_code in receipts
+        ]
+    )
+
+    sent_by = func.coalesce(Notification.sent_by, receipt_values.c.sent_by)
+    # the same as _decide_permanent_temporary_failure
+    new_status = case(
+        (
+            and_(sent_by == "firetext", receipt_values.c.status == NOTIFICATION_PERMANENT_FAILURE),
+            func.coalesce(
+                receipt_values.c.firetext_status,
+                case(
+                    (Notification.status == NOTIFICATION_PENDING, NOTIFICATION_TEMPORARY_FAILURE),
+                    else_=NOTIFICATION_PERMANENT_FAILURE,
+                ),
+            ),
+        ),
+        else_=receipt_values.c.status,
+    )
+
+    stmt = (
+        update(Notification)
+        .where(
+            Notification.id == receipt_values.c.id,
+            Notification.status.in_(
+                [
+                    NOTIFICATION_CREATED,
+                    NOTIFICATION_SENDING,
+                    NOTIFICATION_PENDING,
+                    NOTIFICATION_SENT,
+                    NOTIFICATION_PENDING_VIRUS_CHECK,
+                ]
+            ),
+            or_(
+                Notification.international.isnot(True),
+                Notification.phone_prefix.in_(_phone_prefixes_with_delivery_receipts()),
+            ),
+        )
+        .values(status=new_status, sent_by=sent_by, updated_at=datetime.utcnow())
+        .returning(Notification.id, Notification.status)
+        .execution_options(synchronize_session=False)
+    )
+
+    notifications = _get_notifications_for_status_counts(
+        Notification.id.in_([uuid.UUID(str(notification_id)) for notification_id, _, _, _ in receipts])
+    )
+    updated = {str(notification_id): status for notification_id, status in db.session.execute(stmt)}
+    count_status_changes(
+        [
+            (notification, notification.status, updated[str(notification.id)])
+            for notification in notifications
+            if str(notification.id) in updated
+        ]
+    )
+    return updated
+
+
+def _get_firetext_failure_status(notification_id, status, detailed_status_code):
+    if status != NOTIFICATION_PERMANENT_FAILURE or not detailed_status_code:
+        return None
+
+    try:
+        status, reason = get_message_status_and_reason_from_firetext_code(detailed_status_code)
+    except KeyError:
+        current_app.logger.warning("Failure code %s from Firetext not recognised", detailed_status_code)
+        return None
+
+    current_app.logger.info("Updating notification id %s to status %s, reason: %s", notification_id, status, reason)
+    return status
+
+
+def _phone_prefixes_with_delivery_receipts():
+    return [prefix for prefix in INTERNATIONAL_BILLING_RATES if country_records_delivery(prefix)]
+
+
+def dao_get_sms_notification_ids_by_references_and_recipients(references_and_recipients):
+    """
+    The bulk version of dao_get_sms_notification_id_by_reference_and_recipient. Returns a dict of (reference,
+    normalised_to) to notification id.
+    """
+    if not references_and_recipients:
+        return {}
+
+    query = db.session.query(Notification.reference, Notification.normalised_to, Notification.id).filter(
+        tuple_(Notification.reference, Notification.normalised_to).in_(list(references_and_recipients)),
+        Notification.notification_type == SMS_TYPE,
+    )
+    return {(reference, normalised_to): str(notification_id) for reference, normalised_to, notification_id in query}
+
+
 @autocommit
 def dao_update_notification(notification):
+    count_status_change(notification)
     notification.updated_at = datetime.utcnow()
     db.session.add(notification)
 
 
+@autocommit
+def dao_set_sms_notifications_reference(notification_ids, reference):
+    """
+    Give SMS notifications about to be sent to a provider in one request their shared reference before the request is
+    made, so that a delivery receipt that arrives before they've been marked as sent can still be matched to them
+    """
+    return Notification.query.filter(Notification.id.in_(notification_ids)).update(
+        {"reference": reference}, synchronize_session=False
+    )
+
+
+@autocommit
+def dao_update_sms_notifications_to_sending(notification_ids, *, status, sent_by, reference, billable_units):
+    """
+    Mark SMS notifications sent to a provider in one request as sent, in one statement. Like
+    `update_notification_to_sending`, notifications that already have a final status (because a delivery receipt
+    beat us to it) keep that status.
+    """
+    now = datetime.utcnow()
+    notifications = _get_notifications_for_status_counts(Notification.id.in_(notification_ids))
+    updated_count = Notification.query.filter(Notification.id.in_(notification_ids)).update(
+        {
+            "status": case(
+                (Notification.status.in_(NOTIFICATION_STATUS_TYPES_COMPLETED), Notification.status), else_=status
+            ),
+            "sent_at": now,
+            "sent_by": sent_by,
+            "reference": reference,
+            "billable_units": billable_units,
+            "updated_at": now,
+        },
+        synchronize_session=False,
+    )
+    count_status_changes(
+        [
+            (notification, notification.status, status)
+            for notification in notifications
+            if notification.status not in NOTIFICATION_STATUS_TYPES_COMPLETED
+        ]
+    )
+    return updated_count
+
+
+def dao_get_sms_notification_id_by_reference_and_recipient(reference, normalised_to):
+    """
+    Messages sent to several recipients at once share a provider reference, so delivery receipts for them are matched
+    on the recipient as well
+    """
+    return (
+        db.session.query(Notification.id)
+        .filter(
+            Notification.reference == reference,
+            Notification.normalised_to == normalised_to,
+            Notification.notification_type == SMS_TYPE,
+        )
+        .scalar()
+    )
+
+
 def get_notifications_for_job(service_id, job_id, filter_dict=None, page=1, page_size=None):
     if page_size is None:
         page_size = current_app.config["PAGE_SIZE"]
@@ -222,6 +493,10 @@ def get_notification_by_id(notification_id, service_id=None, _raise=False):
     return query.one() if _raise else query.first()
 
 
+def dao_get_notifications_by_ids(notification_ids):
+    return Notification.query.filter(Notification.id.in_(notification_ids)).all()
+
+
 def get_notifications_for_service(
     service_id,
     filter_dict=None,
@@ -241,6 +516,168 @@ def get_notifications_for_service(
     if page_size is None:
         page_size = current_app.config["PAGE_SIZE"]
 
+    query = _get_notifications_for_service_query(
+        service_id,
+        filter_dict=filter_dict,
+        limit_days=limit_days,
+        key_type=key_type,
+        personalisation=personalisation,
+        include_jobs=include_jobs,
+        include_from_test_key=include_from_test_key,
+        older_than=older_than,
+        client_reference=client_reference,
+        include_one_off=include_one_off,
+    )
+
+    return query.order_by(desc(Notification.created_at), desc(Notification.id)).paginate(
+        page=page,
+        per_page=page_size,
+        count=count_pages,
+        error_out=error_out,
+    )
+
+
+def get_page_of_notifications_for_service(
+    service_id,
+    filter_dict=None,
+    cursor=None,
+    page=1,
+    page_size=None,
+    limit_days=None,
+    key_type=None,
+    personalisation=False,
+    include_jobs=False,
+    include_from_test_key=False,
+    older_than=None,
+    client_reference=None,
+    include_one_off=True,
+):
+    """
+    Returns a page of a service's notifications, newest first, and whether there are any more after it.
+
+    With a `cursor` of the (created_at, id) of the last notification on the previous page, the page starts straight
+    after it without having to skip over the pages before, however deep they go. Otherwise the page is found by its
+    `page` number. Either way it takes one query, which gets one notification more than the page needs to tell if
+    there's another page.
+    """
+    if page_size is None:
+        page_size = current_app.config["PAGE_SIZE"]
+
+    query = _get_notifications_for_service_query(
+        service_id,
+        filter_dict=filter_dict,
+        limit_days=limit_days,
+        key_type=key_type,
+        personalisation=personalisation,
+        include_jobs=include_jobs,
+        include_from_test_key=include_from_test_key,
+        older_than=older_than,
+        client_reference=client_reference,
+        include_one_off=include_one_off,
+    )
+
+    if cursor is not None:
+        query = query.filter(_created_before(*cursor))
+    else:
+        query = query.offset((page - 1) * page_size)
+
+    notifications = query.order_by(desc(Notification.created_at), desc(Notification.id)).limit(page_size + 1).all()
+
+    return notifications[:page_size], len(notifications) > page_size
+
+
+def get_notifications_for_service_for_csv(
+    service_id,
+    filter_dict=None,
+    limit_days=None,
+    include_jobs=False,
+    include_from_test_key=False,
+    include_one_off=True,
+    rows_per_fetch=10000,
+):
+    """
+    Returns the columns of a service's notifications that go in a CSV report, newest first.
+
+    This is a single query that only selects the columns it needs, and with `yield_per` the rows are fetched from a
+    server-side cursor `rows_per_fetch` at a time as they're iterated over, rather than all being loaded at once. Keep
+    the session open until you've finished with them.
+    """
+    query = (
+        db.session.query(
+            Notification.to,
+            Notification.client_reference,
+            Notification.job_row_number,
+            Notification.status,
+            Notification.created_at,
+            TemplateHistory.name.label("template_name"),
+            TemplateHistory.template_type,
+            Job.original_file_name.label("job_name"),
+            User.name.label("created_by_name"),
+            User.email_address.label("created_by_email_address"),
+            ApiKey.name.label("api_key_name"),
+        )
+        .select_from(Notification)
+        .join(Notification.template)
+        .outerjoin(Notification.job)
+        .outerjoin(Notification.api_key)
+        .outerjoin(Notification.created_by)
+        .filter(
+            *_get_notifications_for_service_filters(
+                service_id,
+                limit_days=limit_days,
+                include_jobs=include_jobs,
+                include_from_test_key=include_from_test_key,
+                include_one_off=include_one_off,
+            )
+        )
+    )
+    query = _filter_query(query, filter_dict)
+
+    return query.order_by(desc(Notification.created_at), desc(Notification.id)).yield_per(rows_per_fetch)
+
+
+def _get_notifications_for_service_query(
+    service_id,
+    filter_dict=None,
+    limit_days=None,
+    key_type=None,
+    personalisation=False,
+    include_jobs=False,
+    include_from_test_key=False,
+    older_than=None,
+    client_reference=None,
+    include_one_off=True,
+):
+    filters = _get_notifications_for_service_filters(
+        service_id,
+        limit_days=limit_days,
+        key_type=key_type,
+        include_jobs=include_jobs,
+        include_from_test_key=include_from_test_key,
+        older_than=older_than,
+        client_reference=client_reference,
+        include_one_off=include_one_off,
+    )
+
+    query = Notification.query.filter(*filters)
+    query = _filter_query(query, filter_dict)
+
+    if personalisation:
+        query = query.options(joinedload("template"))
+
+    return query.options(joinedload("api_key"))
+
+
+def _get_notifications_for_service_filters(
+    service_id,
+    limit_days=None,
+    key_type=None,
+    include_jobs=False,
+    include_from_test_key=False,
+    older_than=None,
+    client_reference=None,
+    include_one_off=True,
+):
     filters = [Notification.service_id == service_id]
 
     if limit_days is not None:
@@ -248,9 +685,9 @@ def get_notifications_for_service(
 
     if older_than is not None:
         older_than_created_at = (
-            db.session.query(Notification.created_at).filter(Notification.id == older_than).as_scalar()
+            db.session.query(Notification.created_at).filter(Notification.id == older_than).scalar_subquery()
         )
-        filters.append(Notification.created_at < older_than_created_at)
+        filters.append(_created_before(older_than_created_at, older_than))
 
     if not include_jobs:
         filters.append(Notification.job_id == None)  # noqa
@@ -266,19 +703,18 @@ def get_notifications_for_service(
     if client_reference is not None:
         filters.append(Notification.client_reference == client_reference)
 
-    query = Notification.query.filter(*filters)
-    query = _filter_query(query, filter_dict)
-
-    if personalisation:
-        query = query.options(joinedload("template"))
+    return filters
 
-    query = query.options(joinedload("api_key"))
 
-    return query.order_by(desc(Notification.created_at)).paginate(
-        page=page,
-        per_page=page_size,
-        count=count_pages,
-        error_out=error_out,
+def _created_before(created_at, notification_id):
+    """
+    Notifications that come after (created_at, notification_id) when ordered newest first. This is
+    `(created_at, id) < (created_at, notification_id)` written out, so that postgres can use the `created_at <=` half
+    to start from the right place in ix_notifications_service_created_at.
+    """
+    return and_(
+        Notification.created_at <= created_at,
+        or_(Notification.created_at < created_at, Notification.id < notification_id),
     )
 
 
@@ -404,9 +840,89 @@ def move_notifications_to_notification_history(
     return deleted
 
 
+@autocommit
+def insert_notification_history_delete_notifications_past_retention(
+    notification_type, today, timestamp_to_scan_until, after=None, qry_limit=10000
+):
+    """
+    Move the next batch of notifications of a type that are past their service's data retention (or the default 7
+    days) into notification history, for every service at once.
+
+    Up to `qry_limit` notifications created before `timestamp_to_scan_until` are looked at, in (created_at, id) order
+    starting after `after` - the (created_at, id) of the last notification looked at by the previous batch. Those that
+    are still within retention are left where they are.
+
+    Returns the number of notifications deleted, and the (created_at, id) of the last notification looked at, which is
+    None once there are none left to look at.
+    """
+    fields_to_transfer_to_notification_history = ", ".join(FIELDS_TO_TRANSFER_TO_NOTIFICATION_HISTORY)
+    after_last_batch = (
+        "AND (notifications.created_at, notifications.id) > (:after_created_at, CAST(:after_id AS uuid))"
+        if after
+        else ""
+    )
+
+    select_into_temp_table = f"""
+        CREATE TEMP TABLE NOTIFICATION_BATCH ON COMMIT DROP AS
+        SELECT
+            notifications.id,
+            notifications.created_at,
+            notifications.key_type,
+            notifications.created_at < (
+                (CAST(:today AS date) - COALESCE(service_data_retention.days_of_retention, 7))::timestamp
+                AT TIME ZONE 'Europe/London' AT TIME ZONE 'UTC'
+            ) AS expired
+        FROM notifications
+        LEFT JOIN service_data_retention
+            ON service_data_retention.service_id = notifications.service_id
+            AND service_data_retention.notification_type = notifications.notification_type
+        WHERE notifications.notification_type = :notification_type
+          AND notifications.created_at < :timestamp_to_scan_until
+          {after_last_batch}
+        ORDER BY notifications.created_at, notifications.id
+        LIMIT :qry_limit
+    """
+    # Insert into NotificationHistory if the row already exists do nothing.
+    insert_query = f"""
+        INSERT INTO notification_history ({fields_to_transfer_to_notification_history})
+        SELECT {fields_to_transfer_to_notification_history} FROM notifications
+        WHERE id IN (SELECT id FROM NOTIFICATION_BATCH WHERE expired AND key_type IN ('normal', 'team'))
+        ON CONFLICT ON CONSTRAINT notification_history_pkey
+        DO NOTHING
+    """
+    # test notifications are deleted without being kept in history
+    delete_query = """
+        DELETE FROM notifications
+        WHERE id IN (SELECT id FROM NOTIFICATION_BATCH WHERE expired)
+    """
+    input_params = {
+        "notification_type": notification_type,
+        "today": today,
+        "timestamp_to_scan_until": timestamp_to_scan_until,
+        "after_created_at": after[0] if after else None,
+        "after_id": str(after[1]) if after else None,
+        "qry_limit": qry_limit,
+    }
+
+    db.session.execute(select_into_temp_table, input_params)
+    last_notification = db.session.execute(
+        "SELECT created_at, id FROM NOTIFICATION_BATCH ORDER BY created_at DESC, id DESC LIMIT 1"
+    ).first()
+
+    db.session.execute(insert_query)
+    deleted = db.session.execute(delete_query).rowcount
+
+    return deleted, (last_notification.created_at, last_notification.id) if last_notification else None
+
+
 def _delete_letters_from_s3(notification_type, service_id, date_to_delete_from, query_limit):
     letters_to_delete_from_s3 = (
-        db.session.query(Notification)
+        db.session.query(
+            Notification.reference,
+            Notification.created_at,
+            Notification.key_type,
+            Notification.status,
+        )
         .filter(
             Notification.notification_type == notification_type,
             Notification.created_at < date_to_delete_from,
@@ -419,14 +935,9 @@ def _delete_letters_from_s3(notification_type, service_id, date_to_delete_from,
         .limit(query_limit)
         .all()
     )
-    for letter in letters_to_delete_from_s3:
-        try:
-            letter_pdf = find_letter_pdf_in_s3(letter)
-            letter_pdf.delete()
-        except ClientError:
-            current_app.logger.exception("Error deleting S3 object for letter: %s", letter.id)
-        except LetterPDFNotFound:
-            current_app.logger.warning("No S3 object to delete for letter: %s", letter.id)
+    failed = delete_letter_pdfs_from_s3(letters_to_delete_from_s3)
+    if failed:
+        current_app.logger.error("Failed to delete %s letter PDFs from S3 for service %s", failed, service_id)
 
 
 @autocommit
@@ -434,6 +945,36 @@ def dao_delete_notifications_by_id(notification_id):
     db.session.query(Notification).filter(Notification.id == notification_id).delete(synchronize_session="fetch")
 
 
+def dao_delete_notifications_by_ids(notification_ids):
+    db.session.query(Notification).filter(Notification.id.in_(notification_ids)).delete(synchronize_session=False)
+
+
+def _get_notifications_for_status_counts(*filters):
+    """
+    What's needed to count status changes to the notifications matching `filters` when they're updated in bulk, and
+    their current status. They're locked until the end of the transaction, so their status can't change before it's
+    updated. Returns nothing if status counts aren't being kept.
+    """
+    if not status_counts_enabled():
+        return []
+
+    return (
+        db.session.query(
+            Notification.id,
+            Notification.created_at,
+            Notification.service_id,
+            Notification.notification_type,
+            Notification.template_id,
+            Notification.key_type,
+            Notification.status,
+        )
+        .filter(*filters)
+        .order_by(Notification.id)
+        .with_for_update()
+        .all()
+    )
+
+
 def dao_timeout_notifications(cutoff_time, limit=100000):
     """
     Set email and SMS notifications (only) to "temporary-failure" status
@@ -456,6 +997,7 @@ def dao_timeout_notifications(cutoff_time, limit=100000):
     Notification.query.filter(
         Notification.id.in_([n.id for n in notifications]),
     ).update({"status": new_status, "updated_at": updated_at}, synchronize_session=False)
+    count_status_changes((notification, notification.status, new_status) for notification in notifications)
 
     db.session.commit()
     return notifications
@@ -561,9 +1103,14 @@ def get_slow_text_message_delivery_reports_by_provider(
 
 @autocommit
 def dao_update_notifications_by_reference(references, update_dict):
+    notifications = []
+    if "status" in update_dict:
+        notifications = _get_notifications_for_status_counts(Notification.reference.in_(references))
+
     updated_count = Notification.query.filter(Notification.reference.in_(references)).update(
         update_dict, synchronize_session=False
     )
+    count_status_changes([(notification, notification.status, update_dict["status"]) for notification in notifications])
 
     updated_history_count = 0
     if updated_count != len(references):
@@ -583,7 +1130,16 @@ def dao_get_notifications_by_recipient_or_reference(
     page_size=None,
     error_out=True,
 ):
+    # a whole phone number or email address is stored exactly as we'd format it, so we can look it up with
+    # ix_notifications_service_id_normalised_to instead of searching for it inside every recipient
+    recipient = None
+
     if notification_type == SMS_TYPE:
+        try:
+            recipient = validate_and_format_phone_number(search_term, international=True)
+        except InvalidPhoneError:
+            pass
+
         normalised = try_validate_and_format_phone_number(search_term)
 
         for character in {"(", ")", " ", "-"}:
@@ -593,7 +1149,7 @@ def dao_get_notifications_by_recipient_or_reference(
 
     elif notification_type == EMAIL_TYPE:
         try:
-            normalised = validate_and_format_email_address(search_term)
+            normalised = recipient = validate_and_format_email_address(search_term)
         except InvalidEmailError:
             normalised = search_term.lower()
 
@@ -609,14 +1165,19 @@ def dao_get_notifications_by_recipient_or_reference(
     else:
         raise TypeError(f"Notification type must be {EMAIL_TYPE}, {SMS_TYPE}, {LETTER_TYPE} or None")
 
-    normalised = escape_special_characters(normalised)
-    search_term = escape_special_characters(search_term)
+    if recipient is not None:
+        recipient_filter = Notification.normalised_to == recipient
+    else:
+        # substring searches use the trigram index ix_notifications_normalised_to_trgm
+        recipient_filter = Notification.normalised_to.like("%{}%".format(escape_special_characters(normalised)))
 
     filters = [
         Notification.service_id == service_id,
         or_(
-            Notification.normalised_to.like("%{}%".format(normalised)),
-            Notification.client_reference.ilike("%{}%".format(search_term)),
+            recipient_filter,
+            # this can use ix_notifications_client_reference_trgm, so postgres doesn't need to scan every notification
+            # the service has sent to check their reference
+            Notification.client_reference.ilike("%{}%".format(escape_special_characters(search_term))),
         ),
         Notification.key_type != KEY_TYPE_TEST,
     ]
@@ -648,6 +1209,24 @@ def dao_get_notification_or_history_by_reference(reference):
         return NotificationHistory.query.filter(NotificationHistory.reference == reference).one()
 
 
+def dao_get_notifications_or_history_by_references(references):
+    """
+    Returns a dict of reference to notification, looking in notification_history only for references that aren't in
+    notifications
+    """
+    notifications = {n.reference: n for n in Notification.query.filter(Notification.reference.in_(references))}
+
+    if missing_references := set(references) - notifications.keys():
+        notifications.update(
+            {
+                n.reference: n
+                for n in NotificationHistory.query.filter(NotificationHistory.reference.in_(missing_references))
+            }
+        )
+
+    return notifications
+
+
 def dao_get_notifications_processing_time_stats(start_date, end_date):
     """
     For a given time range, returns the number of notifications sent and the number of
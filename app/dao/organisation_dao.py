@@ -8,6 +8,7 @@ from app.dao.dao_utils import VersionOptions, autocommit, version_class
 from app.dao.email_branding_dao import dao_get_email_branding_by_id
 from app.dao.letter_branding_dao import dao_get_letter_branding_by_id
 from app.dao.organisation_user_permissions_dao import organisation_user_permissions_dao
+from app.memory_cache import invalidate_service_cache
 from app.models import (
     AnnualBilling,
     Domain,
@@ -157,6 +158,7 @@ def _update_organisation_services(organisation, attribute, only_where_none=True)
     for service in organisation.services:
         if getattr(service, attribute) is None or not only_where_none:
             setattr(service, attribute, getattr(organisation, attribute))
+            invalidate_service_cache(service.id)
         db.session.add(service)
 
 
@@ -185,6 +187,7 @@ def dao_add_service_to_organisation(service, organisation_id):
     service.crown = organisation.crown
 
     db.session.add(service)
+    invalidate_service_cache(service.id)
 
 
 def dao_get_users_for_organisation(organisation_id):
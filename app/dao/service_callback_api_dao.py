@@ -3,6 +3,7 @@ from datetime import datetime
 from app import create_uuid, db
 from app.constants import COMPLAINT_CALLBACK_TYPE, DELIVERY_STATUS_CALLBACK_TYPE
 from app.dao.dao_utils import autocommit, version_class
+from app.memory_cache import invalidate_service_cache
 from app.models import ServiceCallbackApi
 
 
@@ -12,6 +13,7 @@ def save_service_callback_api(service_callback_api):
     service_callback_api.id = create_uuid()
     service_callback_api.created_at = datetime.utcnow()
     db.session.add(service_callback_api)
+    invalidate_service_cache(service_callback_api.service_id)
 
 
 @autocommit
@@ -25,6 +27,7 @@ def reset_service_callback_api(service_callback_api, updated_by_id, url=None, be
     service_callback_api.updated_at = datetime.utcnow()
 
     db.session.add(service_callback_api)
+    invalidate_service_cache(service_callback_api.service_id)
 
 
 def get_service_callback_api(service_callback_api_id, service_id, callback_type):
@@ -33,16 +36,19 @@ def get_service_callback_api(service_callback_api_id, service_id, callback_type)
     ).first()
 
 
+def get_service_callback_api_for_service(service_id, callback_type):
+    return ServiceCallbackApi.query.filter_by(service_id=service_id, callback_type=callback_type).first()
+
+
 def get_service_delivery_status_callback_api_for_service(service_id):
-    return ServiceCallbackApi.query.filter_by(
-        service_id=service_id, callback_type=DELIVERY_STATUS_CALLBACK_TYPE
-    ).first()
+    return get_service_callback_api_for_service(service_id, DELIVERY_STATUS_CALLBACK_TYPE)
 
 
 def get_service_complaint_callback_api_for_service(service_id):
-    return ServiceCallbackApi.query.filter_by(service_id=service_id, callback_type=COMPLAINT_CALLBACK_TYPE).first()
+    return get_service_callback_api_for_service(service_id, COMPLAINT_CALLBACK_TYPE)
 
 
 @autocommit
 def delete_service_callback_api(service_callback_api):
     db.session.delete(service_callback_api)
+    invalidate_service_cache(service_callback_api.service_id)
@@ -1,8 +1,10 @@
 import uuid
+from collections import Counter, namedtuple
 from datetime import date, datetime, timedelta
 
 from flask import current_app
-from sqlalchemy import Float, cast
+from sqlalchemy import Float, Integer, Text, cast, column, values
+from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import joinedload
 from sqlalchemy.sql.expression import and_, asc, case, func
 
@@ -28,6 +30,7 @@ from app.dao.organisation_dao import dao_get_organisation_by_email_address
 from app.dao.service_sms_sender_dao import insert_service_sms_sender
 from app.dao.service_user_dao import dao_get_service_user
 from app.dao.template_folder_dao import dao_get_valid_template_folders_by_id
+from app.memory_cache import invalidate_service_cache
 from app.models import (
     AnnualBilling,
     ApiKey,
@@ -51,6 +54,7 @@ from app.models import (
     User,
     VerifyCode,
 )
+from app.notifications.status_counts import get_todays_notification_status_counts
 from app.utils import (
     email_address_is_nhs,
     escape_special_characters,
@@ -67,6 +71,8 @@ DEFAULT_SERVICE_PERMISSIONS = [
     INTERNATIONAL_LETTERS,
 ]
 
+TodaysStats = namedtuple("TodaysStats", ["notification_type", "status", "count"])
+
 
 def dao_fetch_all_services(only_active=False):
     query = Service.query.order_by(asc(Service.created_at)).options(joinedload("users"))
@@ -242,6 +248,8 @@ def dao_archive_service(service_id):
         if not api_key.expiry_date:
             api_key.expiry_date = datetime.utcnow()
 
+    invalidate_service_cache(service_id)
+
 
 def dao_fetch_service_by_id_and_user(service_id, user_id):
     return (
@@ -308,6 +316,7 @@ def dao_create_service(  # noqa: C901
 @version_class(Service)
 def dao_update_service(service):
     db.session.add(service)
+    invalidate_service_cache(service.id)
 
 
 def dao_add_user_to_service(service, user, permissions=None, folder_permissions=None):
@@ -388,6 +397,15 @@ def delete_service_and_all_associated_db_objects(service):
 
 
 def dao_fetch_todays_stats_for_service(service_id):
+    todays_counts = get_todays_notification_status_counts(service_id)
+    if todays_counts is not None:
+        return [
+            TodaysStats(notification_type, status, count)
+            for (_, notification_type, status), count in _sum_status_counts(
+                todays_counts, include_from_test_key=False
+            ).items()
+        ]
+
     today = date.today()
     start_date = get_london_midnight_in_utc(today)
 
@@ -413,21 +431,38 @@ def dao_fetch_todays_stats_for_all_services(include_from_test_key=True, only_act
     start_date = get_london_midnight_in_utc(today)
     end_date = get_london_midnight_in_utc(today + timedelta(days=1))
 
-    subquery = (
-        db.session.query(
-            Notification.notification_type,
-            Notification.status,
-            Notification.service_id,
-            func.count(Notification.id).label("count"),
+    todays_counts = get_todays_notification_status_counts()
+    todays_totals = _sum_status_counts(todays_counts, include_from_test_key) if todays_counts else None
+    if todays_totals:
+        subquery = values(
+            column("notification_type", Text),
+            column("status", Text),
+            column("service_id", UUID(as_uuid=True)),
+            column("count", Integer),
+            name="todays_counts",
+        ).data(
+            [
+                (notification_type, status, uuid.UUID(service_id), count)
+                for (service_id, notification_type, status), count in todays_totals.items()
+            ]
+        )
+    else:
+        # counting is cheap when nothing's been sent yet today
+        subquery = (
+            db.session.query(
+                Notification.notification_type,
+                Notification.status,
+                Notification.service_id,
+                func.count(Notification.id).label("count"),
+            )
+            .filter(Notification.created_at >= start_date, Notification.created_at < end_date)
+            .group_by(Notification.notification_type, Notification.status, Notification.service_id)
         )
-        .filter(Notification.created_at >= start_date, Notification.created_at < end_date)
-        .group_by(Notification.notification_type, Notification.status, Notification.service_id)
-    )
 
-    if not include_from_test_key:
-        subquery = subquery.filter(Notification.key_type != KEY_TYPE_TEST)
+        if not include_from_test_key:
+            subquery = subquery.filter(Notification.key_type != KEY_TYPE_TEST)
 
-    subquery = subquery.subquery()
+        subquery = subquery.subquery()
 
     query = (
         db.session.query(
@@ -450,6 +485,14 @@ def dao_fetch_todays_stats_for_all_services(include_from_test_key=True, only_act
     return query.all()
 
 
+def _sum_status_counts(status_counts, include_from_test_key):
+    totals = Counter()
+    for status_count in status_counts:
+        if include_from_test_key or status_count.key_type != KEY_TYPE_TEST:
+            totals[(status_count.service_id, status_count.notification_type, status_count.status)] += status_count.count
+    return totals
+
+
 def dao_fetch_active_users_for_service(service_id):
     query = User.query.filter(User.services.any(id=service_id), User.state == "active")
 
@@ -8,6 +8,7 @@ from app import db
 from app.constants import LETTER_TYPE, SECOND_CLASS
 from app.dao.dao_utils import VersionOptions, autocommit, version_class
 from app.dao.users_dao import get_user_by_id
+from app.memory_cache import invalidate_service_cache
 from app.models import Template, TemplateHistory, TemplateRedacted
 
 
@@ -35,6 +36,7 @@ def dao_create_template(template):
 @version_class(VersionOptions(Template, history_class=TemplateHistory))
 def dao_update_template(template):
     db.session.add(template)
+    invalidate_service_cache(template.service_id, template_id=template.id)
 
 
 @autocommit
@@ -72,6 +74,7 @@ def dao_update_template_reply_to(template_id, reply_to):
         }
     )
     db.session.add(history)
+    invalidate_service_cache(template.service_id, template_id=template.id)
     return template
 
 
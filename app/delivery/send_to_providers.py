@@ -1,4 +1,5 @@
 import random
+from collections import defaultdict
 from datetime import datetime, timedelta
 from urllib import parse
 
@@ -20,6 +21,7 @@ from app.constants import (
     BRANDING_ORG_BANNER,
     EMAIL_TYPE,
     KEY_TYPE_TEST,
+    NOTIFICATION_CREATED,
     NOTIFICATION_SENDING,
     NOTIFICATION_SENT,
     NOTIFICATION_STATUS_TYPES_COMPLETED,
@@ -27,13 +29,18 @@ from app.constants import (
     SMS_TYPE,
 )
 from app.dao.email_branding_dao import dao_get_email_branding_by_id
-from app.dao.notifications_dao import dao_update_notification
+from app.dao.notifications_dao import (
+    dao_set_sms_notifications_reference,
+    dao_update_notification,
+    dao_update_sms_notifications_to_sending,
+)
 from app.dao.provider_details_dao import (
     dao_reduce_sms_provider_priority,
     get_provider_details_by_notification_type,
 )
 from app.exceptions import NotificationTechnicalFailureException
 from app.serialised_models import SerialisedOrganisation, SerialisedService, SerialisedTemplate
+from app.utils import chunks
 
 
 def send_sms_to_provider(notification):
@@ -46,16 +53,7 @@ def send_sms_to_provider(notification):
     if notification.status == "created":
         provider = provider_to_use(SMS_TYPE, notification.international)
 
-        template_model = SerialisedTemplate.from_id_and_service_id(
-            template_id=notification.template_id, service_id=service.id, version=notification.template_version
-        )
-
-        template = SMSMessageTemplate(
-            template_model.__dict__,
-            values=notification.personalisation,
-            prefix=service.name,
-            show_prefix=service.prefix_sms,
-        )
+        template = _get_sms_template(notification, service)
         created_at = notification.created_at
         key_type = notification.key_type
         if notification.key_type == KEY_TYPE_TEST:
@@ -90,17 +88,137 @@ def send_sms_to_provider(notification):
                 if notification.international:
                     statsd_client.incr(f"international-sms.{NOTIFICATION_SENT}.{notification.phone_prefix}")
 
-        delta_seconds = (datetime.utcnow() - created_at).total_seconds()
-        statsd_client.timing("sms.total-time", delta_seconds)
+        _record_sms_total_time(created_at, key_type, service)
+
+
+def send_sms_to_provider_in_batches(notifications):
+    """
+    Send live SMS notifications that have the same content and sender to the provider in one request per batch, if
+    the provider can take several recipients at once.
+
+    Returns the notifications that weren't batched, which should be sent one at a time with `send_sms_to_provider`,
+    and the ids of notifications in batches that failed.
+    """
+    batches = defaultdict(list)
+    not_batched = []
+
+    for notification in notifications:
+        try:
+            service = SerialisedService.from_id(notification.service_id)
+            if (
+                notification.status != NOTIFICATION_CREATED
+                or notification.key_type == KEY_TYPE_TEST
+                or not service.active
+            ):
+                not_batched.append(notification)
+                continue
+
+            provider = provider_to_use(SMS_TYPE, notification.international)
+            if not provider.supports_batch_sending:
+                not_batched.append(notification)
+                continue
+
+            template = _get_sms_template(notification, service)
+        except Exception:
+            # sending it on its own will fail the same way, and be retried or marked as a technical failure as usual
+            current_app.logger.warning(
+                "Could not batch SMS notification %s, sending it on its own", notification.id, exc_info=True
+            )
+            not_batched.append(notification)
+            continue
+
+        batch = batches[(provider, str(template), notification.reply_to_text, notification.international)]
+        # receipts are matched on the recipient, so each recipient can only be in a batch once
+        if any(n.normalised_to == notification.normalised_to for n, _, _ in batch):
+            not_batched.append(notification)
+            continue
+        batch.append((notification, template.fragment_count, service))
+
+    failed_notification_ids = []
+    for (provider, content, sender, international), batch in batches.items():
+        if len(batch) == 1:
+            not_batched.append(batch[0][0])
+            continue
+
+        for chunk in chunks(batch, current_app.config["SMS_PROVIDER_BATCH_SIZE"]):
+            try:
+                _send_sms_batch_to_provider(provider, content, sender, international, chunk)
+            except Exception:
+                current_app.logger.warning(
+                    "Sending a batch of %s SMS to %s failed", len(chunk), provider.name, exc_info=True
+                )
+                failed_notification_ids.extend(str(notification.id) for notification, _, _ in chunk)
+
+    return not_batched, failed_notification_ids
+
+
+def _send_sms_batch_to_provider(provider, content, sender, international, batch):
+    notification_ids = [notification.id for notification, _, _ in batch]
+    billable_units = batch[0][1]
+    # all the notifications in the batch share a reference, and receipts are matched on it and the recipient
+    reference = str(create_uuid())
+    timings = [(notification.created_at, notification.key_type, service) for notification, _, service in batch]
+    phone_prefixes = [notification.phone_prefix for notification, _, _ in batch]
+    send_sms_kwargs = {
+        "recipients": [notification.normalised_to for notification, _, _ in batch],
+        "content": content,
+        "reference": reference,
+        "sender": sender,
+        "international": international,
+    }
+    # receipts can come back before the request has returned, and for a batch they're matched on the reference, which
+    # (unlike the notification id used when sending one at a time) has to be stored before they can be
+    dao_set_sms_notifications_reference(notification_ids, reference)
+    # as in send_sms_to_provider, don't hold a database connection while we wait for the provider
+    db.session.close()
+
+    try:
+        provider.send_sms_batch(**send_sms_kwargs)
+    except Exception:
+        dao_reduce_sms_provider_priority(provider.name, time_threshold=timedelta(minutes=1))
+        raise
+
+    dao_update_sms_notifications_to_sending(
+        notification_ids,
+        status=NOTIFICATION_SENT if international else NOTIFICATION_SENDING,
+        sent_by=provider.name,
+        reference=reference,
+        billable_units=billable_units,
+    )
+    statsd_client.incr(f"clients.{provider.name}.batch-size", len(batch))
+    if international:
+        for phone_prefix in phone_prefixes:
+            statsd_client.incr(f"international-sms.{NOTIFICATION_SENT}.{phone_prefix}")
 
-        if key_type == KEY_TYPE_TEST:
-            statsd_client.timing("sms.test-key.total-time", delta_seconds)
+    for created_at, key_type, service in timings:
+        _record_sms_total_time(created_at, key_type, service)
+
+
+def _get_sms_template(notification, service):
+    template_model = SerialisedTemplate.from_id_and_service_id(
+        template_id=notification.template_id, service_id=service.id, version=notification.template_version
+    )
+
+    return SMSMessageTemplate(
+        template_model.__dict__,
+        values=notification.personalisation,
+        prefix=service.name,
+        show_prefix=service.prefix_sms,
+    )
+
+
+def _record_sms_total_time(created_at, key_type, service):
+    delta_seconds = (datetime.utcnow() - created_at).total_seconds()
+    statsd_client.timing("sms.total-time", delta_seconds)
+
+    if key_type == KEY_TYPE_TEST:
+        statsd_client.timing("sms.test-key.total-time", delta_seconds)
+    else:
+        statsd_client.timing("sms.live-key.total-time", delta_seconds)
+        if service.high_volume:
+            statsd_client.timing("sms.live-key.high-volume.total-time", delta_seconds)
         else:
-            statsd_client.timing("sms.live-key.total-time", delta_seconds)
-            if service.high_volume:
-                statsd_client.timing("sms.live-key.high-volume.total-time", delta_seconds)
-            else:
-                statsd_client.timing("sms.live-key.not-high-volume.total-time", delta_seconds)
+            statsd_client.timing("sms.live-key.not-high-volume.total-time", delta_seconds)
 
 
 def send_email_to_provider(notification):
@@ -9,3 +9,13 @@ class NotificationTechnicalFailureException(Exception):
 
 class ArchiveValidationError(Exception):
     pass
+
+
+class NotificationsPartlyQueuedException(Exception):
+    """
+    Publishing the delivery tasks for a batch of notifications failed part way through. The notifications in
+    `queued_ids` will be sent, and the rest have been deleted.
+    """
+
+    def __init__(self, queued_ids):
+        self.queued_ids = queued_ids
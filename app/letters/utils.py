@@ -1,6 +1,8 @@
 import io
 import json
 import math
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from enum import Enum
 
@@ -31,6 +33,9 @@ LETTERS_PDF_FILE_LOCATION_STRUCTURE = "{folder}NOTIFY.{reference}.{duplex}.{lett
 
 PRECOMPILED_BUCKET_PREFIX = "{folder}NOTIFY.{reference}"
 
+# the most keys S3 will delete in one DeleteObjects request
+MAX_KEYS_PER_DELETE_REQUEST = 1000
+
 
 def get_folder_name(created_at):
     print_datetime = convert_utc_to_bst(created_at)
@@ -84,6 +89,83 @@ def get_bucket_name_and_prefix_for_notification(notification):
     return bucket_name, upload_file_name
 
 
+def delete_letter_pdfs_from_s3(notifications, max_workers=10):
+    """
+    Delete the PDFs of `notifications` (anything with the attributes `get_bucket_name_and_prefix_for_notification`
+    needs) from S3, with up to `max_workers` requests in flight at once.
+
+    Each PDF is found by listing its reference's prefix, like `find_letter_pdf_in_s3`, because the rest of its name
+    can differ from what the notification would give it now (for example if its postage changed after it was
+    uploaded). The PDFs found are deleted MAX_KEYS_PER_DELETE_REQUEST at a time. Returns the number of PDFs that
+    couldn't be looked up or deleted.
+    """
+    if not notifications:
+        return 0
+
+    # boto3 clients (unlike resources) are safe to share between threads
+    s3 = boto3.client("s3", region_name=current_app.config["AWS_REGION"])
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        keys_by_bucket, failed = _find_letter_pdf_keys(executor, s3, notifications)
+
+        batches = [
+            (bucket_name, keys[i : i + MAX_KEYS_PER_DELETE_REQUEST])
+            for bucket_name, keys in keys_by_bucket.items()
+            for i in range(0, len(keys), MAX_KEYS_PER_DELETE_REQUEST)
+        ]
+        futures = {executor.submit(_delete_s3_objects, s3, *batch): batch for batch in batches}
+        for future in as_completed(futures):
+            bucket_name, keys = futures[future]
+            try:
+                errors = future.result()
+            except Exception:
+                current_app.logger.exception("Error deleting %s letter PDFs from %s", len(keys), bucket_name)
+                failed += len(keys)
+                continue
+
+            for error in errors:
+                current_app.logger.warning(
+                    "Error deleting letter PDF %s from %s: %s", error["Key"], bucket_name, error["Message"]
+                )
+            failed += len(errors)
+
+    return failed
+
+
+def _find_letter_pdf_keys(executor, s3, notifications):
+    keys_by_bucket = defaultdict(list)
+    failed = 0
+
+    futures = {
+        executor.submit(_list_s3_keys, s3, *bucket_name_and_prefix): bucket_name_and_prefix
+        for bucket_name_and_prefix in map(get_bucket_name_and_prefix_for_notification, notifications)
+    }
+    for future in as_completed(futures):
+        bucket_name, prefix = futures[future]
+        try:
+            keys = future.result()
+        except Exception:
+            current_app.logger.exception("Error finding letter PDF in %s with prefix %s", bucket_name, prefix)
+            failed += 1
+            continue
+
+        if not keys:
+            current_app.logger.warning("No letter PDF to delete in %s with prefix %s", bucket_name, prefix)
+        keys_by_bucket[bucket_name].extend(keys)
+
+    return keys_by_bucket, failed
+
+
+def _list_s3_keys(s3, bucket_name, prefix):
+    # the dot stops one reference's prefix matching a longer reference that starts with it
+    response = s3.list_objects_v2(Bucket=bucket_name, Prefix=f"{prefix}.")
+    return [item["Key"] for item in response.get("Contents", [])]
+
+
+def _delete_s3_objects(s3, bucket_name, keys):
+    response = s3.delete_objects(Bucket=bucket_name, Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True})
+    return response.get("Errors", [])
+
+
 def get_reference_from_filename(filename):
     # filename looks like '2018-01-13/NOTIFY.ABCDEF1234567890.D.2.C.20180113120000.PDF'
     filename_parts = filename.split(".")
@@ -0,0 +1,212 @@
+import inspect
+import os
+from functools import partial, wraps
+from threading import Lock, RLock
+from time import monotonic, sleep
+
+import cachetools
+from flask import current_app
+from gds_metrics.metrics import Counter
+from sqlalchemy import event
+
+from app import db, redis_store
+
+# Local caches normally live for this long, and are emptied early for a service whenever it (or one of its API keys or
+# templates) changes. Every process subscribes to a Redis channel so that it hears about changes made by other
+# processes.
+INVALIDATED_CACHE_TTL = 300
+CACHE_INVALIDATION_CHANNEL = "serialised-model-cache-invalidation"
+
+# After losing the subscription we stop caching for this long, so that nothing changed while we weren't listening
+# can get stuck in a cache
+SUBSCRIBER_RECOVERY_SECONDS = 10
+SUBSCRIBE_RETRY_SECONDS = 30
+
+MEMORY_CACHE_HITS = Counter("memory_cache_hits", "Lookups answered from an in-process cache", ["cache"])
+MEMORY_CACHE_MISSES = Counter("memory_cache_misses", "Lookups that missed an in-process cache", ["cache"])
+MEMORY_CACHE_EVICTIONS = Counter(
+    "memory_cache_evictions",
+    "Entries removed from an in-process cache (because they expired, the cache was full or they were invalidated)",
+    ["cache", "reason"],
+)
+
+caches = {}
+
+
+class _InstrumentedTTLCache(cachetools.TTLCache):
+    def __init__(self, name, maxsize, ttl):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.name = name
+
+    def popitem(self):
+        item = super().popitem()
+        MEMORY_CACHE_EVICTIONS.labels(self.name, "size").inc()
+        return item
+
+    def expire(self, time=None):
+        size_before = cachetools.Cache.__len__(self)
+        expired = super().expire(time)
+        if evicted := size_before - cachetools.Cache.__len__(self):
+            MEMORY_CACHE_EVICTIONS.labels(self.name, "expired").inc(evicted)
+        return expired
+
+
+class LocalCache:
+    def __init__(self, name, ttl, maxsize=1024, invalidated=False):
+        self.name = name
+        self.invalidated = invalidated
+        self.entries = _InstrumentedTTLCache(name, maxsize=maxsize, ttl=ttl)
+        self.lock = RLock()
+        # bumped on every invalidation, so that a value read from the database before an invalidation doesn't get
+        # stored after it
+        self.generation = 0
+
+    def get_or_fetch(self, key, fetch):
+        with self.lock:
+            try:
+                value = self.entries[key]
+            except KeyError:
+                generation = self.generation
+            else:
+                MEMORY_CACHE_HITS.labels(self.name).inc()
+                return value
+
+        MEMORY_CACHE_MISSES.labels(self.name).inc()
+        value = fetch()
+
+        with self.lock:
+            if generation == self.generation and (not self.invalidated or _subscriber.can_cache()):
+                self.entries[key] = value
+
+        return value
+
+    def invalidate(self, service_id):
+        with self.lock:
+            self.generation += 1
+            for key in [key for key in self.entries if any(str(part) == service_id for part in key)]:
+                self.entries.pop(key, None)
+                MEMORY_CACHE_EVICTIONS.labels(self.name, "invalidated").inc()
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+
+def memory_cache(ttl=2, invalidated=False):
+    """
+    Cache the return value of a classmethod in this process, keyed on its arguments (ignoring `cls`).
+
+    Caches with `invalidated=True` should hold things that belong to a service, with the service id as one of the
+    arguments, so that `invalidate_service_cache` can find them.
+    """
+
+    def decorator(func):
+        cache = caches[func.__qualname__] = LocalCache(func.__qualname__, ttl=ttl, invalidated=invalidated)
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(cls, *args, **kwargs):
+            if invalidated:
+                _subscriber.ensure_subscribed()
+            # key on the argument values in the order of the signature, however they were passed, so that calls made
+            # with keyword arguments share entries with positional calls and `invalidate` can find the service id
+            bound = signature.bind(cls, *args, **kwargs)
+            bound.apply_defaults()
+            key = cachetools.keys.hashkey(*list(bound.arguments.values())[1:])
+            return cache.get_or_fetch(key, partial(func, cls, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate_service_cache(service_id, template_id=None):
+    """
+    Once the current transaction commits, empty the caches for this service in every process and delete the copies
+    in Redis that they are refreshed from
+    """
+    event.listen(
+        db.session(),
+        "after_commit",
+        lambda session: _invalidate_service_cache(str(service_id), template_id),
+        once=True,
+    )
+
+
+def _invalidate_service_cache(service_id, template_id):
+    _clear_local_caches_for_service(service_id)
+
+    if not current_app.config["REDIS_ENABLED"]:
+        return
+
+    redis_keys = [f"service-{service_id}"]
+    if template_id:
+        redis_keys.append(f"service-{service_id}-template-{template_id}-version-None")
+    redis_store.delete(*redis_keys)
+
+    try:
+        redis_store.redis_store.publish(CACHE_INVALIDATION_CHANNEL, service_id)
+    except Exception:
+        current_app.logger.exception("Failed to publish cache invalidation for service %s", service_id)
+
+
+def _clear_local_caches_for_service(service_id):
+    for cache in caches.values():
+        if cache.invalidated:
+            cache.invalidate(service_id)
+
+
+def _clear_invalidated_local_caches():
+    for cache in caches.values():
+        if cache.invalidated:
+            cache.clear()
+
+
+class _CacheInvalidationSubscriber:
+    def __init__(self):
+        self.lock = Lock()
+        self.pid = None
+        self.next_attempt = 0
+        self.last_error = None
+
+    def ensure_subscribed(self):
+        if self.pid == os.getpid() or not current_app.config["REDIS_ENABLED"] or monotonic() < self.next_attempt:
+            return
+
+        with self.lock:
+            # the subscriber thread doesn't survive a fork, so each worker process needs its own
+            if self.pid == os.getpid():
+                return
+
+            try:
+                pubsub = redis_store.redis_store.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{CACHE_INVALIDATION_CHANNEL: self.handle_message})
+                pubsub.run_in_thread(sleep_time=1, daemon=True, exception_handler=self.handle_error)
+            except Exception:
+                current_app.logger.exception("Failed to subscribe to %s", CACHE_INVALIDATION_CHANNEL)
+                self.next_attempt = monotonic() + SUBSCRIBE_RETRY_SECONDS
+                self.last_error = monotonic()
+                return
+
+            self.pid = os.getpid()
+
+    def can_cache(self):
+        if not current_app.config["REDIS_ENABLED"]:
+            return True
+        if self.pid != os.getpid():
+            return False
+        return self.last_error is None or monotonic() - self.last_error > SUBSCRIBER_RECOVERY_SECONDS
+
+    def handle_message(self, message):
+        service_id = message["data"]
+        _clear_local_caches_for_service(service_id.decode() if isinstance(service_id, bytes) else service_id)
+
+    def handle_error(self, exception, pubsub, thread):
+        # redis-py reconnects and resubscribes on the next read, but anything published in the meantime is lost
+        self.last_error = monotonic()
+        _clear_invalidated_local_caches()
+        sleep(1)
+
+
+_subscriber = _CacheInvalidationSubscriber()
@@ -1447,6 +1447,20 @@ class Notification(db.Model):
         Index("ix_notifications_notification_type_composite", "notification_type", "status", "created_at"),
         Index("ix_notifications_service_created_at", "service_id", "created_at"),
         Index("ix_notifications_service_id_composite", "service_id", "notification_type", "status", "created_at"),
+        # for searching a service's notifications by recipient or reference
+        Index("ix_notifications_service_id_normalised_to", "service_id", "normalised_to"),
+        Index(
+            "ix_notifications_normalised_to_trgm",
+            "normalised_to",
+            postgresql_using="gin",
+            postgresql_ops={"normalised_to": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_notifications_client_reference_trgm",
+            "client_reference",
+            postgresql_using="gin",
+            postgresql_ops={"client_reference": "gin_trgm_ops"},
+        ),
     )
 
     @property
@@ -1503,6 +1517,14 @@ class Notification(db.Model):
 
     @property
     def formatted_status(self):
+        return self.format_status(self.template.template_type, self.status)
+
+    @staticmethod
+    def format_status(template_type, status):
+        """
+        How we describe a status to users, for example in CSV reports. Takes the template type and status rather than
+        a notification, so it can be used for rows from queries that don't load the whole notification.
+        """
         return {
             "email": {
                 "failed": "Failed",
@@ -1532,7 +1554,7 @@ class Notification(db.Model):
                 "delivered": "Received",
                 "returned-letter": "Returned",
             },
-        }[self.template.template_type].get(self.status, self.status)
+        }[template_type].get(status, status)
 
     def get_letter_status(self):
         """
@@ -2016,6 +2038,41 @@ class FactProcessingTime(db.Model):
     updated_at = db.Column(db.DateTime, nullable=True, onupdate=datetime.datetime.utcnow)
 
 
+class FactPlatformNotificationStatus(db.Model):
+    """
+    ft_notification_status added up across all services, for platform-wide statistics
+    """
+
+    __tablename__ = "ft_platform_notification_status"
+
+    bst_date = db.Column(db.Date, index=True, primary_key=True, nullable=False)
+    notification_type = db.Column(db.Text, primary_key=True, nullable=False)
+    key_type = db.Column(db.Text, primary_key=True, nullable=False)
+    notification_status = db.Column(db.Text, primary_key=True, nullable=False)
+    notification_count = db.Column(db.Integer(), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=True, onupdate=datetime.datetime.utcnow)
+
+
+class FactPlatformBilling(db.Model):
+    """
+    ft_billing added up across all services, for platform-wide statistics. `chargeable_units` are billable units
+    times the rate multiplier, and `cost` is what they (or, for letters, the letters sent) cost at their rates.
+    """
+
+    __tablename__ = "ft_platform_billing"
+
+    bst_date = db.Column(db.Date, index=True, primary_key=True, nullable=False)
+    notification_type = db.Column(db.Text, primary_key=True, nullable=False)
+    provider = db.Column(db.Text, primary_key=True, nullable=False)
+    notifications_sent = db.Column(db.Integer(), nullable=False)
+    billable_units = db.Column(db.Integer(), nullable=False)
+    chargeable_units = db.Column(db.Integer(), nullable=False)
+    cost = db.Column(db.Numeric(), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=True, onupdate=datetime.datetime.utcnow)
+
+
 class Complaint(db.Model):
     __tablename__ = "complaints"
 
@@ -7,15 +7,13 @@ from app.celery.service_callback_tasks import (
     send_delivery_status_to_service,
 )
 from app.config import QueueNames
+from app.constants import COMPLAINT_CALLBACK_TYPE, DELIVERY_STATUS_CALLBACK_TYPE
 from app.dao.complaint_dao import save_complaint
 from app.dao.notifications_dao import (
     dao_get_notification_or_history_by_reference,
 )
-from app.dao.service_callback_api_dao import (
-    get_service_complaint_callback_api_for_service,
-    get_service_delivery_status_callback_api_for_service,
-)
 from app.models import Complaint
+from app.serialised_models import SerialisedServiceCallbackApi
 
 
 def determine_notification_bounce_type(notification_type, ses_message):
@@ -70,7 +68,9 @@ def remove_emails_from_complaint(complaint_dict):
 
 def check_and_queue_callback_task(notification):
     # queue callback task only if the service_callback_api exists
-    service_callback_api = get_service_delivery_status_callback_api_for_service(service_id=notification.service_id)
+    service_callback_api = SerialisedServiceCallbackApi.from_service_id_and_type(
+        notification.service_id, DELIVERY_STATUS_CALLBACK_TYPE
+    )
     if service_callback_api:
         notification_data = create_delivery_status_callback_data(notification, service_callback_api)
         send_delivery_status_to_service.apply_async(
@@ -80,7 +80,9 @@ def check_and_queue_callback_task(notification):
 
 def _check_and_queue_complaint_callback_task(complaint, notification, recipient):
     # queue callback task only if the service_callback_api exists
-    service_callback_api = get_service_complaint_callback_api_for_service(service_id=notification.service_id)
+    service_callback_api = SerialisedServiceCallbackApi.from_service_id_and_type(
+        notification.service_id, COMPLAINT_CALLBACK_TYPE
+    )
     if service_callback_api:
         complaint_data = create_complaint_callback_data(complaint, notification, service_callback_api, recipient)
         send_complaint_to_service.apply_async([complaint_data], queue=QueueNames.CALLBACKS)
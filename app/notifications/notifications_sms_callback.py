@@ -60,9 +60,11 @@ def process_spryng_response():
     status = request.args.get("STATUS")
     detailed_status_code = request.args.get("REASONCODE")
     provider_reference = request.args.get("REFERENCE")
+    # messages sent to several recipients at once share a reference, so their receipts are matched on the recipient
+    recipient = request.args.get("RECIPIENT")
 
     process_sms_client_response.apply_async(
-        [status, provider_reference, client_name, detailed_status_code], queue=QueueNames.SMS_CALLBACKS
+        [status, provider_reference, client_name, detailed_status_code, recipient], queue=QueueNames.SMS_CALLBACKS
     )
 
     return jsonify(result="success"), 200
@@ -3,7 +3,6 @@ from datetime import datetime
 
 from flask import current_app
 from gds_metrics import Histogram
-from notifications_utils.clients import redis
 from notifications_utils.recipients import (
     format_email_address,
     get_international_phone_info,
@@ -15,7 +14,6 @@ from notifications_utils.template import (
     SMSMessageTemplate,
 )
 
-from app import redis_store
 from app.celery import provider_tasks
 from app.celery.letters_pdf_tasks import get_pdf_for_templated_letter
 from app.config import QueueNames
@@ -29,9 +27,18 @@ from app.constants import (
 )
 from app.dao.notifications_dao import (
     dao_create_notification,
+    dao_create_notifications,
     dao_delete_notifications_by_id,
+    dao_delete_notifications_by_ids,
 )
+from app.exceptions import NotificationsPartlyQueuedException
 from app.models import Notification
+from app.notifications.send_limits import (
+    check_and_increment_limits,
+    use_daily_limit_reservation,
+)
+from app.notifications.status_counts import count_new_notifications
+from app.utils import chunks
 from app.v2.errors import BadRequestError, QrCodeTooLongError
 
 REDIS_GET_AND_INCR_DAILY_LIMIT_DURATION_SECONDS = Histogram(
@@ -113,6 +120,79 @@ def persist_notification(
     postage=None,
     document_download_count=None,
     updated_at=None,
+):
+    notification = build_notification(
+        template_id=template_id,
+        template_version=template_version,
+        recipient=recipient,
+        service=service,
+        personalisation=personalisation,
+        notification_type=notification_type,
+        api_key_id=api_key_id,
+        key_type=key_type,
+        created_at=created_at,
+        job_id=job_id,
+        job_row_number=job_row_number,
+        reference=reference,
+        client_reference=client_reference,
+        notification_id=notification_id,
+        created_by_id=created_by_id,
+        status=status,
+        reply_to_text=reply_to_text,
+        billable_units=billable_units,
+        postage=postage,
+        document_download_count=document_download_count,
+        updated_at=updated_at,
+    )
+
+    # if simulated create a Notification model to return but do not persist the Notification to the dB
+    if not simulated:
+        dao_create_notification(notification)
+        increment_daily_limit_cache(service, notification_type, key_type)
+        count_new_notifications([notification])
+        current_app.logger.info("%s %s created at %s", notification_type, notification.id, notification.created_at)
+    return notification
+
+
+def persist_notifications(notifications, *, service, notification_type, key_type, ignore_duplicates=False):
+    """
+    Persist a list of notifications built with `build_notification` in one INSERT. They must all be for the same
+    service, notification type and key type. Returns the ids of the notifications that were inserted.
+    """
+    notification_ids = dao_create_notifications(notifications, ignore_duplicates=ignore_duplicates)
+    if notification_ids:
+        increment_daily_limit_cache(service, notification_type, key_type, num_notifications=len(notification_ids))
+        inserted = {str(notification_id) for notification_id in notification_ids}
+        count_new_notifications(notification for notification in notifications if str(notification.id) in inserted)
+    current_app.logger.info(
+        "%s %s notifications created for service %s", len(notification_ids), notification_type, service.id
+    )
+    return notification_ids
+
+
+def build_notification(
+    *,
+    template_id,
+    template_version,
+    recipient,
+    service,
+    personalisation,
+    notification_type,
+    api_key_id,
+    key_type,
+    created_at=None,
+    job_id=None,
+    job_row_number=None,
+    reference=None,
+    client_reference=None,
+    notification_id=None,
+    created_by_id=None,
+    status=NOTIFICATION_CREATED,
+    reply_to_text=None,
+    billable_units=None,
+    postage=None,
+    document_download_count=None,
+    updated_at=None,
 ):
     notification_created_at = created_at or datetime.utcnow()
     if not notification_id:
@@ -154,24 +234,19 @@ def persist_notification(
         notification.international = postage in INTERNATIONAL_POSTAGE_TYPES
         notification.normalised_to = "".join(notification.to.split()).lower()
 
-    # if simulated create a Notification model to return but do not persist the Notification to the dB
-    if not simulated:
-        dao_create_notification(notification)
-        if key_type != KEY_TYPE_TEST and current_app.config["REDIS_ENABLED"]:
-            for notification_type_ in [None, notification_type]:
-                cache_key = redis.daily_limit_cache_key(service.id, notification_type=notification_type_)
-                if redis_store.get(cache_key) is None:
-                    # if cache does not exist set the cache to 1 with an expiry of 24 hours,
-                    # The cache should be set by the time we create the notification
-                    # but in case it is this will make sure the expiry is set to 24 hours,
-                    # where if we let the incr method create the cache it will be set a ttl.
-                    redis_store.set(cache_key, 1, ex=86400)
-                else:
-                    redis_store.incr(cache_key)
-        current_app.logger.info("%s %s created at %s", notification_type, notification_id, notification_created_at)
     return notification
 
 
+def increment_daily_limit_cache(service, notification_type, key_type, num_notifications=1):
+    if key_type == KEY_TYPE_TEST or not current_app.config["REDIS_ENABLED"]:
+        return
+
+    # notifications sent through the API were already counted when check_rate_limiting checked the daily limit
+    if num_notifications := use_daily_limit_reservation(service.id, notification_type, num_notifications):
+        with REDIS_GET_AND_INCR_DAILY_LIMIT_DURATION_SECONDS.time():
+            check_and_increment_limits(service.id, key_type, notification_type, num_notifications=num_notifications)
+
+
 def send_notification_to_queue_detached(key_type, notification_type, notification_id, queue=None):
     if key_type == KEY_TYPE_TEST:
         queue = QueueNames.RESEARCH_MODE
@@ -198,6 +273,39 @@ def send_notification_to_queue_detached(key_type, notification_type, notificatio
     current_app.logger.debug("%s %s sent to the %s queue for delivery", notification_type, notification_id, queue)
 
 
+def send_notifications_to_queue_in_batches(key_type, notification_type, notification_ids):
+    """
+    Publish one delivery task per chunk of notification ids rather than one per notification. If a chunk can't be
+    published, it and every chunk after it are deleted, as `send_notification_to_queue_detached` does for a single
+    notification, and NotificationsPartlyQueuedException is raised with the ids of the notifications that were queued.
+    """
+    if key_type == KEY_TYPE_TEST:
+        queue = QueueNames.RESEARCH_MODE
+    elif notification_type == SMS_TYPE:
+        queue = QueueNames.SEND_SMS
+    else:
+        queue = QueueNames.SEND_EMAIL
+
+    deliver_task = (
+        provider_tasks.deliver_sms_batch if notification_type == SMS_TYPE else provider_tasks.deliver_email_batch
+    )
+
+    notification_ids = list(notification_ids)
+    queued = 0
+    for chunk in chunks(notification_ids, current_app.config["NOTIFICATION_BATCH_DELIVERY_CHUNK_SIZE"]):
+        try:
+            deliver_task.apply_async([[str(notification_id) for notification_id in chunk]], queue=queue)
+        except Exception as e:
+            # nothing would ever send the notifications that haven't been queued
+            dao_delete_notifications_by_ids(notification_ids[queued:])
+            raise NotificationsPartlyQueuedException(notification_ids[:queued]) from e
+        queued += len(chunk)
+
+        current_app.logger.debug(
+            "%s %s notifications sent to the %s queue for delivery", len(chunk), notification_type, queue
+        )
+
+
 def send_notification_to_queue(notification, queue=None):
     send_notification_to_queue_detached(notification.key_type, notification.notification_type, notification.id, queue)
 
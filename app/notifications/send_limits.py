@@ -0,0 +1,146 @@
+import uuid
+from time import time
+
+from flask import after_this_request, current_app, g, has_request_context
+from notifications_utils.clients.redis import (
+    daily_limit_cache_key,
+    rate_limit_cache_key,
+)
+
+from app import redis_store
+
+RATE_LIMIT_INTERVAL = 60
+DAILY_LIMIT_CACHE_EXPIRY = 86400
+
+WITHIN_LIMITS = 0
+OVER_RATE_LIMIT = 1
+OVER_DAILY_LIMIT = 2
+
+# Checks the per-minute rate limit and the daily limit for a notification type, and counts the notifications
+# towards the daily totals if both pass. Running it as one script makes it atomic, so two requests can't both see
+# the last remaining message of a daily limit, and it takes one round-trip rather than up to six.
+#
+# KEYS: rate limit sorted set, daily count for the notification type, daily count for all notification types
+# ARGV: now, rate limit interval, rate limit (-1 to skip), daily limit (-1 to skip), number of notifications
+#       (negative to give back unused ones), 1 to add to the daily counts, a unique prefix for rate limit members
+CHECK_AND_INCREMENT_LIMITS_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local rate_limit = tonumber(ARGV[3])
+local daily_limit = tonumber(ARGV[4])
+local count = tonumber(ARGV[5])
+
+if rate_limit >= 0 then
+    for i = 1, count do
+        redis.call('ZADD', KEYS[1], now, ARGV[7] .. '-' .. i)
+    end
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - interval)
+    redis.call('EXPIRE', KEYS[1], interval)
+    if redis.call('ZCARD', KEYS[1]) > rate_limit then
+        return {1, 0}
+    end
+end
+
+local sent_today = tonumber(redis.call('GET', KEYS[2]) or '0')
+if daily_limit >= 0 and sent_today + count > daily_limit then
+    return {2, sent_today}
+end
+
+if ARGV[6] == '1' then
+    for _, key in ipairs({KEYS[2], KEYS[3]}) do
+        if redis.call('EXISTS', key) == 1 then
+            redis.call('INCRBY', key, count)
+        elseif count > 0 then
+            redis.call('SET', key, count, 'EX', ARGV[8])
+        end
+    end
+end
+
+return {0, sent_today}
+"""
+
+_script = None
+
+
+def check_and_increment_limits(
+    service_id,
+    key_type,
+    notification_type,
+    *,
+    rate_limit=None,
+    daily_limit=None,
+    num_notifications=1,
+    increment=True,
+):
+    """
+    Returns (status, sent_today), where status is WITHIN_LIMITS, OVER_RATE_LIMIT or OVER_DAILY_LIMIT and sent_today
+    is how many notifications of this type the service had sent before this call. Leave `rate_limit` or
+    `daily_limit` as None to skip that check.
+
+    If Redis is unavailable we let the notifications through, the same as the redis client does.
+    """
+    global _script
+
+    try:
+        if _script is None:
+            _script = redis_store.redis_store.register_script(CHECK_AND_INCREMENT_LIMITS_SCRIPT)
+
+        status, sent_today = _script(
+            keys=[
+                rate_limit_cache_key(service_id, key_type),
+                daily_limit_cache_key(service_id, notification_type=notification_type),
+                daily_limit_cache_key(service_id),
+            ],
+            args=[
+                time(),
+                RATE_LIMIT_INTERVAL,
+                -1 if rate_limit is None else rate_limit,
+                -1 if daily_limit is None else daily_limit,
+                num_notifications,
+                1 if increment else 0,
+                uuid.uuid4().hex,
+                DAILY_LIMIT_CACHE_EXPIRY,
+            ],
+        )
+        return int(status), int(sent_today)
+    except Exception:
+        current_app.logger.exception("Redis error checking limits for service %s", service_id)
+        return WITHIN_LIMITS, 0
+
+
+def reserve_daily_limit(service_id, notification_type, num_notifications):
+    """
+    Record that the current request has already counted `num_notifications` towards the daily limit, so that
+    persisting them doesn't count them again. Any that the request doesn't go on to persist (because it fails
+    validation, say) are given back when it finishes.
+    """
+    if not has_request_context():
+        return
+
+    if "daily_limit_reservations" not in g:
+        g.daily_limit_reservations = {}
+        after_this_request(_release_unused_daily_limit_reservations)
+
+    key = (str(service_id), notification_type)
+    g.daily_limit_reservations[key] = g.daily_limit_reservations.get(key, 0) + num_notifications
+
+
+def use_daily_limit_reservation(service_id, notification_type, num_notifications):
+    """
+    Returns how many of `num_notifications` still need counting towards the daily limit
+    """
+    reservations = g.get("daily_limit_reservations") if has_request_context() else None
+    if not reservations:
+        return num_notifications
+
+    key = (str(service_id), notification_type)
+    reserved = min(reservations.get(key, 0), num_notifications)
+    reservations[key] = reservations.get(key, 0) - reserved
+    return num_notifications - reserved
+
+
+def _release_unused_daily_limit_reservations(response):
+    for (service_id, notification_type), unused in g.pop("daily_limit_reservations", {}).items():
+        if unused:
+            check_and_increment_limits(service_id, None, notification_type, num_notifications=-unused)
+    return response
@@ -0,0 +1,193 @@
+"""
+Counts of each day's notifications for every service by notification type, template, key type and status, kept in
+Redis so that the dashboard and template statistics don't have to count today's notifications in the database every
+time they're loaded.
+
+Notifications are counted when they're created, and moved from one status to another when they're updated through
+`dao_update_notification`, updated in bulk (by reference, from batches of SMS delivery receipts or when SMS are sent in
+batches) or timed out. `reconcile-notification-status-counts` recounts the day from the database every few minutes,
+which corrects anything missed because Redis wasn't available or a status was changed some other way.
+
+A day's counts are only used once they're known to be complete: either the day before's rollover marked them as
+starting from nothing, or they've been recounted since.
+"""
+
+from collections import Counter, namedtuple
+from datetime import datetime
+
+from flask import current_app
+from notifications_utils.timezones import convert_utc_to_bst
+from sqlalchemy import inspect
+
+from app import redis_store
+
+# long enough to still be there while yesterday's counts are being replaced by ft_notification_status
+STATUS_COUNTS_EXPIRY_SECONDS = 2 * 86400
+
+StatusCount = namedtuple(
+    "StatusCount", ["service_id", "notification_type", "template_id", "key_type", "status", "count"]
+)
+
+
+def count_new_notifications(notifications):
+    if not status_counts_enabled():
+        return
+
+    _apply_changes(Counter(_counts_key_and_field(notification, notification.status) for notification in notifications))
+
+
+def count_status_change(notification):
+    """
+    Count a change to `notification.status` that hasn't been flushed to the database yet
+    """
+    if not status_counts_enabled():
+        return
+
+    history = inspect(notification).attrs.status.history
+    # the old status isn't known if it wasn't loaded before it was changed, so leave it to be recounted
+    if history.deleted and history.added:
+        count_status_changes([(notification, history.deleted[0], history.added[0])])
+
+
+def count_status_changes(changes):
+    """
+    Count notifications moving between statuses, given as (notification, old status, new status)
+    """
+    if not status_counts_enabled():
+        return
+
+    counts = Counter()
+    for notification, old_status, new_status in changes:
+        if old_status != new_status:
+            counts[_counts_key_and_field(notification, old_status)] -= 1
+            counts[_counts_key_and_field(notification, new_status)] += 1
+
+    _apply_changes(counts)
+
+
+def get_todays_notification_status_counts(service_id=None):
+    """
+    Today's counts for one service or, leaving out `service_id`, for every service, as StatusCounts. Returns None if
+    they're not complete or can't be read, in which case the caller should count today's notifications itself.
+    """
+    if not status_counts_enabled():
+        return None
+
+    day = _today()
+    try:
+        pipe = redis_store.redis_store.pipeline()
+        pipe.exists(_complete_key(day))
+        pipe.smembers(_services_key(day))
+        complete, service_ids = pipe.execute()
+        if not complete:
+            return None
+
+        service_ids = [service_id] if service_id else [member.decode() for member in service_ids]
+        pipe = redis_store.redis_store.pipeline()
+        for service_id in service_ids:
+            pipe.hgetall(_counts_key(service_id, day))
+        all_counts = pipe.execute()
+    except Exception:
+        current_app.logger.exception("Failed to get notification status counts for %s", day)
+        return None
+
+    return [
+        StatusCount(str(service_id), *field.decode().split(":"), int(count))
+        for service_id, counts in zip(service_ids, all_counts, strict=True)
+        for field, count in counts.items()
+        if int(count) > 0
+    ]
+
+
+def set_notification_status_counts(day, status_counts):
+    """
+    Replace all the counts for `day` with `status_counts`, and mark them as complete. Notifications counted while the
+    database was being counted can be lost or counted twice, until the next time it's counted.
+    """
+    counts_by_service = {}
+    for status_count in status_counts:
+        field = _field(
+            status_count.notification_type, status_count.template_id, status_count.key_type, status_count.status
+        )
+        counts_by_service.setdefault(str(status_count.service_id), {})[field] = status_count.count
+
+    old_service_ids = {service_id.decode() for service_id in redis_store.redis_store.smembers(_services_key(day))}
+
+    pipe = redis_store.redis_store.pipeline(transaction=True)
+    for service_id in old_service_ids - counts_by_service.keys():
+        pipe.delete(_counts_key(service_id, day))
+    for service_id, counts in counts_by_service.items():
+        pipe.delete(_counts_key(service_id, day))
+        pipe.hset(_counts_key(service_id, day), mapping=counts)
+        pipe.expire(_counts_key(service_id, day), STATUS_COUNTS_EXPIRY_SECONDS)
+    pipe.delete(_services_key(day))
+    if counts_by_service:
+        pipe.sadd(_services_key(day), *counts_by_service)
+        pipe.expire(_services_key(day), STATUS_COUNTS_EXPIRY_SECONDS)
+    pipe.set(_complete_key(day), 1, ex=STATUS_COUNTS_EXPIRY_SECONDS)
+    pipe.execute()
+
+
+def start_notification_status_counts(day):
+    """
+    Mark the counts for `day`, which hasn't started yet, as complete - nothing has been sent that day, so there's
+    nothing to count until notifications are created
+    """
+    redis_store.redis_store.set(_complete_key(day), 1, ex=STATUS_COUNTS_EXPIRY_SECONDS)
+
+
+def _apply_changes(counts):
+    day = _today()
+    # only today's counts are ever used
+    changes = [
+        (service_id, field, change)
+        for (created_on, service_id, field), change in counts.items()
+        if created_on == day and change
+    ]
+    if not changes:
+        return
+
+    pipe = redis_store.redis_store.pipeline()
+    for service_id, field, change in changes:
+        pipe.hincrby(_counts_key(service_id, day), field, change)
+        pipe.expire(_counts_key(service_id, day), STATUS_COUNTS_EXPIRY_SECONDS)
+        pipe.sadd(_services_key(day), str(service_id))
+        pipe.expire(_services_key(day), STATUS_COUNTS_EXPIRY_SECONDS)
+
+    try:
+        pipe.execute()
+    except Exception:
+        # they'll be put right when they're next recounted
+        current_app.logger.exception("Failed to update notification status counts")
+
+
+def _counts_key_and_field(notification, status):
+    return (
+        convert_utc_to_bst(notification.created_at).date(),
+        str(notification.service_id),
+        _field(notification.notification_type, notification.template_id, notification.key_type, status),
+    )
+
+
+def _field(notification_type, template_id, key_type, status):
+    return f"{notification_type}:{template_id}:{key_type}:{status}"
+
+
+def status_counts_enabled():
+    return current_app.config["REDIS_ENABLED"] and current_app.config["NOTIFICATION_STATUS_COUNTS_IN_REDIS"]
+
+
+def _today():
+    return convert_utc_to_bst(datetime.utcnow()).date()
+
+
+def _counts_key(service_id, day):
+    return f"service-{service_id}-notification-status-counts-{day}"
+
+
+def _services_key(day):
+    return f"notification-status-counts-{day}-services"
+
+
+def _complete_key(day):
+    return f"notification-status-counts-{day}-complete"
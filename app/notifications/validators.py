@@ -3,7 +3,6 @@ from gds_metrics.metrics import Histogram
 from notifications_utils import SMS_CHAR_COUNT_LIMIT
 from notifications_utils.clients.redis import (
     daily_limit_cache_key,
-    rate_limit_cache_key,
 )
 from notifications_utils.postal_address import PostalAddress
 from notifications_utils.recipients import (
@@ -31,6 +30,13 @@ from app.models import ServicePermission
 from app.notifications.process_notifications import (
     create_content_for_notification,
 )
+from app.notifications.send_limits import (
+    OVER_DAILY_LIMIT,
+    OVER_RATE_LIMIT,
+    RATE_LIMIT_INTERVAL,
+    check_and_increment_limits,
+    reserve_daily_limit,
+)
 from app.serialised_models import SerialisedTemplate
 from app.service.utils import service_allowed_to_send_to
 from app.utils import get_public_notify_type_text
@@ -47,29 +53,12 @@ REDIS_EXCEEDED_RATE_LIMIT_DURATION_SECONDS = Histogram(
 )
 
 
-def check_service_over_api_rate_limit(service, key_type):
-    if current_app.config["API_RATE_LIMIT_ENABLED"] and current_app.config["REDIS_ENABLED"]:
-        cache_key = rate_limit_cache_key(service.id, key_type)
-        rate_limit = service.rate_limit
-        interval = 60
-        with REDIS_EXCEEDED_RATE_LIMIT_DURATION_SECONDS.time():
-            if redis_store.exceeded_rate_limit(cache_key, rate_limit, interval):
-                current_app.logger.info("service %s has been rate limited for throughput", service.id)
-                raise RateLimitError(rate_limit, interval, key_type)
-
-
 def check_service_over_daily_message_limit(service, key_type, notification_type, num_notifications=1):
     if key_type == KEY_TYPE_TEST or not current_app.config["REDIS_ENABLED"]:
         return
 
-    rate_limits = {
-        EMAIL_TYPE: service.email_message_limit,
-        SMS_TYPE: service.sms_message_limit,
-        LETTER_TYPE: service.letter_message_limit,
-    }
-
     limit_name = notification_type
-    limit_value = rate_limits[notification_type]
+    limit_value = _get_daily_limit(service, notification_type)
 
     cache_key = daily_limit_cache_key(service.id, notification_type=notification_type)
     if (service_stats := redis_store.get(cache_key)) is None:
@@ -89,9 +78,57 @@ def check_service_over_daily_message_limit(service, key_type, notification_type,
         raise TooManyRequestsError(limit_name, limit_value)
 
 
-def check_rate_limiting(service, api_key, notification_type):
-    check_service_over_api_rate_limit(service, api_key.key_type)
-    check_service_over_daily_message_limit(service, api_key.key_type, notification_type=notification_type)
+def check_rate_limiting(service, api_key, notification_type, num_notifications=1):
+    """
+    Check the service's rate limit and daily limit, and count the notifications towards the daily limit, in one
+    atomic Redis call. persist_notification won't count them again for the rest of this request.
+    """
+    if not current_app.config["REDIS_ENABLED"]:
+        return
+
+    key_type = api_key.key_type
+    check_rate_limit = current_app.config["API_RATE_LIMIT_ENABLED"]
+    check_daily_limit = key_type != KEY_TYPE_TEST
+    if not check_rate_limit and not check_daily_limit:
+        return
+
+    daily_limit = _get_daily_limit(service, notification_type)
+
+    with REDIS_EXCEEDED_RATE_LIMIT_DURATION_SECONDS.time():
+        status, sent_today = check_and_increment_limits(
+            service.id,
+            key_type,
+            notification_type,
+            rate_limit=service.rate_limit if check_rate_limit else None,
+            daily_limit=daily_limit if check_daily_limit else None,
+            num_notifications=num_notifications,
+            increment=check_daily_limit,
+        )
+
+    if status == OVER_RATE_LIMIT:
+        current_app.logger.info("service %s has been rate limited for throughput", service.id)
+        raise RateLimitError(service.rate_limit, RATE_LIMIT_INTERVAL, key_type)
+
+    if status == OVER_DAILY_LIMIT:
+        current_app.logger.info(
+            "service %s has been rate limited for %s daily use sent %s limit %s",
+            service.id,
+            sent_today,
+            notification_type,
+            daily_limit,
+        )
+        raise TooManyRequestsError(notification_type, daily_limit)
+
+    if check_daily_limit:
+        reserve_daily_limit(service.id, notification_type, num_notifications)
+
+
+def _get_daily_limit(service, notification_type):
+    return {
+        EMAIL_TYPE: service.email_message_limit,
+        SMS_TYPE: service.sms_message_limit,
+        LETTER_TYPE: service.letter_message_limit,
+    }[notification_type]
 
 
 def check_template_is_for_notification_type(notification_type, template_type):
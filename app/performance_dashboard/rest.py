@@ -13,6 +13,7 @@ from app.errors import register_errors
 from app.performance_dashboard.performance_dashboard_schema import (
     performance_dashboard_request,
 )
+from app.platform_stats.caching import cache_platform_stats
 from app.schema_validation import validate
 
 performance_dashboard_blueprint = Blueprint("performance_dashboard", __name__, url_prefix="/performance-dashboard")
@@ -21,6 +22,7 @@ register_errors(performance_dashboard_blueprint)
 
 
 @performance_dashboard_blueprint.route("")
+@cache_platform_stats
 def get_performance_dashboard():
     # All statistics are as of last night this matches the existing performance platform
     # and avoids the need to query notifications.
@@ -0,0 +1,47 @@
+import functools
+import hashlib
+from time import time
+
+from flask import current_app, request
+
+from app import redis_store
+from app.constants import CacheKeys
+
+# how long a response is cached for. Responses also stop being used once `update-platform-stats` has run again.
+PLATFORM_STATS_CACHE_TTL_SECONDS = 10 * 60
+
+
+def cache_platform_stats(view):
+    """
+    Cache the JSON response of a platform-wide stats endpoint in Redis, keyed by its path and query string, and give it
+    an ETag so the admin app can ask for it again with If-None-Match and get a 304 if nothing has changed.
+
+    The ETag changes whenever the platform stats are updated and at least every PLATFORM_STATS_CACHE_TTL_SECONDS, so
+    today's figures, which can come from the notifications table, aren't out of date for longer than that.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        updated_at = redis_store.get(CacheKeys.PLATFORM_STATS_UPDATED_AT_UTC_ISOFORMAT) or b""
+        time_bucket = int(time() // PLATFORM_STATS_CACHE_TTL_SECONDS)
+        etag = hashlib.sha1(
+            f"{request.full_path}:{updated_at.decode()}:{time_bucket}".encode(), usedforsecurity=False
+        ).hexdigest()
+
+        if etag in request.if_none_match:
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+
+        cache_key = f"platform-stats-{etag}"
+        if body := redis_store.get(cache_key):
+            response = current_app.response_class(body, mimetype="application/json")
+        else:
+            response = view(*args, **kwargs)
+            if response.status_code == 200:
+                redis_store.set(cache_key, response.get_data(), ex=PLATFORM_STATS_CACHE_TTL_SECONDS)
+
+        response.set_etag(etag)
+        return response
+
+    return wrapper
@@ -18,6 +18,7 @@ from app.dao.fact_notification_status_dao import (
 from app.dao.services_dao import fetch_billing_details_for_all_services
 from app.errors import InvalidRequest, register_errors
 from app.models import FactBillingLetterDespatch
+from app.platform_stats.caching import cache_platform_stats
 from app.platform_stats.platform_stats_schema import platform_stats_request
 from app.schema_validation import validate
 from app.service.statistics import format_admin_stats
@@ -29,6 +30,7 @@ register_errors(platform_stats_blueprint)
 
 
 @platform_stats_blueprint.route("")
+@cache_platform_stats
 def get_platform_stats():
     if request.args:
         validate(request.args, platform_stats_request)
@@ -184,6 +186,7 @@ def get_data_for_dvla_billing_report():
 
 
 @platform_stats_blueprint.route("daily-volumes-report")
+@cache_platform_stats
 def daily_volumes_report():
     start_date = validate_date_format(request.args.get("start_date"))
     end_date = validate_date_format(request.args.get("end_date"))
@@ -207,6 +210,7 @@ def daily_volumes_report():
 
 
 @platform_stats_blueprint.route("daily-sms-provider-volumes-report")
+@cache_platform_stats
 def daily_sms_provider_volumes_report():
     start_date = validate_date_format(request.args.get("start_date"))
     end_date = validate_date_format(request.args.get("end_date"))
@@ -27,7 +27,7 @@ from app import ma, models
 from app.dao.permissions_dao import permission_dao
 from app.models import ServicePermission
 from app.notifications.validators import remap_phone_number_validation_messages
-from app.utils import DATETIME_FORMAT_NO_TIMEZONE, get_template_instance
+from app.utils import DATETIME_FORMAT_NO_TIMEZONE, decode_pagination_cursor, get_template_instance
 
 
 def _validate_positive_number(value, msg="Not a positive integer"):
@@ -54,6 +54,18 @@ class FlexibleDateTime(fields.DateTime):
         self.SERIALIZATION_FUNCS["flexible"] = lambda x: x.strftime(self.OLD_MARSHMALLOW_FORMAT)
 
 
+class PaginationCursor(fields.String):
+    """
+    A cursor from `encode_pagination_cursor`, loaded as the (created_at, id) it was made from
+    """
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        try:
+            return decode_pagination_cursor(super()._deserialize(value, attr, data, **kwargs))
+        except ValueError as e:
+            raise ValidationError("Not a valid cursor") from e
+
+
 class UUIDsAsStringsMixin:
     @post_dump()
     def __post_dump(self, data, **kwargs):
@@ -785,6 +797,7 @@ class NotificationsFilterSchema(ma.Schema):
     status = fields.Nested(NotificationModelSchema, only=["status"], many=True)
     page = fields.Int(required=False)
     page_size = fields.Int(required=False)
+    cursor = PaginationCursor(required=False)
     limit_days = fields.Int(required=False)
     include_jobs = fields.Boolean(required=False)
     include_from_test_key = fields.Boolean(required=False)
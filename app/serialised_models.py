@@ -1,8 +1,3 @@
-from collections import defaultdict
-from functools import partial
-from threading import RLock
-
-import cachetools
 from flask import current_app
 from notifications_utils.clients.redis import RequestCache
 from notifications_utils.serialised_model import (
@@ -14,29 +9,13 @@ from werkzeug.utils import cached_property
 from app import db, redis_store
 from app.dao.api_key_dao import get_model_api_keys
 from app.dao.organisation_dao import dao_get_organisation_by_id
+from app.dao.service_callback_api_dao import get_service_callback_api_for_service
 from app.dao.services_dao import dao_fetch_service_by_id
+from app.memory_cache import INVALIDATED_CACHE_TTL, memory_cache
 
-caches = defaultdict(partial(cachetools.TTLCache, maxsize=1024, ttl=2))
-locks = defaultdict(RLock)
 redis_cache = RequestCache(redis_store)
 
 
-def memory_cache(func):
-    @cachetools.cached(
-        cache=caches[func.__qualname__],
-        lock=locks[func.__qualname__],
-        key=ignore_first_argument_cache_key,
-    )
-    def wrapper(*args, **kwargs):
-        return func(*args, **kwargs)
-
-    return wrapper
-
-
-def ignore_first_argument_cache_key(cls, *args, **kwargs):
-    return cachetools.keys.hashkey(*args, **kwargs)
-
-
 class SerialisedTemplate(SerialisedModel):
     ALLOWED_PROPERTIES = {
         "archived",
@@ -51,7 +30,7 @@ class SerialisedTemplate(SerialisedModel):
     }
 
     @classmethod
-    @memory_cache
+    @memory_cache(ttl=INVALIDATED_CACHE_TTL, invalidated=True)
     def from_id_and_service_id(cls, template_id, service_id, version=None):
         return cls(cls.get_dict(template_id, service_id, version)["data"])
 
@@ -93,7 +72,7 @@ class SerialisedService(SerialisedModel):
     }
 
     @classmethod
-    @memory_cache
+    @memory_cache(ttl=INVALIDATED_CACHE_TTL, invalidated=True)
     def from_id(cls, service_id):
         return cls(cls.get_dict(service_id)["data"])
 
@@ -129,7 +108,7 @@ class SerialisedAPIKeyCollection(SerialisedModelCollection):
     model = SerialisedAPIKey
 
     @classmethod
-    @memory_cache
+    @memory_cache(ttl=INVALIDATED_CACHE_TTL, invalidated=True)
     def from_service_id(cls, service_id):
         keys = [
             {k: getattr(key, k) for k in SerialisedAPIKey.ALLOWED_PROPERTIES} for key in get_model_api_keys(service_id)
@@ -138,11 +117,31 @@ class SerialisedAPIKeyCollection(SerialisedModelCollection):
         return cls(keys)
 
 
+class SerialisedServiceCallbackApi(SerialisedModel):
+    ALLOWED_PROPERTIES = {
+        "id",
+        "url",
+        "bearer_token",
+    }
+
+    @classmethod
+    @memory_cache(ttl=INVALIDATED_CACHE_TTL, invalidated=True)
+    def from_service_id_and_type(cls, service_id, callback_type):
+        """
+        Returns None if the service doesn't have a callback of this type, which is cached like any other answer
+        since most services don't
+        """
+        callback_api = get_service_callback_api_for_service(service_id, callback_type)
+        if not callback_api:
+            return None
+        return cls({k: getattr(callback_api, k) for k in cls.ALLOWED_PROPERTIES})
+
+
 class SerialisedOrganisation(SerialisedModel):
     ALLOWED_PROPERTIES = {"name", "domains"}
 
     @classmethod
-    @memory_cache
+    @memory_cache()
     def from_id(cls, organisation_id):
         return cls(cls.get_dict(organisation_id)["data"])
 
@@ -1,7 +1,17 @@
+import csv
+import io
 import itertools
 from datetime import datetime
 
-from flask import Blueprint, current_app, jsonify, request
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    jsonify,
+    request,
+    stream_with_context,
+    url_for,
+)
 from notifications_utils.letter_timings import (
     letter_can_be_cancelled,
     too_late_to_cancel_letter,
@@ -104,6 +114,7 @@ from app.letters.utils import adjust_daily_service_limits_for_cancelled_letters,
 from app.models import (
     EmailBranding,
     LetterBranding,
+    Notification,
     Permission,
     Service,
     ServiceContactList,
@@ -145,6 +156,7 @@ from app.user.users_schema import post_set_permissions_schema
 from app.utils import (
     DATE_FORMAT,
     DATETIME_FORMAT_NO_TIMEZONE,
+    encode_pagination_cursor,
     get_prev_next_pagination_links,
     midnight_n_days_ago,
 )
@@ -439,59 +451,120 @@ def get_all_notifications_for_service(service_id):
     # for whether to show pagination links
     count_pages = data.get("count_pages", True)
 
-    pagination = notifications_dao.get_notifications_for_service(
+    # with a cursor we carry on from the last notification the admin app was shown, rather than skipping over all
+    # the pages before this one. Either way we get one notification more than we need, to tell if there's a next page.
+    notifications, next_page_exists = notifications_dao.get_page_of_notifications_for_service(
         service_id,
         filter_dict=data,
+        cursor=data.get("cursor"),
         page=page,
         page_size=page_size,
-        count_pages=False,
         limit_days=limit_days,
         include_jobs=include_jobs,
         include_from_test_key=include_from_test_key,
         include_one_off=include_one_off,
     )
+    next_cursor = (
+        encode_pagination_cursor(notifications[-1].created_at, notifications[-1].id) if next_page_exists else None
+    )
 
     kwargs = request.args.to_dict()
     kwargs["service_id"] = service_id
 
     if data.get("format_for_csv"):
-        notifications = [notification.serialize_for_csv() for notification in pagination.items]
+        notifications = [notification.serialize_for_csv() for notification in notifications]
     else:
-        notifications = notification_with_template_schema.dump(pagination.items, many=True)
-
-    # We try and get the next page of results to work out if we need provide a pagination link to the next page
-    # in our response if it exists. Note, this could be done instead by changing `count_pages` in the previous
-    # call to be True which will enable us to use Flask-Sqlalchemy to tell if there is a next page of results but
-    # this way is much more performant for services with many results (unlike Flask SqlAlchemy, this approach
-    # doesn't do an additional query to count all the results of which there could be millions but instead only
-    # asks for a single extra page of results).
-    next_page_of_pagination = notifications_dao.get_notifications_for_service(
-        service_id,
-        filter_dict=data,
-        page=page + 1,
-        page_size=page_size,
-        count_pages=False,
-        limit_days=limit_days,
-        include_jobs=include_jobs,
-        include_from_test_key=include_from_test_key,
-        include_one_off=include_one_off,
-        error_out=False,  # False so that if there are no results, it doesn't end in aborting with a 404
-    )
+        notifications = notification_with_template_schema.dump(notifications, many=True)
+
+    if not count_pages:
+        links = {}
+    elif "cursor" in data:
+        kwargs.pop("cursor", None)
+        kwargs.pop("page", None)
+        links = {}
+        if next_cursor:
+            links["next"] = url_for(".get_all_notifications_for_service", cursor=next_cursor, **kwargs)
+    else:
+        links = get_prev_next_pagination_links(page, next_page_exists, ".get_all_notifications_for_service", **kwargs)
 
     return (
         jsonify(
             notifications=notifications,
             page_size=page_size,
-            links=get_prev_next_pagination_links(
-                page, len(next_page_of_pagination.items), ".get_all_notifications_for_service", **kwargs
-            )
-            if count_pages
-            else {},
+            next_cursor=next_cursor,
+            links=links,
         ),
         200,
     )
 
 
+@service_blueprint.route("/<uuid:service_id>/notifications.csv", methods=["GET"])
+def get_notifications_csv_for_service(service_id):
+    """
+    A CSV report of all of a service's notifications that match the same filters as get_all_notifications_for_service.
+
+    The rows are written out as they're read from the database, so this takes one query and the same amount of
+    memory however many notifications there are.
+    """
+    data = notifications_filter_schema.load(request.args)
+
+    rows = notifications_dao.get_notifications_for_service_for_csv(
+        service_id,
+        filter_dict=data,
+        limit_days=data.get("limit_days"),
+        include_jobs=data.get("include_jobs", True),
+        include_from_test_key=data.get("include_from_test_key", False),
+        include_one_off=data.get("include_one_off", True),
+    )
+
+    return Response(stream_with_context(_generate_notifications_csv(rows)), mimetype="text/csv")
+
+
+NOTIFICATIONS_CSV_HEADERS = [
+    "Row number",
+    "Recipient",
+    "Reference",
+    "Template",
+    "Type",
+    "Sent by",
+    "Sent by email",
+    "Job",
+    "Status",
+    "Time",
+    "API key name",
+]
+
+
+def _generate_notifications_csv(rows, rows_per_chunk=1000):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(NOTIFICATIONS_CSV_HEADERS)
+
+    for i, row in enumerate(rows, start=1):
+        writer.writerow(
+            [
+                "" if row.job_row_number is None else row.job_row_number + 1,
+                row.to,
+                row.client_reference or "",
+                row.template_name,
+                row.template_type,
+                row.created_by_name or "",
+                row.created_by_email_address or "",
+                row.job_name or "",
+                Notification.format_status(row.template_type, row.status),
+                convert_utc_to_bst(row.created_at).strftime("%Y-%m-%d %H:%M:%S"),
+                row.api_key_name or "",
+            ]
+        )
+
+        if i % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
 @service_blueprint.route("/<uuid:service_id>/notifications/<uuid:notification_id>", methods=["GET"])
 def get_notification_for_service(service_id, notification_id):
     notification = notifications_dao.get_notification_with_personalisation(
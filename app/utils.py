@@ -1,3 +1,6 @@
+import itertools
+import uuid
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -50,6 +53,24 @@ def get_prev_next_pagination_links(current_page, next_page_exists, endpoint, **k
     return links
 
 
+def encode_pagination_cursor(created_at, item_id):
+    """
+    Turn the (created_at, id) of the last item on a page into an opaque string that can go in a link to the next page
+    """
+    return urlsafe_b64encode(f"{created_at.strftime(DATETIME_FORMAT_NO_TIMEZONE)}|{item_id}".encode()).decode()
+
+
+def decode_pagination_cursor(cursor):
+    """
+    Get the (created_at, id) back out of a cursor made by `encode_pagination_cursor`. Raises ValueError if it isn't one.
+    """
+    try:
+        created_at, item_id = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.strptime(created_at, DATETIME_FORMAT_NO_TIMEZONE), uuid.UUID(item_id)
+    except (TypeError, UnicodeError, ValueError) as e:
+        raise ValueError(f"{cursor} is not a valid cursor") from e
+
+
 def url_with_token(data, url, config, base_url=None):
     from notifications_utils.url_safe_token import generate_token
 
@@ -146,6 +167,15 @@ def get_uuid_string_or_none(val):
     return str(val) if val else None
 
 
+def chunks(iterable, size):
+    """
+    Yield successive lists of at most `size` items from `iterable`.
+    """
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
 def format_sequential_number(sequential_number):
     return format(sequential_number, "x").zfill(8)
 
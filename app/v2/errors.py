@@ -82,6 +82,17 @@ class QrCodeTooLongError(ValidationError):
         }
 
 
+class BatchPartlyAcceptedError(InvalidRequest):
+    status_code = 500
+    message = "Internal server error: only the notifications listed were accepted, send the rest again"
+
+    def __init__(self, accepted_notifications):
+        self.accepted_notifications = accepted_notifications
+
+    def to_dict_v2(self):
+        return {**super().to_dict_v2(), "notifications": self.accepted_notifications}
+
+
 def register_errors(blueprint):
     @blueprint.errorhandler(InvalidEmailError)
     def invalid_format(error):
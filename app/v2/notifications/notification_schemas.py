@@ -289,3 +289,29 @@ post_letter_response = {
     },
     "required": ["id", "content", "uri", "template"],
 }
+
+
+POST_NOTIFICATION_BATCH_MAX_SIZE = 1_000
+
+
+def _batch_request(notification_request, notification_type):
+    return {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "description": f"POST {notification_type} notification batch schema",
+        "type": "object",
+        "title": f"POST v2/notifications/{notification_type}/batch",
+        "properties": {
+            "notifications": {
+                "type": "array",
+                "items": {key: value for key, value in notification_request.items() if key != "$schema"},
+                "minItems": 1,
+                "maxItems": POST_NOTIFICATION_BATCH_MAX_SIZE,
+            },
+        },
+        "required": ["notifications"],
+        "additionalProperties": False,
+    }
+
+
+post_sms_batch_request = _batch_request(post_sms_request, "sms")
+post_email_batch_request = _batch_request(post_email_request, "email")
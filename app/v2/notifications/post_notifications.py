@@ -38,14 +38,18 @@ from app.constants import (
 )
 from app.dao.dao_utils import transaction
 from app.dao.templates_dao import get_precompiled_letter_template
+from app.exceptions import NotificationsPartlyQueuedException
 from app.letters.utils import upload_letter_pdf
 from app.models import Notification
 from app.notifications.process_letter_notifications import (
     create_letter_notification,
 )
 from app.notifications.process_notifications import (
+    build_notification,
     persist_notification,
+    persist_notifications,
     send_notification_to_queue_detached,
+    send_notifications_to_queue_in_batches,
     simulated_recipient,
 )
 from app.notifications.validators import (
@@ -61,7 +65,7 @@ from app.notifications.validators import (
 )
 from app.schema_validation import validate
 from app.utils import DATETIME_FORMAT
-from app.v2.errors import BadRequestError
+from app.v2.errors import BadRequestError, BatchPartlyAcceptedError
 from app.v2.notifications import v2_notification_blueprint
 from app.v2.notifications.create_response import (
     create_post_email_response_from_notification,
@@ -69,9 +73,11 @@ from app.v2.notifications.create_response import (
     create_post_sms_response_from_notification,
 )
 from app.v2.notifications.notification_schemas import (
+    post_email_batch_request,
     post_email_request,
     post_letter_request,
     post_precompiled_letter_request,
+    post_sms_batch_request,
     post_sms_request,
     send_a_file_validation,
 )
@@ -166,6 +172,159 @@ def post_notification(notification_type):
     return jsonify(notification), 201
 
 
+@v2_notification_blueprint.route("/<notification_type>/batch", methods=["POST"])
+def post_notification_batch(notification_type):
+    with POST_NOTIFICATION_JSON_PARSE_DURATION_SECONDS.time():
+        request_json = get_valid_json()
+
+        if notification_type == EMAIL_TYPE:
+            form = validate(request_json, post_email_batch_request)
+        elif notification_type == SMS_TYPE:
+            form = validate(request_json, post_sms_batch_request)
+        else:
+            abort(404)
+
+    check_service_has_permission(notification_type, authenticated_service.permissions)
+
+    check_rate_limiting(
+        authenticated_service,
+        api_user,
+        notification_type=notification_type,
+        num_notifications=len(form["notifications"]),
+    )
+
+    notifications = process_sms_or_email_notification_batch(
+        forms=form["notifications"],
+        notification_type=notification_type,
+        service=authenticated_service,
+    )
+
+    return jsonify(notifications=notifications), 201
+
+
+def process_sms_or_email_notification_batch(*, forms, notification_type, service):
+    """
+    Validate every notification in the batch before persisting any of them, so that a batch is either accepted or
+    rejected as a whole. The accepted notifications are then saved with one INSERT and queued for delivery in chunks.
+    """
+    reply_to_texts = {}
+    validated = []
+    for form in forms:
+        template, template_with_content = validate_template(
+            form["template_id"],
+            form.get("personalisation", {}),
+            service,
+            notification_type,
+            check_char_count=False,
+        )
+
+        # most batches use a handful of templates and senders, so only look each combination up once
+        reply_to_key = (template.id, form.get("email_reply_to_id"), form.get("sms_sender_id"))
+        if reply_to_key not in reply_to_texts:
+            reply_to_texts[reply_to_key] = get_reply_to_text(notification_type, form, template)
+
+        form_send_to = form["email_address"] if notification_type == EMAIL_TYPE else form["phone_number"]
+        send_to = validate_and_format_recipient(
+            send_to=form_send_to, key_type=api_user.key_type, service=service, notification_type=notification_type
+        )
+
+        # nothing is uploaded until the whole batch is valid, so check the length with a link of the same form in
+        # place of each file. It's checked again once the real links are in.
+        if file_keys := validate_document_uploads(form.get("personalisation")):
+            stand_in_link = document_download_client.get_upload_url_for_simulated_email(service.id) + "/test-document"
+            template_with_content.values = {
+                **form["personalisation"],
+                **{key: stand_in_link for key in file_keys},
+            }
+        check_is_message_too_long(template_with_content)
+
+        validated.append((form, template, template_with_content, reply_to_texts[reply_to_key], form_send_to, send_to))
+
+    responses = []
+    notifications = []
+    for form, template, template_with_content, reply_to_text, form_send_to, send_to in validated:
+        notification_id = uuid.uuid4()
+
+        # Do not persist or send notification to the queue if it is a simulated recipient
+        simulated = simulated_recipient(send_to, notification_type)
+
+        personalisation, document_download_count = process_document_uploads(
+            form.get("personalisation"),
+            service,
+            send_to=send_to,
+            simulated=simulated,
+        )
+        if document_download_count:
+            # We changed personalisation which means we need to update the content
+            template_with_content.values = personalisation
+
+        # validate content length after url is replaced in personalisation.
+        check_is_message_too_long(template_with_content)
+
+        responses.append(
+            create_response_for_post_notification(
+                notification_id=notification_id,
+                client_reference=form.get("reference", None),
+                template_id=template.id,
+                template_version=template.version,
+                service_id=service.id,
+                notification_type=notification_type,
+                reply_to=reply_to_text,
+                template_with_content=template_with_content,
+            )
+        )
+
+        if not simulated:
+            notifications.append(
+                build_notification(
+                    notification_id=notification_id,
+                    template_id=template.id,
+                    template_version=template.version,
+                    recipient=form_send_to,
+                    service=service,
+                    personalisation=personalisation,
+                    notification_type=notification_type,
+                    api_key_id=api_user.id,
+                    key_type=api_user.key_type,
+                    client_reference=form.get("reference", None),
+                    reply_to_text=reply_to_text,
+                    document_download_count=document_download_count,
+                )
+            )
+
+    if notifications:
+        persist_notifications(
+            notifications, service=service, notification_type=notification_type, key_type=api_user.key_type
+        )
+        try:
+            send_notifications_to_queue_in_batches(
+                key_type=api_user.key_type,
+                notification_type=notification_type,
+                notification_ids=[notification.id for notification in notifications],
+            )
+        except NotificationsPartlyQueuedException as e:
+            # the notifications that weren't queued have been deleted, so tell the client which ones to send again
+            rejected_ids = {str(notification.id) for notification in notifications} - {str(id) for id in e.queued_ids}
+            current_app.logger.exception(
+                "POST %s batch: %s of %s notifications could not be queued",
+                notification_type,
+                len(rejected_ids),
+                len(responses),
+            )
+            raise BatchPartlyAcceptedError(
+                [response for response in responses if str(response["id"]) not in rejected_ids]
+            ) from e
+
+    current_app.logger.debug(
+        "POST %s batch of %s notifications, %s simulated",
+        notification_type,
+        len(responses),
+        len(responses) - len(notifications),
+    )
+
+    return responses
+
+
 def process_sms_or_email_notification(
     *,
     form,
@@ -303,14 +462,13 @@ def save_email_or_sms_to_queue(
     return Notification(**data)
 
 
-def process_document_uploads(personalisation_data, service, send_to: str, simulated=False):
+def validate_document_uploads(personalisation_data):
     """
-    Returns modified personalisation dict and a count of document uploads. If there are no document uploads, returns
-    a count of `None` rather than `0`.
+    Returns the keys of the files to upload in `personalisation_data`, once it's been checked they can be sent
     """
     file_keys = [k for k, v in (personalisation_data or {}).items() if isinstance(v, dict) and "file" in v]
     if not file_keys:
-        return personalisation_data, None
+        return []
 
     # Make sure that all data for file uploads matches our expected schema.
     # We can't (feasibly) do this at the start of the request because the JSON Schema required would throw error
@@ -319,12 +477,24 @@ def process_document_uploads(personalisation_data, service, send_to: str, simula
     for file_key in file_keys:
         validate(personalisation_data[file_key], send_a_file_validation)
 
-    personalisation_data = personalisation_data.copy()
-
     check_if_service_can_send_files_by_email(
         service_contact_link=authenticated_service.contact_link, service_id=authenticated_service.id
     )
 
+    return file_keys
+
+
+def process_document_uploads(personalisation_data, service, send_to: str, simulated=False):
+    """
+    Returns modified personalisation dict and a count of document uploads. If there are no document uploads, returns
+    a count of `None` rather than `0`.
+    """
+    file_keys = validate_document_uploads(personalisation_data)
+    if not file_keys:
+        return personalisation_data, None
+
+    personalisation_data = personalisation_data.copy()
+
     for key in file_keys:
         if simulated:
             personalisation_data[key] = (
@@ -0,0 +1,21 @@
+"""
+
+Revision ID: 0445_batched_callbacks_perm
+Revises: 0444_pentest_whs_003
+Create Date: 2026-10-18 10:12:41.318206
+
+"""
+
+from alembic import op
+
+revision = "0445_batched_callbacks_perm"
+down_revision = "0444_pentest_whs_003"
+
+
+def upgrade():
+    op.execute("INSERT INTO service_permission_types VALUES ('batched_delivery_status_callbacks')")
+
+
+def downgrade():
+    op.execute("DELETE FROM service_permissions WHERE permission = 'batched_delivery_status_callbacks'")
+    op.execute("DELETE FROM service_permission_types WHERE name = 'batched_delivery_status_callbacks'")
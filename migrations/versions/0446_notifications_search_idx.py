@@ -0,0 +1,81 @@
+"""
+
+Revision ID: 0446_notifications_search_idx
+Revises: 0445_batched_callbacks_perm
+Create Date: 2026-10-18 14:02:17.529814
+
+"""
+
+from alembic import op
+
+revision = "0446_notifications_search_idx"
+down_revision = "0445_batched_callbacks_perm"
+
+# name: (access method, columns)
+INDEXES = {
+    "ix_notifications_service_id_normalised_to": ("btree", "service_id, normalised_to"),
+    "ix_notifications_normalised_to_trgm": ("gin", "normalised_to gin_trgm_ops"),
+    "ix_notifications_client_reference_trgm": ("gin", "client_reference gin_trgm_ops"),
+}
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    conn = op.get_bind()
+    with op.get_context().autocommit_block():
+        if _notifications_is_partitioned(conn):
+            _create_partitioned_indexes(conn)
+            return
+
+        for name, (method, columns) in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON notifications USING {method} ({columns})")
+
+
+def _notifications_is_partitioned(conn):
+    return conn.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('notifications'))"
+    ).scalar()
+
+
+def _create_partitioned_indexes(conn):
+    # CREATE INDEX CONCURRENTLY doesn't work on a partitioned table, so build each partition's index concurrently,
+    # then create the index on the parent alone (which is quick, as it starts out invalid) and attach them to it. It
+    # becomes valid once every partition's index is attached, and partitions created later get one automatically.
+    partitions = [
+        row.relname
+        for row in conn.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass('notifications')
+            """
+        )
+    ]
+
+    for name, (method, columns) in INDEXES.items():
+        for partition in partitions:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {_partition_index_name(name, partition)} "
+                f"ON {partition} USING {method} ({columns})"
+            )
+
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY notifications USING {method} ({columns})")
+        for partition in partitions:
+            op.execute(f"ALTER INDEX {name} ATTACH PARTITION {_partition_index_name(name, partition)}")
+
+
+def _partition_index_name(name, partition):
+    return name.replace("notifications", partition, 1)
+
+
+def downgrade():
+    # pg_trgm is left installed, as dropping it would fail if anything else has started using it
+    is_partitioned = _notifications_is_partitioned(op.get_bind())
+
+    with op.get_context().autocommit_block():
+        for name in reversed(INDEXES):
+            # an index on a partitioned table (which drops the partitions' indexes with it) can't be dropped
+            # concurrently
+            op.execute(f"DROP INDEX {'' if is_partitioned else 'CONCURRENTLY '}IF EXISTS {name}")
@@ -0,0 +1,55 @@
+"""
+
+Revision ID: 0447_ft_platform_stats
+Revises: 0446_notifications_search_idx
+Create Date: 2026-10-18 16:40:12.301958
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0447_ft_platform_stats"
+down_revision = "0446_notifications_search_idx"
+
+
+def upgrade():
+    op.create_table(
+        "ft_platform_notification_status",
+        sa.Column("bst_date", sa.Date(), nullable=False),
+        sa.Column("notification_type", sa.Text(), nullable=False),
+        sa.Column("key_type", sa.Text(), nullable=False),
+        sa.Column("notification_status", sa.Text(), nullable=False),
+        sa.Column("notification_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("bst_date", "notification_type", "key_type", "notification_status"),
+    )
+    op.create_index(
+        op.f("ix_ft_platform_notification_status_bst_date"),
+        "ft_platform_notification_status",
+        ["bst_date"],
+        unique=False,
+    )
+
+    op.create_table(
+        "ft_platform_billing",
+        sa.Column("bst_date", sa.Date(), nullable=False),
+        sa.Column("notification_type", sa.Text(), nullable=False),
+        sa.Column("provider", sa.Text(), nullable=False),
+        sa.Column("notifications_sent", sa.Integer(), nullable=False),
+        sa.Column("billable_units", sa.Integer(), nullable=False),
+        sa.Column("chargeable_units", sa.Integer(), nullable=False),
+        sa.Column("cost", sa.Numeric(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("bst_date", "notification_type", "provider"),
+    )
+    op.create_index(op.f("ix_ft_platform_billing_bst_date"), "ft_platform_billing", ["bst_date"], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f("ix_ft_platform_billing_bst_date"), table_name="ft_platform_billing")
+    op.drop_table("ft_platform_billing")
+    op.drop_index(op.f("ix_ft_platform_notification_status_bst_date"), table_name="ft_platform_notification_status")
+    op.drop_table("ft_platform_notification_status")
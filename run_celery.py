@@ -19,6 +19,17 @@ import prometheus_client  # noqa
 # See https://github.com/alphagov/notifications-api/pull/3687 for a little more of the investigation/notes
 import pycurl  # noqa
 
+# workers started with --pool=eventlet have already been monkey patched by celery, and need the same fix for redis
+# as the API (see gunicorn_config.fix_ssl_monkeypatching)
+import socket  # noqa
+
+from eventlet import patcher  # noqa
+
+if patcher.is_monkey_patched("socket"):
+    from eventlet.green import ssl as green_ssl
+
+    green_ssl.timeout_exc = socket.timeout
+
 # notify_celery is referenced from manifest_delivery_base.yml, and cannot be removed
 from app import create_app, notify_celery  # noqa
 from app.notify_api_flask_app import NotifyApiFlaskApp  # noqa
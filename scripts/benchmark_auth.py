@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Times how long `_decode_jwt_token` takes to find the API key a token was signed with, for services with different
+numbers of API keys.
+
+    python scripts/benchmark_auth.py [--iterations 2000] [--key-counts 1 10 100]
+
+Three cases are timed for each number of keys, all using the last key in the service's list:
+
+* unknown key: nothing is cached, so keys are tried in order until one matches. This is what every request cost
+  before the fast path.
+* last used key: a token we haven't seen before, signed with the key the service used last time
+* repeated token: a token we verified on an earlier request
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from timeit import timeit
+
+import jwt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.authentication import auth  # noqa: E402
+from app.authentication.auth import InternalApiKey, _decode_jwt_token  # noqa: E402
+
+
+def create_token(service_id, secret):
+    return jwt.encode({"iss": service_id, "iat": int(time.time())}, secret, algorithm="HS256", headers={"typ": "JWT"})
+
+
+def microseconds_per_call(func, iterations):
+    return timeit(func, number=iterations) / iterations * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--key-counts", type=int, nargs="+", default=[1, 5, 10, 25, 50, 100])
+    args = parser.parse_args()
+
+    print(f"{'keys':>6} {'unknown key (µs)':>18} {'last used key (µs)':>20} {'repeated token (µs)':>21}")
+
+    for key_count in args.key_counts:
+        service_id = str(uuid.uuid4())
+        api_keys = [InternalApiKey(uuid.uuid4(), str(uuid.uuid4())) for _ in range(key_count)]
+        token = create_token(service_id, api_keys[-1].secret)
+
+        def unknown_key():
+            auth.verified_tokens.clear()
+            auth.last_used_api_key_ids.clear()
+            _decode_jwt_token(token, api_keys, service_id)  # noqa: B023
+
+        def last_used_key():
+            auth.verified_tokens.clear()
+            _decode_jwt_token(token, api_keys, service_id)  # noqa: B023
+
+        def repeated_token():
+            _decode_jwt_token(token, api_keys, service_id)  # noqa: B023
+
+        print(
+            f"{key_count:>6} "
+            f"{microseconds_per_call(unknown_key, args.iterations):>18.1f} "
+            f"{microseconds_per_call(last_used_key, args.iterations):>20.1f} "
+            f"{microseconds_per_call(repeated_token, args.iterations):>21.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
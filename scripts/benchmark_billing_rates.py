@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+"""
+Compares how long it takes to find the rate for each of a day's ft_billing rows by looking through every rate (what
+`get_rate` used to do) and with the RateIndex that `get_rate` now builds.
+
+    python scripts/benchmark_billing_rates.py [--rows 100000] [--repeat 3]
+
+The rates are made up to look like production's: a new SMS rate every year and a new set of letter rates, for every
+sheet count, post class and crown / non-crown, every six months since 2016. The billing rows are a mix of SMS, email
+and letters, in roughly the proportions of a busy day. Nothing is read from the database.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.constants import EMAIL_TYPE, LETTER_TYPE, SMS_TYPE  # noqa: E402
+from app.dao.fact_billing_dao import (  # noqa: E402
+    LetterRateForBilling,
+    NonLetterRate,
+    RateIndex,
+    get_rate,
+)
+from app.utils import get_london_midnight_in_utc  # noqa: E402
+
+POST_CLASSES = ["first", "second", "economy", "europe", "rest-of-world"]
+
+
+def make_rates():
+    non_letter_rates = [
+        NonLetterRate(notification_type, datetime(year, 3, 31, 23), rate)
+        for year in range(2016, 2025)
+        for notification_type, rate in [(SMS_TYPE, 0.0158 + (year - 2016) * 0.001), (EMAIL_TYPE, 0)]
+    ]
+    letter_rates = [
+        LetterRateForBilling(
+            datetime(year, month, 1) - timedelta(hours=1),
+            crown,
+            sheet_count,
+            post_class,
+            Decimal("0.30") + Decimal(sheet_count) / 20,
+        )
+        for year in range(2016, 2025)
+        for month in (4, 10)
+        for crown in (True, False)
+        for sheet_count in range(1, 6)
+        for post_class in POST_CLASSES
+    ]
+    # newest first, the same as get_rates_for_billing
+    non_letter_rates.sort(key=lambda r: r.valid_from, reverse=True)
+    letter_rates.sort(key=lambda r: r.start_date, reverse=True)
+    return non_letter_rates, letter_rates
+
+
+def make_billing_rows(count):
+    rows = []
+    for _ in range(count):
+        notification_type = random.choices([SMS_TYPE, EMAIL_TYPE, LETTER_TYPE], weights=[5, 4, 1])[0]
+        if notification_type == LETTER_TYPE:
+            rows.append(
+                (
+                    notification_type,
+                    random.choice([True, False, None]),
+                    random.randint(1, 5),
+                    random.choice(POST_CLASSES),
+                )
+            )
+        else:
+            rows.append((notification_type, random.choice([True, False, None]), 1, "none"))
+    return rows
+
+
+def linear_get_rate(
+    non_letter_rates, letter_rates, notification_type, date, crown=None, letter_page_count=None, post_class="second"
+):
+    start_of_day = get_london_midnight_in_utc(date)
+
+    if notification_type == LETTER_TYPE:
+        if letter_page_count == 0:
+            return 0
+        crown = crown or True
+        return next(
+            r.rate
+            for r in letter_rates
+            if (
+                start_of_day >= r.start_date
+                and crown == r.crown
+                and letter_page_count == r.sheet_count
+                and post_class == r.post_class
+            )
+        )
+    elif notification_type == SMS_TYPE:
+        return next(
+            r.rate
+            for r in non_letter_rates
+            if (notification_type == r.notification_type and start_of_day >= r.valid_from)
+        )
+    else:
+        return 0
+
+
+def time_lookups(lookup, non_letter_rates, letter_rates, process_day, rows):
+    start = time.perf_counter()
+    rates = [
+        lookup(non_letter_rates, letter_rates, notification_type, process_day, crown, page_count, post_class)
+        for notification_type, crown, page_count, post_class in rows
+    ]
+    return time.perf_counter() - start, rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(0)
+    process_day = date(2022, 3, 1)
+    rows = make_billing_rows(args.rows)
+
+    print(f"{'lookup':>16} {'rows':>8} {'seconds':>9} {'rows/s':>12}")
+    for name, lookup in [("linear", linear_get_rate), ("index", get_rate)]:
+        best, rates = None, None
+        for _ in range(args.repeat):
+            # new lists each time, so get_rate has to build its index again
+            non_letter_rates, letter_rates = make_rates()
+            seconds, rates = time_lookups(lookup, non_letter_rates, letter_rates, process_day, rows)
+            best = seconds if best is None else min(best, seconds)
+        if name == "linear":
+            expected = rates
+        else:
+            assert rates == expected, "the index found different rates"
+        print(f"{name:>16} {args.rows:>8} {best:>9.3f} {args.rows / best:>12.0f}")
+
+    non_letter_rates, letter_rates = make_rates()
+    start = time.perf_counter()
+    RateIndex(non_letter_rates, letter_rates)
+    print(
+        f"building the index for {len(non_letter_rates) + len(letter_rates)} rates: {time.perf_counter() - start:.4f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""
+Compares how quickly one worker process sends service callbacks with celery's prefork pool (what
+delivery-worker-service-callbacks runs) and with the eventlet pool (delivery-worker-service-callbacks-eventlet),
+against a local fake callback API that takes --latency-ms to answer each callback.
+
+    python scripts/benchmark_callbacks.py [--callbacks 2000] [--latency-ms 200] [--prefork-concurrency 4]
+                                          [--eventlet-concurrency 1000]
+
+Both send callbacks with `post_to_service_callback_api`, the same as the callback tasks, so the difference is only in
+how many can be waiting on the callback API at once. Each runs in its own process, because eventlet has to monkey
+patch the standard library before anything else is imported.
+"""
+
+import sys
+
+if __name__ == "__main__" and sys.argv[1:2] == ["--run-eventlet"]:
+    import eventlet
+
+    eventlet.monkey_patch()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import subprocess  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # noqa: E402
+from multiprocessing import Pool  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeCallbackHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeCallbackServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 4096
+
+
+def start_fake_callback_api(latency_ms):
+    FakeCallbackHandler.latency = latency_ms / 1000
+    server = FakeCallbackServer(("127.0.0.1", 0), FakeCallbackHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/callback"
+
+
+def push_app_context(concurrency):
+    from flask import Flask
+
+    app = Flask("benchmark_callbacks")
+    app.config.update(
+        REDIS_ENABLED=False,
+        SSL_CERT_DIR="/nonexistent",
+        SERVICE_CALLBACK_MAX_CONCURRENCY_PER_HOST=concurrency,
+        SERVICE_CALLBACK_SLOW_RESPONSE_SECONDS=4,
+    )
+    app.app_context().push()
+
+
+def send_callback(args):
+    from app.celery.callback_dispatcher import post_to_service_callback_api
+
+    url, i = args
+    post_to_service_callback_api(url, {"id": str(i), "status": "delivered"}, "token").raise_for_status()
+
+
+def run_prefork(url, callbacks, concurrency):
+    with Pool(concurrency, initializer=push_app_context, initargs=(concurrency,)) as pool:
+        start = time.monotonic()
+        pool.map(send_callback, [(url, i) for i in range(callbacks)], chunksize=1)
+        return time.monotonic() - start
+
+
+def run_eventlet(url, callbacks, concurrency):
+    push_app_context(concurrency)
+    pool = eventlet.GreenPool(concurrency)
+
+    start = time.monotonic()
+    for i in range(callbacks):
+        pool.spawn_n(send_callback, (url, i))
+    pool.waitall()
+    return time.monotonic() - start
+
+
+def run_in_subprocess(mode, url, callbacks, concurrency):
+    output = subprocess.check_output(
+        [sys.executable, __file__, f"--run-{mode}", url, str(callbacks), str(concurrency)], text=True
+    )
+    return json.loads(output.splitlines()[-1])["seconds"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callbacks", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=int, default=200)
+    parser.add_argument("--prefork-concurrency", type=int, default=4)
+    parser.add_argument("--eventlet-concurrency", type=int, default=1000)
+    args = parser.parse_args()
+
+    url = start_fake_callback_api(args.latency_ms)
+
+    print(f"{'pool':>9} {'concurrency':>12} {'callbacks':>10} {'seconds':>9} {'callbacks/s':>12}")
+    for mode, concurrency in [("prefork", args.prefork_concurrency), ("eventlet", args.eventlet_concurrency)]:
+        seconds = run_in_subprocess(mode, url, args.callbacks, concurrency)
+        print(f"{mode:>9} {concurrency:>12} {args.callbacks:>10} {seconds:>9.2f} {args.callbacks / seconds:>12.1f}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] and sys.argv[1].startswith("--run-"):
+        run = {"--run-prefork": run_prefork, "--run-eventlet": run_eventlet}[sys.argv[1]]
+        seconds = run(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+        print(json.dumps({"seconds": seconds}))
+    else:
+        main()
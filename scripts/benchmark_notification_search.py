@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Times `dao_get_notifications_by_recipient_or_reference` for a service with a lot of notifications, and shows which
+indexes postgres used for each kind of search.
+
+    python scripts/benchmark_notification_search.py SERVICE_ID [--notifications 10000000] [--repeats 5]
+
+SERVICE_ID must be a service in the database the app is configured to use (SQLALCHEMY_DATABASE_URI), with an SMS
+template. The notifications are made up for the benchmark inside a transaction, which is rolled back at the end, so
+nothing is left behind - but don't run it against a database other people are using.
+
+Run it before and after `flask db upgrade` to 0446_notifications_search_idx to compare with and without the indexes.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, text  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.dao.notifications_dao import (  # noqa: E402
+    dao_get_notifications_by_recipient_or_reference,
+)
+from app.notify_api_flask_app import NotifyApiFlaskApp  # noqa: E402
+
+SEARCHES = [
+    ("whole phone number", "07700 900123", "sms"),
+    ("partial phone number", "900123", "sms"),
+    ("whole email address", "someone-123000@example.com", "email"),
+    ("partial email address", "one-123000@", "email"),
+    ("reference", "ref-123", None),
+    ("no matches", "nothing-matches-this", None),
+]
+
+
+def create_notifications(service_id, count):
+    # every thousandth notification is an email, so that the email searches have something to find
+    db.session.execute(
+        text(
+            """
+            INSERT INTO notifications (
+                id, "to", normalised_to, job_id, service_id, template_id, template_version, key_type,
+                billable_units, notification_type, created_at, status, client_reference, international
+            )
+            SELECT
+                md5(random()::text || i::text)::uuid,
+                CASE WHEN i % 1000 = 0 THEN 'someone-' || i || '@example.com' ELSE '0770' || lpad(i::text, 7, '0') END,
+                CASE WHEN i % 1000 = 0 THEN 'someone-' || i || '@example.com' ELSE '44770' || lpad(i::text, 7, '0') END,
+                NULL, :service_id, templates.id, templates.version, 'normal',
+                1, CASE WHEN i % 1000 = 0 THEN 'email' ELSE 'sms' END::notification_type,
+                now() - (i || ' milliseconds')::interval, 'delivered', 'ref-' || i, false
+            FROM generate_series(1, :count) AS i,
+                (SELECT id, version FROM templates WHERE service_id = :service_id AND template_type = 'sms' LIMIT 1)
+                AS templates
+            """
+        ),
+        {"service_id": service_id, "count": count},
+    )
+    db.session.execute(text("ANALYZE notifications"))
+
+
+def indexes_used(service_id, search_term, notification_type):
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", record_statement)
+    try:
+        dao_get_notifications_by_recipient_or_reference(
+            service_id, search_term, notification_type=notification_type, page_size=50
+        )
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record_statement)
+
+    statement, parameters = statements[-1]
+    plan = db.session.connection().exec_driver_sql(f"EXPLAIN {statement}", parameters).scalars().all()
+    return sorted({line.split(" on ")[1].split()[0] for line in plan if " on ix_" in line}) or ["none"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("service_id")
+    parser.add_argument("--notifications", type=int, default=10_000_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    application = NotifyApiFlaskApp("app")
+    create_app(application)
+
+    with application.app_context():
+        try:
+            print(f"Creating {args.notifications:,} notifications for service {args.service_id}…")
+            create_notifications(args.service_id, args.notifications)
+
+            print(f"{'search':>22} {'ms (best of {})'.format(args.repeats):>18}  indexes used")
+            for name, search_term, notification_type in SEARCHES:
+                timings = []
+                for _ in range(args.repeats):
+                    start = time.perf_counter()
+                    dao_get_notifications_by_recipient_or_reference(
+                        args.service_id, search_term, notification_type=notification_type, page_size=50
+                    )
+                    timings.append((time.perf_counter() - start) * 1000)
+
+                print(
+                    f"{name:>22} {min(timings):>18.1f}  "
+                    f"{', '.join(indexes_used(args.service_id, search_term, notification_type))}"
+                )
+        finally:
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -58,6 +58,12 @@ case $NOTIFY_APP_NAME in
     exec scripts/run_app_paas.sh celery -A run_celery.notify_celery worker --loglevel=INFO --concurrency=4 \
     -Q service-callbacks,service-callbacks-retry 2> /dev/null
     ;;
+  # callbacks spend almost all their time waiting for services' servers, so green threads let one process send
+  # many at once. SERVICE_CALLBACK_MAX_CONCURRENCY_PER_HOST still limits how many go to any one service.
+  delivery-worker-service-callbacks-eventlet)
+    exec scripts/run_app_paas.sh celery -A run_celery.notify_celery worker --loglevel=INFO --pool=eventlet \
+    --concurrency=${CALLBACK_WORKER_CONCURRENCY:-1000} -Q service-callbacks,service-callbacks-retry 2> /dev/null
+    ;;
   delivery-worker-save-api-notifications)
     exec scripts/run_app_paas.sh celery -A run_celery.notify_celery worker --loglevel=INFO --concurrency=4 \
     -Q save-api-email-tasks,save-api-sms-tasks 2> /dev/null
@@ -4,7 +4,10 @@ import uuid
 import jwt
 import pytest
 from flask import g, request
-from notifications_python_client.authentication import create_jwt_token
+from notifications_python_client.authentication import (
+    create_jwt_token,
+    decode_jwt_token,
+)
 
 from app import db
 from app.authentication.auth import (
@@ -26,6 +29,7 @@ from tests import (
     create_admin_authorization_header,
     create_service_authorization_header,
 )
+from tests.app.db import create_api_key
 from tests.conftest import set_config_values
 
 
@@ -231,6 +235,71 @@ def test_decode_jwt_token_returns_error_with_no_secrets(client):
     assert exc.value.short_message == "Invalid token: API key not found"
 
 
+def test_decode_jwt_token_does_not_verify_the_same_token_twice(client, mocker, sample_api_key, sample_test_api_key):
+    mock_decode = mocker.patch("app.authentication.auth.decode_jwt_token", wraps=decode_jwt_token)
+    token = create_jwt_token(secret=sample_test_api_key.secret, client_id=str(sample_test_api_key.service_id))
+
+    assert _decode_jwt_token(token, [sample_api_key, sample_test_api_key]) == sample_test_api_key
+    calls_for_first_request = mock_decode.call_count
+    assert _decode_jwt_token(token, [sample_api_key, sample_test_api_key]) == sample_test_api_key
+
+    assert mock_decode.call_count == calls_for_first_request
+
+
+def test_decode_jwt_token_checks_a_previously_verified_token_has_not_been_revoked(
+    client, sample_api_key, sample_test_api_key
+):
+    token = create_jwt_token(secret=sample_test_api_key.secret, client_id=str(sample_test_api_key.service_id))
+    _decode_jwt_token(token, [sample_api_key, sample_test_api_key])
+
+    expire_api_key(sample_test_api_key.service_id, sample_test_api_key.id)
+
+    with pytest.raises(AuthError) as exc:
+        _decode_jwt_token(token, [sample_api_key, sample_test_api_key])
+    assert exc.value.short_message == "Invalid token: API key revoked"
+
+
+def test_decode_jwt_token_does_not_trust_a_previously_verified_token_if_its_key_is_gone(
+    client, sample_api_key, sample_test_api_key
+):
+    token = create_jwt_token(secret=sample_test_api_key.secret, client_id=str(sample_test_api_key.service_id))
+    _decode_jwt_token(token, [sample_api_key, sample_test_api_key])
+
+    with pytest.raises(AuthError) as exc:
+        _decode_jwt_token(token, [sample_api_key])
+    assert exc.value.short_message == "Invalid token: API key not found"
+
+
+def test_decode_jwt_token_tries_the_last_used_api_key_first(client, mocker, sample_service):
+    api_keys = [create_api_key(sample_service, key_name=f"key {i}") for i in range(5)]
+    _decode_jwt_token(
+        create_jwt_token(secret=api_keys[3].secret, client_id=str(sample_service.id)), api_keys, sample_service.id
+    )
+    mock_decode = mocker.patch("app.authentication.auth.decode_jwt_token", wraps=decode_jwt_token)
+
+    # a different `iat` to the first token, so this isn't one we've already verified
+    token = create_custom_jwt_token(
+        payload={"iss": str(sample_service.id), "iat": int(time.time()) - 5}, secret=api_keys[3].secret
+    )
+    assert _decode_jwt_token(token, api_keys, sample_service.id) == api_keys[3]
+
+    mock_decode.assert_called_once_with(token, api_keys[3].secret)
+
+
+def test_decode_jwt_token_tries_the_key_named_by_kid_first(client, mocker, sample_service):
+    api_keys = [create_api_key(sample_service, key_name=f"key {i}") for i in range(5)]
+    mock_decode = mocker.patch("app.authentication.auth.decode_jwt_token", wraps=decode_jwt_token)
+    token = create_custom_jwt_token(
+        headers={"typ": "JWT", "alg": "HS256", "kid": str(api_keys[2].id)},
+        payload={"iss": str(sample_service.id), "iat": int(time.time())},
+        secret=api_keys[2].secret,
+    )
+
+    assert _decode_jwt_token(token, api_keys, sample_service.id) == api_keys[2]
+
+    mock_decode.assert_called_once_with(token, api_keys[2].secret)
+
+
 @pytest.mark.parametrize("service_id", ["not-a-valid-id", 1234])
 def test_requires_auth_should_not_allow_service_id_with_the_wrong_data_type(client, service_jwt_secret, service_id):
     token = create_jwt_token(
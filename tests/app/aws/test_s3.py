@@ -1,10 +1,17 @@
 from datetime import datetime, timedelta
+from io import BytesIO
+from unittest.mock import Mock
 
 import pytest
 import pytz
 from freezegun import freeze_time
 
-from app.aws.s3 import get_list_of_files_by_suffix, get_s3_file
+from app.aws.s3 import (
+    get_job_and_metadata_from_s3,
+    get_list_of_files_by_suffix,
+    get_s3_file,
+    stream_job_and_metadata_from_s3,
+)
 from tests.app.conftest import datetime_in_past
 
 
@@ -23,6 +30,34 @@ def test_get_s3_file_makes_correct_call(notify_api, mocker):
     get_s3_mock.assert_called_with("foo-bucket", "bar-file.txt")
 
 
+def test_get_job_and_metadata_from_s3_makes_a_single_request(notify_api, mocker):
+    get_s3_mock = mocker.patch("app.aws.s3.get_s3_object")
+    get_s3_mock.return_value.get.return_value = {
+        "Body": BytesIO(b"phone number\n07700900001\n"),
+        "Metadata": {"a": "b"},
+    }
+
+    assert get_job_and_metadata_from_s3("service-id", "job-id") == ("phone number\n07700900001\n", {"a": "b"})
+    get_s3_mock.assert_called_once_with(
+        notify_api.config["S3_BUCKET_CSV_UPLOAD"], "service-service-id-notify/job-id.csv"
+    )
+    get_s3_mock.return_value.get.assert_called_once_with()
+
+
+def test_stream_job_and_metadata_from_s3_decodes_lines_as_they_are_read(notify_api, mocker):
+    body = Mock()
+    body.iter_lines.return_value = iter([b"phone number,name\r\n", "07700900001,Zo\u00eb\n".encode()])
+    get_s3_mock = mocker.patch("app.aws.s3.get_s3_object")
+    get_s3_mock.return_value.get.return_value = {"Body": body, "Metadata": {"a": "b"}}
+
+    lines, metadata = stream_job_and_metadata_from_s3("service-id", "job-id")
+
+    assert metadata == {"a": "b"}
+    assert list(lines) == ["phone number,name\r\n", "07700900001,Zo\u00eb\n"]
+    body.iter_lines.assert_called_once_with(keepends=True)
+    get_s3_mock.return_value.get.assert_called_once_with()
+
+
 @freeze_time("2018-01-11 00:00:00")
 @pytest.mark.parametrize(
     "suffix_str, days_before, returned_no",
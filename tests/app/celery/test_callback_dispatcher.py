@@ -0,0 +1,217 @@
+import json
+
+import pytest
+import requests
+import requests_mock
+from freezegun import freeze_time
+
+from app.celery import callback_dispatcher
+from app.celery.callback_dispatcher import (
+    CallbackCircuitOpen,
+    CallbackHostBusy,
+    defer_callback,
+    get_client_certificate,
+    post_to_service_callback_api,
+    take_deferred_callbacks,
+)
+from tests.conftest import set_config_values
+
+
+@pytest.fixture(autouse=True)
+def empty_dispatcher_caches(mocker):
+    mocker.patch.dict(callback_dispatcher._sessions, clear=True)
+    mocker.patch.object(callback_dispatcher, "_client_certificates", {})
+
+
+@pytest.fixture
+def mock_pipeline(notify_api, mocker):
+    mocker.patch.object(callback_dispatcher, "_take_host_slot_script", None)
+    mock_redis = mocker.patch("app.redis_store.redis_store")
+    mock_redis.exists.return_value = 0
+    mock_redis.register_script.return_value.return_value = 1
+    with set_config_values(
+        notify_api,
+        {
+            "REDIS_ENABLED": True,
+            "SERVICE_CALLBACK_MAX_CONCURRENCY_PER_HOST": 2,
+            "SERVICE_CALLBACK_FAILURE_THRESHOLD": 3,
+            "SERVICE_CALLBACK_CIRCUIT_OPEN_SECONDS": 60,
+        },
+    ):
+        yield mock_redis.pipeline.return_value
+
+
+def test_post_to_service_callback_api_posts_json_with_bearer_token(notify_api):
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post("https://example.com/callback", status_code=200)
+        response = post_to_service_callback_api("https://example.com/callback", {"id": "1"}, "token")
+
+    assert response.status_code == 200
+    assert request_mock.request_history[0].text == json.dumps({"id": "1"})
+    assert request_mock.request_history[0].headers["Content-Type"] == "application/json"
+    assert request_mock.request_history[0].headers["Authorization"] == "Bearer token"
+
+
+def test_post_to_service_callback_api_uses_one_session_per_host(notify_api):
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post(requests_mock.ANY, status_code=200)
+        post_to_service_callback_api("https://example.com/one", {}, "token")
+        post_to_service_callback_api("https://example.com/two", {}, "token")
+        post_to_service_callback_api("https://example.org/one", {}, "token")
+
+    assert set(callback_dispatcher._sessions) == {"example.com", "example.org"}
+
+
+def test_get_client_certificate_only_looks_on_disk_once_per_host(notify_api, mocker):
+    mock_exists = mocker.patch("app.celery.callback_dispatcher.os.path.exists", side_effect=[True, False])
+
+    with set_config_values(notify_api, {"SSL_CERT_DIR": "/certs"}):
+        for _ in range(3):
+            assert get_client_certificate("www.example.com") == "/certs/www-example-com.pem"
+            assert get_client_certificate("example.org") is None
+
+    assert mock_exists.call_count == 2
+
+
+@freeze_time("2022-06-01T12:00:00")
+def test_post_to_service_callback_api_takes_and_gives_back_a_slot_for_the_host(mock_pipeline, mocker):
+    mocker.patch("app.celery.callback_dispatcher.uuid.uuid4", return_value="1234")
+    mock_pipeline.execute.return_value = [0, 0]
+    mock_redis = callback_dispatcher.redis_store.redis_store
+
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post("https://example.com/callback", status_code=200)
+        post_to_service_callback_api("https://example.com/callback", {}, "token")
+
+    mock_redis.register_script.return_value.assert_called_once_with(
+        keys=["service-callback-host-example.com-slots"], args=[1654084800.0, 60, 2, "1234"]
+    )
+    mock_redis.zrem.assert_called_once_with("service-callback-host-example.com-slots", "1234")
+
+
+def test_post_to_service_callback_api_does_not_send_if_host_is_busy(mock_pipeline):
+    callback_dispatcher.redis_store.redis_store.register_script.return_value.return_value = 0
+
+    with requests_mock.Mocker() as request_mock, pytest.raises(CallbackHostBusy):
+        post_to_service_callback_api("https://example.com/callback", {}, "token")
+
+    assert request_mock.call_count == 0
+    assert not callback_dispatcher.redis_store.redis_store.zrem.called
+
+
+def test_post_to_service_callback_api_gives_back_its_slot_if_the_request_fails(mock_pipeline):
+    mock_pipeline.execute.return_value = [1, True, None]
+
+    with requests_mock.Mocker() as request_mock, pytest.raises(requests.ConnectionError):
+        request_mock.post("https://example.com/callback", exc=requests.ConnectionError)
+        post_to_service_callback_api("https://example.com/callback", {}, "token")
+
+    callback_dispatcher.redis_store.redis_store.zrem.assert_called_once()
+
+
+def test_post_to_service_callback_api_sends_if_redis_fails(mock_pipeline):
+    callback_dispatcher.redis_store.redis_store.register_script.return_value.side_effect = ConnectionError
+    mock_pipeline.execute.side_effect = ConnectionError
+
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post("https://example.com/callback", status_code=200)
+        post_to_service_callback_api("https://example.com/callback", {}, "token")
+
+    assert request_mock.call_count == 1
+
+
+def test_post_to_service_callback_api_does_not_send_if_circuit_is_open(mock_pipeline):
+    callback_dispatcher.redis_store.redis_store.exists.return_value = 1
+
+    with requests_mock.Mocker() as request_mock, pytest.raises(CallbackCircuitOpen):
+        post_to_service_callback_api("https://example.com/callback", {}, "token")
+
+    callback_dispatcher.redis_store.redis_store.exists.assert_called_once_with(
+        "service-callback-https://example.com/callback-circuit-open"
+    )
+    assert request_mock.call_count == 0
+
+
+@pytest.mark.parametrize(
+    "failures, trips, expected_open_seconds",
+    [
+        (2, None, None),
+        (3, None, 60),
+        (1, b"1", 120),
+        (1, b"3", 480),
+        (1, b"10", 3600),
+    ],
+)
+def test_post_to_service_callback_api_opens_circuit_after_failures(
+    mock_pipeline, mocker, failures, trips, expected_open_seconds
+):
+    mock_pipeline.execute.side_effect = [[failures, True, trips], [True, True, 1]]
+
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post("https://example.com/callback", status_code=500)
+        post_to_service_callback_api("https://example.com/callback", {}, "token")
+
+    mock_pipeline.incr.assert_any_call("service-callback-https://example.com/callback-recent-failures")
+    if expected_open_seconds:
+        mock_pipeline.set.assert_any_call(
+            "service-callback-https://example.com/callback-circuit-open", 1, ex=expected_open_seconds
+        )
+    else:
+        assert not mock_pipeline.set.called
+
+
+def test_post_to_service_callback_api_counts_slow_responses_as_failures(mock_pipeline, mocker):
+    mocker.patch("app.celery.callback_dispatcher.monotonic", side_effect=[0, 10])
+    mock_pipeline.execute.side_effect = [[1, True, None]]
+
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post("https://example.com/callback", status_code=200)
+        post_to_service_callback_api("https://example.com/callback", {}, "token")
+
+    mock_pipeline.incr.assert_any_call("service-callback-https://example.com/callback-recent-failures")
+
+
+@pytest.mark.parametrize("recovered, expected_replays", [(0, 0), (1, 1)])
+def test_post_to_service_callback_api_replays_deferred_callbacks_once_callback_api_recovers(
+    mock_pipeline, mocker, recovered, expected_replays
+):
+    mock_replay = mocker.patch("app.celery.service_callback_tasks.replay_deferred_service_callbacks.apply_async")
+    mock_pipeline.execute.side_effect = [[1, recovered]]
+
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post("https://example.com/callback", status_code=200)
+        post_to_service_callback_api("https://example.com/callback", {}, "token")
+
+    mock_pipeline.delete.assert_any_call("service-callback-https://example.com/callback-circuit-trips")
+    assert mock_replay.call_args_list == [mocker.call(["https://example.com/callback"], queue="service-callbacks")] * (
+        expected_replays
+    )
+
+
+def test_defer_callback(mock_pipeline):
+    assert defer_callback("https://example.com/callback", "send-complaint", ["data"], {})
+
+    mock_pipeline.rpush.assert_called_once_with(
+        "service-callback-https://example.com/callback-deferred",
+        json.dumps({"task": "send-complaint", "args": ["data"], "kwargs": {}}),
+    )
+    mock_pipeline.sadd.assert_called_once_with("service-callbacks-deferred-urls", "https://example.com/callback")
+
+
+@pytest.mark.parametrize("trips_exists, expected_count", [(0, 100), (1, 1)])
+def test_take_deferred_callbacks_only_takes_one_until_callback_api_has_recovered(
+    mock_pipeline, trips_exists, expected_count
+):
+    callback_dispatcher.redis_store.redis_store.exists.side_effect = [0, trips_exists]
+    mock_pipeline.execute.return_value = [[b'{"task": "send-complaint", "args": ["data"], "kwargs": {}}'], True, 0]
+
+    assert take_deferred_callbacks("https://example.com/callback", 100) == [
+        {"task": "send-complaint", "args": ["data"], "kwargs": {}}
+    ]
+
+    mock_pipeline.lrange.assert_called_once_with(
+        "service-callback-https://example.com/callback-deferred", 0, expected_count - 1
+    )
+    callback_dispatcher.redis_store.redis_store.srem.assert_called_once_with(
+        "service-callbacks-deferred-urls", "https://example.com/callback"
+    )
@@ -1,3 +1,4 @@
+import uuid
 from datetime import date, datetime, timedelta
 from unittest.mock import ANY, call
 
@@ -13,9 +14,11 @@ from notifications_utils.clients.zendesk.zendesk_client import (
 from app.celery import nightly_tasks
 from app.celery.nightly_tasks import (
     _delete_notifications_older_than_retention_by_type,
+    create_notification_partitions,
     delete_email_notifications_older_than_retention,
     delete_inbound_sms,
     delete_letter_notifications_older_than_retention,
+    delete_notifications_older_than_retention,
     delete_sms_notifications_older_than_retention,
     delete_unneeded_notification_history_by_hour,
     delete_unneeded_notification_history_for_specific_hour,
@@ -29,7 +32,9 @@ from app.celery.nightly_tasks import (
     timeout_notifications,
 )
 from app.constants import EMAIL_TYPE, LETTER_TYPE, SMS_TYPE
+from app.dao.notification_partitions_dao import Partition
 from app.models import FactProcessingTime
+from app.utils import encode_pagination_cursor
 from tests.app.db import (
     create_job,
     create_notification,
@@ -37,6 +42,7 @@ from tests.app.db import (
     create_service_data_retention,
     create_template,
 )
+from tests.conftest import set_config_values
 
 
 def mock_s3_get_list_match(bucket_name, subfolder="", suffix="", last_modified=None):
@@ -168,6 +174,69 @@ def test_delete_letter_notifications_older_than_retention_calls_child_task(notif
     mocked.assert_called_once_with("letter")
 
 
+def test_delete_notifications_older_than_retention_does_not_drop_partitions_if_not_partitioned(
+    notify_db_session, mocker
+):
+    mock_detach = mocker.patch("app.celery.nightly_tasks.dao_detach_notifications_partition")
+    mock_sms = mocker.patch("app.celery.nightly_tasks.delete_sms_notifications_older_than_retention.apply_async")
+    mocker.patch("app.celery.nightly_tasks.delete_email_notifications_older_than_retention.apply_async")
+    mocker.patch("app.celery.nightly_tasks.delete_letter_notifications_older_than_retention.apply_async")
+
+    delete_notifications_older_than_retention()
+
+    assert not mock_detach.called
+    mock_sms.assert_called_once_with(queue="reporting-tasks")
+
+
+@freeze_time("2022-06-10 12:00")
+def test_delete_notifications_older_than_retention_drops_partitions_before_deleting_by_type(notify_api, mocker):
+    manager = mocker.Mock()
+    mocker.patch("app.celery.nightly_tasks.dao_is_partitioned", return_value=True)
+    mock_get_expired = mocker.patch(
+        "app.celery.nightly_tasks.dao_get_expired_notifications_partitions",
+        return_value=[Partition("notifications_p20220601", datetime(2022, 6, 1, 23))],
+    )
+    mocker.patch(
+        "app.celery.nightly_tasks.dao_get_detached_partitions",
+        return_value=["notifications_p20220531", "notifications_p20220601"],
+    )
+    manager.attach_mock(mocker.patch("app.celery.nightly_tasks.dao_detach_notifications_partition"), "detach")
+    manager.attach_mock(
+        mocker.patch(
+            "app.celery.nightly_tasks.dao_archive_and_drop_detached_notifications_partition", return_value=(1, 2)
+        ),
+        "drop",
+    )
+    manager.attach_mock(
+        mocker.patch("app.celery.nightly_tasks.delete_sms_notifications_older_than_retention.apply_async"), "sms"
+    )
+    mocker.patch("app.celery.nightly_tasks.delete_email_notifications_older_than_retention.apply_async")
+    mocker.patch("app.celery.nightly_tasks.delete_letter_notifications_older_than_retention.apply_async")
+
+    delete_notifications_older_than_retention()
+
+    # midnight at the start of 3rd June, BST
+    mock_get_expired.assert_called_once_with(datetime(2022, 6, 2, 23))
+    assert manager.mock_calls == [
+        call.detach("notifications_p20220601"),
+        call.drop("notifications_p20220531"),
+        call.drop("notifications_p20220601"),
+        call.sms(queue="reporting-tasks"),
+    ]
+
+
+@pytest.mark.parametrize("partitioned, expected_tables", [([False, False], []), ([True, False], ["notifications"])])
+def test_create_notification_partitions_only_creates_partitions_for_partitioned_tables(
+    notify_api, mocker, partitioned, expected_tables
+):
+    mocker.patch("app.celery.nightly_tasks.dao_is_partitioned", side_effect=partitioned)
+    mock_create = mocker.patch("app.celery.nightly_tasks.dao_create_daily_partitions", return_value=[])
+
+    create_notification_partitions()
+
+    assert mock_create.call_args_list == [call(table, 7) for table in expected_tables]
+
+
 def test_should_not_update_status_of_letter_notifications(client, sample_letter_template):
     created_at = datetime.utcnow() - timedelta(days=5)
     not1 = create_notification(template=sample_letter_template, status="sending", created_at=created_at)
@@ -580,6 +649,84 @@ def test_delete_notifications_task_calls_task_for_services_that_have_sent_notifi
     )
 
 
+@freeze_time("2021-06-05 03:00")
+@pytest.mark.parametrize("checkpoint, expected_after", [(None, None), ("2021-05-01 10:00", datetime(2021, 5, 1, 10))])
+def test_delete_notifications_in_one_pass_deletes_for_all_services_in_batches(
+    notify_api, mocker, sample_service, checkpoint, expected_after
+):
+    notification_id = uuid.uuid4()
+    create_service_data_retention(sample_service, notification_type="sms", days_of_retention=3)
+    mocker.patch(
+        "app.celery.nightly_tasks.redis_store.get",
+        return_value=(
+            encode_pagination_cursor(datetime.fromisoformat(checkpoint), notification_id).encode()
+            if checkpoint
+            else None
+        ),
+    )
+    mock_set = mocker.patch("app.celery.nightly_tasks.redis_store.set")
+    mock_subtask = mocker.patch("app.celery.nightly_tasks.delete_notifications_for_service_and_type")
+    mock_delete = mocker.patch(
+        "app.celery.nightly_tasks.insert_notification_history_delete_notifications_past_retention",
+        side_effect=[
+            (10, (datetime(2021, 5, 20), notification_id)),
+            (5, (datetime(2021, 5, 30), notification_id)),
+            (0, None),
+        ],
+    )
+
+    with set_config_values(
+        notify_api, {"DELETE_NOTIFICATIONS_IN_ONE_PASS": True, "DELETE_NOTIFICATIONS_BATCH_SIZE": 10}
+    ):
+        _delete_notifications_older_than_retention_by_type("sms")
+
+    assert not mock_subtask.apply_async.called
+    # three days of retention is the shortest, so nothing after midnight at the start of 2nd June can be deleted
+    assert mock_delete.call_args_list == [
+        call(
+            "sms",
+            date(2021, 6, 5),
+            datetime(2021, 6, 1, 23),
+            after=(expected_after, notification_id) if expected_after else None,
+            qry_limit=10,
+        ),
+        call(
+            "sms",
+            date(2021, 6, 5),
+            datetime(2021, 6, 1, 23),
+            after=(datetime(2021, 5, 20), notification_id),
+            qry_limit=10,
+        ),
+        call(
+            "sms",
+            date(2021, 6, 5),
+            datetime(2021, 6, 1, 23),
+            after=(datetime(2021, 5, 30), notification_id),
+            qry_limit=10,
+        ),
+    ]
+    assert mock_set.call_args_list == [
+        call(
+            "delete-sms-notifications-older-than-retention-2021-06-05-checkpoint",
+            encode_pagination_cursor(created_at, notification_id),
+            ex=86400,
+        )
+        for created_at in [datetime(2021, 5, 20), datetime(2021, 5, 30)]
+    ]
+
+
+def test_delete_letter_notifications_are_not_deleted_in_one_pass(notify_api, notify_db_session, mocker):
+    mock_delete = mocker.patch(
+        "app.celery.nightly_tasks.insert_notification_history_delete_notifications_past_retention"
+    )
+    mocker.patch("app.celery.nightly_tasks.get_service_ids_with_notifications_before", return_value=set())
+
+    with set_config_values(notify_api, {"DELETE_NOTIFICATIONS_IN_ONE_PASS": True}):
+        _delete_notifications_older_than_retention_by_type("letter")
+
+    assert not mock_delete.called
+
+
 def test_delete_unneeded_notification_history_for_specific_hour(mocker):
     delete_mock = mocker.patch("app.celery.nightly_tasks.delete_notification_history_between_two_datetimes")
 
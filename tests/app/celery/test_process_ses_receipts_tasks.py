@@ -1,15 +1,20 @@
 import json
+from contextlib import nullcontext
 from datetime import datetime
 
 from freezegun import freeze_time
 
 from app import signing, statsd_client
-from app.celery.process_ses_receipts_tasks import process_ses_results
+from app.celery.process_ses_receipts_tasks import (
+    process_ses_results,
+    process_ses_results_batch,
+)
 from app.celery.research_mode_tasks import (
     ses_hard_bounce_callback,
     ses_notification_callback,
     ses_soft_bounce_callback,
 )
+from app.dao import notifications_dao
 from app.dao.notifications_dao import get_notification_by_id
 from app.models import Complaint, Notification
 from app.notifications.notifications_ses_callback import (
@@ -21,6 +26,7 @@ from tests.app.db import (
     create_service_callback_api,
     ses_complaint_callback,
 )
+from tests.conftest import set_config
 
 
 def test_process_ses_results(sample_email_template):
@@ -197,7 +203,7 @@ def test_ses_callback_should_set_status_to_permanent_failure(
 
 def test_ses_callback_should_send_on_complaint_to_user_callback_api(sample_email_template, mocker):
     send_mock = mocker.patch("app.celery.service_callback_tasks.send_complaint_to_service.apply_async")
-    create_service_callback_api(
+    callback_api = create_service_callback_api(
         service=sample_email_template.service, url="https://original_url.com", callback_type="complaint"
     )
 
@@ -213,7 +219,148 @@ def test_ses_callback_should_send_on_complaint_to_user_callback_api(sample_email
         "complaint_id": str(Complaint.query.one().id),
         "notification_id": str(notification.id),
         "reference": None,
+        "service_id": str(sample_email_template.service_id),
+        "service_callback_api_id": str(callback_api.id),
         "service_callback_api_bearer_token": "some_super_secret",
         "service_callback_api_url": "https://original_url.com",
         "to": "recipient1@example.com",
     }
+
+
+def test_process_ses_results_buffers_receipt_if_batching_enabled(notify_api, mocker):
+    mock_buffer = mocker.patch("app.celery.process_ses_receipts_tasks.buffer_receipt", return_value=True)
+    mock_get_notification = mocker.patch("app.dao.notifications_dao.dao_get_notification_or_history_by_reference")
+    response = ses_notification_callback(reference="ref")
+
+    with set_config(notify_api, "SES_RECEIPT_BATCHING_ENABLED", True):
+        assert process_ses_results(response)
+
+    mock_buffer.assert_called_once_with("ses", response, process_ses_results_batch, "ses-callbacks")
+    assert not mock_get_notification.called
+
+
+def test_process_ses_results_processes_receipt_if_it_cannot_be_buffered(notify_api, sample_email_template, mocker):
+    mocker.patch("app.celery.process_ses_receipts_tasks.buffer_receipt", return_value=False)
+    notification = create_notification(sample_email_template, reference="ref", status="sending")
+
+    with set_config(notify_api, "SES_RECEIPT_BATCHING_ENABLED", True):
+        assert process_ses_results(ses_notification_callback(reference="ref"))
+
+    assert notification.status == "delivered"
+
+
+@freeze_time("2017-11-17T12:14:04")
+def test_process_ses_results_batch_updates_each_status_in_one_update(sample_email_template, mocker, caplog):
+    delivered = [
+        create_notification(sample_email_template, reference=f"delivered-{i}", status="sending") for i in range(2)
+    ]
+    bounced = create_notification(sample_email_template, reference="bounced", status="pending")
+    already_delivered = create_notification(sample_email_template, reference="already-delivered", status="delivered")
+    mocker.patch(
+        "app.celery.process_ses_receipts_tasks.take_buffered_receipts",
+        return_value=nullcontext(
+            [
+                ses_notification_callback(reference="delivered-0"),
+                ses_hard_bounce_callback(reference="bounced"),
+                ses_notification_callback(reference="delivered-1"),
+                ses_notification_callback(reference="already-delivered"),
+                ses_hard_bounce_callback(reference="delivered-0"),
+                ses_notification_callback(reference="not-yet-saved"),
+            ]
+        ),
+    )
+    mock_update = mocker.patch(
+        "app.dao.notifications_dao.dao_update_notifications_by_reference",
+        wraps=notifications_dao.dao_update_notifications_by_reference,
+    )
+    mock_callback = mocker.patch("app.celery.process_ses_receipts_tasks.check_and_queue_callback_task")
+    mock_retry = mocker.patch("app.celery.process_ses_receipts_tasks.process_ses_results.apply_async")
+
+    process_ses_results_batch()
+
+    assert mock_update.call_args_list == [
+        mocker.call(references=["delivered-0", "delivered-1"], update_dict={"status": "delivered"}),
+        mocker.call(references=["bounced"], update_dict={"status": "permanent-failure"}),
+    ]
+    assert [n.status for n in delivered] == ["delivered", "delivered"]
+    assert bounced.status == "permanent-failure"
+    assert already_delivered.status == "delivered"
+    assert mock_callback.call_args_list == [
+        mocker.call(delivered[0]),
+        mocker.call(bounced),
+        mocker.call(delivered[1]),
+    ]
+    mock_retry.assert_called_once_with(
+        [ses_notification_callback(reference="not-yet-saved")],
+        {"allow_batching": False},
+        queue="retry-tasks",
+        countdown=300,
+    )
+
+
+def test_process_ses_results_batch_retries_receipts_one_at_a_time_if_it_fails(notify_db_session, mocker):
+    responses = [ses_notification_callback(reference="ref1"), ses_notification_callback(reference="ref2")]
+    mocker.patch("app.celery.process_ses_receipts_tasks.take_buffered_receipts", return_value=nullcontext(responses))
+    mocker.patch(
+        "app.dao.notifications_dao.dao_get_notifications_or_history_by_references", side_effect=Exception("EXPECTED")
+    )
+    mock_apply_async = mocker.patch("app.celery.process_ses_receipts_tasks.process_ses_results.apply_async")
+
+    process_ses_results_batch()
+
+    assert mock_apply_async.call_args_list == [
+        mocker.call([response], {"allow_batching": False}, queue="retry-tasks") for response in responses
+    ]
+
+
+def test_process_ses_results_batch_only_retries_receipts_whose_update_did_not_commit(sample_email_template, mocker):
+    delivered = create_notification(sample_email_template, reference="delivered", status="sending")
+    create_notification(sample_email_template, reference="bounced", status="sending")
+    responses = [
+        ses_notification_callback(reference="delivered"),
+        ses_complaint_callback(),
+        ses_hard_bounce_callback(reference="bounced"),
+    ]
+    mocker.patch("app.celery.process_ses_receipts_tasks.take_buffered_receipts", return_value=nullcontext(responses))
+    mock_complaint = mocker.patch(
+        "app.celery.process_ses_receipts_tasks.handle_complaint", return_value=(mocker.Mock(), None, None)
+    )
+    mocker.patch("app.celery.process_ses_receipts_tasks._check_and_queue_complaint_callback_task")
+    update = notifications_dao.dao_update_notifications_by_reference
+
+    def update_unless_bounced(references, update_dict):
+        if update_dict["status"] == "permanent-failure":
+            raise Exception("EXPECTED")
+        return update(references=references, update_dict=update_dict)
+
+    mocker.patch("app.dao.notifications_dao.dao_update_notifications_by_reference", side_effect=update_unless_bounced)
+    mock_callback = mocker.patch("app.celery.process_ses_receipts_tasks.check_and_queue_callback_task")
+    mock_apply_async = mocker.patch("app.celery.process_ses_receipts_tasks.process_ses_results.apply_async")
+
+    process_ses_results_batch()
+
+    assert mock_complaint.call_count == 1
+    mock_callback.assert_called_once_with(delivered)
+    mock_apply_async.assert_called_once_with(
+        [ses_hard_bounce_callback(reference="bounced")], {"allow_batching": False}, queue="retry-tasks"
+    )
+
+
+def test_process_ses_results_batch_carries_on_if_a_callback_cannot_be_queued(sample_email_template, mocker):
+    notifications = [
+        create_notification(sample_email_template, reference=f"ref-{i}", status="sending") for i in range(2)
+    ]
+    mocker.patch(
+        "app.celery.process_ses_receipts_tasks.take_buffered_receipts",
+        return_value=nullcontext([ses_notification_callback(reference=f"ref-{i}") for i in range(2)]),
+    )
+    mock_callback = mocker.patch(
+        "app.celery.process_ses_receipts_tasks.check_and_queue_callback_task", side_effect=[Exception, None]
+    )
+    mock_apply_async = mocker.patch("app.celery.process_ses_receipts_tasks.process_ses_results.apply_async")
+
+    process_ses_results_batch()
+
+    assert [n.status for n in notifications] == ["delivered", "delivered"]
+    assert mock_callback.call_args_list == [mocker.call(notifications[0]), mocker.call(notifications[1])]
+    assert not mock_apply_async.called
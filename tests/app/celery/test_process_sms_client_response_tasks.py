@@ -1,4 +1,5 @@
 import uuid
+from contextlib import nullcontext
 from datetime import datetime
 
 import pytest
@@ -7,9 +8,12 @@ from freezegun import freeze_time
 from app import statsd_client
 from app.celery.process_sms_client_response_tasks import (
     process_sms_client_response,
+    process_sms_client_responses_batch,
 )
 from app.clients import ClientException
 from app.constants import NOTIFICATION_TECHNICAL_FAILURE
+from tests.app.db import create_notification
+from tests.conftest import set_config
 
 
 def test_process_sms_client_response_raises_error_if_reference_is_not_a_valid_uuid(client):
@@ -157,3 +161,248 @@ def test_process_sms_updates_sent_by_with_client_name_if_not_in_noti(sample_noti
     process_sms_client_response("3", str(sample_notification.id), "MMG")
 
     assert sample_notification.sent_by == "mmg"
+
+
+def test_process_sms_client_response_matches_batched_messages_on_reference_and_recipient(sample_template):
+    reference = str(uuid.uuid4())
+    first, second = (
+        create_notification(
+            template=sample_template,
+            status="sending",
+            sent_by="spryng",
+            reference=reference,
+            normalised_to=normalised_to,
+        )
+        for normalised_to in ["447700900001", "447700900002"]
+    )
+
+    process_sms_client_response("10", reference, "Spryng", "0", "447700900002")
+
+    assert first.status == "sending"
+    assert second.status == "delivered"
+
+
+def test_process_sms_client_response_buffers_receipt_when_batching_enabled(notify_api, sample_notification, mocker):
+    mock_buffer = mocker.patch("app.celery.process_sms_client_response_tasks.buffer_receipt", return_value=True)
+
+    with set_config(notify_api, "SMS_RECEIPT_BATCHING_ENABLED", True):
+        process_sms_client_response("3", str(sample_notification.id), "MMG", "2")
+
+    mock_buffer.assert_called_once_with(
+        "sms",
+        {
+            "status": "3",
+            "provider_reference": str(sample_notification.id),
+            "client_name": "MMG",
+            "detailed_status_code": "2",
+            "recipient": None,
+        },
+        process_sms_client_responses_batch,
+        "sms-callbacks",
+    )
+    assert sample_notification.status == "created"
+
+
+def test_process_sms_client_response_processes_receipt_itself_if_it_cannot_be_buffered(
+    notify_api, sample_notification, mocker
+):
+    mocker.patch("app.celery.process_sms_client_response_tasks.buffer_receipt", return_value=False)
+
+    with set_config(notify_api, "SMS_RECEIPT_BATCHING_ENABLED", True):
+        process_sms_client_response("3", str(sample_notification.id), "MMG", "2")
+
+    assert sample_notification.status == "delivered"
+
+
+def test_process_sms_client_responses_batch_updates_notifications(sample_template, mocker):
+    mock_callback = mocker.patch("app.celery.process_sms_client_response_tasks.check_and_queue_callback_task")
+    mock_incr = mocker.patch("app.statsd_client.incr")
+    mock_apply_async = mocker.patch(
+        "app.celery.process_sms_client_response_tasks.process_sms_client_response.apply_async"
+    )
+    delivered, pending, failed = (
+        create_notification(sample_template, status="sending", sent_by="firetext") for _ in range(3)
+    )
+    batch_reference = str(uuid.uuid4())
+    batched = create_notification(
+        sample_template, status="sending", sent_by="spryng", reference=batch_reference, normalised_to="447700900001"
+    )
+    receipts = [
+        {
+            "status": "0",
+            "provider_reference": str(delivered.id),
+            "client_name": "Firetext",
+            "detailed_status_code": None,
+            "recipient": None,
+        },
+        {
+            "status": "2",
+            "provider_reference": str(pending.id),
+            "client_name": "Firetext",
+            "detailed_status_code": "102",
+            "recipient": None,
+        },
+        {
+            "status": "1",
+            "provider_reference": str(failed.id),
+            "client_name": "Firetext",
+            "detailed_status_code": "101",
+            "recipient": None,
+        },
+        {
+            "status": "10",
+            "provider_reference": batch_reference,
+            "client_name": "Spryng",
+            "detailed_status_code": "0",
+            "recipient": "447700900001",
+        },
+        {
+            "status": "0",
+            "provider_reference": "not-a-uuid",
+            "client_name": "Firetext",
+            "detailed_status_code": None,
+            "recipient": None,
+        },
+    ]
+    mocker.patch(
+        "app.celery.process_sms_client_response_tasks.take_buffered_receipts", return_value=nullcontext(receipts)
+    )
+
+    process_sms_client_responses_batch()
+
+    assert delivered.status == "delivered"
+    assert pending.status == "pending"
+    assert failed.status == "permanent-failure"
+    assert batched.status == "delivered"
+    assert {call[0][0] for call in mock_callback.call_args_list} == {delivered, failed, batched}
+    mock_incr.assert_any_call("callback.firetext.delivered")
+    mock_incr.assert_any_call("callback.spryng.delivered")
+    mock_apply_async.assert_not_called()
+
+
+def test_process_sms_client_responses_batch_processes_later_receipts_for_a_notification_on_their_own(
+    sample_notification, mocker
+):
+    mock_apply_async = mocker.patch(
+        "app.celery.process_sms_client_response_tasks.process_sms_client_response.apply_async"
+    )
+    sample_notification.status = "sending"
+    pending = {
+        "status": "2",
+        "provider_reference": str(sample_notification.id),
+        "client_name": "Firetext",
+        "detailed_status_code": "102",
+        "recipient": None,
+    }
+    delivered = {**pending, "status": "0", "detailed_status_code": None}
+    mocker.patch(
+        "app.celery.process_sms_client_response_tasks.take_buffered_receipts",
+        return_value=nullcontext([pending, delivered]),
+    )
+
+    process_sms_client_responses_batch()
+
+    assert sample_notification.status == "pending"
+    mock_apply_async.assert_called_once_with(kwargs={**delivered, "allow_batching": False}, queue="sms-callbacks")
+
+
+def test_process_sms_client_responses_batch_retries_receipts_one_at_a_time_if_batch_fails(notify_api, mocker):
+    mock_apply_async = mocker.patch(
+        "app.celery.process_sms_client_response_tasks.process_sms_client_response.apply_async"
+    )
+    mocker.patch("app.dao.notifications_dao.dao_update_sms_notification_statuses", side_effect=Exception("EXPECTED"))
+    receipt = {
+        "status": "0",
+        "provider_reference": str(uuid.uuid4()),
+        "client_name": "Firetext",
+        "detailed_status_code": None,
+        "recipient": None,
+    }
+    mocker.patch(
+        "app.celery.process_sms_client_response_tasks.take_buffered_receipts", return_value=nullcontext([receipt])
+    )
+
+    process_sms_client_responses_batch()
+
+    mock_apply_async.assert_called_once_with(kwargs={**receipt, "allow_batching": False}, queue="retry-tasks")
+
+
+def test_process_sms_client_responses_batch_matches_upper_case_references(sample_notification, mocker):
+    mock_callback = mocker.patch("app.celery.process_sms_client_response_tasks.check_and_queue_callback_task")
+    sample_notification.status = "sending"
+    receipt = {
+        "status": "0",
+        "provider_reference": str(sample_notification.id).upper(),
+        "client_name": "Firetext",
+        "detailed_status_code": None,
+        "recipient": None,
+    }
+    mocker.patch(
+        "app.celery.process_sms_client_response_tasks.take_buffered_receipts", return_value=nullcontext([receipt])
+    )
+
+    process_sms_client_responses_batch()
+
+    assert sample_notification.status == "delivered"
+    mock_callback.assert_called_once_with(sample_notification)
+
+
+def test_process_sms_client_responses_batch_does_not_retry_receipts_once_their_update_has_committed(
+    sample_template, mocker
+):
+    first, second = (create_notification(sample_template, status="sending", sent_by="firetext") for _ in range(2))
+    mock_callback = mocker.patch(
+        "app.celery.process_sms_client_response_tasks.check_and_queue_callback_task",
+        side_effect=[Exception("EXPECTED"), None],
+    )
+    mock_apply_async = mocker.patch(
+        "app.celery.process_sms_client_response_tasks.process_sms_client_response.apply_async"
+    )
+    receipts = [
+        {
+            "status": "0",
+            "provider_reference": str(notification.id),
+            "client_name": "Firetext",
+            "detailed_status_code": None,
+            "recipient": None,
+        }
+        for notification in (first, second)
+    ]
+    mocker.patch(
+        "app.celery.process_sms_client_response_tasks.take_buffered_receipts", return_value=nullcontext(receipts)
+    )
+
+    process_sms_client_responses_batch()
+
+    assert first.status == "delivered"
+    assert second.status == "delivered"
+    assert [call[0][0] for call in mock_callback.call_args_list] == [first, second]
+    mock_apply_async.assert_not_called()
+
+
+def test_process_sms_client_responses_batch_only_retries_receipts_that_were_not_processed(sample_notification, mocker):
+    sample_notification.status = "sending"
+    pending = {
+        "status": "2",
+        "provider_reference": str(sample_notification.id),
+        "client_name": "Firetext",
+        "detailed_status_code": "102",
+        "recipient": None,
+    }
+    delivered = {**pending, "status": "0", "detailed_status_code": None}
+    mock_apply_async = mocker.patch(
+        "app.celery.process_sms_client_response_tasks.process_sms_client_response.apply_async",
+        side_effect=[Exception("EXPECTED"), None],
+    )
+    mocker.patch(
+        "app.celery.process_sms_client_response_tasks.take_buffered_receipts",
+        return_value=nullcontext([pending, delivered]),
+    )
+
+    process_sms_client_responses_batch()
+
+    assert sample_notification.status == "pending"
+    assert mock_apply_async.call_args_list == [
+        mocker.call(kwargs={**delivered, "allow_batching": False}, queue="sms-callbacks"),
+        mocker.call(kwargs={**delivered, "allow_batching": False}, queue="retry-tasks"),
+    ]
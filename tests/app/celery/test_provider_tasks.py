@@ -13,8 +13,10 @@ import app
 from app.celery import provider_tasks
 from app.celery.provider_tasks import (
     deliver_email,
+    deliver_email_batch,
     deliver_letter,
     deliver_sms,
+    deliver_sms_batch,
     update_letter_to_sending,
 )
 from app.clients.email import EmailClientNonRetryableException
@@ -37,6 +39,7 @@ from app.constants import (
 )
 from app.exceptions import NotificationTechnicalFailureException
 from tests.app.db import create_notification
+from tests.conftest import set_config
 
 
 def test_should_have_decorated_tasks_functions():
@@ -106,6 +109,57 @@ def test_should_retry_and_log_exception_for_non_SmsClientResponseException_excep
     assert f"SMS notification delivery for id: {sample_notification.id} failed" in caplog.messages
 
 
+def test_deliver_sms_batch_sends_every_notification_in_the_batch(sample_template, mocker):
+    mock_send = mocker.patch("app.delivery.send_to_providers.send_sms_to_provider")
+    notifications = [create_notification(template=sample_template) for _ in range(3)]
+
+    deliver_sms_batch([str(notification.id) for notification in notifications])
+
+    assert mock_send.call_args_list == [mocker.call(notification) for notification in notifications]
+
+
+def test_deliver_sms_batch_sends_in_provider_batches_if_enabled(notify_api, sample_template, mocker):
+    batched, not_batched, failed = (create_notification(template=sample_template) for _ in range(3))
+    mock_send_in_batches = mocker.patch(
+        "app.delivery.send_to_providers.send_sms_to_provider_in_batches",
+        return_value=([not_batched], [str(failed.id)]),
+    )
+    mock_send = mocker.patch("app.delivery.send_to_providers.send_sms_to_provider")
+    mock_deliver_sms = mocker.patch("app.celery.provider_tasks.deliver_sms.apply_async")
+    missing_id = app.create_uuid()
+
+    with set_config(notify_api, "SMS_PROVIDER_BATCHING_ENABLED", True):
+        deliver_sms_batch([str(batched.id), str(not_batched.id), str(failed.id), missing_id])
+
+    assert set(mock_send_in_batches.call_args[0][0]) == {batched, not_batched, failed}
+    assert mock_send.call_args_list == [mocker.call(not_batched)]
+    assert mock_deliver_sms.call_args_list == [
+        mocker.call([str(failed.id)], queue="retry-tasks"),
+        mocker.call([missing_id], queue="retry-tasks"),
+    ]
+
+
+def test_deliver_email_batch_hands_failed_notifications_to_deliver_email_on_the_retry_queue(
+    sample_email_template, mocker
+):
+    first, second = create_notification(template=sample_email_template), create_notification(
+        template=sample_email_template
+    )
+    mock_send = mocker.patch(
+        "app.delivery.send_to_providers.send_email_to_provider", side_effect=[Exception("EXPECTED"), None]
+    )
+    mock_deliver_email = mocker.patch("app.celery.provider_tasks.deliver_email.apply_async")
+    missing_id = app.create_uuid()
+
+    deliver_email_batch([str(first.id), missing_id, str(second.id)])
+
+    assert mock_send.call_args_list == [mocker.call(first), mocker.call(second)]
+    assert mock_deliver_email.call_args_list == [
+        mocker.call([str(first.id)], queue="retry-tasks"),
+        mocker.call([missing_id], queue="retry-tasks"),
+    ]
+
+
 def test_should_go_into_technical_error_if_exceeds_retries_on_deliver_sms_task(sample_notification, mocker, caplog):
     mocker.patch("app.delivery.send_to_providers.send_sms_to_provider", side_effect=Exception("EXPECTED"))
     mocker.patch("app.celery.provider_tasks.deliver_sms.retry", side_effect=MaxRetriesExceededError())
@@ -0,0 +1,105 @@
+import json
+
+import pytest
+from freezegun import freeze_time
+
+from app.celery.receipt_buffer import (
+    RECEIPT_BATCH_PROCESSING_TIMEOUT_SECONDS,
+    buffer_receipt,
+    take_buffered_receipts,
+)
+from tests.conftest import set_config_values
+
+
+@pytest.fixture
+def mock_redis(notify_api, mocker):
+    mocker.patch("app.celery.receipt_buffer._take_script", None)
+    with set_config_values(
+        notify_api, {"REDIS_ENABLED": True, "RECEIPT_BATCH_MAX_SIZE": 3, "RECEIPT_BATCH_MAX_WAIT_MS": 200}
+    ):
+        yield mocker.patch("app.redis_store.redis_store")
+
+
+@pytest.fixture
+def mock_pipeline(mock_redis):
+    return mock_redis.pipeline.return_value
+
+
+@pytest.mark.parametrize(
+    "buffered, first_in_window, expected_calls",
+    [
+        (1, True, [{"queue": "ses-callbacks", "countdown": 0.2}]),
+        (2, None, []),
+        (3, None, [{"queue": "ses-callbacks"}]),
+        (6, None, [{"queue": "ses-callbacks"}]),
+    ],
+)
+def test_buffer_receipt_schedules_flush_at_end_of_window_or_when_batch_is_full(
+    mock_pipeline, mocker, buffered, first_in_window, expected_calls
+):
+    mock_pipeline.execute.return_value = [buffered, first_in_window]
+    flush_task = mocker.Mock()
+
+    assert buffer_receipt("ses", {"Message": "receipt"}, flush_task, "ses-callbacks")
+
+    mock_pipeline.rpush.assert_called_once_with("ses-receipt-buffer", json.dumps({"Message": "receipt"}))
+    mock_pipeline.set.assert_called_once_with("ses-receipt-buffer-flush-scheduled", 1, nx=True, px=200)
+    assert flush_task.apply_async.call_args_list == [mocker.call((), **kwargs) for kwargs in expected_calls]
+
+
+def test_buffer_receipt_returns_false_if_redis_fails(mock_pipeline, mocker):
+    mock_pipeline.execute.side_effect = ConnectionError
+    flush_task = mocker.Mock()
+
+    assert buffer_receipt("ses", {"Message": "receipt"}, flush_task, "ses-callbacks") is False
+    assert not flush_task.apply_async.called
+
+
+def test_buffer_receipt_returns_false_if_redis_disabled(notify_api, mocker):
+    mock_redis = mocker.patch("app.redis_store.redis_store")
+
+    assert buffer_receipt("ses", {"Message": "receipt"}, mocker.Mock(), "ses-callbacks") is False
+    assert not mock_redis.pipeline.called
+
+
+@freeze_time("2022-06-01T12:00:00")
+@pytest.mark.parametrize("remaining, expected_calls", [(0, 0), (5, 1)])
+def test_take_buffered_receipts(mock_redis, mocker, remaining, expected_calls):
+    mock_take = mock_redis.register_script.return_value
+    mock_take.return_value = [[b'{"Message": "1"}', b'{"Message": "2"}'], remaining]
+    mocker.patch("app.celery.receipt_buffer.uuid.uuid4", return_value="1234")
+    flush_task = mocker.Mock()
+
+    with take_buffered_receipts("ses", flush_task, "ses-callbacks") as receipts:
+        assert receipts == [{"Message": "1"}, {"Message": "2"}]
+        assert flush_task.apply_async.call_count == expected_calls
+        # they're not removed from Redis until they've been processed
+        assert not mock_redis.pipeline.called
+
+    mock_take.assert_called_once_with(
+        keys=["ses-receipt-buffer", "ses-receipt-buffer-batches", "ses-receipt-buffer-batch-1234"],
+        args=[3, 1654084800.0, RECEIPT_BATCH_PROCESSING_TIMEOUT_SECONDS],
+    )
+    mock_redis.pipeline.return_value.zrem.assert_called_once_with(
+        "ses-receipt-buffer-batches", "ses-receipt-buffer-batch-1234"
+    )
+    mock_redis.pipeline.return_value.delete.assert_called_once_with("ses-receipt-buffer-batch-1234")
+
+
+def test_take_buffered_receipts_leaves_them_to_be_put_back_if_processing_fails(mock_redis, mocker):
+    mock_redis.register_script.return_value.return_value = [[b'{"Message": "1"}'], 0]
+
+    with pytest.raises(ValueError):
+        with take_buffered_receipts("ses", mocker.Mock(), "ses-callbacks"):
+            raise ValueError
+
+    assert not mock_redis.pipeline.called
+
+
+def test_take_buffered_receipts_when_there_are_none(mock_redis, mocker):
+    mock_redis.register_script.return_value.return_value = [[], 0]
+
+    with take_buffered_receipts("ses", mocker.Mock(), "ses-callbacks") as receipts:
+        assert receipts == []
+
+    assert not mock_redis.pipeline.called
@@ -1,5 +1,6 @@
 from datetime import date, datetime, time, timedelta
 from decimal import Decimal
+from unittest.mock import call
 from uuid import UUID
 
 import pytest
@@ -8,8 +9,11 @@ from freezegun import freeze_time
 from app.celery.reporting_tasks import (
     create_nightly_billing,
     create_nightly_notification_status,
+    create_nightly_notification_status_for_day,
     create_nightly_notification_status_for_service_and_day,
     create_or_update_ft_billing_for_day,
+    update_ft_billing_for_today,
+    update_platform_stats,
 )
 from app.config import QueueNames
 from app.constants import (
@@ -20,6 +24,7 @@ from app.constants import (
     LETTER_TYPE,
     NOTIFICATION_TYPES,
     SMS_TYPE,
+    CacheKeys,
 )
 from app.dao.fact_billing_dao import get_rate
 from app.models import FactBilling, FactNotificationStatus, Notification
@@ -31,6 +36,7 @@ from tests.app.db import (
     create_service,
     create_template,
 )
+from tests.conftest import set_config, set_config_values
 
 
 def mocker_get_rate(
@@ -65,6 +71,97 @@ def test_create_nightly_billing_triggers_tasks_for_days(notify_api, mocker, day_
             assert mock.apply_async.call_args_list[i][1]["kwargs"] == {"process_day": expected_kwargs[i]}
 
 
+@freeze_time("2019-08-01T00:15")
+def test_create_nightly_billing_only_updates_changed_days_and_services_if_incremental(notify_api, mocker):
+    service_id = UUID("d1a0f2e9-3b8b-4a6f-9a4e-1d2c3b4a5f60")
+    mock_get = mocker.patch("app.celery.reporting_tasks.redis_store.get", return_value=b"2019-07-31T23:00:00")
+    mock_set = mocker.patch("app.celery.reporting_tasks.redis_store.set")
+    mock_fetch_changes = mocker.patch(
+        "app.celery.reporting_tasks.fetch_service_ids_with_billing_changes_by_day",
+        return_value={date(2019, 7, 30): {service_id}, date(2019, 7, 31): {service_id}},
+    )
+    mock_fetch_billing_data = mocker.patch(
+        "app.celery.reporting_tasks.fetch_billing_data_for_day", return_value=["billing data"]
+    )
+    mock_update_ft_billing = mocker.patch("app.celery.reporting_tasks.update_ft_billing")
+    mock_ft_billing = mocker.patch("app.celery.reporting_tasks.create_or_update_ft_billing_for_day")
+    mock_ft_billing_letter_despatch = mocker.patch(
+        "app.celery.reporting_tasks.create_or_update_ft_billing_letter_despatch_for_day"
+    )
+
+    with set_config(notify_api, "INCREMENTAL_FT_BILLING", True):
+        create_nightly_billing()
+
+    mock_get.assert_called_once_with("ft_billing:includes-changes-until-utc-isoformat")
+    mock_fetch_changes.assert_called_once_with(
+        since=datetime(2019, 7, 31, 22, 55), start_day=date(2019, 7, 23), end_day=date(2019, 8, 1)
+    )
+    assert mock_fetch_billing_data.call_args_list == [
+        mocker.call(process_day=date(2019, 7, 30), service_ids=[service_id]),
+        mocker.call(process_day=date(2019, 7, 31), service_ids=[service_id]),
+    ]
+    assert mock_update_ft_billing.call_args_list == [
+        mocker.call(["billing data"], date(2019, 7, 30)),
+        mocker.call(["billing data"], date(2019, 7, 31)),
+    ]
+    mock_set.assert_called_once_with("ft_billing:includes-changes-until-utc-isoformat", "2019-08-01T00:15:00", ex=86400)
+    assert not mock_ft_billing.apply_async.called
+    assert mock_ft_billing_letter_despatch.apply_async.call_count == 10
+
+
+@freeze_time("2019-08-01T00:15")
+def test_create_nightly_billing_updates_all_days_if_incremental_but_last_update_not_known(notify_api, mocker):
+    mocker.patch("app.celery.reporting_tasks.redis_store.get", return_value=None)
+    mock_set = mocker.patch("app.celery.reporting_tasks.redis_store.set")
+    mock_fetch_changes = mocker.patch("app.celery.reporting_tasks.fetch_service_ids_with_billing_changes_by_day")
+    mock_ft_billing = mocker.patch("app.celery.reporting_tasks.create_or_update_ft_billing_for_day")
+    mocker.patch("app.celery.reporting_tasks.create_or_update_ft_billing_letter_despatch_for_day")
+
+    with set_config(notify_api, "INCREMENTAL_FT_BILLING", True):
+        create_nightly_billing()
+
+    assert not mock_fetch_changes.called
+    assert mock_ft_billing.apply_async.call_count == 10
+    mock_set.assert_called_once_with("ft_billing:includes-changes-until-utc-isoformat", "2019-08-01T00:15:00", ex=86400)
+
+
+@freeze_time("2019-08-01T10:00")
+@pytest.mark.parametrize(
+    "incremental, includes_changes_until, expect_whole_day",
+    [
+        (False, b"2019-08-01T09:00:00", True),
+        (True, None, True),
+        (True, b"2019-08-01T09:00:00", False),
+    ],
+)
+def test_update_ft_billing_for_today(notify_api, mocker, incremental, includes_changes_until, expect_whole_day):
+    mocker.patch("app.celery.reporting_tasks.redis_store.get", return_value=includes_changes_until)
+    mocker.patch("app.celery.reporting_tasks.redis_store.set")
+    mock_fetch_changes = mocker.patch(
+        "app.celery.reporting_tasks.fetch_service_ids_with_billing_changes_by_day", return_value={}
+    )
+    mock_ft_billing = mocker.patch("app.celery.reporting_tasks.create_or_update_ft_billing_for_day")
+
+    with set_config(notify_api, "INCREMENTAL_FT_BILLING", incremental):
+        update_ft_billing_for_today()
+
+    assert mock_ft_billing.called is expect_whole_day
+    assert mock_fetch_changes.called is not expect_whole_day
+
+
+@freeze_time("2019-08-01T10:30")
+def test_update_platform_stats_updates_days_that_can_still_change(notify_api, mocker):
+    mock_update = mocker.patch("app.celery.reporting_tasks.update_fact_platform_stats_for_day")
+    mock_redis_set = mocker.patch("app.celery.reporting_tasks.redis_store.set")
+
+    update_platform_stats()
+
+    assert mock_update.call_args_list == [call(date(2019, 8, 1) - timedelta(days=i)) for i in range(10)]
+    mock_redis_set.assert_called_once_with(
+        CacheKeys.PLATFORM_STATS_UPDATED_AT_UTC_ISOFORMAT, "2019-08-01T10:30:00+00:00"
+    )
+
+
 @freeze_time("2019-08-01T00:30")
 def test_create_nightly_notification_status_triggers_tasks(
     notify_api,
@@ -118,6 +215,31 @@ def test_create_nightly_notification_status_triggers_relevant_tasks(
     assert types == expected_types_aggregated
 
 
+@freeze_time("2019-08-01T00:30")
+def test_create_nightly_notification_status_triggers_task_for_each_day_and_partition(notify_api, mocker):
+    mock_service_task = mocker.patch(
+        "app.celery.reporting_tasks.create_nightly_notification_status_for_service_and_day"
+    ).apply_async
+    mock_day_task = mocker.patch("app.celery.reporting_tasks.create_nightly_notification_status_for_day").apply_async
+
+    with set_config_values(
+        notify_api, {"NIGHTLY_NOTIFICATION_STATUS_BY_DAY": True, "NIGHTLY_NOTIFICATION_STATUS_PARTITIONS": 2}
+    ):
+        create_nightly_notification_status()
+
+    assert not mock_service_task.called
+    # 4 days of emails and text messages, and 10 of letters
+    assert mock_day_task.call_count == (4 + 4 + 10) * 2
+    mock_day_task.assert_any_call(
+        kwargs={"process_day": "2019-07-31", "notification_type": SMS_TYPE, "partition": 0, "partitions": 2},
+        queue=QueueNames.REPORTING,
+    )
+    mock_day_task.assert_any_call(
+        kwargs={"process_day": "2019-07-22", "notification_type": LETTER_TYPE, "partition": 1, "partitions": 2},
+        queue=QueueNames.REPORTING,
+    )
+
+
 def test_create_or_update_ft_billing_for_day_checks_history(sample_service, sample_letter_template, mocker):
     yesterday = datetime.now() - timedelta(days=1)
     mocker.patch("app.dao.fact_billing_dao.get_rate", side_effect=mocker_get_rate)
@@ -629,6 +751,69 @@ def test_create_nightly_notification_status_for_service_and_day_overwrites_old_d
     assert updated_fact_data[1].notification_status == "delivered"
 
 
+@pytest.mark.parametrize("partitions", [1, 3])
+def test_create_nightly_notification_status_for_day_counts_every_service(notify_db_session, partitions):
+    first_service = create_service(service_name="First Service")
+    first_template = create_template(service=first_service)
+    second_service = create_service(service_name="Second Service")
+    second_template = create_template(service=second_service)
+    email_template = create_template(service=second_service, template_type="email")
+
+    process_day = date.today() - timedelta(days=5)
+    with freeze_time(datetime.combine(process_day, time.min)):
+        create_notification(template=first_template, status="delivered")
+        create_notification(template=first_template, status="delivered")
+        create_notification(template=second_template, status="sending", key_type=KEY_TYPE_TEAM)
+        # test notifications and other notification types are ignored
+        create_notification(template=second_template, status="sending", key_type=KEY_TYPE_TEST)
+        create_notification(template=email_template, status="delivered")
+        # historical notifications are included
+        create_notification_history(template=second_template, status="delivered")
+
+    for partition in range(partitions):
+        create_nightly_notification_status_for_day(str(process_day), "sms", partition=partition, partitions=partitions)
+
+    assert sorted(
+        (row.service_id, row.key_type, row.notification_status, row.notification_count)
+        for row in FactNotificationStatus.query.filter_by(bst_date=process_day, notification_type="sms")
+    ) == sorted(
+        [
+            (first_service.id, KEY_TYPE_NORMAL, "delivered", 2),
+            (second_service.id, KEY_TYPE_TEAM, "sending", 1),
+            (second_service.id, KEY_TYPE_NORMAL, "delivered", 1),
+        ]
+    )
+    assert FactNotificationStatus.query.count() == 3
+
+
+def test_create_nightly_notification_status_for_day_only_changes_rows_whose_counts_changed(notify_db_session):
+    template = create_template(service=create_service())
+    process_day = date.today()
+    create_notification(template=template, status="delivered")
+    sending = create_notification(template=template, status="sending")
+    create_nightly_notification_status_for_day(str(process_day), "sms")
+
+    Notification.query.filter_by(id=sending.id).update({"status": "permanent-failure"})
+    create_notification(template=template, status="delivered")
+    with freeze_time("2030-01-01T12:00"):
+        create_nightly_notification_status_for_day(str(process_day), "sms")
+
+    rows = {row.notification_status: row for row in FactNotificationStatus.query.all()}
+    assert rows.keys() == {"delivered", "permanent-failure"}
+    assert rows["delivered"].notification_count == 2
+    assert rows["delivered"].updated_at == datetime(2030, 1, 1, 12, 0)
+    assert rows["permanent-failure"].notification_count == 1
+    assert rows["permanent-failure"].updated_at is None
+
+    with freeze_time("2030-01-02T12:00"):
+        create_nightly_notification_status_for_day(str(process_day), "sms")
+
+    # nothing has changed since, so nothing is updated
+    assert FactNotificationStatus.query.filter_by(notification_status="delivered").one().updated_at == datetime(
+        2030, 1, 1, 12, 0
+    )
+
+
 # the job runs at 12:30am London time. 04/01 is in BST.
 @freeze_time("2019-04-01T23:30")
 def test_create_nightly_notification_status_for_service_and_day_respects_bst(sample_template):
@@ -1,6 +1,6 @@
 import uuid
 from collections import namedtuple
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from unittest import mock
 from unittest.mock import ANY, call
 
@@ -33,9 +33,11 @@ from app.celery.scheduled_tasks import (
     delete_verify_codes,
     generate_sms_delivery_stats,
     populate_annual_billing,
+    reconcile_notification_status_counts,
     replay_created_notifications,
     run_populate_annual_billing,
     run_scheduled_jobs,
+    start_notification_status_counts_for_tomorrow,
     switch_current_sms_provider_on_slow_delivery,
     weekly_dwp_report,
     zendesk_new_email_branding_report,
@@ -67,7 +69,7 @@ from tests.app.db import (
     create_template,
     create_user,
 )
-from tests.conftest import set_config
+from tests.conftest import set_config, set_config_values
 
 
 def test_should_call_delete_codes_on_delete_verify_codes_task(notify_db_session, mocker):
@@ -453,6 +455,46 @@ def test_replay_created_notifications_get_pdf_for_templated_letter_tasks_for_let
     mock_task.assert_has_calls(calls, any_order=True)
 
 
+@pytest.fixture
+def notification_status_counts_enabled(notify_api):
+    with set_config_values(notify_api, {"REDIS_ENABLED": True, "NOTIFICATION_STATUS_COUNTS_IN_REDIS": True}):
+        yield
+
+
+@freeze_time("2021-06-01T23:30:00")
+def test_reconcile_notification_status_counts_recounts_today_in_the_uk(
+    sample_template, notification_status_counts_enabled, mocker
+):
+    create_notification(sample_template, created_at=datetime(2021, 6, 1, 23, 10), status="delivered")
+    create_notification(sample_template, created_at=datetime(2021, 6, 1, 12, 0), status="delivered")
+    mock_set_counts = mocker.patch("app.celery.scheduled_tasks.set_notification_status_counts")
+
+    reconcile_notification_status_counts()
+
+    mock_set_counts.assert_called_once_with(
+        date(2021, 6, 2),
+        [(sample_template.service_id, "sms", sample_template.id, "normal", "delivered", 1)],
+    )
+
+
+def test_reconcile_notification_status_counts_does_nothing_if_not_enabled(notify_api, mocker):
+    mock_set_counts = mocker.patch("app.celery.scheduled_tasks.set_notification_status_counts")
+
+    reconcile_notification_status_counts()
+
+    assert not mock_set_counts.called
+
+
+@pytest.mark.parametrize("now", ["2021-06-01T22:30:00", "2021-01-01T22:30:00"])
+def test_start_notification_status_counts_for_tomorrow(notification_status_counts_enabled, mocker, now):
+    mock_start_counts = mocker.patch("app.celery.scheduled_tasks.start_notification_status_counts")
+
+    with freeze_time(now):
+        start_notification_status_counts_for_tomorrow()
+
+    mock_start_counts.assert_called_once_with((datetime.fromisoformat(now) + timedelta(days=1)).date())
+
+
 def test_check_job_status_task_does_not_raise_error(sample_template):
     create_job(
         template=sample_template,
@@ -1,4 +1,5 @@
 import json
+from contextlib import nullcontext
 from datetime import datetime
 
 import pytest
@@ -6,10 +7,17 @@ import requests_mock
 from freezegun import freeze_time
 
 from app import signing
+from app.celery.callback_dispatcher import CallbackCircuitOpen, CallbackHostBusy
 from app.celery.service_callback_tasks import (
+    create_delivery_status_callback_data,
+    flush_delivery_status_callbacks,
+    replay_deferred_service_callbacks,
     send_complaint_to_service,
     send_delivery_status_to_service,
+    send_delivery_statuses_to_service,
 )
+from app.constants import BATCHED_DELIVERY_STATUS_CALLBACKS
+from app.dao.service_callback_api_dao import delete_service_callback_api
 from app.utils import DATETIME_FORMAT
 from tests.app.db import (
     create_complaint,
@@ -18,6 +26,7 @@ from tests.app.db import (
     create_service_callback_api,
     create_template,
 )
+from tests.conftest import set_config
 
 
 @pytest.mark.parametrize("notification_type", ["email", "sms"])
@@ -136,6 +145,191 @@ def test_send_delivery_status_to_service_succeeds_if_sent_at_is_none(notify_db_s
     assert mocked.call_count == 0
 
 
+def test_send_delivery_status_to_service_buffers_status_update_if_service_uses_batched_callbacks(
+    notify_db_session, mocker
+):
+    mock_buffer = mocker.patch("app.celery.service_callback_tasks.buffer_receipt", return_value=True)
+    service = create_service(service_permissions=["sms", BATCHED_DELIVERY_STATUS_CALLBACKS])
+    callback_api = create_service_callback_api(service=service)
+    notification = create_notification(template=create_template(service=service), status="delivered")
+    encoded_status_update = create_delivery_status_callback_data(notification, callback_api)
+
+    with requests_mock.Mocker() as request_mock:
+        send_delivery_status_to_service(notification.id, encoded_status_update=encoded_status_update)
+
+    assert request_mock.call_count == 0
+    mock_buffer.assert_called_once_with(
+        f"delivery-status-callbacks-{service.id}",
+        encoded_status_update,
+        flush_delivery_status_callbacks,
+        "service-callbacks",
+        flush_args=[str(service.id)],
+    )
+
+
+def test_send_delivery_status_to_service_does_not_buffer_for_other_services(notify_db_session, mocker):
+    mock_buffer = mocker.patch("app.celery.service_callback_tasks.buffer_receipt")
+    callback_api, template = _set_up_test_data("sms", "delivery_status")
+    notification = create_notification(template=template, status="delivered")
+
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post(callback_api.url, json={}, status_code=200)
+        send_delivery_status_to_service(
+            notification.id, encoded_status_update=create_delivery_status_callback_data(notification, callback_api)
+        )
+
+    assert request_mock.call_count == 1
+    assert not mock_buffer.called
+
+
+def test_flush_delivery_status_callbacks_sends_a_batch_for_each_callback_api(notify_db_session, mocker):
+    mock_apply_async = mocker.patch("app.celery.service_callback_tasks.send_delivery_statuses_to_service.apply_async")
+    callback_api, template = _set_up_test_data("sms", "delivery_status")
+    notifications = [create_notification(template=template, status="delivered") for _ in range(3)]
+    first, second = (create_delivery_status_callback_data(n, callback_api) for n in notifications[:2])
+    callback_api.url = "https://new.service.gov.uk/"
+    third = create_delivery_status_callback_data(notifications[2], callback_api)
+    mocker.patch(
+        "app.celery.service_callback_tasks.take_buffered_receipts", return_value=nullcontext([first, third, second])
+    )
+
+    flush_delivery_status_callbacks(str(template.service_id))
+
+    assert mock_apply_async.call_args_list == [
+        mocker.call([[first, second]], queue="service-callbacks"),
+        mocker.call([[third]], queue="service-callbacks"),
+    ]
+
+
+def test_send_delivery_statuses_to_service_posts_a_list_of_status_updates(notify_db_session):
+    callback_api, template = _set_up_test_data("sms", "delivery_status")
+    notifications = [create_notification(template=template, status="delivered") for _ in range(2)]
+
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post(callback_api.url, json={}, status_code=200)
+        send_delivery_statuses_to_service(
+            [create_delivery_status_callback_data(notification, callback_api) for notification in notifications]
+        )
+
+    assert request_mock.call_count == 1
+    assert [status_update["id"] for status_update in request_mock.request_history[0].json()] == [
+        str(notification.id) for notification in notifications
+    ]
+    assert request_mock.request_history[0].headers["Authorization"] == "Bearer {}".format(callback_api.bearer_token)
+
+
+def test_send_delivery_status_to_service_tries_again_later_if_host_is_busy(notify_db_session, mocker):
+    mocker.patch("app.celery.service_callback_tasks.post_to_service_callback_api", side_effect=CallbackHostBusy)
+    mock_apply_async = mocker.patch("app.celery.service_callback_tasks.send_delivery_status_to_service.apply_async")
+    mock_retry = mocker.patch("app.celery.service_callback_tasks.send_delivery_status_to_service.retry")
+    callback_api, template = _set_up_test_data("sms", "delivery_status")
+    notification = create_notification(template=template, status="delivered")
+
+    send_delivery_status_to_service(notification.id, _set_up_data_for_status_update(callback_api, notification))
+
+    assert mock_apply_async.call_count == 1
+    assert mock_apply_async.call_args[1] == {"queue": "service-callbacks-retry", "countdown": 5, "retries": 0}
+    assert not mock_retry.called
+
+
+def test_send_delivery_status_to_service_defers_callback_if_circuit_is_open(notify_db_session, mocker):
+    mocker.patch("app.celery.service_callback_tasks.post_to_service_callback_api", side_effect=CallbackCircuitOpen)
+    mock_defer = mocker.patch("app.celery.service_callback_tasks.defer_callback", return_value=True)
+    mock_retry = mocker.patch("app.celery.service_callback_tasks.send_delivery_status_to_service.retry")
+    callback_api, template = _set_up_test_data("sms", "delivery_status")
+    notification = create_notification(template=template, status="delivered")
+    encoded_status_update = _set_up_data_for_status_update(callback_api, notification)
+
+    send_delivery_status_to_service(notification.id, encoded_status_update)
+
+    mock_defer.assert_called_once_with(callback_api.url, "send-delivery-status", [notification.id, mocker.ANY], {})
+    deferred_status_update = signing.decode(mock_defer.call_args.args[2][1])
+    assert "service_callback_api_bearer_token" not in deferred_status_update
+    assert deferred_status_update == {
+        key: value
+        for key, value in signing.decode(encoded_status_update).items()
+        if key != "service_callback_api_bearer_token"
+    }
+    assert not mock_retry.called
+
+
+def test_send_delivery_status_to_service_looks_up_the_bearer_token_of_a_deferred_callback(notify_db_session):
+    callback_api, template = _set_up_test_data("sms", "delivery_status")
+    notification = create_notification(template=template, status="delivered")
+    status_update = signing.decode(_set_up_data_for_status_update(callback_api, notification))
+    del status_update["service_callback_api_bearer_token"]
+
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post(callback_api.url, json={}, status_code=200)
+        send_delivery_status_to_service(notification.id, signing.encode(status_update))
+
+    assert request_mock.request_history[0].headers["Authorization"] == f"Bearer {callback_api.bearer_token}"
+
+
+def test_send_complaint_to_service_does_not_send_a_deferred_callback_if_callback_api_has_been_removed(
+    notify_db_session,
+):
+    callback_api, template = _set_up_test_data("email", "complaint")
+    notification = create_notification(template=template)
+    complaint = create_complaint(service=template.service, notification=notification)
+    complaint_data = signing.decode(_set_up_data_for_complaint(callback_api, complaint, notification))
+    del complaint_data["service_callback_api_bearer_token"]
+    delete_service_callback_api(callback_api)
+
+    with requests_mock.Mocker() as request_mock:
+        send_complaint_to_service(signing.encode(complaint_data))
+
+    assert not request_mock.called
+
+
+def test_send_delivery_status_to_service_retries_callbacks_queued_without_a_callback_api_id(notify_db_session, mocker):
+    mocker.patch("app.celery.service_callback_tasks.post_to_service_callback_api", side_effect=CallbackCircuitOpen)
+    mock_defer = mocker.patch("app.celery.service_callback_tasks.defer_callback", return_value=True)
+    mock_retry = mocker.patch("app.celery.service_callback_tasks.send_delivery_status_to_service.retry")
+    callback_api, template = _set_up_test_data("sms", "delivery_status")
+    notification = create_notification(template=template, status="delivered")
+    status_update = signing.decode(_set_up_data_for_status_update(callback_api, notification))
+    del status_update["service_callback_api_id"]
+
+    send_delivery_status_to_service(notification.id, signing.encode(status_update))
+
+    assert not mock_defer.called
+    mock_retry.assert_called_once_with(queue="service-callbacks-retry")
+
+
+def test_send_delivery_status_to_service_retries_if_callback_cannot_be_deferred(notify_db_session, mocker):
+    mocker.patch("app.celery.service_callback_tasks.post_to_service_callback_api", side_effect=CallbackCircuitOpen)
+    mocker.patch("app.celery.service_callback_tasks.defer_callback", return_value=False)
+    mock_retry = mocker.patch("app.celery.service_callback_tasks.send_delivery_status_to_service.retry")
+    callback_api, template = _set_up_test_data("sms", "delivery_status")
+    notification = create_notification(template=template, status="delivered")
+
+    send_delivery_status_to_service(notification.id, _set_up_data_for_status_update(callback_api, notification))
+
+    mock_retry.assert_called_once_with(queue="service-callbacks-retry")
+
+
+def test_replay_deferred_service_callbacks_requeues_callbacks_for_each_url(notify_api, mocker):
+    mocker.patch(
+        "app.celery.service_callback_tasks.get_urls_with_deferred_callbacks",
+        return_value=["https://one.example.com", "https://two.example.com"],
+    )
+    mocker.patch(
+        "app.celery.service_callback_tasks.take_deferred_callbacks",
+        side_effect=[[{"task": "send-complaint", "args": ["complaint"], "kwargs": {}}], []],
+    )
+    mocker.patch("app.celery.service_callback_tasks.DEFERRED_CALLBACKS_REPLAY_BATCH_SIZE", 1)
+    mock_send_complaint = mocker.patch("app.celery.service_callback_tasks.send_complaint_to_service.apply_async")
+    mock_replay = mocker.patch("app.celery.service_callback_tasks.replay_deferred_service_callbacks.apply_async")
+
+    with set_config(notify_api, "REDIS_ENABLED", True):
+        replay_deferred_service_callbacks()
+
+    mock_send_complaint.assert_called_once_with(["complaint"], {}, queue="service-callbacks")
+    # the first url might have more to replay
+    mock_replay.assert_called_once_with(["https://one.example.com"], queue="service-callbacks")
+
+
 def _set_up_test_data(notification_type, callback_type):
     service = create_service(restricted=True)
     template = create_template(service=service, template_type=notification_type, subject="Hello")
@@ -160,6 +354,8 @@ def _set_up_data_for_status_update(callback_api, notification):
         else None,
         "notification_sent_at": notification.sent_at.strftime(DATETIME_FORMAT) if notification.sent_at else None,
         "notification_type": notification.notification_type,
+        "service_id": str(notification.service_id),
+        "service_callback_api_id": str(callback_api.id),
         "service_callback_api_url": callback_api.url,
         "service_callback_api_bearer_token": callback_api.bearer_token,
         "template_id": str(notification.template_id),
@@ -176,6 +372,8 @@ def _set_up_data_for_complaint(callback_api, complaint, notification):
         "reference": notification.client_reference,
         "to": notification.to,
         "complaint_date": complaint.complaint_date.strftime(DATETIME_FORMAT),
+        "service_id": str(notification.service_id),
+        "service_callback_api_id": str(callback_api.id),
         "service_callback_api_url": callback_api.url,
         "service_callback_api_bearer_token": callback_api.bearer_token,
     }
@@ -7,7 +7,7 @@ import pytest
 import requests_mock
 from celery.exceptions import Retry
 from freezegun import freeze_time
-from notifications_utils.recipients import Row
+from notifications_utils.recipients import RecipientCSV, Row
 from notifications_utils.template import (
     LetterPrintTemplate,
     PlainTextEmailTemplate,
@@ -20,6 +20,8 @@ from app import signing
 from app.celery import provider_tasks, tasks
 from app.celery.tasks import (
     get_recipient_csv_and_template_and_sender_id,
+    get_recipient_rows,
+    get_recipient_rows_and_template_and_sender_id,
     process_incomplete_job,
     process_incomplete_jobs,
     process_job,
@@ -29,8 +31,10 @@ from app.celery.tasks import (
     save_api_email,
     save_api_sms,
     save_email,
+    save_email_chunk,
     save_letter,
     save_sms,
+    save_sms_chunk,
     send_inbound_sms_to_service,
 )
 from app.config import QueueNames
@@ -64,6 +68,7 @@ from tests.app.db import (
     create_template,
     create_user,
 )
+from tests.conftest import set_config_values
 
 
 class AnyStringWith(str):
@@ -74,6 +79,10 @@ class AnyStringWith(str):
 mmg_error = {"Error": "40", "Description": "error"}
 
 
+def _csv_lines(file):
+    return load_example_csv(file).splitlines(keepends=True)
+
+
 def _notification_json(template, to, personalisation=None, job_id=None, row_number=0, client_reference=None):
     return {
         "template": str(template.id),
@@ -104,14 +113,14 @@ def email_job_with_placeholders(notify_db_session, sample_email_template_with_pl
 
 def test_should_process_sms_job(sample_job, mocker):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3", return_value=(load_example_csv("sms"), {"sender_id": None})
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3", return_value=(_csv_lines("sms"), {"sender_id": None})
     )
     mocker.patch("app.celery.tasks.save_sms.apply_async")
     mocker.patch("app.signing.encode", return_value="something_encoded")
     mocker.patch("app.celery.tasks.create_uuid", return_value="uuid")
 
     process_job(sample_job.id)
-    s3.get_job_and_metadata_from_s3.assert_called_once_with(
+    s3.stream_job_and_metadata_from_s3.assert_called_once_with(
         service_id=str(sample_job.service.id), job_id=str(sample_job.id)
     )
     assert signing.encode.call_args[0][0]["to"] == "+441234123123"
@@ -128,8 +137,8 @@ def test_should_process_sms_job(sample_job, mocker):
 
 def test_should_process_sms_job_with_sender_id(sample_job, mocker, fake_uuid):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("sms"), {"sender_id": fake_uuid}),
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("sms"), {"sender_id": fake_uuid}),
     )
     mocker.patch("app.celery.tasks.save_sms.apply_async")
     mocker.patch("app.signing.encode", return_value="something_encoded")
@@ -145,12 +154,12 @@ def test_should_process_sms_job_with_sender_id(sample_job, mocker, fake_uuid):
 def test_should_not_process_job_if_already_pending(sample_template, mocker):
     job = create_job(template=sample_template, job_status="scheduled")
 
-    mocker.patch("app.celery.tasks.s3.get_job_and_metadata_from_s3")
+    mocker.patch("app.celery.tasks.s3.stream_job_and_metadata_from_s3")
     mocker.patch("app.celery.tasks.process_row")
 
     process_job(job.id)
 
-    assert s3.get_job_and_metadata_from_s3.called is False
+    assert s3.stream_job_and_metadata_from_s3.called is False
     assert tasks.process_row.called is False
 
 
@@ -159,8 +168,8 @@ def test_should_not_process_if_send_limit_is_exceeded(notify_api, notify_db_sess
     template = create_template(service=service)
     job = create_job(template=template, notification_count=10, original_file_name="multiple_sms.csv")
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mocker.patch("app.celery.tasks.process_row")
     mock_check_message_limit = mocker.patch(
@@ -171,7 +180,7 @@ def test_should_not_process_if_send_limit_is_exceeded(notify_api, notify_db_sess
 
     job = jobs_dao.dao_get_job_by_id(job.id)
     assert job.job_status == "sending limits exceeded"
-    assert s3.get_job_and_metadata_from_s3.called is False
+    assert s3.stream_job_and_metadata_from_s3.called is False
     assert tasks.process_row.called is False
     assert mock_check_message_limit.call_args_list == [
         mocker.call(service, "normal", notification_type=SMS_TYPE, num_notifications=10),
@@ -183,8 +192,8 @@ def test_should_not_process_if_send_limit_is_exceeded_by_job_notification_count(
     template = create_template(service=service)
     job = create_job(template=template, notification_count=10, original_file_name="multiple_sms.csv")
     mock_s3 = mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mock_process_row = mocker.patch("app.celery.tasks.process_row")
     mock_check_message_limit = mocker.patch(
@@ -207,8 +216,8 @@ def test_should_process_job_if_send_limits_are_not_exceeded(notify_api, notify_d
     job = create_job(template=template, notification_count=10)
 
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_email"), {"sender_id": None}),
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("multiple_email"), {"sender_id": None}),
     )
     mocker.patch("app.celery.tasks.save_email.apply_async")
     mocker.patch("app.signing.encode", return_value="something_encoded")
@@ -218,7 +227,7 @@ def test_should_process_job_if_send_limits_are_not_exceeded(notify_api, notify_d
     )
     process_job(job.id)
 
-    s3.get_job_and_metadata_from_s3.assert_called_once_with(service_id=str(job.service.id), job_id=str(job.id))
+    s3.stream_job_and_metadata_from_s3.assert_called_once_with(service_id=str(job.service.id), job_id=str(job.id))
     job = jobs_dao.dao_get_job_by_id(job.id)
     assert job.job_status == "finished"
     tasks.save_email.apply_async.assert_called_with(
@@ -237,14 +246,14 @@ def test_should_process_job_if_send_limits_are_not_exceeded(notify_api, notify_d
 
 def test_should_not_create_save_task_for_empty_file(sample_job, mocker):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("empty"), {"sender_id": None}),
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("empty"), {"sender_id": None}),
     )
     mocker.patch("app.celery.tasks.save_sms.apply_async")
 
     process_job(sample_job.id)
 
-    s3.get_job_and_metadata_from_s3.assert_called_once_with(
+    s3.stream_job_and_metadata_from_s3.assert_called_once_with(
         service_id=str(sample_job.service.id), job_id=str(sample_job.id)
     )
     job = jobs_dao.dao_get_job_by_id(sample_job.id)
@@ -256,14 +265,17 @@ def test_should_process_email_job(email_job_with_placeholders, mocker):
     email_csv = """email_address,name
     test@test.com,foo
     """
-    mocker.patch("app.celery.tasks.s3.get_job_and_metadata_from_s3", return_value=(email_csv, {"sender_id": None}))
+    mocker.patch(
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(email_csv.splitlines(keepends=True), {"sender_id": None}),
+    )
     mocker.patch("app.celery.tasks.save_email.apply_async")
     mocker.patch("app.signing.encode", return_value="something_encoded")
     mocker.patch("app.celery.tasks.create_uuid", return_value="uuid")
 
     process_job(email_job_with_placeholders.id)
 
-    s3.get_job_and_metadata_from_s3.assert_called_once_with(
+    s3.stream_job_and_metadata_from_s3.assert_called_once_with(
         service_id=str(email_job_with_placeholders.service.id), job_id=str(email_job_with_placeholders.id)
     )
     assert signing.encode.call_args[0][0]["to"] == "test@test.com"
@@ -287,7 +299,10 @@ def test_should_process_email_job_with_sender_id(email_job_with_placeholders, mo
     email_csv = """email_address,name
     test@test.com,foo
     """
-    mocker.patch("app.celery.tasks.s3.get_job_and_metadata_from_s3", return_value=(email_csv, {"sender_id": fake_uuid}))
+    mocker.patch(
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(email_csv.splitlines(keepends=True), {"sender_id": fake_uuid}),
+    )
     mocker.patch("app.celery.tasks.save_email.apply_async")
     mocker.patch("app.signing.encode", return_value="something_encoded")
     mocker.patch("app.celery.tasks.create_uuid", return_value="uuid")
@@ -306,7 +321,10 @@ def test_should_process_letter_job(sample_letter_job, mocker):
     csv = """address_line_1,address_line_2,address_line_3,address_line_4,postcode,name
     A1,A2,A3,A4,A_POST,Alice
     """
-    s3_mock = mocker.patch("app.celery.tasks.s3.get_job_and_metadata_from_s3", return_value=(csv, {"sender_id": None}))
+    s3_mock = mocker.patch(
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(csv.splitlines(keepends=True), {"sender_id": None}),
+    )
     process_row_mock = mocker.patch("app.celery.tasks.process_row")
     mocker.patch("app.celery.tasks.create_uuid", return_value="uuid")
 
@@ -334,8 +352,8 @@ def test_should_process_letter_job(sample_letter_job, mocker):
 
 def test_should_process_all_sms_job(sample_job_with_placeholdered_template, mocker):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mocker.patch("app.celery.tasks.save_sms.apply_async")
     mocker.patch("app.signing.encode", return_value="something_encoded")
@@ -343,7 +361,7 @@ def test_should_process_all_sms_job(sample_job_with_placeholdered_template, mock
 
     process_job(sample_job_with_placeholdered_template.id)
 
-    s3.get_job_and_metadata_from_s3.assert_called_once_with(
+    s3.stream_job_and_metadata_from_s3.assert_called_once_with(
         service_id=str(sample_job_with_placeholdered_template.service.id),
         job_id=str(sample_job_with_placeholdered_template.id),
     )
@@ -358,6 +376,46 @@ def test_should_process_all_sms_job(sample_job_with_placeholdered_template, mock
     assert job.job_status == "finished"
 
 
+def test_should_process_sms_job_in_chunks(notify_api, sample_job_with_placeholdered_template, mocker):
+    mocker.patch(
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("multiple_sms"), {"sender_id": None}),
+    )
+    mock_save_sms = mocker.patch("app.celery.tasks.save_sms.apply_async")
+    mock_save_sms_chunk = mocker.patch("app.celery.tasks.save_sms_chunk.apply_async")
+
+    with set_config_values(notify_api, {"PROCESS_JOBS_IN_CHUNKS": True, "JOB_CHUNK_SIZE": 4}):
+        process_job(sample_job_with_placeholdered_template.id)
+
+    assert not mock_save_sms.called
+    assert mock_save_sms_chunk.call_count == 3
+    rows = [row for call_ in mock_save_sms_chunk.call_args_list for row in signing.decode(call_[0][0][1])]
+    assert [row["row_number"] for row in rows] == list(range(10))
+    assert len({row["id"] for row in rows}) == 10
+    assert rows[0]["to"] == "+441234123120"
+    assert rows[0]["personalisation"] == {"phonenumber": "+441234123120", "name": "chris"}
+    assert mock_save_sms_chunk.call_args_list[0][0][0][0] == str(sample_job_with_placeholdered_template.service_id)
+    assert mock_save_sms_chunk.call_args_list[0][1] == {"queue": "database-tasks"}
+    job = jobs_dao.dao_get_job_by_id(sample_job_with_placeholdered_template.id)
+    assert job.job_status == "finished"
+
+
+def test_should_process_letter_job_row_by_row_even_in_chunk_mode(notify_api, sample_letter_job, mocker):
+    csv = """address_line_1,address_line_2,address_line_3,address_line_4,postcode,name
+    A1,A2,A3,A4,A_POST,Alice
+    """
+    mocker.patch(
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(csv.splitlines(keepends=True), {"sender_id": None}),
+    )
+    mock_save_letter = mocker.patch("app.celery.tasks.save_letter.apply_async")
+
+    with set_config_values(notify_api, {"PROCESS_JOBS_IN_CHUNKS": True, "JOB_CHUNK_SIZE": 4}):
+        process_job(sample_letter_job.id)
+
+    assert mock_save_letter.call_count == 1
+
+
 # -------------- process_row tests -------------- #
 
 
@@ -900,6 +958,78 @@ def test_save_email_should_go_to_retry_queue_if_database_errors(sample_email_tem
     assert Notification.query.count() == 0
 
 
+def _notification_chunk_json(template, job, recipients):
+    return [
+        {
+            **_notification_json(template, to=to, job_id=job.id, row_number=i),
+            "id": str(uuid.uuid4()),
+        }
+        for i, to in enumerate(recipients)
+    ]
+
+
+def test_save_sms_chunk_persists_all_rows_and_queues_them_for_delivery(sample_job, mocker):
+    mock_deliver = mocker.patch("app.celery.provider_tasks.deliver_sms_batch.apply_async")
+    rows = _notification_chunk_json(sample_job.template, sample_job, ["+447700900001", "+447700900002"])
+
+    save_sms_chunk(str(sample_job.service_id), signing.encode(rows))
+
+    notifications = Notification.query.order_by(Notification.job_row_number).all()
+    assert [str(n.id) for n in notifications] == [row["id"] for row in rows]
+    assert [n.to for n in notifications] == ["+447700900001", "+447700900002"]
+    assert {n.job_id for n in notifications} == {sample_job.id}
+    assert {n.status for n in notifications} == {NOTIFICATION_CREATED}
+    assert {n.reply_to_text for n in notifications} == {sample_job.template.reply_to_text}
+    mock_deliver.assert_called_once_with([[row["id"] for row in rows]], queue="send-sms-tasks")
+
+
+def test_save_sms_chunk_does_not_create_duplicates_when_replayed(sample_job, mocker):
+    mock_deliver = mocker.patch("app.celery.provider_tasks.deliver_sms_batch.apply_async")
+    rows = _notification_chunk_json(sample_job.template, sample_job, ["+447700900001", "+447700900002"])
+
+    save_sms_chunk(str(sample_job.service_id), signing.encode(rows))
+    save_sms_chunk(str(sample_job.service_id), signing.encode(rows))
+
+    assert Notification.query.count() == 2
+    mock_deliver.assert_called_once_with([[row["id"] for row in rows]], queue="send-sms-tasks")
+
+
+def test_save_sms_chunk_skips_rows_a_restricted_service_cannot_send_to(notify_db_session, mocker):
+    mock_deliver = mocker.patch("app.celery.provider_tasks.deliver_sms_batch.apply_async")
+    service = create_service(user=create_user(), restricted=True)
+    job = create_job(template=create_template(service=service))
+    rows = _notification_chunk_json(job.template, job, ["+447700900001"])
+
+    save_sms_chunk(str(service.id), signing.encode(rows))
+
+    assert Notification.query.count() == 0
+    assert not mock_deliver.called
+
+
+def test_save_email_chunk_uses_reply_to_text_from_sender_id(sample_email_template, mocker):
+    mocker.patch("app.celery.provider_tasks.deliver_email_batch.apply_async")
+    job = create_job(template=sample_email_template)
+    reply_to = create_reply_to_email(job.service, "reply@example.com", is_default=False)
+    rows = _notification_chunk_json(sample_email_template, job, ["one@example.com"])
+
+    save_email_chunk(str(job.service_id), signing.encode(rows), sender_id=reply_to.id)
+
+    assert Notification.query.one().reply_to_text == "reply@example.com"
+
+
+def test_save_sms_chunk_should_go_to_retry_queue_if_database_errors(sample_job, mocker):
+    mock_deliver = mocker.patch("app.celery.provider_tasks.deliver_sms_batch.apply_async")
+    mocker.patch("app.celery.tasks.save_sms_chunk.retry", side_effect=Retry)
+    mocker.patch("app.notifications.process_notifications.dao_create_notifications", side_effect=SQLAlchemyError())
+    rows = _notification_chunk_json(sample_job.template, sample_job, ["+447700900001"])
+
+    with pytest.raises(Retry):
+        save_sms_chunk(str(sample_job.service_id), signing.encode(rows))
+
+    assert not mock_deliver.called
+    tasks.save_sms_chunk.retry.assert_called_once_with(queue="retry-tasks", exc=mocker.ANY)
+
+
 def test_save_email_does_not_send_duplicate_and_does_not_put_in_retry_queue(sample_notification, mocker):
     json = _notification_json(sample_notification.template, sample_notification.to, job_id=uuid.uuid4(), row_number=1)
     deliver_email = mocker.patch("app.celery.provider_tasks.deliver_email.apply_async")
@@ -1231,6 +1361,65 @@ def test_should_cancel_job_if_service_is_inactive(sample_service, sample_job, mo
     tasks.process_row.assert_not_called()
 
 
+def test_get_recipient_rows_and_template_and_sender_id_streams_rows_from_s3(notify_api, mocker, sample_job):
+    mocker.patch(
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(iter(_csv_lines("multiple_sms")), {"sender_id": "abc"}),
+    )
+
+    with set_config_values(notify_api, {"JOB_CSV_STREAM_CHUNK_SIZE": 3}):
+        rows, template, sender_id = get_recipient_rows_and_template_and_sender_id(sample_job)
+        rows = list(rows)
+
+    assert isinstance(template, SMSMessageTemplate)
+    assert sender_id == "abc"
+    assert [row.index for row in rows] == list(range(10))
+    assert [row.recipient for row in rows] == [f"+44123412312{i}" for i in range(1, 10)] + ["+441234123120"]
+
+
+def test_get_recipient_rows_keeps_quoted_fields_that_span_lines_together(notify_api, sample_template_with_placeholders):
+    template = sample_template_with_placeholders._as_utils_template()
+    lines = ["\n", "phone number,name\n", '07700900001,"Multi\n', 'line"\n', "07700900002,Single\n"]
+
+    with set_config_values(notify_api, {"JOB_CSV_STREAM_CHUNK_SIZE": 1}):
+        rows = list(get_recipient_rows(iter(lines), template))
+
+    assert [(row.index, row.recipient) for row in rows] == [(0, "07700900001"), (1, "07700900002")]
+    assert rows[0].personalisation["name"].startswith("Multi")
+    assert rows[0].personalisation["name"].endswith("line")
+
+
+def test_get_recipient_rows_does_not_treat_a_quote_inside_a_field_as_opening_a_quoted_field(
+    notify_api, sample_template_with_placeholders
+):
+    template = sample_template_with_placeholders._as_utils_template()
+    lines = ["phone number,name\n", '07700900001,5" screen\n', "07700900002,Single\n", "07700900003,Other\n"]
+
+    with set_config_values(notify_api, {"JOB_CSV_STREAM_CHUNK_SIZE": 1}):
+        rows = list(get_recipient_rows(iter(lines), template))
+
+    assert [(row.index, row.recipient) for row in rows] == [(0, "07700900001"), (1, "07700900002"), (2, "07700900003")]
+    assert rows[0].personalisation["name"] == '5" screen'
+
+
+def test_get_recipient_rows_numbers_rows_the_same_as_the_whole_file_when_blank_rows_straddle_chunks(
+    notify_api, sample_template
+):
+    template = sample_template._as_utils_template()
+    lines = ["phone number\n", "07700900001\n", "\n", ",\n", "07700900002\n", "\n", "07700900003\n"]
+
+    with set_config_values(notify_api, {"JOB_CSV_STREAM_CHUNK_SIZE": 2}):
+        rows = list(get_recipient_rows(iter(lines), template))
+
+    whole_file_rows = RecipientCSV("".join(lines), template=template).get_rows()
+    assert [(row.index, row.recipient) for row in rows] == [(row.index, row.recipient) for row in whole_file_rows]
+    assert [row.recipient for row in rows] == ["07700900001", "07700900002", "07700900003"]
+
+
+def test_get_recipient_rows_for_empty_file(notify_api, sample_template):
+    assert list(get_recipient_rows(iter(["\n"]), sample_template._as_utils_template())) == []
+
+
 def test_get_email_template_instance(mocker, sample_email_template, sample_job):
     mocker.patch(
         "app.celery.tasks.s3.get_job_and_metadata_from_s3",
@@ -1418,8 +1607,8 @@ def test_send_inbound_sms_to_service_does_not_retries_if_request_returns_404(not
 
 def test_process_incomplete_job_sms(mocker, sample_template):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     save_sms = mocker.patch("app.celery.tasks.save_sms.apply_async")
 
@@ -1446,10 +1635,37 @@ def test_process_incomplete_job_sms(mocker, sample_template):
     assert save_sms.call_count == 8  # There are 10 in the file and we've added two already
 
 
+def test_process_incomplete_job_in_chunks_resumes_after_last_row(notify_api, mocker, sample_template):
+    mocker.patch(
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("multiple_sms"), {"sender_id": None}),
+    )
+    mock_save_sms_chunk = mocker.patch("app.celery.tasks.save_sms_chunk.apply_async")
+
+    job = create_job(
+        template=sample_template,
+        notification_count=10,
+        created_at=datetime.utcnow() - timedelta(hours=2),
+        scheduled_for=datetime.utcnow() - timedelta(minutes=31),
+        processing_started=datetime.utcnow() - timedelta(minutes=31),
+        job_status=JOB_STATUS_ERROR,
+    )
+    create_notification(sample_template, job, 0)
+    create_notification(sample_template, job, 1)
+
+    with set_config_values(notify_api, {"PROCESS_JOBS_IN_CHUNKS": True, "JOB_CHUNK_SIZE": 5}):
+        process_incomplete_job(str(job.id))
+
+    rows = [row for call_ in mock_save_sms_chunk.call_args_list for row in signing.decode(call_[0][0][1])]
+    assert mock_save_sms_chunk.call_count == 2
+    assert [row["row_number"] for row in rows] == list(range(2, 10))
+    assert Job.query.get(job.id).job_status == JOB_STATUS_FINISHED
+
+
 def test_process_incomplete_job_with_notifications_all_sent(mocker, sample_template):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mock_save_sms = mocker.patch("app.celery.tasks.save_sms.apply_async")
 
@@ -1486,8 +1702,8 @@ def test_process_incomplete_job_with_notifications_all_sent(mocker, sample_templ
 
 def test_process_incomplete_jobs_sms(mocker, sample_template):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mock_save_sms = mocker.patch("app.celery.tasks.save_sms.apply_async")
 
@@ -1537,8 +1753,8 @@ def test_process_incomplete_jobs_sms(mocker, sample_template):
 
 def test_process_incomplete_jobs_no_notifications_added(mocker, sample_template):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mock_save_sms = mocker.patch("app.celery.tasks.save_sms.apply_async")
 
@@ -1564,8 +1780,8 @@ def test_process_incomplete_jobs_no_notifications_added(mocker, sample_template)
 
 def test_process_incomplete_jobs(mocker):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mock_save_sms = mocker.patch("app.celery.tasks.save_sms.apply_async")
 
@@ -1577,8 +1793,8 @@ def test_process_incomplete_jobs(mocker):
 
 def test_process_incomplete_job_no_job_in_database(mocker, fake_uuid):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_sms"), {"sender_id": None}),
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("multiple_sms"), {"sender_id": None}),
     )
     mock_save_sms = mocker.patch("app.celery.tasks.save_sms.apply_async")
 
@@ -1590,8 +1806,8 @@ def test_process_incomplete_job_no_job_in_database(mocker, fake_uuid):
 
 def test_process_incomplete_job_email(mocker, sample_email_template):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_email"), {"sender_id": None}),
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("multiple_email"), {"sender_id": None}),
     )
     mock_email_saver = mocker.patch("app.celery.tasks.save_email.apply_async")
 
@@ -1620,8 +1836,8 @@ def test_process_incomplete_job_email(mocker, sample_email_template):
 
 def test_process_incomplete_job_letter(mocker, sample_letter_template):
     mocker.patch(
-        "app.celery.tasks.s3.get_job_and_metadata_from_s3",
-        return_value=(load_example_csv("multiple_letter"), {"sender_id": None}),
+        "app.celery.tasks.s3.stream_job_and_metadata_from_s3",
+        return_value=(_csv_lines("multiple_letter"), {"sender_id": None}),
     )
     mock_letter_saver = mocker.patch("app.celery.tasks.save_letter.apply_async")
 
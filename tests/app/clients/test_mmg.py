@@ -65,6 +65,7 @@ def test_try_send_sms_calls_mmg_correctly(notify_api, mocker):
     assert request_mock.call_count == 1
     assert request_mock.request_history[0].url == "https://example.com/mmg"
     assert request_mock.request_history[0].method == "POST"
+    assert request_mock.request_history[0].timeout == (5, 60)
 
     request_args = request_mock.request_history[0].json()
     assert request_args["reqType"] == "BULK"
@@ -1,6 +1,7 @@
 import pytest
 
 from app import statsd_client
+from app.clients import ClientException
 from app.clients.sms import SmsClient, SmsClientResponseException
 
 
@@ -41,3 +42,37 @@ def test_send_sms_error(fake_client, mocker):
             international=False,
             sender=None,
         )
+
+
+def test_send_sms_batch_refuses_if_client_does_not_support_batch_sending(fake_client):
+    with pytest.raises(ClientException):
+        fake_client.send_sms_batch(
+            recipients=["to", "to2"],
+            content="content",
+            reference="reference",
+            international=False,
+            sender=None,
+        )
+
+
+def test_sms_client_reuses_one_session_with_a_connection_pool(fake_client, notify_api):
+    adapter = fake_client.session.get_adapter("https://example.com")
+
+    assert adapter._pool_maxsize == notify_api.config["SMS_PROVIDER_CONNECTION_POOL_SIZE"]
+    assert adapter.max_retries.connect == notify_api.config["SMS_PROVIDER_CONNECT_RETRIES"]
+    assert adapter.max_retries.read == 0
+    assert fake_client.timeout == (
+        notify_api.config["SMS_PROVIDER_CONNECT_TIMEOUT_SECONDS"],
+        notify_api.config["SMS_PROVIDER_READ_TIMEOUT_SECONDS"],
+    )
+
+
+def test_sms_client_counts_new_connections_for_provider(fake_client, mocker):
+    mock_connections_opened = mocker.patch("app.clients.sms.SMS_PROVIDER_CONNECTIONS_OPENED")
+    pool = fake_client.session.get_adapter("https://example.com").get_connection("https://example.com")
+
+    # only creates the connection object, it doesn't connect until it's used
+    pool._new_conn()
+
+    mock_connections_opened.labels.assert_called_once_with("fake")
+    mock_connections_opened.labels.return_value.inc.assert_called_once_with()
@@ -7,11 +7,13 @@ from freezegun import freeze_time
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm.exc import NoResultFound
 
+from app import db
 from app.constants import (
     JOB_STATUS_IN_PROGRESS,
     KEY_TYPE_NORMAL,
     KEY_TYPE_TEAM,
     KEY_TYPE_TEST,
+    NOTIFICATION_CREATED,
     NOTIFICATION_DELIVERED,
     NOTIFICATION_PENDING,
     NOTIFICATION_SENDING,
@@ -21,9 +23,12 @@ from app.constants import (
     NOTIFICATION_TEMPORARY_FAILURE,
     SMS_TYPE,
 )
+from app.dao import notifications_dao
 from app.dao.notifications_dao import (
     dao_create_notification,
+    dao_create_notifications,
     dao_delete_notifications_by_id,
+    dao_delete_notifications_by_ids,
     dao_get_last_notification_added_for_job_id,
     dao_get_letters_and_sheets_volume_by_postage,
     dao_get_letters_to_be_printed,
@@ -34,10 +39,13 @@ from app.dao.notifications_dao import (
     dao_timeout_notifications,
     dao_update_notification,
     dao_update_notifications_by_reference,
+    dao_update_sms_notification_statuses,
+    dao_update_sms_notifications_to_sending,
     get_notification_by_id,
     get_notification_with_personalisation,
     get_notifications_for_job,
     get_notifications_for_service,
+    get_page_of_notifications_for_service,
     get_service_ids_with_notifications_on_date,
     is_delivery_slow_for_providers,
     notifications_not_yet_sent,
@@ -52,6 +60,7 @@ from tests.app.db import (
     create_service,
     create_template,
 )
+from tests.conftest import set_config_values
 
 
 def test_should_by_able_to_update_status_by_id(sample_template, sample_job, mmg_provider):
@@ -157,6 +166,139 @@ def test_should_not_update_status_by_id_if_sent_to_country_with_delivery_receipt
     assert notification.status == NOTIFICATION_DELIVERED
 
 
+def test_dao_update_sms_notification_statuses_updates_each_notification(sample_template):
+    sending = create_notification(sample_template, status=NOTIFICATION_SENDING, sent_by=None)
+    pending = create_notification(sample_template, status=NOTIFICATION_PENDING, sent_by="mmg")
+
+    updated = dao_update_sms_notification_statuses(
+        [
+            (str(sending.id), NOTIFICATION_DELIVERED, "firetext", None),
+            (str(pending.id), NOTIFICATION_TEMPORARY_FAILURE, "mmg", "27"),
+        ]
+    )
+
+    assert updated == {str(sending.id): NOTIFICATION_DELIVERED, str(pending.id): NOTIFICATION_TEMPORARY_FAILURE}
+    db.session.expire_all()
+    assert sending.status == NOTIFICATION_DELIVERED
+    assert sending.sent_by == "firetext"
+    assert pending.status == NOTIFICATION_TEMPORARY_FAILURE
+    assert pending.sent_by == "mmg"
+
+
+@pytest.mark.parametrize(
+    "status, detailed_status_code, expected_status",
+    [
+        (NOTIFICATION_SENDING, "101", "permanent-failure"),
+        (NOTIFICATION_SENDING, "102", "temporary-failure"),
+        (NOTIFICATION_SENDING, None, "permanent-failure"),
+        (NOTIFICATION_PENDING, None, "temporary-failure"),
+        (NOTIFICATION_PENDING, "101", "permanent-failure"),
+    ],
+)
+def test_dao_update_sms_notification_statuses_decides_firetext_failure_type(
+    sample_template, status, detailed_status_code, expected_status
+):
+    notification = create_notification(sample_template, status=status, sent_by="firetext")
+
+    updated = dao_update_sms_notification_statuses(
+        [(notification.id, "permanent-failure", "firetext", detailed_status_code)]
+    )
+
+    assert updated == {str(notification.id): expected_status}
+
+
+def test_dao_update_sms_notification_statuses_leaves_notifications_it_should_not_update(sample_template):
+    delivered = create_notification(sample_template, status=NOTIFICATION_DELIVERED)
+    no_delivery_receipts = create_notification(
+        sample_template, status=NOTIFICATION_SENT, international=True, phone_prefix="249"
+    )
+    with_delivery_receipts = create_notification(
+        sample_template, status=NOTIFICATION_SENT, international=True, phone_prefix="7"
+    )
+
+    updated = dao_update_sms_notification_statuses(
+        [
+            (notification.id, NOTIFICATION_TEMPORARY_FAILURE, "mmg", None)
+            for notification in [delivered, no_delivery_receipts, with_delivery_receipts]
+        ]
+        + [(uuid.uuid4(), NOTIFICATION_DELIVERED, "mmg", None)]
+    )
+
+    assert updated == {str(with_delivery_receipts.id): NOTIFICATION_TEMPORARY_FAILURE}
+    db.session.expire_all()
+    assert delivered.status == NOTIFICATION_DELIVERED
+    assert no_delivery_receipts.status == NOTIFICATION_SENT
+
+
+def test_dao_update_sms_notification_statuses_with_no_receipts(notify_db_session):
+    assert dao_update_sms_notification_statuses([]) == {}
+
+
+@pytest.fixture
+def mock_count_status_changes(notify_api, mocker):
+    with set_config_values(notify_api, {"REDIS_ENABLED": True, "NOTIFICATION_STATUS_COUNTS_IN_REDIS": True}):
+        yield mocker.patch("app.dao.notifications_dao.count_status_changes")
+
+
+def _counted_status_changes(mock_count_status_changes):
+    return {
+        (notification.id, old_status, new_status)
+        for notification, old_status, new_status in mock_count_status_changes.call_args[0][0]
+    }
+
+
+def test_dao_update_sms_notification_statuses_counts_status_changes(sample_template, mock_count_status_changes):
+    sending = create_notification(sample_template, status=NOTIFICATION_SENDING)
+    pending = create_notification(sample_template, status=NOTIFICATION_PENDING)
+    delivered = create_notification(sample_template, status=NOTIFICATION_DELIVERED)
+
+    dao_update_sms_notification_statuses(
+        [
+            (str(sending.id).upper(), NOTIFICATION_DELIVERED, "mmg", None),
+            (pending.id, NOTIFICATION_TEMPORARY_FAILURE, "mmg", None),
+            (delivered.id, NOTIFICATION_TEMPORARY_FAILURE, "mmg", None),
+        ]
+    )
+
+    assert _counted_status_changes(mock_count_status_changes) == {
+        (sending.id, NOTIFICATION_SENDING, NOTIFICATION_DELIVERED),
+        (pending.id, NOTIFICATION_PENDING, NOTIFICATION_TEMPORARY_FAILURE),
+    }
+
+
+def test_dao_update_sms_notifications_to_sending_counts_status_changes(sample_template, mock_count_status_changes):
+    created = create_notification(sample_template, status=NOTIFICATION_CREATED)
+    delivered = create_notification(sample_template, status=NOTIFICATION_DELIVERED)
+
+    dao_update_sms_notifications_to_sending(
+        [created.id, delivered.id], status=NOTIFICATION_SENDING, sent_by="spryng", reference="ref", billable_units=1
+    )
+
+    assert _counted_status_changes(mock_count_status_changes) == {
+        (created.id, NOTIFICATION_CREATED, NOTIFICATION_SENDING)
+    }
+
+
+def test_dao_update_notifications_by_reference_counts_status_changes(sample_template, mock_count_status_changes):
+    notification = create_notification(sample_template, status=NOTIFICATION_SENDING, reference="ref1")
+
+    dao_update_notifications_by_reference(references=["ref1"], update_dict={"status": NOTIFICATION_DELIVERED})
+
+    assert _counted_status_changes(mock_count_status_changes) == {
+        (notification.id, NOTIFICATION_SENDING, NOTIFICATION_DELIVERED)
+    }
+
+
+def test_dao_update_notifications_by_reference_does_not_count_if_status_does_not_change(
+    sample_template, mock_count_status_changes
+):
+    create_notification(sample_template, reference="ref1")
+
+    dao_update_notifications_by_reference(references=["ref1"], update_dict={"billable_units": 2})
+
+    mock_count_status_changes.assert_called_once_with([])
+
+
 def test_should_by_able_to_update_status_by_id_from_pending_to_delivered(sample_template, sample_job):
     notification = create_notification(template=sample_template, job=sample_job, status="sending")
 
@@ -232,6 +374,50 @@ def test_save_notification_creates_sms(sample_template, sample_job):
     assert notification_from_db.status == "created"
 
 
+def test_dao_create_notifications_inserts_all_notifications(sample_template, sample_job):
+    notifications = [
+        Notification(**_notification_json(sample_template, job_id=sample_job.id), job_row_number=i) for i in range(3)
+    ]
+
+    dao_create_notifications(notifications)
+
+    notifications_from_db = Notification.query.order_by(Notification.job_row_number).all()
+    assert [n.id for n in notifications_from_db] == [n.id for n in notifications]
+    assert [n.job_row_number for n in notifications_from_db] == [0, 1, 2]
+    assert {n.status for n in notifications_from_db} == {"created"}
+    assert {n.international for n in notifications_from_db} == {False}
+
+
+def test_dao_create_notifications_skips_rows_of_a_chunk_replayed_on_a_later_day(sample_template, sample_job, mocker):
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    first_time = [
+        Notification(**_notification_json(sample_template, job_id=sample_job.id), job_row_number=i) for i in range(2)
+    ]
+    for notification in first_time:
+        notification.created_at = yesterday
+    dao_create_notifications(first_time)
+
+    # once notifications is partitioned, the replay goes to today's partition, where ON CONFLICT can't see yesterday's
+    # rows - so they have to be left out of the INSERT altogether
+    replayed_id = Notification(
+        **_notification_json(sample_template, job_id=sample_job.id, id=first_time[0].id), job_row_number=0
+    )
+    replayed_job_row = Notification(**_notification_json(sample_template, job_id=sample_job.id), job_row_number=1)
+    new = Notification(**_notification_json(sample_template, job_id=sample_job.id), job_row_number=2)
+    mock_insert_values = mocker.spy(notifications_dao, "_get_notification_insert_values")
+
+    assert dao_create_notifications([replayed_id, replayed_job_row, new], ignore_duplicates=True) == [new.id]
+
+    mock_insert_values.assert_called_once_with(new)
+    assert Notification.query.count() == 3
+
+
+def test_dao_create_notifications_does_nothing_for_empty_list(notify_db_session):
+    dao_create_notifications([])
+
+    assert Notification.query.count() == 0
+
+
 def test_save_notification_and_create_email(sample_email_template, sample_job):
     assert Notification.query.count() == 0
 
@@ -518,6 +704,16 @@ def test_should_delete_only_notification_with_id(sample_template):
     assert Notification.query.first().id == notification_2.id
 
 
+def test_dao_delete_notifications_by_ids(sample_template):
+    notification_1 = create_notification(template=sample_template)
+    notification_2 = create_notification(template=sample_template)
+    notification_3 = create_notification(template=sample_template)
+
+    dao_delete_notifications_by_ids([notification_1.id, notification_3.id])
+
+    assert Notification.query.one().id == notification_2.id
+
+
 def test_should_delete_no_notifications_if_no_matching_ids(sample_template):
     create_notification(template=sample_template)
     assert Notification.query.count() == 1
@@ -629,6 +825,64 @@ def test_should_not_count_pages_when_given_a_flag(sample_user, sample_template):
     assert pagination.items[0].id == notification.id
 
 
+def test_get_page_of_notifications_for_service_pages_by_cursor(sample_template):
+    same_time = datetime(2024, 1, 1, 12)
+    notifications = sorted(
+        [create_notification(sample_template, created_at=same_time) for _ in range(3)],
+        key=lambda notification: notification.id,
+        reverse=True,
+    )
+    newest = create_notification(sample_template, created_at=same_time + timedelta(seconds=1))
+    oldest = create_notification(sample_template, created_at=same_time - timedelta(seconds=1))
+
+    first_page, next_page_exists = get_page_of_notifications_for_service(sample_template.service_id, page_size=2)
+    assert first_page == [newest, notifications[0]]
+    assert next_page_exists
+
+    second_page, next_page_exists = get_page_of_notifications_for_service(
+        sample_template.service_id, page_size=2, cursor=(first_page[-1].created_at, first_page[-1].id)
+    )
+    assert second_page == notifications[1:]
+    assert next_page_exists
+
+    last_page, next_page_exists = get_page_of_notifications_for_service(
+        sample_template.service_id, page_size=2, cursor=(second_page[-1].created_at, second_page[-1].id)
+    )
+    assert last_page == [oldest]
+    assert not next_page_exists
+
+
+@pytest.mark.parametrize(
+    "page, expected_count, expected_next_page_exists", [(1, 2, True), (2, 1, False), (3, 0, False)]
+)
+def test_get_page_of_notifications_for_service_pages_by_number(
+    sample_template, page, expected_count, expected_next_page_exists
+):
+    for _ in range(3):
+        create_notification(sample_template)
+
+    notifications, next_page_exists = get_page_of_notifications_for_service(
+        sample_template.service_id, page=page, page_size=2
+    )
+
+    assert len(notifications) == expected_count
+    assert next_page_exists == expected_next_page_exists
+
+
+def test_get_notifications_for_service_older_than_includes_notifications_created_at_the_same_time(sample_template):
+    same_time = datetime(2024, 1, 1, 12)
+    notifications = sorted(
+        [create_notification(sample_template, created_at=same_time) for _ in range(3)],
+        key=lambda notification: notification.id,
+        reverse=True,
+    )
+
+    assert (
+        get_notifications_for_service(sample_template.service_id, older_than=notifications[0].id).items
+        == notifications[1:]
+    )
+
+
 def test_get_notifications_created_by_api_or_csv_are_returned_correctly_excluding_test_key_notifications(
     notify_db_session, sample_service, sample_job, sample_api_key, sample_team_api_key, sample_test_api_key
 ):
@@ -953,6 +1207,30 @@ def test_dao_get_notifications_by_recipient_matches_partial_emails(sample_email_
     assert notification_2.id not in notification_ids
 
 
+@pytest.mark.parametrize(
+    "notification_type, search_term, recipients",
+    [
+        ("email", "Jo@Example.com", ["jo@example.com", "bojo@example.com"]),
+        ("sms", "07700 900100", ["447700900100", "9447700900100"]),
+    ],
+)
+def test_dao_get_notifications_by_recipient_only_matches_whole_phone_numbers_and_emails_exactly(
+    sample_service, notification_type, search_term, recipients
+):
+    template = create_template(service=sample_service, template_type=notification_type)
+    notification = create_notification(template=template, to_field=recipients[0], normalised_to=recipients[0])
+    create_notification(template=template, to_field=recipients[1], normalised_to=recipients[1])
+    by_reference = create_notification(
+        template=template, to_field="someone-else", normalised_to="someone-else", client_reference=search_term
+    )
+
+    results = dao_get_notifications_by_recipient_or_reference(
+        sample_service.id, search_term, notification_type=notification_type
+    )
+
+    assert {result.id for result in results.items} == {notification.id, by_reference.id}
+
+
 @pytest.mark.parametrize(
     "search_term, expected_result_count",
     [
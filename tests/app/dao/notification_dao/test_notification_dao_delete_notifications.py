@@ -11,6 +11,7 @@ from app.constants import KEY_TYPE_NORMAL, KEY_TYPE_TEAM, KEY_TYPE_TEST
 from app.dao.notifications_dao import (
     FIELDS_TO_TRANSFER_TO_NOTIFICATION_HISTORY,
     insert_notification_history_delete_notifications,
+    insert_notification_history_delete_notifications_past_retention,
     move_notifications_to_notification_history,
 )
 from app.models import Notification, NotificationHistory
@@ -18,6 +19,7 @@ from tests.app.db import (
     create_notification,
     create_notification_history,
     create_service,
+    create_service_data_retention,
     create_template,
 )
 
@@ -95,7 +97,7 @@ def test_move_notifications_does_nothing_if_notification_history_row_already_exi
 def test_move_notifications_deletes_letters_not_sent_and_in_final_state_from_table_but_not_s3(
     sample_service, mocker, notification_status
 ):
-    mock_s3_object = mocker.patch("app.dao.notifications_dao.find_letter_pdf_in_s3").return_value
+    mock_delete_pdfs = mocker.patch("app.dao.notifications_dao.delete_letter_pdfs_from_s3", return_value=0)
     letter_template = create_template(service=sample_service, template_type="letter")
     create_notification(
         template=letter_template,
@@ -110,7 +112,7 @@ def test_move_notifications_deletes_letters_not_sent_and_in_final_state_from_tab
 
     assert Notification.query.count() == 0
     assert NotificationHistory.query.count() == 1
-    mock_s3_object.assert_not_called()
+    mock_delete_pdfs.assert_called_once_with([])
 
 
 @mock_s3
@@ -151,7 +153,7 @@ def test_move_notifications_deletes_letters_sent_and_in_final_state_from_table_a
 
 @pytest.mark.parametrize("notification_status", ["pending-virus-check", "created", "sending"])
 def test_move_notifications_does_not_delete_letters_not_yet_in_final_state(sample_service, mocker, notification_status):
-    mock_s3_object = mocker.patch("app.dao.notifications_dao.find_letter_pdf_in_s3").return_value
+    mock_delete_pdfs = mocker.patch("app.dao.notifications_dao.delete_letter_pdfs_from_s3", return_value=0)
     letter_template = create_template(service=sample_service, template_type="letter")
     create_notification(
         template=letter_template,
@@ -166,7 +168,7 @@ def test_move_notifications_does_not_delete_letters_not_yet_in_final_state(sampl
 
     assert Notification.query.count() == 1
     assert NotificationHistory.query.count() == 0
-    mock_s3_object.assert_not_called()
+    mock_delete_pdfs.assert_called_once_with([])
 
 
 def test_move_notifications_only_moves_notifications_older_than_provided_timestamp(sample_template):
@@ -438,3 +440,60 @@ def test_insert_notification_history_delete_notifications_can_handle_different_c
 
         # Restore the view and undo column changes.
         notify_db_session.rollback()
+
+
+@freeze_time("2020-03-20 14:00")
+def test_insert_notification_history_delete_notifications_past_retention_for_all_services(notify_db_session):
+    default_retention_template = create_template(create_service(service_name="default"))
+    short_retention_template = create_template(create_service(service_name="short"))
+    long_retention_template = create_template(create_service(service_name="long"))
+    create_service_data_retention(short_retention_template.service, days_of_retention=3)
+    create_service_data_retention(long_retention_template.service, days_of_retention=10)
+
+    expired_default = create_notification(default_retention_template, created_at=datetime(2020, 3, 12, 23, 59))
+    expired_test_key = create_notification(
+        default_retention_template, created_at=datetime(2020, 3, 10), key_type=KEY_TYPE_TEST
+    )
+    kept_default = create_notification(default_retention_template, created_at=datetime(2020, 3, 13))
+    expired_short = create_notification(short_retention_template, created_at=datetime(2020, 3, 16, 12))
+    kept_long = create_notification(long_retention_template, created_at=datetime(2020, 3, 9, 12))
+
+    deleted, last = insert_notification_history_delete_notifications_past_retention(
+        "sms", "2020-03-20", datetime(2020, 3, 17)
+    )
+
+    assert deleted == 3
+    assert last == (expired_short.created_at, expired_short.id)
+    assert {n.id for n in Notification.query.all()} == {kept_default.id, kept_long.id}
+    assert {n.id for n in NotificationHistory.query.all()} == {expired_default.id, expired_short.id}
+    assert expired_test_key.id not in {n.id for n in NotificationHistory.query.all()}
+
+
+@freeze_time("2020-03-20 14:00")
+def test_insert_notification_history_delete_notifications_past_retention_carries_on_after_last_batch(
+    sample_template,
+):
+    create_service_data_retention(sample_template.service, days_of_retention=30)
+    notifications = [
+        create_notification(sample_template, created_at=datetime(2020, 3, 1, hour)) for hour in range(3)
+    ] + [create_notification(sample_template, created_at=datetime(2020, 2, 1))]
+
+    assert insert_notification_history_delete_notifications_past_retention(
+        "sms", "2020-03-20", datetime(2020, 3, 13), qry_limit=2
+    ) == (1, (notifications[0].created_at, notifications[0].id))
+    assert insert_notification_history_delete_notifications_past_retention(
+        "sms",
+        "2020-03-20",
+        datetime(2020, 3, 13),
+        after=(notifications[0].created_at, notifications[0].id),
+        qry_limit=2,
+    ) == (0, (notifications[2].created_at, notifications[2].id))
+    assert insert_notification_history_delete_notifications_past_retention(
+        "sms",
+        "2020-03-20",
+        datetime(2020, 3, 13),
+        after=(notifications[2].created_at, notifications[2].id),
+        qry_limit=2,
+    ) == (0, None)
+
+    assert Notification.query.count() == 3
@@ -1,17 +1,20 @@
 from datetime import date, datetime, timedelta
 from decimal import Decimal
+from unittest.mock import Mock
 
 import pytest
 from freezegun import freeze_time
 from notifications_utils.timezones import convert_utc_to_bst
 
 from app import db
-from app.constants import NOTIFICATION_STATUS_TYPES
+from app.constants import KEY_TYPE_TEST, NOTIFICATION_STATUS_TYPES
+from app.dao import fact_billing_dao
 from app.dao.fact_billing_dao import (
     delete_billing_data_for_day,
     fetch_billing_data_for_day,
     fetch_daily_sms_provider_volumes_for_platform,
     fetch_daily_volumes_for_platform,
+    fetch_service_ids_with_billing_changes_by_day,
     fetch_usage_for_all_services_letter,
     fetch_usage_for_all_services_letter_breakdown,
     fetch_usage_for_all_services_sms,
@@ -21,6 +24,7 @@ from app.dao.fact_billing_dao import (
     fetch_volumes_by_service,
     get_rate,
     get_rates_for_billing,
+    update_ft_billing,
     update_ft_billing_letter_despatch,
 )
 from app.dao.notifications_dao import dao_record_letter_despatched_on
@@ -152,6 +156,39 @@ def test_fetch_billing_data_for_today_includes_data_with_the_right_date(notify_d
     assert results[0].notifications_sent == 2
 
 
+def test_fetch_service_ids_with_billing_changes_by_day(notify_db_session):
+    changed_service = create_service(service_name="changed")
+    other_changed_service = create_service(service_name="other changed")
+    unchanged_service = create_service(service_name="unchanged")
+    since = datetime(2018, 7, 5, 12)
+
+    # created on 4th July in UK time, status changed since
+    create_notification(
+        create_template(changed_service), created_at=datetime(2018, 7, 3, 23, 30), updated_at=datetime(2018, 7, 5, 13)
+    )
+    # created since, but not yet sent
+    create_notification(
+        create_template(other_changed_service), status="created", created_at=datetime(2018, 7, 5, 12, 30)
+    )
+    # moved to history after its status changed
+    create_notification_history(
+        create_template(other_changed_service, template_type="email"),
+        created_at=datetime(2018, 7, 1, 12),
+        updated_at=datetime(2018, 7, 5, 12),
+    )
+    unchanged_template = create_template(unchanged_service)
+    create_notification(unchanged_template, created_at=datetime(2018, 7, 4), updated_at=datetime(2018, 7, 5, 11, 59))
+    create_notification(unchanged_template, created_at=datetime(2018, 7, 5, 13), key_type=KEY_TYPE_TEST)
+    # changed, but too long ago to be looked at
+    create_notification(unchanged_template, created_at=datetime(2018, 6, 30, 22), updated_at=datetime(2018, 7, 5, 13))
+
+    assert fetch_service_ids_with_billing_changes_by_day(since, date(2018, 7, 1), date(2018, 7, 5)) == {
+        date(2018, 7, 1): {other_changed_service.id},
+        date(2018, 7, 4): {changed_service.id},
+        date(2018, 7, 5): {other_changed_service.id},
+    }
+
+
 def test_fetch_billing_data_for_day_is_grouped_by_template_and_notification_type(notify_db_session):
     service = create_service()
     email_template = create_template(service=service, template_type="email")
@@ -440,6 +477,53 @@ def test_get_rate_for_letters_when_page_count_is_zero(notify_db_session):
     assert letter_rate == 0
 
 
+def test_get_rates_for_billing_keeps_rates_until_they_change(notify_db_session):
+    create_rate(start_date=datetime(2017, 5, 30, 23, 0), value=2.2, notification_type="sms")
+    create_letter_rate(start_date=datetime(2017, 5, 30, 23, 0), rate=0.3, post_class="second")
+
+    first_rates = get_rates_for_billing()
+    assert get_rates_for_billing()[0] is first_rates[0]
+    assert get_rates_for_billing()[1] is first_rates[1]
+
+    create_letter_rate(start_date=datetime(2018, 5, 30, 23, 0), rate=0.35, post_class="second")
+    non_letter_rates, letter_rates = get_rates_for_billing()
+
+    assert non_letter_rates == first_rates[0]
+    assert [rate.rate for rate in letter_rates] == [Decimal("0.35"), Decimal("0.3")]
+
+
+def test_get_rate_only_indexes_the_same_rates_once(notify_db_session, mocker):
+    create_rate(start_date=datetime(2017, 5, 30, 23, 0), value=2.2, notification_type="sms")
+    create_letter_rate(start_date=datetime(2017, 5, 30, 23, 0), rate=0.3, post_class="second")
+    rate_index = mocker.patch.object(fact_billing_dao, "RateIndex", wraps=fact_billing_dao.RateIndex)
+
+    non_letter_rates, letter_rates = get_rates_for_billing()
+    for _ in range(3):
+        assert get_rate(non_letter_rates, letter_rates, "sms", date(2017, 6, 1)) == 2.2
+        assert get_rate(non_letter_rates, letter_rates, "letter", date(2017, 6, 1), True, 1) == Decimal("0.3")
+
+    assert rate_index.call_count == 1
+
+
+def test_get_rate_raises_lookup_error_if_there_is_no_rate_for_the_day(notify_db_session):
+    create_letter_rate(start_date=datetime(2017, 5, 30, 23, 0), rate=0.3, post_class="second")
+
+    non_letter_rates, letter_rates = get_rates_for_billing()
+
+    with pytest.raises(LookupError, match=r"No rate for \(True, 1, 'second'\) on 2017-04-30 23:00:00"):
+        get_rate(non_letter_rates, letter_rates, "letter", date(2017, 5, 1), True, 1)
+    with pytest.raises(LookupError, match=r"No rate for \(True, 2, 'second'\) on 2017-05-31 23:00:00"):
+        get_rate(non_letter_rates, letter_rates, "letter", date(2017, 6, 1), True, 2)
+
+
+def test_update_ft_billing_raises_lookup_error_if_there_is_no_rate_for_the_day(notify_db_session):
+    create_letter_rate(start_date=datetime(2017, 5, 30, 23, 0), rate=0.3, post_class="second")
+    billing_datum = Mock(notification_type="letter", crown=True, letter_page_count=1, postage="second")
+
+    with pytest.raises(LookupError):
+        update_ft_billing([billing_datum], date(2017, 5, 1))
+
+
 def test_fetch_usage_for_service_by_month(
     sample_service,
     sample_service_billing_fy_2016,
@@ -7,6 +7,7 @@ from freezegun import freeze_time
 
 from app.constants import (
     EMAIL_TYPE,
+    KEY_TYPE_NORMAL,
     KEY_TYPE_TEAM,
     KEY_TYPE_TEST,
     LETTER_TYPE,
@@ -24,6 +25,7 @@ from app.constants import (
 from app.dao.fact_notification_status_dao import (
     fetch_monthly_notification_statuses_per_service,
     fetch_monthly_template_usage_for_service,
+    fetch_notification_status_counts_for_day,
     fetch_notification_status_for_service_by_month,
     fetch_notification_status_for_service_for_day,
     fetch_notification_status_for_service_for_today_and_7_previous_days,
@@ -34,6 +36,7 @@ from app.dao.fact_notification_status_dao import (
     update_fact_notification_status,
 )
 from app.models import FactNotificationStatus
+from app.notifications.status_counts import StatusCount
 from tests.app.db import (
     create_ft_notification_status,
     create_job,
@@ -219,6 +222,75 @@ def test_fetch_notification_status_by_template_for_service_for_today_and_7_previ
     ] == sorted(results, key=lambda x: (x.notification_type, x.status, x.template_name, x.count))
 
 
+@freeze_time("2018-10-31T18:00:00")
+@pytest.mark.parametrize("by_template", [True, False])
+def test_fetch_notification_status_for_service_for_today_and_7_previous_days_uses_counts_from_redis(
+    notify_db_session, mocker, by_template
+):
+    service = create_service()
+    sms_template = create_template(template_name="sms Template 1", service=service, template_type=SMS_TYPE)
+    create_ft_notification_status(date(2018, 10, 29), "sms", service, template=sms_template, count=10)
+    # counts from redis are used instead, so this isn't counted
+    create_notification(sms_template, created_at=datetime(2018, 10, 31, 11, 0, 0), status="delivered")
+    mocker.patch(
+        "app.dao.fact_notification_status_dao.get_todays_notification_status_counts",
+        return_value=[
+            StatusCount(str(service.id), "sms", str(sms_template.id), KEY_TYPE_NORMAL, "delivered", 3),
+            StatusCount(str(service.id), "sms", str(sms_template.id), KEY_TYPE_TEST, "delivered", 5),
+            StatusCount(str(service.id), "sms", str(sms_template.id), KEY_TYPE_NORMAL, "sending", 2),
+        ],
+    )
+
+    results = fetch_notification_status_for_service_for_today_and_7_previous_days(service.id, by_template=by_template)
+
+    assert sorted((row.notification_type, row.status, row.count) for row in results) == [
+        ("sms", "delivered", 13),
+        ("sms", "sending", 2),
+    ]
+    if by_template:
+        assert {row.template_name for row in results} == {"sms Template 1"}
+
+
+@freeze_time("2018-10-31T18:00:00")
+def test_fetch_notification_status_for_service_for_today_and_7_previous_days_with_no_counts_today(
+    notify_db_session, mocker
+):
+    service = create_service()
+    create_ft_notification_status(date(2018, 10, 29), "sms", service, count=10)
+    mocker.patch(
+        "app.dao.fact_notification_status_dao.get_todays_notification_status_counts",
+        return_value=[],
+    )
+
+    results = fetch_notification_status_for_service_for_today_and_7_previous_days(service.id)
+
+    assert [(row.notification_type, row.status, row.count) for row in results] == [("sms", "delivered", 10)]
+
+
+@freeze_time("2018-10-31T18:00:00")
+def test_fetch_notification_status_counts_for_day(notify_db_session):
+    service = create_service()
+    sms_template = create_template(service=service, template_type=SMS_TYPE)
+    email_template = create_template(service=service, template_type=EMAIL_TYPE)
+    create_notification(sms_template, created_at=datetime(2018, 10, 31, 11, 0, 0), status="delivered")
+    create_notification(sms_template, created_at=datetime(2018, 10, 31, 12, 0, 0), status="delivered")
+    create_notification(sms_template, created_at=datetime(2018, 10, 31, 12, 0, 0), key_type=KEY_TYPE_TEST)
+    create_notification(email_template, created_at=datetime(2018, 10, 31, 13, 0, 0), status="sending")
+    # the day before, and the day after, in UK time
+    create_notification(sms_template, created_at=datetime(2018, 10, 30, 23, 59, 0))
+    create_notification(sms_template, created_at=datetime(2018, 11, 1, 0, 0, 0))
+
+    results = fetch_notification_status_counts_for_day(date(2018, 10, 31))
+
+    assert sorted(tuple(row) for row in results) == sorted(
+        [
+            (service.id, "email", email_template.id, "normal", "sending", 1),
+            (service.id, "sms", sms_template.id, "normal", "delivered", 2),
+            (service.id, "sms", sms_template.id, "test", "created", 1),
+        ]
+    )
+
+
 @pytest.mark.parametrize(
     "start_date, end_date, expected_email, expected_letters, expected_sms, expected_created_sms",
     [
@@ -0,0 +1,88 @@
+from datetime import date
+from decimal import Decimal
+
+from app.dao.fact_platform_stats_dao import update_fact_platform_stats_for_day
+from app.models import FactPlatformBilling, FactPlatformNotificationStatus
+from tests.app.db import (
+    create_ft_billing,
+    create_ft_notification_status,
+    create_service,
+    create_template,
+)
+
+
+def test_update_fact_platform_stats_for_day_adds_up_notification_statuses_for_all_services(notify_db_session):
+    service_1 = create_service(service_name="service 1")
+    service_2 = create_service(service_name="service 2")
+    create_ft_notification_status(date(2022, 3, 1), "sms", service_1, count=3)
+    create_ft_notification_status(date(2022, 3, 1), "sms", service_2, count=4)
+    create_ft_notification_status(date(2022, 3, 1), "sms", service_2, key_type="test", count=1)
+    create_ft_notification_status(date(2022, 3, 1), "email", service_1, notification_status="sending", count=2)
+    # another day
+    create_ft_notification_status(date(2022, 3, 2), "sms", service_1, count=5)
+
+    update_fact_platform_stats_for_day(date(2022, 3, 1))
+
+    rows = FactPlatformNotificationStatus.query.order_by(
+        FactPlatformNotificationStatus.notification_type, FactPlatformNotificationStatus.key_type
+    ).all()
+    assert [
+        (row.bst_date, row.notification_type, row.key_type, row.notification_status, row.notification_count)
+        for row in rows
+    ] == [
+        (date(2022, 3, 1), "email", "normal", "sending", 2),
+        (date(2022, 3, 1), "sms", "normal", "delivered", 7),
+        (date(2022, 3, 1), "sms", "test", "delivered", 1),
+    ]
+
+
+def test_update_fact_platform_stats_for_day_adds_up_billing_for_all_services(notify_db_session):
+    sms_template_1 = create_template(service=create_service(service_name="service 1"))
+    sms_template_2 = create_template(service=create_service(service_name="service 2"))
+    letter_template = create_template(service=sms_template_1.service, template_type="letter")
+    create_ft_billing("2022-03-01", sms_template_1, provider="mmg", rate=0.0158, billable_unit=2, rate_multiplier=1)
+    create_ft_billing("2022-03-01", sms_template_2, provider="mmg", rate=0.0158, billable_unit=3, rate_multiplier=2)
+    create_ft_billing("2022-03-01", sms_template_2, provider="firetext", rate=0.0158, billable_unit=1)
+    create_ft_billing(
+        "2022-03-01",
+        letter_template,
+        provider="dvla",
+        rate=0.5,
+        billable_unit=4,
+        notifications_sent=2,
+        postage="second",
+    )
+
+    update_fact_platform_stats_for_day(date(2022, 3, 1))
+
+    rows = FactPlatformBilling.query.order_by(FactPlatformBilling.notification_type, FactPlatformBilling.provider).all()
+    assert [
+        (
+            row.notification_type,
+            row.provider,
+            row.notifications_sent,
+            row.billable_units,
+            row.chargeable_units,
+            row.cost,
+        )
+        for row in rows
+    ] == [
+        ("letter", "dvla", 2, 4, 4, Decimal("1.0")),
+        ("sms", "firetext", 1, 1, 1, Decimal("0.0158")),
+        ("sms", "mmg", 2, 5, 8, Decimal("0.1264")),
+    ]
+
+
+def test_update_fact_platform_stats_for_day_replaces_the_days_existing_totals(notify_db_session):
+    sms_template = create_template(service=create_service())
+    create_ft_notification_status(date(2022, 3, 1), "sms", sms_template.service, count=3)
+    create_ft_billing("2022-03-01", sms_template, provider="mmg", notifications_sent=3, billable_unit=3)
+    update_fact_platform_stats_for_day(date(2022, 3, 1))
+
+    create_ft_notification_status(date(2022, 3, 1), "sms", sms_template.service, notification_status="sending")
+    update_fact_platform_stats_for_day(date(2022, 3, 1))
+
+    assert {
+        (row.notification_status, row.notification_count) for row in FactPlatformNotificationStatus.query.all()
+    } == {("delivered", 3), ("sending", 1)}
+    assert [(row.provider, row.notifications_sent) for row in FactPlatformBilling.query.all()] == [("mmg", 3)]
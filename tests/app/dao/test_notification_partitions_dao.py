@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from freezegun import freeze_time
+from sqlalchemy import text
+
+from app import db
+from app.dao import DAOException, notification_partitions_dao
+from app.dao.notification_partitions_dao import (
+    Partition,
+    dao_create_daily_partitions,
+    dao_get_detached_partitions,
+    dao_get_expired_notifications_partitions,
+    dao_get_partitions,
+    dao_is_partitioned,
+    dao_partition_table_by_day,
+)
+
+
+def test_dao_is_partitioned_is_false_for_an_unpartitioned_table(notify_db_session):
+    assert dao_is_partitioned("notifications") is False
+
+
+def test_dao_get_partitions_of_an_unpartitioned_table_is_empty(notify_db_session):
+    assert dao_get_partitions("notifications") == []
+    assert dao_get_detached_partitions("notifications") == []
+
+
+def test_dao_get_expired_notifications_partitions(notify_db_session, mocker):
+    mocker.patch(
+        "app.dao.notification_partitions_dao.dao_get_partitions",
+        return_value=[
+            Partition("notifications_legacy", datetime(2022, 5, 31, 23)),
+            Partition("notifications_p20220601", datetime(2022, 6, 1, 23)),
+            Partition("notifications_p20220602", datetime(2022, 6, 2, 23)),
+        ],
+    )
+
+    assert dao_get_expired_notifications_partitions(datetime(2022, 6, 1, 23)) == [
+        Partition("notifications_legacy", datetime(2022, 5, 31, 23)),
+        Partition("notifications_p20220601", datetime(2022, 6, 1, 23)),
+    ]
+
+
+@freeze_time("2022-10-28 12:00")
+def test_dao_create_daily_partitions_creates_partitions_from_the_end_of_the_newest_partition(notify_api, mocker):
+    mocker.patch(
+        "app.dao.notification_partitions_dao.dao_get_partitions",
+        return_value=[Partition("notifications_p20221029", datetime(2022, 10, 29, 23))],
+    )
+    mock_create_partition = mocker.patch.object(notification_partitions_dao, "_create_partition")
+
+    # the clocks go back on the 30th, so that day is 25 hours long
+    assert dao_create_daily_partitions("notifications", 3) == ["notifications_p20221030", "notifications_p20221031"]
+    assert mock_create_partition.call_args_list == [
+        mocker.call("notifications", "notifications_p20221030", datetime(2022, 10, 29, 23), datetime(2022, 10, 31, 0)),
+        mocker.call("notifications", "notifications_p20221031", datetime(2022, 10, 31, 0), datetime(2022, 11, 1, 0)),
+    ]
+
+
+def test_dao_partition_table_by_day_keeps_views_of_the_table_up_to_date(notify_api, notify_db_session):
+    # a stand-in for notifications and notifications_all_time_view, so the real tables aren't changed for other tests
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("CREATE TABLE partition_test (id uuid PRIMARY KEY, created_at timestamp NOT NULL)"))
+        connection.execute(text("CREATE VIEW partition_test_view AS SELECT id, created_at FROM partition_test"))
+        connection.execute(text("INSERT INTO partition_test VALUES (:id, now() - interval '1 day')"), {"id": uuid4()})
+
+    try:
+        dao_partition_table_by_day("partition_test", 1)
+
+        new_id = uuid4()
+        # after the cutover, which is the start of the day after tomorrow
+        db.session.execute(text("INSERT INTO partition_test VALUES (:id, now() + interval '3 days')"), {"id": new_id})
+        assert db.session.execute(text("SELECT count(*) FROM partition_test_view")).scalar() == 2
+        assert db.session.execute(
+            text("SELECT EXISTS (SELECT 1 FROM partition_test_view WHERE id = :id)"), {"id": new_id}
+        ).scalar()
+
+        # the legacy partition can be dropped once it's detached, as nothing else depends on it
+        db.session.execute(text("ALTER TABLE partition_test DETACH PARTITION partition_test_legacy"))
+        db.session.execute(text("DROP TABLE partition_test_legacy"))
+        db.session.commit()
+    finally:
+        db.session.rollback()
+        db.session.execute(text("DROP VIEW IF EXISTS partition_test_view"))
+        db.session.execute(text("DROP TABLE IF EXISTS partition_test, partition_test_legacy CASCADE"))
+        db.session.commit()
+
+
+def test_dao_partition_table_by_day_leaves_the_table_alone_if_too_close_to_the_cutover(
+    notify_api, notify_db_session, mocker
+):
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("CREATE TABLE partition_test (id uuid PRIMARY KEY, created_at timestamp NOT NULL)"))
+    mocker.patch.object(notification_partitions_dao, "PARTITION_CUTOVER_MARGIN", timedelta(days=3))
+
+    try:
+        with pytest.raises(DAOException):
+            dao_partition_table_by_day("partition_test", 1)
+
+        assert not dao_is_partitioned("partition_test")
+        # nothing stops notifications being created after the cutover
+        db.session.execute(text("INSERT INTO partition_test VALUES (:id, now() + interval '3 days')"), {"id": uuid4()})
+        db.session.commit()
+    finally:
+        db.session.rollback()
+        db.session.execute(text("DROP TABLE IF EXISTS partition_test CASCADE"))
+        db.session.commit()
@@ -70,6 +70,7 @@ from app.models import (
     VerifyCode,
     user_folder_permissions,
 )
+from app.notifications.status_counts import StatusCount
 from tests.app.db import (
     create_annual_billing,
     create_api_key,
@@ -1097,6 +1098,55 @@ def test_dao_fetch_todays_stats_for_all_services_can_exclude_from_test_key(notif
     assert stats[0].count == 2
 
 
+def test_dao_fetch_todays_stats_for_service_uses_counts_from_redis(notify_db_session, mocker):
+    service = create_service()
+    template = create_template(service=service)
+    # counts from redis are used instead, so this isn't counted
+    create_notification(template=template)
+    mocker.patch(
+        "app.dao.services_dao.get_todays_notification_status_counts",
+        return_value=[
+            StatusCount(str(service.id), "sms", str(template.id), KEY_TYPE_NORMAL, "delivered", 3),
+            StatusCount(str(service.id), "sms", str(uuid.uuid4()), KEY_TYPE_TEAM, "delivered", 2),
+            StatusCount(str(service.id), "sms", str(template.id), KEY_TYPE_TEST, "delivered", 5),
+            StatusCount(str(service.id), "email", str(uuid.uuid4()), KEY_TYPE_NORMAL, "sending", 1),
+        ],
+    )
+
+    stats = dao_fetch_todays_stats_for_service(service.id)
+
+    assert sorted(stats) == [("email", "sending", 1), ("sms", "delivered", 5)]
+
+
+@pytest.mark.parametrize("include_from_test_key, expected_count", [(True, 10), (False, 5)])
+def test_dao_fetch_todays_stats_for_all_services_uses_counts_from_redis(
+    notify_db_session, mocker, include_from_test_key, expected_count
+):
+    service_1 = create_service(service_name="service 1")
+    service_2 = create_service(service_name="service 2")
+    template = create_template(service=service_1)
+    create_notification(template=template)
+    mocker.patch(
+        "app.dao.services_dao.get_todays_notification_status_counts",
+        return_value=[
+            StatusCount(str(service_1.id), "sms", str(template.id), KEY_TYPE_NORMAL, "delivered", 3),
+            StatusCount(str(service_1.id), "sms", str(template.id), KEY_TYPE_TEAM, "delivered", 2),
+            StatusCount(str(service_1.id), "sms", str(template.id), KEY_TYPE_TEST, "delivered", 5),
+        ],
+    )
+
+    stats = dao_fetch_todays_stats_for_all_services(include_from_test_key=include_from_test_key)
+
+    assert len(stats) == 2
+    assert (service_1.id, "sms", "delivered", expected_count) in [
+        (row.service_id, row.notification_type, row.status, row.count) for row in stats
+    ]
+    # services without any notifications today are still included
+    assert (service_2.id, None, None, None) in [
+        (row.service_id, row.notification_type, row.status, row.count) for row in stats
+    ]
+
+
 def test_dao_fetch_active_users_for_service_returns_active_only(notify_db_session):
     active_user = create_user(email="active@foo.com", state="active")
     pending_user = create_user(email="pending@foo.com", state="pending")
@@ -10,7 +10,7 @@ from notifications_utils.recipients import validate_and_format_phone_number
 from requests import HTTPError
 
 import app
-from app import firetext_client, mmg_client, notification_provider_clients
+from app import firetext_client, mmg_client, notification_provider_clients, spryng_client
 from app.constants import (
     BRANDING_BOTH,
     BRANDING_ORG,
@@ -35,6 +35,7 @@ from tests.app.db import (
     create_service_with_defined_sms_sender,
     create_template,
 )
+from tests.conftest import set_config
 
 
 def setup_function(_function):
@@ -809,3 +810,123 @@ def test_get_html_email_options_add_email_branding_from_service(sample_service):
         "brand_text": branding.text,
         "brand_alt_text": branding.alt_text,
     }
+
+
+def _create_sms_notifications(template, count, **kwargs):
+    return [
+        create_notification(template=template, to_field=f"+44770090000{i}", normalised_to=f"44770090000{i}", **kwargs)
+        for i in range(count)
+    ]
+
+
+def test_send_sms_to_provider_in_batches_sends_notifications_with_the_same_content_in_one_request(
+    sample_template, mocker
+):
+    mocker.patch("app.delivery.send_to_providers.provider_to_use", return_value=spryng_client)
+    mock_send_batch = mocker.patch.object(spryng_client, "send_sms_batch")
+    notifications = _create_sms_notifications(sample_template, 3, reply_to_text="testing")
+    notification_ids = [notification.id for notification in notifications]
+
+    assert send_to_providers.send_sms_to_provider_in_batches(notifications) == ([], [])
+
+    mock_send_batch.assert_called_once_with(
+        recipients=["447700900000", "447700900001", "447700900002"],
+        content="Sample service: This is a template:\nwith a newline",
+        reference=ANY,
+        sender="testing",
+        international=False,
+    )
+    reference = mock_send_batch.call_args[1]["reference"]
+    sent = Notification.query.filter(Notification.id.in_(notification_ids)).all()
+    assert {(n.status, n.sent_by, n.reference, n.billable_units) for n in sent} == {("sending", "spryng", reference, 1)}
+    assert all(n.sent_at for n in sent)
+
+
+def test_send_sms_to_provider_in_batches_stores_the_reference_before_sending_so_early_receipts_match(
+    sample_template, mocker
+):
+    mocker.patch("app.delivery.send_to_providers.provider_to_use", return_value=spryng_client)
+    notifications = _create_sms_notifications(sample_template, 2)
+    notification_id = notifications[1].id
+
+    def receipt_arrives_before_response(recipients, reference, **kwargs):
+        assert (
+            notifications_dao.dao_get_sms_notification_id_by_reference_and_recipient(reference, recipients[1])
+            == notification_id
+        )
+
+    mocker.patch.object(spryng_client, "send_sms_batch", side_effect=receipt_arrives_before_response)
+
+    assert send_to_providers.send_sms_to_provider_in_batches(notifications) == ([], [])
+
+
+def test_send_sms_to_provider_in_batches_splits_batches_by_content_and_size(
+    notify_api, sample_template_with_placeholders, mocker
+):
+    mocker.patch("app.delivery.send_to_providers.provider_to_use", return_value=spryng_client)
+    mock_send_batch = mocker.patch.object(spryng_client, "send_sms_batch")
+    jos = _create_sms_notifications(sample_template_with_placeholders, 3, personalisation={"name": "Jo"})
+    sam = _create_sms_notifications(sample_template_with_placeholders, 1, personalisation={"name": "Sam"})
+
+    with set_config(notify_api, "SMS_PROVIDER_BATCH_SIZE", 2):
+        not_batched, failed = send_to_providers.send_sms_to_provider_in_batches(jos + sam)
+
+    assert [call[1]["recipients"] for call in mock_send_batch.call_args_list] == [
+        ["447700900000", "447700900001"],
+        ["447700900002"],
+    ]
+    assert not_batched == sam
+    assert failed == []
+
+
+def test_send_sms_to_provider_in_batches_does_not_batch_the_same_recipient_twice(sample_template, mocker):
+    mocker.patch("app.delivery.send_to_providers.provider_to_use", return_value=spryng_client)
+    mock_send_batch = mocker.patch.object(spryng_client, "send_sms_batch")
+    first, second, third = _create_sms_notifications(sample_template, 2) + _create_sms_notifications(sample_template, 1)
+
+    assert send_to_providers.send_sms_to_provider_in_batches([first, second, third]) == ([third], [])
+    assert mock_send_batch.call_args[1]["recipients"] == ["447700900000", "447700900001"]
+
+
+@pytest.mark.parametrize(
+    "provider, key_type",
+    [
+        (mmg_client, KEY_TYPE_NORMAL),
+        (spryng_client, KEY_TYPE_TEST),
+    ],
+)
+def test_send_sms_to_provider_in_batches_leaves_notifications_it_cannot_batch(
+    sample_template, mocker, provider, key_type
+):
+    mocker.patch("app.delivery.send_to_providers.provider_to_use", return_value=provider)
+    mock_send_batch = mocker.patch.object(spryng_client, "send_sms_batch")
+    notifications = _create_sms_notifications(sample_template, 2, key_type=key_type)
+
+    assert send_to_providers.send_sms_to_provider_in_batches(notifications) == (notifications, [])
+    assert not mock_send_batch.called
+
+
+def test_send_sms_to_provider_in_batches_leaves_notifications_it_fails_to_batch(sample_template, mocker):
+    mocker.patch(
+        "app.delivery.send_to_providers.provider_to_use",
+        side_effect=[spryng_client, Exception("EXPECTED"), spryng_client],
+    )
+    mock_send_batch = mocker.patch.object(spryng_client, "send_sms_batch")
+    first, second, third = _create_sms_notifications(sample_template, 3)
+
+    assert send_to_providers.send_sms_to_provider_in_batches([first, second, third]) == ([second], [])
+    assert mock_send_batch.call_args[1]["recipients"] == ["447700900000", "447700900002"]
+
+
+def test_send_sms_to_provider_in_batches_returns_notifications_in_failed_batches(sample_template, mocker):
+    mocker.patch("app.delivery.send_to_providers.provider_to_use", return_value=spryng_client)
+    mocker.patch.object(spryng_client, "send_sms_batch", side_effect=HTTPError)
+    mock_reduce = mocker.patch("app.delivery.send_to_providers.dao_reduce_sms_provider_priority")
+    notifications = _create_sms_notifications(sample_template, 2)
+
+    not_batched, failed = send_to_providers.send_sms_to_provider_in_batches(notifications)
+
+    assert not_batched == []
+    assert failed == [str(notification.id) for notification in notifications]
+    mock_reduce.assert_called_once_with("spryng", time_threshold=timedelta(minutes=1))
+    assert {n.status for n in Notification.query.all()} == {"created"}
@@ -1,3 +1,4 @@
+from collections import namedtuple
 from datetime import datetime
 from unittest.mock import call
 
@@ -11,6 +12,7 @@ from moto import mock_s3
 from app.constants import (
     KEY_TYPE_NORMAL,
     KEY_TYPE_TEST,
+    NOTIFICATION_DELIVERED,
     NOTIFICATION_VALIDATION_FAILED,
     PRECOMPILED_TEMPLATE_NAME,
 )
@@ -18,6 +20,7 @@ from app.letters.utils import (
     LetterPDFNotFound,
     ScanErrorType,
     adjust_daily_service_limits_for_cancelled_letters,
+    delete_letter_pdfs_from_s3,
     find_letter_pdf_in_s3,
     generate_letter_pdf_filename,
     get_billable_units_for_letter_page_count,
@@ -34,6 +37,8 @@ from tests.conftest import set_config
 
 FROZEN_DATE_TIME = "2018-03-14 17:00:00"
 
+Letter = namedtuple("Letter", ["reference", "created_at", "key_type", "status"])
+
 
 @pytest.fixture(name="sample_precompiled_letter_notification")
 def _sample_precompiled_letter_notification(sample_letter_notification):
@@ -184,6 +189,97 @@ def test_generate_letter_pdf_filename_returns_correct_postage_for_filename(notif
     assert filename == "2017-12-04/NOTIFY.FOO.D.{}.C.20171204172900.PDF".format(expected_postage)
 
 
+def _put_letter_pdf(s3, letter, postage="second"):
+    bucket_name = current_app.config[
+        "S3_BUCKET_TEST_LETTERS" if letter.key_type == KEY_TYPE_TEST else "S3_BUCKET_LETTERS_PDF"
+    ]
+    key = generate_letter_pdf_filename(
+        reference=letter.reference,
+        created_at=letter.created_at,
+        ignore_folder=letter.key_type == KEY_TYPE_TEST,
+        postage=postage,
+    )
+    s3.put_object(Bucket=bucket_name, Key=key, Body=b"pdf")
+    return key
+
+
+@mock_s3
+def test_delete_letter_pdfs_from_s3_deletes_only_the_letters_pdfs(notify_api):
+    s3 = boto3.client("s3", region_name="eu-west-1")
+    for bucket_name in [current_app.config["S3_BUCKET_LETTERS_PDF"], current_app.config["S3_BUCKET_TEST_LETTERS"]]:
+        s3.create_bucket(Bucket=bucket_name, CreateBucketConfiguration={"LocationConstraint": "eu-west-1"})
+
+    letters = [
+        Letter(
+            f"ref{i}", datetime(2018, 3, 14, 12, i), KEY_TYPE_TEST if i % 2 else KEY_TYPE_NORMAL, NOTIFICATION_DELIVERED
+        )
+        for i in range(6)
+    ]
+    for letter in letters:
+        _put_letter_pdf(s3, letter)
+
+    other_letter = Letter("other", datetime(2018, 3, 14, 12), KEY_TYPE_NORMAL, NOTIFICATION_DELIVERED)
+    other_key = _put_letter_pdf(s3, other_letter)
+
+    # a letter whose PDF has already gone
+    letters.append(Letter("gone", datetime(2018, 3, 14, 12), KEY_TYPE_NORMAL, NOTIFICATION_DELIVERED))
+
+    assert delete_letter_pdfs_from_s3(letters, max_workers=2) == 0
+
+    remaining = [
+        item["Key"]
+        for bucket_name in [current_app.config["S3_BUCKET_LETTERS_PDF"], current_app.config["S3_BUCKET_TEST_LETTERS"]]
+        for item in s3.list_objects_v2(Bucket=bucket_name).get("Contents", [])
+    ]
+    assert remaining == [other_key]
+
+
+@mock_s3
+def test_delete_letter_pdfs_from_s3_deletes_pdfs_named_for_a_different_postage(notify_api):
+    s3 = boto3.client("s3", region_name="eu-west-1")
+    bucket_name = current_app.config["S3_BUCKET_LETTERS_PDF"]
+    s3.create_bucket(Bucket=bucket_name, CreateBucketConfiguration={"LocationConstraint": "eu-west-1"})
+
+    # uploaded as a first class letter, before the letter's postage was changed to europe
+    letter = Letter("ref", datetime(2018, 3, 14, 12), KEY_TYPE_NORMAL, NOTIFICATION_DELIVERED)
+    key = _put_letter_pdf(s3, letter, postage="first")
+    assert key != generate_letter_pdf_filename(reference="ref", created_at=letter.created_at, postage="europe")
+
+    assert delete_letter_pdfs_from_s3([letter]) == 0
+    assert "Contents" not in s3.list_objects_v2(Bucket=bucket_name)
+
+
+def test_delete_letter_pdfs_from_s3_deletes_1000_at_a_time_and_counts_failures(notify_api, mocker):
+    mock_s3 = mocker.patch("app.letters.utils.boto3.client").return_value
+    mock_s3.list_objects_v2.side_effect = lambda Bucket, Prefix: (
+        {"Contents": [{"Key": f"{Prefix}D.2.C.20180314120000.PDF"}]} if Prefix != "2018-03-14/NOTIFY.REF0." else {}
+    )
+    mock_s3.delete_objects.side_effect = lambda Bucket, Delete: (
+        {"Errors": [{"Key": Delete["Objects"][0]["Key"], "Message": "Access Denied"}]}
+        if len(Delete["Objects"]) < 1000
+        else {}
+    )
+
+    letters = [
+        Letter(f"ref{i}", datetime(2018, 3, 14, 12), KEY_TYPE_NORMAL, NOTIFICATION_DELIVERED) for i in range(2501)
+    ]
+
+    assert delete_letter_pdfs_from_s3(letters) == 1
+    assert mock_s3.list_objects_v2.call_count == 2501
+    assert sorted(len(c.kwargs["Delete"]["Objects"]) for c in mock_s3.delete_objects.call_args_list) == [
+        500,
+        1000,
+        1000,
+    ]
+
+
+def test_delete_letter_pdfs_from_s3_does_nothing_without_letters(notify_api, mocker):
+    mock_client = mocker.patch("app.letters.utils.boto3.client")
+
+    assert delete_letter_pdfs_from_s3([]) == 0
+    assert not mock_client.called
+
+
 def test_generate_letter_pdf_filename_returns_correct_filename_for_test_letters(notify_api, mocker):
     created_at = datetime(2017, 12, 4, 17, 29)
     filename = generate_letter_pdf_filename(reference="foo", created_at=created_at, ignore_folder=True)
@@ -176,3 +176,17 @@ def test_validate_callback_data_returns_error_for_empty_string():
     result = validate_callback_data(form, fields, client_name)
     assert result is not None
     assert "{} callback failed: {} missing".format(client_name, "status") in result
+
+
+def test_spryng_callback_should_return_200_and_call_task_with_valid_data(client, mocker):
+    mock_celery = mocker.patch("app.notifications.notifications_sms_callback.process_sms_client_response.apply_async")
+
+    response = client.get(
+        path="/notifications/sms/spryng?STATUS=10&REASONCODE=0&REFERENCE=batch_reference&RECIPIENT=447700900001"
+    )
+
+    assert response.status_code == 200
+    mock_celery.assert_called_once_with(
+        ["10", "batch_reference", "Spryng", "0", "447700900001"],
+        queue="sms-callbacks",
+    )
@@ -12,13 +12,18 @@ from notifications_utils.recipients import (
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.constants import LETTER_TYPE
+from app.exceptions import NotificationsPartlyQueuedException
 from app.models import Notification, NotificationHistory
 from app.notifications.process_notifications import (
+    build_notification,
     create_content_for_notification,
     persist_notification,
+    persist_notifications,
     send_notification_to_queue,
+    send_notifications_to_queue_in_batches,
     simulated_recipient,
 )
+from app.notifications.send_limits import reserve_daily_limit
 from app.serialised_models import SerialisedTemplate
 from app.v2.errors import BadRequestError, QrCodeTooLongError
 from tests.app.db import create_api_key, create_service, create_template
@@ -169,7 +174,7 @@ def test_persist_notification_with_optionals(sample_job, sample_api_key):
 def test_persist_notification_cache_is_not_incremented_on_failure_to_create_notification(
     notify_api, sample_api_key, mocker
 ):
-    mocked_redis = mocker.patch("app.redis_store.incr")
+    mock_check = mocker.patch("app.notifications.process_notifications.check_and_increment_limits")
     with pytest.raises(SQLAlchemyError):
         persist_notification(
             template_id=None,
@@ -181,13 +186,13 @@ def test_persist_notification_cache_is_not_incremented_on_failure_to_create_noti
             api_key_id=sample_api_key.id,
             key_type=sample_api_key.key_type,
         )
-    mocked_redis.assert_not_called()
+    mock_check.assert_not_called()
 
 
 def test_persist_notification_does_not_increment_cache_if_test_key(
     notify_api, sample_template, sample_job, mocker, sample_test_api_key
 ):
-    daily_limit_cache = mocker.patch("app.notifications.process_notifications.redis_store.incr")
+    daily_limit_cache = mocker.patch("app.notifications.process_notifications.check_and_increment_limits")
 
     assert Notification.query.count() == 0
     assert NotificationHistory.query.count() == 0
@@ -219,8 +224,7 @@ def test_persist_notification_increments_cache_for_trial_or_live_service(
     service = create_service(restricted=restricted_service)
     template = create_template(service=service)
     api_key = create_api_key(service=service)
-    mocker.patch("app.notifications.process_notifications.redis_store.get", return_value=1)
-    mock_incr = mocker.patch("app.notifications.process_notifications.redis_store.incr")
+    mock_check = mocker.patch("app.notifications.process_notifications.check_and_increment_limits")
     with set_config(notify_api, "REDIS_ENABLED", True):
         persist_notification(
             template_id=template.id,
@@ -234,23 +238,18 @@ def test_persist_notification_increments_cache_for_trial_or_live_service(
             reference="ref2",
         )
 
-        assert mock_incr.call_args_list == [
-            mocker.call(f"{service.id}-2016-01-01-count"),
-            mocker.call(f"{service.id}-sms-2016-01-01-count"),
-        ]
+        mock_check.assert_called_once_with(service.id, api_key.key_type, "sms", num_notifications=1)
 
 
-@pytest.mark.parametrize("restricted_service", [True, False])
-@freeze_time("2016-01-01 11:09:00.061258")
-def test_persist_notification_sets_daily_limit_cache_if_one_does_not_exists(
-    notify_api, notify_db_session, mocker, restricted_service
+def test_persist_notification_does_not_count_notifications_already_reserved_by_the_request(
+    notify_api, notify_db_session, mocker
 ):
-    service = create_service(restricted=restricted_service)
+    service = create_service()
     template = create_template(service=service)
     api_key = create_api_key(service=service)
-    mocker.patch("app.notifications.process_notifications.redis_store.get", return_value=None)
-    mock_set = mocker.patch("app.notifications.process_notifications.redis_store.set")
-    with set_config(notify_api, "REDIS_ENABLED", True):
+    mock_check = mocker.patch("app.notifications.process_notifications.check_and_increment_limits")
+    with set_config(notify_api, "REDIS_ENABLED", True), notify_api.test_request_context():
+        reserve_daily_limit(service.id, "sms", 1)
         persist_notification(
             template_id=template.id,
             template_version=template.version,
@@ -263,10 +262,109 @@ def test_persist_notification_sets_daily_limit_cache_if_one_does_not_exists(
             reference="ref2",
         )
 
-        assert mock_set.call_args_list == [
-            mocker.call(f"{service.id}-2016-01-01-count", 1, ex=86400),
-            mocker.call(f"{service.id}-sms-2016-01-01-count", 1, ex=86400),
-        ]
+    assert not mock_check.called
+
+
+@freeze_time("2016-01-01 11:09:00.061258")
+def test_persist_notifications_inserts_all_notifications_and_increments_cache_once(
+    notify_api, notify_db_session, mocker
+):
+    service = create_service()
+    template = create_template(service=service)
+    api_key = create_api_key(service=service)
+    mock_check = mocker.patch("app.notifications.process_notifications.check_and_increment_limits")
+    notifications = [
+        build_notification(
+            template_id=template.id,
+            template_version=template.version,
+            recipient=f"+44711111112{i}",
+            service=service,
+            personalisation={"name": str(i)},
+            notification_type="sms",
+            api_key_id=api_key.id,
+            key_type=api_key.key_type,
+        )
+        for i in range(3)
+    ]
+
+    with set_config(notify_api, "REDIS_ENABLED", True):
+        persist_notifications(notifications, service=service, notification_type="sms", key_type=api_key.key_type)
+
+    persisted = Notification.query.order_by(Notification.normalised_to).all()
+    assert [n.id for n in persisted] == [n.id for n in notifications]
+    assert [n.normalised_to for n in persisted] == ["447111111120", "447111111121", "447111111122"]
+    assert [n.personalisation for n in persisted] == [{"name": "0"}, {"name": "1"}, {"name": "2"}]
+    assert {n.status for n in persisted} == {"created"}
+    assert {n.billable_units for n in persisted} == {0}
+    mock_check.assert_called_once_with(service.id, api_key.key_type, "sms", num_notifications=3)
+
+
+def test_persist_notifications_only_counts_statuses_of_notifications_inserted(notify_api, notify_db_session, mocker):
+    service = create_service()
+    template = create_template(service=service)
+    mocker.patch("app.notifications.process_notifications.check_and_increment_limits")
+    mock_count = mocker.patch("app.notifications.process_notifications.count_new_notifications")
+    notifications = [
+        build_notification(
+            template_id=template.id,
+            template_version=template.version,
+            recipient=f"+44711111112{i}",
+            service=service,
+            personalisation=None,
+            notification_type="sms",
+            api_key_id=None,
+            key_type="normal",
+        )
+        for i in range(2)
+    ]
+    persist_notifications(notifications[:1], service=service, notification_type="sms", key_type="normal")
+
+    persist_notifications(
+        notifications, service=service, notification_type="sms", key_type="normal", ignore_duplicates=True
+    )
+
+    assert [notification.id for notification in mock_count.call_args[0][0]] == [notifications[1].id]
+
+
+@pytest.mark.parametrize(
+    "notification_type, key_type, expected_queue, expected_task",
+    [
+        ("sms", "normal", "send-sms-tasks", "deliver_sms_batch"),
+        ("email", "team", "send-email-tasks", "deliver_email_batch"),
+        ("sms", "test", "research-mode-tasks", "deliver_sms_batch"),
+    ],
+)
+def test_send_notifications_to_queue_in_batches(
+    notify_api, mocker, notification_type, key_type, expected_queue, expected_task
+):
+    mocked = mocker.patch(f"app.celery.provider_tasks.{expected_task}.apply_async")
+    notification_ids = [uuid.uuid4() for _ in range(5)]
+
+    with set_config(notify_api, "NOTIFICATION_BATCH_DELIVERY_CHUNK_SIZE", 2):
+        send_notifications_to_queue_in_batches(key_type, notification_type, notification_ids)
+
+    assert mocked.call_args_list == [
+        mocker.call([[str(id_) for id_ in notification_ids[0:2]]], queue=expected_queue),
+        mocker.call([[str(id_) for id_ in notification_ids[2:4]]], queue=expected_queue),
+        mocker.call([[str(notification_ids[4])]], queue=expected_queue),
+    ]
+
+
+def test_send_notifications_to_queue_in_batches_deletes_everything_not_yet_queued_if_publishing_fails(
+    notify_api, mocker
+):
+    mocker.patch(
+        "app.celery.provider_tasks.deliver_sms_batch.apply_async", side_effect=[None, Boto3Error("EXPECTED"), None]
+    )
+    mock_delete = mocker.patch("app.notifications.process_notifications.dao_delete_notifications_by_ids")
+    notification_ids = [uuid.uuid4() for _ in range(5)]
+
+    with set_config(notify_api, "NOTIFICATION_BATCH_DELIVERY_CHUNK_SIZE", 2):
+        with pytest.raises(NotificationsPartlyQueuedException) as e:
+            send_notifications_to_queue_in_batches("normal", "sms", notification_ids)
+
+    assert e.value.queued_ids == notification_ids[:2]
+    mock_delete.assert_called_once_with(notification_ids[2:])
 
 
 @pytest.mark.parametrize(
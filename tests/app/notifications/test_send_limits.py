@@ -0,0 +1,97 @@
+import pytest
+from flask import g
+from freezegun import freeze_time
+
+from app import redis_store
+from app.notifications import send_limits
+from app.notifications.send_limits import (
+    CHECK_AND_INCREMENT_LIMITS_SCRIPT,
+    OVER_DAILY_LIMIT,
+    WITHIN_LIMITS,
+    check_and_increment_limits,
+    reserve_daily_limit,
+    use_daily_limit_reservation,
+)
+
+
+@pytest.fixture
+def mock_script(mocker):
+    mocker.patch.object(send_limits, "_script", None)
+    mock_redis = mocker.patch("app.redis_store.redis_store")
+    script = mock_redis.register_script.return_value
+    script.return_value = [0, 5]
+    return script
+
+
+@freeze_time("2016-01-01 11:09:00")
+def test_check_and_increment_limits_runs_script_with_all_three_keys(notify_api, mock_script, mocker):
+    mocker.patch("app.notifications.send_limits.uuid.uuid4").return_value.hex = "abc"
+
+    assert check_and_increment_limits(
+        "service-id", "normal", "sms", rate_limit=3000, daily_limit=1000, num_notifications=10
+    ) == (WITHIN_LIMITS, 5)
+
+    mock_script.assert_called_once_with(
+        keys=["service-id-normal", "service-id-sms-2016-01-01-count", "service-id-2016-01-01-count"],
+        args=[1451646540.0, 60, 3000, 1000, 10, 1, "abc", 86400],
+    )
+
+
+def test_check_and_increment_limits_registers_script_once(notify_api, mock_script):
+    check_and_increment_limits("service-id", "normal", "sms")
+    check_and_increment_limits("service-id", "normal", "sms")
+
+    redis_store.redis_store.register_script.assert_called_once_with(CHECK_AND_INCREMENT_LIMITS_SCRIPT)
+    assert mock_script.call_count == 2
+
+
+def test_check_and_increment_limits_skips_limits_left_as_none(notify_api, mock_script):
+    check_and_increment_limits("service-id", "test", "email", increment=False)
+
+    rate_limit, daily_limit, num_notifications, increment = mock_script.call_args[1]["args"][2:6]
+    assert (rate_limit, daily_limit, num_notifications, increment) == (-1, -1, 1, 0)
+
+
+def test_check_and_increment_limits_returns_status_from_script(notify_api, mock_script):
+    mock_script.return_value = [b"2", b"1000"]
+
+    assert check_and_increment_limits("service-id", "normal", "sms", daily_limit=1000) == (OVER_DAILY_LIMIT, 1000)
+
+
+def test_check_and_increment_limits_lets_notifications_through_if_redis_fails(notify_api, mock_script):
+    mock_script.side_effect = ConnectionError
+
+    assert check_and_increment_limits("service-id", "normal", "sms", rate_limit=1, daily_limit=1) == (
+        WITHIN_LIMITS,
+        0,
+    )
+
+
+def test_use_daily_limit_reservation_only_uses_what_was_reserved(notify_api):
+    with notify_api.test_request_context():
+        reserve_daily_limit("service-id", "sms", 3)
+
+        assert use_daily_limit_reservation("service-id", "sms", 2) == 0
+        assert use_daily_limit_reservation("service-id", "sms", 2) == 1
+        assert use_daily_limit_reservation("service-id", "sms", 2) == 2
+        assert use_daily_limit_reservation("service-id", "email", 2) == 2
+
+
+def test_use_daily_limit_reservation_outside_a_request(notify_api):
+    assert use_daily_limit_reservation("service-id", "sms", 2) == 2
+
+
+def test_unused_reservations_are_given_back_at_the_end_of_the_request(notify_api, mocker):
+    mock_check = mocker.patch("app.notifications.send_limits.check_and_increment_limits")
+
+    with notify_api.test_request_context():
+        reserve_daily_limit("service-id", "sms", 5)
+        reserve_daily_limit("service-id", "email", 1)
+        use_daily_limit_reservation("service-id", "sms", 2)
+        use_daily_limit_reservation("service-id", "email", 1)
+
+        notify_api.process_response(notify_api.response_class())
+
+        assert "daily_limit_reservations" not in g
+
+    mock_check.assert_called_once_with("service-id", None, "sms", num_notifications=-3)
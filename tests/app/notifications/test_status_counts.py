@@ -0,0 +1,193 @@
+import uuid
+from datetime import date, datetime
+from unittest.mock import call
+
+import pytest
+from freezegun import freeze_time
+
+from app.notifications.status_counts import (
+    STATUS_COUNTS_EXPIRY_SECONDS,
+    StatusCount,
+    count_new_notifications,
+    count_status_change,
+    count_status_changes,
+    get_todays_notification_status_counts,
+    set_notification_status_counts,
+    start_notification_status_counts,
+)
+from tests.app.db import create_notification
+from tests.conftest import set_config_values
+
+
+@pytest.fixture
+def status_counts_enabled(notify_api):
+    with set_config_values(notify_api, {"REDIS_ENABLED": True, "NOTIFICATION_STATUS_COUNTS_IN_REDIS": True}):
+        yield
+
+
+@pytest.fixture
+def mock_redis(mocker):
+    return mocker.patch("app.redis_store.redis_store")
+
+
+@freeze_time("2021-06-01T23:30:00")
+def test_count_new_notifications_counts_them_for_the_day_they_were_created_in_the_uk(
+    sample_template, status_counts_enabled, mock_redis
+):
+    notifications = [
+        create_notification(sample_template, created_at=datetime(2021, 6, 1, 23, 0)),
+        create_notification(sample_template, created_at=datetime(2021, 6, 1, 23, 1)),
+        # yesterday in the UK, so not counted
+        create_notification(sample_template, created_at=datetime(2021, 6, 1, 22, 59)),
+    ]
+
+    count_new_notifications(notifications)
+
+    counts_key = f"service-{sample_template.service_id}-notification-status-counts-2021-06-02"
+    pipe = mock_redis.pipeline.return_value
+    assert pipe.hincrby.call_args_list == [call(counts_key, f"sms:{sample_template.id}:normal:created", 2)]
+    pipe.expire.assert_any_call(counts_key, STATUS_COUNTS_EXPIRY_SECONDS)
+    pipe.sadd.assert_called_once_with("notification-status-counts-2021-06-02-services", str(sample_template.service_id))
+    pipe.execute.assert_called_once_with()
+
+
+def test_count_new_notifications_does_nothing_if_not_enabled(notify_api, sample_template, mock_redis):
+    count_new_notifications([create_notification(sample_template)])
+
+    assert not mock_redis.pipeline.called
+
+
+def test_count_new_notifications_carries_on_if_redis_fails(sample_template, status_counts_enabled, mock_redis):
+    mock_redis.pipeline.return_value.execute.side_effect = ConnectionError
+
+    count_new_notifications([create_notification(sample_template)])
+
+
+@freeze_time("2021-06-01T12:00:00")
+def test_count_status_change_moves_count_from_old_status_to_new(sample_template, status_counts_enabled, mock_redis):
+    notification = create_notification(sample_template, status="sending")
+    # the old status has to have been loaded to be counted
+    assert notification.status == "sending"
+    notification.status = "delivered"
+
+    count_status_change(notification)
+
+    counts_key = f"service-{sample_template.service_id}-notification-status-counts-2021-06-01"
+    assert mock_redis.pipeline.return_value.hincrby.call_args_list == [
+        call(counts_key, f"sms:{sample_template.id}:normal:sending", -1),
+        call(counts_key, f"sms:{sample_template.id}:normal:delivered", 1),
+    ]
+
+
+def test_count_status_change_ignores_unchanged_status(sample_template, status_counts_enabled, mock_redis):
+    notification = create_notification(sample_template, status="sending")
+    notification.billable_units = 2
+
+    count_status_change(notification)
+
+    assert not mock_redis.pipeline.called
+
+
+@freeze_time("2021-06-01T12:00:00")
+def test_count_status_changes_adds_up_changes_for_the_same_status(sample_template, status_counts_enabled, mock_redis):
+    notifications = [create_notification(sample_template, status="sending") for _ in range(3)]
+
+    count_status_changes(
+        [
+            (notifications[0], "sending", "temporary-failure"),
+            (notifications[1], "sending", "temporary-failure"),
+            (notifications[2], "pending", "temporary-failure"),
+        ]
+    )
+
+    counts_key = f"service-{sample_template.service_id}-notification-status-counts-2021-06-01"
+    assert sorted(mock_redis.pipeline.return_value.hincrby.call_args_list) == sorted(
+        [
+            call(counts_key, f"sms:{sample_template.id}:normal:sending", -2),
+            call(counts_key, f"sms:{sample_template.id}:normal:pending", -1),
+            call(counts_key, f"sms:{sample_template.id}:normal:temporary-failure", 3),
+        ]
+    )
+
+
+@freeze_time("2021-06-01T12:00:00")
+def test_get_todays_notification_status_counts_for_all_services(status_counts_enabled, mock_redis):
+    service_id, template_id = uuid.uuid4(), uuid.uuid4()
+    mock_redis.pipeline.return_value.execute.side_effect = [
+        [1, {str(service_id).encode()}],
+        [{f"sms:{template_id}:normal:delivered".encode(): b"3", f"sms:{template_id}:normal:sending".encode(): b"0"}],
+    ]
+
+    assert get_todays_notification_status_counts() == [
+        StatusCount(str(service_id), "sms", str(template_id), "normal", "delivered", 3)
+    ]
+    mock_redis.pipeline.return_value.hgetall.assert_called_once_with(
+        f"service-{service_id}-notification-status-counts-2021-06-01"
+    )
+
+
+def test_get_todays_notification_status_counts_for_one_service(status_counts_enabled, mock_redis):
+    service_id, template_id = uuid.uuid4(), uuid.uuid4()
+    mock_redis.pipeline.return_value.execute.side_effect = [
+        [1, {str(uuid.uuid4()).encode()}],
+        [{f"email:{template_id}:team:sending".encode(): b"2"}],
+    ]
+
+    assert get_todays_notification_status_counts(service_id) == [
+        StatusCount(str(service_id), "email", str(template_id), "team", "sending", 2)
+    ]
+
+
+def test_get_todays_notification_status_counts_returns_none_until_counts_are_complete(
+    status_counts_enabled, mock_redis
+):
+    mock_redis.pipeline.return_value.execute.return_value = [0, set()]
+
+    assert get_todays_notification_status_counts() is None
+
+
+def test_get_todays_notification_status_counts_returns_none_if_redis_fails(status_counts_enabled, mock_redis):
+    mock_redis.pipeline.return_value.execute.side_effect = ConnectionError
+
+    assert get_todays_notification_status_counts() is None
+
+
+def test_get_todays_notification_status_counts_returns_none_if_not_enabled(notify_api, mock_redis):
+    assert get_todays_notification_status_counts() is None
+    assert not mock_redis.pipeline.called
+
+
+def test_set_notification_status_counts_replaces_counts_for_the_day(notify_api, mock_redis):
+    service_id, old_service_id, template_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    mock_redis.smembers.return_value = {str(service_id).encode(), str(old_service_id).encode()}
+
+    set_notification_status_counts(
+        date(2021, 6, 1),
+        [
+            StatusCount(service_id, "sms", template_id, "normal", "delivered", 3),
+            StatusCount(service_id, "sms", template_id, "normal", "sending", 1),
+        ],
+    )
+
+    counts_key = f"service-{service_id}-notification-status-counts-2021-06-01"
+    pipe = mock_redis.pipeline.return_value
+    mock_redis.pipeline.assert_called_once_with(transaction=True)
+    pipe.delete.assert_any_call(f"service-{old_service_id}-notification-status-counts-2021-06-01")
+    pipe.delete.assert_any_call(counts_key)
+    pipe.hset.assert_called_once_with(
+        counts_key,
+        mapping={f"sms:{template_id}:normal:delivered": 3, f"sms:{template_id}:normal:sending": 1},
+    )
+    pipe.sadd.assert_called_once_with("notification-status-counts-2021-06-01-services", str(service_id))
+    pipe.set.assert_called_once_with(
+        "notification-status-counts-2021-06-01-complete", 1, ex=STATUS_COUNTS_EXPIRY_SECONDS
+    )
+    pipe.execute.assert_called_once_with()
+
+
+def test_start_notification_status_counts_marks_counts_as_complete(notify_api, mock_redis):
+    start_notification_status_counts(date(2021, 6, 2))
+
+    mock_redis.set.assert_called_once_with(
+        "notification-status-counts-2021-06-02-complete", 1, ex=STATUS_COUNTS_EXPIRY_SECONDS
+    )
@@ -1,10 +1,8 @@
 import pytest
-from flask import current_app
 from freezegun import freeze_time
 from notifications_utils import SMS_CHAR_COUNT_LIMIT
 from notifications_utils.clients.redis import daily_limit_cache_key
 
-import app
 from app.constants import (
     EMAIL_TYPE,
     INTERNATIONAL_LETTERS,
@@ -16,6 +14,11 @@ from app.dao import templates_dao
 from app.notifications.process_notifications import (
     create_content_for_notification,
 )
+from app.notifications.send_limits import (
+    OVER_DAILY_LIMIT,
+    OVER_RATE_LIMIT,
+    WITHIN_LIMITS,
+)
 from app.notifications.validators import (
     check_if_service_can_send_files_by_email,
     check_is_message_too_long,
@@ -24,7 +27,6 @@ from app.notifications.validators import (
     check_reply_to,
     check_service_email_reply_to_id,
     check_service_letter_contact_id,
-    check_service_over_api_rate_limit,
     check_service_over_daily_message_limit,
     check_service_sms_sender_id,
     check_template_is_active,
@@ -35,7 +37,6 @@ from app.notifications.validators import (
     validate_template,
 )
 from app.serialised_models import (
-    SerialisedAPIKeyCollection,
     SerialisedService,
     SerialisedTemplate,
 )
@@ -437,79 +438,111 @@ def test_validate_template_calls_all_validators_exception_message_too_long(mocke
     assert not mock_check_message_is_too_long.called
 
 
-@pytest.mark.parametrize("key_type", ["team", "live", "test"])
-def test_check_service_over_api_rate_limit_when_exceed_rate_limit_request_fails_raises_error(
-    key_type, sample_service, mocker
+@pytest.mark.parametrize("notification_type", NOTIFICATION_TYPES)
+@pytest.mark.parametrize("num_notifications", [1, 50])
+def test_check_rate_limiting_checks_api_rate_limit_and_daily_limit_in_one_call(
+    notify_api, notify_db_session, mocker, notification_type, num_notifications
 ):
-    with freeze_time("2016-01-01 12:00:00.000000"):
-        if key_type == "live":
-            api_key_type = "normal"
-        else:
-            api_key_type = key_type
+    mock_check = mocker.patch(
+        "app.notifications.validators.check_and_increment_limits", return_value=(WITHIN_LIMITS, 0)
+    )
+    service = create_service(sms_message_limit=1000, email_message_limit=2000, letter_message_limit=3000)
+    api_key = create_api_key(service=service)
 
-        mocker.patch("app.redis_store.exceeded_rate_limit", return_value=True)
+    with set_config(notify_api, "API_RATE_LIMIT_ENABLED", True):
+        check_rate_limiting(service, api_key, notification_type=notification_type, num_notifications=num_notifications)
+
+    mock_check.assert_called_once_with(
+        service.id,
+        api_key.key_type,
+        notification_type,
+        rate_limit=3000,
+        daily_limit={SMS_TYPE: 1000, EMAIL_TYPE: 2000, LETTER_TYPE: 3000}[notification_type],
+        num_notifications=num_notifications,
+        increment=True,
+    )
 
-        sample_service.restricted = True
-        api_key = create_api_key(sample_service, key_type=api_key_type)
-        serialised_service = SerialisedService.from_id(sample_service.id)
-        serialised_api_key = SerialisedAPIKeyCollection.from_service_id(serialised_service.id)[0]
 
-        with pytest.raises(RateLimitError) as e:
-            check_service_over_api_rate_limit(serialised_service, serialised_api_key.key_type)
+def test_check_rate_limiting_skips_daily_limit_for_test_keys(notify_api, notify_db_session, mocker):
+    mock_check = mocker.patch(
+        "app.notifications.validators.check_and_increment_limits", return_value=(WITHIN_LIMITS, 0)
+    )
+    service = create_service()
+    api_key = create_api_key(service=service, key_type="test")
+
+    with set_config(notify_api, "API_RATE_LIMIT_ENABLED", True):
+        check_rate_limiting(service, api_key, notification_type=SMS_TYPE)
+
+    mock_check.assert_called_once_with(
+        service.id,
+        "test",
+        SMS_TYPE,
+        rate_limit=3000,
+        daily_limit=None,
+        num_notifications=1,
+        increment=False,
+    )
 
-        assert app.redis_store.exceeded_rate_limit.called_with(
-            "{}-{}".format(str(sample_service.id), api_key.key_type), sample_service.rate_limit, 60
-        )
-        assert e.value.status_code == 429
-        assert e.value.message == "Exceeded rate limit for key type {} of {} requests per {} seconds".format(
-            key_type.upper(), sample_service.rate_limit, 60
-        )
-        assert e.value.fields == []
 
+def test_check_rate_limiting_skips_rate_limit_if_disabled(notify_api, notify_db_session, mocker):
+    mock_check = mocker.patch(
+        "app.notifications.validators.check_and_increment_limits", return_value=(WITHIN_LIMITS, 0)
+    )
+    service = create_service()
+    api_key = create_api_key(service=service)
 
-def test_check_service_over_api_rate_limit_when_rate_limit_has_not_exceeded_limit_succeeds(sample_service, mocker):
-    with freeze_time("2016-01-01 12:00:00.000000"):
-        mocker.patch("app.redis_store.exceeded_rate_limit", return_value=False)
+    with set_config(notify_api, "API_RATE_LIMIT_ENABLED", False):
+        check_rate_limiting(service, api_key, notification_type=SMS_TYPE)
 
-        sample_service.restricted = True
-        api_key = create_api_key(sample_service)
-        serialised_service = SerialisedService.from_id(sample_service.id)
-        serialised_api_key = SerialisedAPIKeyCollection.from_service_id(serialised_service.id)[0]
+    assert mock_check.call_args[1]["rate_limit"] is None
 
-        check_service_over_api_rate_limit(serialised_service, serialised_api_key.key_type)
-        assert app.redis_store.exceeded_rate_limit.called_with(
-            "{}-{}".format(str(sample_service.id), api_key.key_type), 3000, 60
-        )
 
+def test_check_rate_limiting_does_nothing_if_redis_disabled(notify_api, notify_db_session, mocker):
+    mock_check = mocker.patch("app.notifications.validators.check_and_increment_limits")
+    service = create_service()
+    api_key = create_api_key(service=service)
 
-def test_check_service_over_api_rate_limit_should_do_nothing_if_limiting_is_disabled(sample_service, mocker):
-    with freeze_time("2016-01-01 12:00:00.000000"):
-        current_app.config["API_RATE_LIMIT_ENABLED"] = False
+    with set_config(notify_api, "REDIS_ENABLED", False):
+        check_rate_limiting(service, api_key, notification_type=SMS_TYPE)
 
-        mocker.patch("app.redis_store.exceeded_rate_limit", return_value=False)
+    assert not mock_check.called
 
-        sample_service.restricted = True
-        create_api_key(sample_service)
-        serialised_service = SerialisedService.from_id(sample_service.id)
-        serialised_api_key = SerialisedAPIKeyCollection.from_service_id(serialised_service.id)[0]
 
-        check_service_over_api_rate_limit(serialised_service, serialised_api_key.key_type)
-        assert app.redis_store.exceeded_rate_limit.call_args_list == []
+def test_check_rate_limiting_raises_if_over_rate_limit(notify_api, notify_db_session, mocker):
+    mocker.patch("app.notifications.validators.check_and_increment_limits", return_value=(OVER_RATE_LIMIT, 0))
+    mock_reserve = mocker.patch("app.notifications.validators.reserve_daily_limit")
+    service = create_service()
+    api_key = create_api_key(service=service)
 
+    with pytest.raises(RateLimitError) as e:
+        check_rate_limiting(service, api_key, notification_type=SMS_TYPE)
 
-@pytest.mark.parametrize("notification_type", NOTIFICATION_TYPES)
-def test_check_rate_limiting_validates_api_rate_limit_and_daily_limit(notify_db_session, mocker, notification_type):
-    mock_rate_limit = mocker.patch("app.notifications.validators.check_service_over_api_rate_limit")
-    mock_daily_limit = mocker.patch("app.notifications.validators.check_service_over_daily_message_limit")
+    assert e.value.message == "Exceeded rate limit for key type LIVE of 3000 requests per 60 seconds"
+    assert not mock_reserve.called
+
+
+def test_check_rate_limiting_raises_if_over_daily_limit(notify_api, notify_db_session, mocker):
+    mocker.patch("app.notifications.validators.check_and_increment_limits", return_value=(OVER_DAILY_LIMIT, 1000))
+    mock_reserve = mocker.patch("app.notifications.validators.reserve_daily_limit")
+    service = create_service(sms_message_limit=1000)
+    api_key = create_api_key(service=service)
+
+    with pytest.raises(TooManyRequestsError) as e:
+        check_rate_limiting(service, api_key, notification_type=SMS_TYPE)
+
+    assert e.value.message == "Exceeded send limits (sms: 1000) for today"
+    assert not mock_reserve.called
+
+
+def test_check_rate_limiting_reserves_the_notifications_it_counted(notify_api, notify_db_session, mocker):
+    mocker.patch("app.notifications.validators.check_and_increment_limits", return_value=(WITHIN_LIMITS, 0))
+    mock_reserve = mocker.patch("app.notifications.validators.reserve_daily_limit")
     service = create_service()
     api_key = create_api_key(service=service)
 
-    check_rate_limiting(service, api_key, notification_type=notification_type)
+    check_rate_limiting(service, api_key, notification_type=EMAIL_TYPE, num_notifications=20)
 
-    mock_rate_limit.assert_called_once_with(service, api_key.key_type)
-    assert mock_daily_limit.call_args_list == [
-        mocker.call(service, api_key.key_type, notification_type=notification_type),
-    ]
+    mock_reserve.assert_called_once_with(service.id, EMAIL_TYPE, 20)
 
 
 @pytest.mark.parametrize("key_type", ["test", "normal"])
@@ -2,11 +2,13 @@ from datetime import date
 
 from pytest import approx
 
+from app.models import FactPlatformNotificationStatus
 from tests.app.db import (
     create_ft_notification_status,
     create_process_time,
     create_template,
 )
+from tests.conftest import set_config
 
 
 def test_performance_dashboard(sample_service, admin_request):
@@ -74,3 +76,34 @@ def test_performance_dashboard(sample_service, admin_request):
     assert results["live_service_count"] == 1
     assert results["services_using_notify"][0]["service_name"] == sample_service.name
     assert not results["services_using_notify"][0]["organisation_name"]
+
+
+def test_performance_dashboard_from_rollups(notify_api, notify_db_session, admin_request):
+    for bst_date, notification_type, key_type, count in [
+        (date(2021, 3, 1), "email", "normal", 15),
+        (date(2021, 3, 1), "sms", "team", 20),
+        (date(2021, 3, 1), "sms", "test", 100),
+        (date(2021, 3, 2), "letter", "normal", 10),
+        (date(2021, 3, 3), "email", "normal", 45),
+    ]:
+        notify_db_session.add(
+            FactPlatformNotificationStatus(
+                bst_date=bst_date,
+                notification_type=notification_type,
+                key_type=key_type,
+                notification_status="delivered",
+                notification_count=count,
+            )
+        )
+
+    with set_config(notify_api, "PLATFORM_STATS_FROM_ROLLUPS", True):
+        results = admin_request.get(
+            endpoint="performance_dashboard.get_performance_dashboard", start_date="2021-03-01", end_date="2021-03-02"
+        )
+
+    assert results["total_notifications"] == 15 + 20 + 10 + 45
+    assert results["email_notifications"] == 15 + 45
+    assert results["notifications_by_type"] == [
+        {"date": "2021-03-01", "emails": 15, "sms": 20, "letters": 0},
+        {"date": "2021-03-02", "emails": 0, "sms": 0, "letters": 10},
+    ]
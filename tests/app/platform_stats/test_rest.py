@@ -1,14 +1,17 @@
 from datetime import date, datetime
 
 import pytest
+from flask import url_for
 from freezegun import freeze_time
 
 from app.constants import EMAIL_TYPE, SMS_TYPE
+from app.dao.fact_platform_stats_dao import update_fact_platform_stats_for_day
 from app.errors import InvalidRequest
 from app.models import FactBillingLetterDespatch, LetterCostThreshold
 from app.platform_stats.rest import (
     validate_date_range_is_within_a_financial_year,
 )
+from tests import create_admin_authorization_header
 from tests.app.db import (
     create_ft_billing,
     create_ft_notification_status,
@@ -17,6 +20,7 @@ from tests.app.db import (
     create_template,
     set_up_usage_data,
 )
+from tests.conftest import set_config
 
 
 @freeze_time("2018-06-01")
@@ -239,6 +243,23 @@ def test_daily_volumes_report(
     }
 
 
+def test_daily_volumes_report_from_rollups_matches_ft_billing(
+    notify_api, notify_db_session, sample_template, sample_email_template, sample_letter_template, admin_request
+):
+    set_up_usage_data(datetime(2022, 3, 1))
+    expected = admin_request.get("platform_stats.daily_volumes_report", start_date="2022-03-01", end_date="2022-03-31")
+    for day in range(1, 32):
+        update_fact_platform_stats_for_day(date(2022, 3, day))
+
+    with set_config(notify_api, "PLATFORM_STATS_FROM_ROLLUPS", True):
+        response = admin_request.get(
+            "platform_stats.daily_volumes_report", start_date="2022-03-01", end_date="2022-03-31"
+        )
+
+    assert len(response) == 3
+    assert response == expected
+
+
 def test_volumes_by_service_report(
     notify_db_session, sample_template, sample_email_template, sample_letter_template, admin_request
 ):
@@ -321,6 +342,80 @@ def test_daily_sms_provider_volumes_report(admin_request, sample_template):
     }
 
 
+def test_daily_sms_provider_volumes_report_from_rollups(notify_api, admin_request, sample_template):
+    create_ft_billing("2022-03-01", sample_template, provider="foo", rate=1.5, notifications_sent=1, billable_unit=3)
+    update_fact_platform_stats_for_day(date(2022, 3, 1))
+
+    with set_config(notify_api, "PLATFORM_STATS_FROM_ROLLUPS", True):
+        resp = admin_request.get(
+            "platform_stats.daily_sms_provider_volumes_report", start_date="2022-03-01", end_date="2022-03-01"
+        )
+
+    assert resp == [
+        {
+            "day": "2022-03-01",
+            "provider": "foo",
+            "sms_totals": 1,
+            "sms_fragment_totals": 3,
+            "sms_chargeable_units": 3,
+            "sms_cost": 4.5,
+        }
+    ]
+
+
+@freeze_time("2022-04-01T12:00:00")
+def test_platform_stats_returns_not_modified_if_etag_matches(client, mocker):
+    dao_mock = mocker.patch(
+        "app.platform_stats.rest.fetch_daily_volumes_for_platform",
+        return_value=[],
+    )
+    url = url_for("platform_stats.daily_volumes_report", start_date="2022-03-01", end_date="2022-03-31")
+
+    response = client.get(url, headers=[create_admin_authorization_header()])
+    assert response.status_code == 200
+    assert response.json == []
+    etag = response.headers["ETag"]
+
+    response = client.get(url, headers=[create_admin_authorization_header(), ("If-None-Match", etag)])
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert dao_mock.call_count == 1
+
+
+@freeze_time("2022-04-01T12:00:00")
+def test_platform_stats_etag_changes_when_platform_stats_are_updated(client, mocker):
+    mocker.patch("app.platform_stats.rest.fetch_daily_volumes_for_platform", return_value=[])
+    # when the stats were last updated, then the cached response, for each request
+    mocker.patch(
+        "app.platform_stats.caching.redis_store.get",
+        side_effect=[None, None, b"2022-04-01T11:30:00+00:00", None],
+    )
+    url = url_for("platform_stats.daily_volumes_report", start_date="2022-03-01", end_date="2022-03-31")
+
+    etag = client.get(url, headers=[create_admin_authorization_header()]).headers["ETag"]
+    response = client.get(url, headers=[create_admin_authorization_header(), ("If-None-Match", etag)])
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_platform_stats_uses_cached_response(client, mocker):
+    dao_mock = mocker.patch("app.platform_stats.rest.fetch_daily_volumes_for_platform")
+    mocker.patch(
+        "app.platform_stats.caching.redis_store.get",
+        side_effect=[None, b'[{"day": "2022-03-01"}]'],
+    )
+
+    response = client.get(
+        url_for("platform_stats.daily_volumes_report", start_date="2022-03-01", end_date="2022-03-31"),
+        headers=[create_admin_authorization_header()],
+    )
+
+    assert response.status_code == 200
+    assert response.json == [{"day": "2022-03-01"}]
+    assert not dao_mock.called
+
+
 class TestGetDataForDvlaBillingReport:
     def test_no_rows(self, admin_request, notify_db_session):
         response = admin_request.get(
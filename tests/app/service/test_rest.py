@@ -1,3 +1,4 @@
+import csv
 import json
 import uuid
 from datetime import date, datetime, timedelta
@@ -23,6 +24,7 @@ from app.constants import (
     SMS_TYPE,
     UPLOAD_LETTERS,
 )
+from app.dao import notifications_dao
 from app.dao.organisation_dao import dao_add_service_to_organisation
 from app.dao.service_user_dao import dao_get_service_user
 from app.dao.services_dao import (
@@ -43,6 +45,8 @@ from app.models import (
     ServiceSmsSender,
     User,
 )
+from app.service.rest import _generate_notifications_csv
+from app.utils import encode_pagination_cursor
 from tests import create_admin_authorization_header
 from tests.app.db import (
     create_annual_billing,
@@ -1625,6 +1629,92 @@ def test_get_all_notifications_for_service_formatted_for_csv(client, sample_temp
     assert resp["notifications"][0]["status"] == "Sending"
 
 
+@freeze_time("2024-06-01 12:00")
+def test_get_notifications_csv_for_service(client, sample_template, sample_job):
+    user = sample_template.created_by
+    create_notification(
+        template=sample_template, client_reference="ref", status="delivered", one_off=True, created_by_id=user.id
+    )
+    create_notification(job=sample_job, job_row_number=0, status="sending", created_at=datetime(2024, 6, 1, 11, 0))
+    create_notification(template=sample_template, key_type=KEY_TYPE_TEST)
+
+    response = client.get(
+        path=f"/service/{sample_template.service_id}/notifications.csv",
+        headers=[create_admin_authorization_header()],
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert response.is_streamed
+    assert list(csv.reader(response.get_data(as_text=True).splitlines())) == [
+        [
+            "Row number",
+            "Recipient",
+            "Reference",
+            "Template",
+            "Type",
+            "Sent by",
+            "Sent by email",
+            "Job",
+            "Status",
+            "Time",
+            "API key name",
+        ],
+        [
+            "",
+            "+447700900855",
+            "ref",
+            sample_template.name,
+            "sms",
+            user.name,
+            user.email_address,
+            "",
+            "Delivered",
+            "2024-06-01 13:00:00",
+            "",
+        ],
+        [
+            "1",
+            "+447700900855",
+            "",
+            sample_job.template.name,
+            "sms",
+            "",
+            "",
+            sample_job.original_file_name,
+            "Sending",
+            "2024-06-01 12:00:00",
+            "",
+        ],
+    ]
+
+
+def test_get_notifications_csv_for_service_filters_by_status(client, sample_template):
+    create_notification(template=sample_template, status="delivered")
+    create_notification(template=sample_template, status="permanent-failure")
+
+    response = client.get(
+        path=f"/service/{sample_template.service_id}/notifications.csv?status=permanent-failure",
+        headers=[create_admin_authorization_header()],
+    )
+
+    rows = list(csv.DictReader(response.get_data(as_text=True).splitlines()))
+    assert [row["Status"] for row in rows] == ["Phone number doesn’t exist"]
+
+
+def test_generate_notifications_csv_yields_chunks_of_rows(sample_template):
+    for _ in range(5):
+        create_notification(template=sample_template)
+
+    chunks = list(
+        _generate_notifications_csv(
+            notifications_dao.get_notifications_for_service_for_csv(sample_template.service_id), rows_per_chunk=2
+        )
+    )
+
+    assert [chunk.count("\r\n") for chunk in chunks] == [3, 2, 1]
+
+
 def test_get_notification_for_service_without_uuid(client, notify_db_session):
     service_1 = create_service(service_name="1")
     response = client.get(
@@ -1795,6 +1885,62 @@ def test_get_notifications_for_service_pagination_links(
     assert "next" not in resp["links"]
 
 
+def test_get_notifications_for_service_pagination_links_with_cursor(
+    admin_request,
+    sample_template,
+):
+    notifications = [create_notification(sample_template) for _ in range(3)]
+
+    resp = admin_request.get(
+        "service.get_all_notifications_for_service", service_id=sample_template.service_id, page_size=2
+    )
+
+    assert [notification["id"] for notification in resp["notifications"]] == [
+        str(notifications[2].id),
+        str(notifications[1].id),
+    ]
+    assert resp["next_cursor"] == encode_pagination_cursor(notifications[1].created_at, notifications[1].id)
+
+    resp = admin_request.get(
+        "service.get_all_notifications_for_service",
+        service_id=sample_template.service_id,
+        page_size=2,
+        cursor=resp["next_cursor"],
+    )
+
+    assert [notification["id"] for notification in resp["notifications"]] == [str(notifications[0].id)]
+    assert resp["next_cursor"] is None
+    assert resp["links"] == {}
+
+
+def test_get_notifications_for_service_links_to_next_cursor(admin_request, sample_template):
+    notifications = [create_notification(sample_template) for _ in range(3)]
+    cursor = encode_pagination_cursor(notifications[2].created_at, notifications[2].id)
+
+    resp = admin_request.get(
+        "service.get_all_notifications_for_service",
+        service_id=sample_template.service_id,
+        page_size=1,
+        cursor=cursor,
+    )
+
+    assert [notification["id"] for notification in resp["notifications"]] == [str(notifications[1].id)]
+    assert "prev" not in resp["links"]
+    assert "page=" not in resp["links"]["next"]
+    assert f"cursor={resp['next_cursor']}" in resp["links"]["next"]
+
+
+def test_get_notifications_for_service_rejects_invalid_cursor(admin_request, sample_template):
+    resp = admin_request.get(
+        "service.get_all_notifications_for_service",
+        service_id=sample_template.service_id,
+        cursor="not-a-cursor",
+        _expected_status=400,
+    )
+
+    assert resp["message"] == {"cursor": ["Not a valid cursor"]}
+
+
 @pytest.mark.parametrize(
     "should_prefix",
     [
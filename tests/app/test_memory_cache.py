@@ -0,0 +1,234 @@
+import uuid
+from unittest.mock import call
+
+import pytest
+
+from app.constants import COMPLAINT_CALLBACK_TYPE, DELIVERY_STATUS_CALLBACK_TYPE
+from app.dao.api_key_dao import expire_api_key
+from app.dao.organisation_dao import (
+    dao_add_service_to_organisation,
+    dao_update_organisation,
+)
+from app.dao.service_callback_api_dao import (
+    delete_service_callback_api,
+    reset_service_callback_api,
+)
+from app.dao.services_dao import dao_update_service
+from app.dao.templates_dao import dao_update_template
+from app.memory_cache import (
+    CACHE_INVALIDATION_CHANNEL,
+    LocalCache,
+    _subscriber,
+    invalidate_service_cache,
+)
+from app.serialised_models import (
+    SerialisedAPIKeyCollection,
+    SerialisedService,
+    SerialisedServiceCallbackApi,
+    SerialisedTemplate,
+)
+from tests.app.db import (
+    create_email_branding,
+    create_organisation,
+    create_service_callback_api,
+)
+from tests.conftest import set_config
+
+
+def test_local_cache_only_fetches_once(notify_api, mocker):
+    cache = LocalCache("test", ttl=300)
+    fetch = mocker.Mock(return_value="value")
+
+    assert cache.get_or_fetch(("key",), fetch) == "value"
+    assert cache.get_or_fetch(("key",), fetch) == "value"
+
+    fetch.assert_called_once_with()
+
+
+def test_local_cache_invalidate_only_removes_entries_for_that_service(notify_api, mocker):
+    service_id, other_service_id = str(uuid.uuid4()), str(uuid.uuid4())
+    cache = LocalCache("test", ttl=300)
+    cache.get_or_fetch((uuid.UUID(service_id),), lambda: "service")
+    cache.get_or_fetch(("template-id", service_id), lambda: "template")
+    cache.get_or_fetch((other_service_id,), lambda: "other service")
+
+    cache.invalidate(service_id)
+
+    assert list(cache.entries) == [(other_service_id,)]
+
+
+def test_local_cache_does_not_store_values_fetched_before_an_invalidation(notify_api):
+    service_id = str(uuid.uuid4())
+    cache = LocalCache("test", ttl=300)
+
+    def fetch_while_service_changes():
+        cache.invalidate(service_id)
+        return "old value"
+
+    assert cache.get_or_fetch((service_id,), fetch_while_service_changes) == "old value"
+    assert cache.get_or_fetch((service_id,), lambda: "new value") == "new value"
+
+
+def test_local_cache_counts_hits_misses_and_evictions(notify_api, mocker):
+    mock_hits = mocker.patch("app.memory_cache.MEMORY_CACHE_HITS")
+    mock_misses = mocker.patch("app.memory_cache.MEMORY_CACHE_MISSES")
+    mock_evictions = mocker.patch("app.memory_cache.MEMORY_CACHE_EVICTIONS")
+    cache = LocalCache("test", ttl=300, maxsize=1)
+
+    cache.get_or_fetch(("a",), lambda: 1)
+    cache.get_or_fetch(("a",), lambda: 1)
+    cache.get_or_fetch(("b",), lambda: 2)
+    cache.invalidate("b")
+
+    assert mock_hits.labels.call_args_list == [call("test")]
+    assert mock_misses.labels.call_args_list == [call("test"), call("test")]
+    assert mock_evictions.labels.call_args_list == [call("test", "size"), call("test", "invalidated")]
+
+
+@pytest.mark.parametrize(
+    "change_service",
+    (
+        lambda service, api_key, template: dao_update_service(service),
+        lambda service, api_key, template: expire_api_key(service.id, api_key.id),
+        lambda service, api_key, template: dao_update_template(template),
+    ),
+)
+def test_changes_through_daos_clear_cached_service_api_keys_and_templates(
+    sample_api_key, sample_template, change_service
+):
+    service = sample_template.service
+    SerialisedService.from_id(service.id)
+    api_keys = SerialisedAPIKeyCollection.from_service_id(service.id)
+    SerialisedTemplate.from_id_and_service_id(sample_template.id, service.id)
+
+    service.name = "new name"
+    sample_template.content = "new content"
+    change_service(service, sample_api_key, sample_template)
+
+    assert SerialisedService.from_id(service.id).name == "new name"
+    assert SerialisedAPIKeyCollection.from_service_id(service.id) is not api_keys
+    assert SerialisedTemplate.from_id_and_service_id(sample_template.id, service.id).content == "new content"
+
+
+def test_changes_to_a_services_organisation_clear_the_cached_service(sample_service):
+    organisation = create_organisation()
+    assert SerialisedService.from_id(sample_service.id).organisation is None
+
+    dao_add_service_to_organisation(sample_service, organisation.id)
+    assert SerialisedService.from_id(sample_service.id).organisation == str(organisation.id)
+
+    email_branding = create_email_branding()
+    dao_update_organisation(organisation.id, email_branding_id=email_branding.id)
+    assert SerialisedService.from_id(sample_service.id).email_branding == str(email_branding.id)
+
+
+def test_cached_templates_fetched_with_keyword_arguments_are_cleared_when_the_template_changes(sample_template, mocker):
+    mock_get_dict = mocker.patch.object(SerialisedTemplate, "get_dict", wraps=SerialisedTemplate.get_dict)
+
+    SerialisedTemplate.from_id_and_service_id(template_id=sample_template.id, service_id=sample_template.service_id)
+    SerialisedTemplate.from_id_and_service_id(sample_template.id, sample_template.service_id, None)
+    assert mock_get_dict.call_count == 1
+
+    sample_template.content = "new content"
+    dao_update_template(sample_template)
+
+    template = SerialisedTemplate.from_id_and_service_id(
+        template_id=sample_template.id, service_id=sample_template.service_id, version=None
+    )
+    assert template.content == "new content"
+    assert mock_get_dict.call_count == 2
+
+
+def test_service_callback_api_lookups_are_cached_including_services_without_callbacks(sample_service, mocker):
+    mock_fetch = mocker.patch(
+        "app.serialised_models.get_service_callback_api_for_service",
+        side_effect=lambda service_id, callback_type: None,
+    )
+
+    for _ in range(3):
+        assert SerialisedServiceCallbackApi.from_service_id_and_type(sample_service.id, COMPLAINT_CALLBACK_TYPE) is None
+
+    mock_fetch.assert_called_once_with(sample_service.id, COMPLAINT_CALLBACK_TYPE)
+
+
+def test_changes_to_service_callback_apis_clear_cached_lookups(sample_service):
+    assert (
+        SerialisedServiceCallbackApi.from_service_id_and_type(sample_service.id, DELIVERY_STATUS_CALLBACK_TYPE) is None
+    )
+
+    callback_api = create_service_callback_api(sample_service, url="https://first.example.com", bearer_token="first")
+    cached = SerialisedServiceCallbackApi.from_service_id_and_type(sample_service.id, DELIVERY_STATUS_CALLBACK_TYPE)
+    assert (cached.url, cached.bearer_token) == ("https://first.example.com", "first")
+
+    reset_service_callback_api(callback_api, sample_service.users[0].id, url="https://second.example.com")
+    cached = SerialisedServiceCallbackApi.from_service_id_and_type(sample_service.id, DELIVERY_STATUS_CALLBACK_TYPE)
+    assert cached.url == "https://second.example.com"
+
+    delete_service_callback_api(callback_api)
+    assert (
+        SerialisedServiceCallbackApi.from_service_id_and_type(sample_service.id, DELIVERY_STATUS_CALLBACK_TYPE) is None
+    )
+
+
+def test_invalidate_service_cache_waits_for_commit(notify_api, notify_db_session, mocker):
+    mock_invalidate = mocker.patch("app.memory_cache._invalidate_service_cache")
+
+    invalidate_service_cache("service-id", template_id="template-id")
+    assert not mock_invalidate.called
+
+    notify_db_session.commit()
+    mock_invalidate.assert_called_once_with("service-id", "template-id")
+
+    notify_db_session.commit()
+    mock_invalidate.assert_called_once_with("service-id", "template-id")
+
+
+def test_invalidate_service_cache_clears_redis_and_tells_other_processes(notify_api, notify_db_session, mocker):
+    mock_redis_delete = mocker.patch("app.redis_store.delete")
+    mock_raw_redis = mocker.patch("app.redis_store.redis_store")
+
+    with set_config(notify_api, "REDIS_ENABLED", True):
+        invalidate_service_cache("service-id", template_id="template-id")
+        notify_db_session.commit()
+
+    mock_redis_delete.assert_called_once_with(
+        "service-service-id", "service-service-id-template-template-id-version-None"
+    )
+    mock_raw_redis.publish.assert_called_once_with(CACHE_INVALIDATION_CHANNEL, "service-id")
+
+
+def test_subscriber_clears_local_caches_when_told_a_service_has_changed(sample_service, mocker):
+    fetch = mocker.patch.object(SerialisedService, "get_dict", wraps=SerialisedService.get_dict)
+    SerialisedService.from_id(str(sample_service.id))
+
+    _subscriber.handle_message({"type": "message", "data": str(sample_service.id).encode()})
+    SerialisedService.from_id(str(sample_service.id))
+
+    assert fetch.call_count == 2
+
+
+def test_subscriber_is_started_once_per_process(notify_api, mocker):
+    mock_raw_redis = mocker.patch("app.redis_store.redis_store")
+    mocker.patch.multiple(_subscriber, pid=None, next_attempt=0, last_error=None)
+
+    with set_config(notify_api, "REDIS_ENABLED", True):
+        _subscriber.ensure_subscribed()
+        _subscriber.ensure_subscribed()
+
+        assert _subscriber.can_cache()
+
+    pubsub = mock_raw_redis.pubsub.return_value
+    pubsub.subscribe.assert_called_once_with(**{CACHE_INVALIDATION_CHANNEL: _subscriber.handle_message})
+    pubsub.run_in_thread.assert_called_once_with(sleep_time=1, daemon=True, exception_handler=_subscriber.handle_error)
+
+
+def test_local_caches_are_not_filled_while_the_subscriber_is_down(notify_api, mocker):
+    mocker.patch("app.redis_store.redis_store").pubsub.side_effect = ConnectionError
+    mocker.patch.multiple(_subscriber, pid=None, next_attempt=0, last_error=None)
+    cache = LocalCache("test", ttl=300, invalidated=True)
+
+    with set_config(notify_api, "REDIS_ENABLED", True):
+        _subscriber.ensure_subscribed()
+        cache.get_or_fetch(("key",), lambda: "value")
+
+    assert list(cache.entries) == []
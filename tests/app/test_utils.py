@@ -1,9 +1,13 @@
+import uuid
 from datetime import date, datetime
 
 import pytest
 from freezegun import freeze_time
 
 from app.utils import (
+    chunks,
+    decode_pagination_cursor,
+    encode_pagination_cursor,
     format_sequential_number,
     get_london_midnight_in_utc,
     get_midnight_for_day_before,
@@ -62,3 +66,31 @@ def test_midnight_n_days_ago(current_time, arg, expected_datetime):
 
 def test_format_sequential_number():
     assert format_sequential_number(123) == "0000007b"
+
+
+@pytest.mark.parametrize(
+    "iterable, size, expected",
+    [
+        ([], 2, []),
+        ([1, 2, 3], 2, [[1, 2], [3]]),
+        ([1, 2, 3, 4], 2, [[1, 2], [3, 4]]),
+        ((i for i in range(3)), 5, [[0, 1, 2]]),
+    ],
+)
+def test_chunks(iterable, size, expected):
+    assert list(chunks(iterable, size)) == expected
+
+
+def test_pagination_cursor_round_trips():
+    created_at = datetime(2024, 1, 1, 12, 30, 15, 123456)
+    item_id = uuid.uuid4()
+
+    assert decode_pagination_cursor(encode_pagination_cursor(created_at, item_id)) == (created_at, item_id)
+
+
+@pytest.mark.parametrize(
+    "cursor", ["", "not-a-cursor", "bm90IGEgY3Vyc29y", "MjAyNC0wMS0wMSAxMjozMDoxNS4xMjM0NTZ8bm9wZQ=="]
+)
+def test_decode_pagination_cursor_rejects_anything_else(cursor):
+    with pytest.raises(ValueError):
+        decode_pagination_cursor(cursor)
@@ -208,13 +208,6 @@ def test_notification_reply_to_text_is_original_value_if_sender_is_changed_after
     assert notifications[0].reply_to_text == "123456"
 
 
-# This test checks the memory_caches created in `app.serialised_models`. They have a TTL of 2 seconds (as of writing
-# this comment), which has sometimes caused this test to flake when running slowly (eg on CI). Normally we'd use
-# freezegun to stop time elapsing, but the way we create the cache configures the timers to use `time.monotonic` before
-# freezegun is able to monkeypatch them. We could manually monkeypatch them but it reaches deep into the internal
-# implementation of TimedCaches, so feels a bit more gross than just accepting that this test interacts with time and
-# in rare slow runs, may fail.
-@pytest.mark.flaky(max_runs=3, min_passes=1)
 def test_should_cache_template_lookups_in_memory(mocker, api_client_request, sample_template):
     mock_get_template = mocker.patch(
         "app.dao.templates_dao.dao_get_template_by_id_and_service_id",
@@ -1404,3 +1397,182 @@ def test_post_notification_does_not_use_save_queue_for_letters(api_client_reques
 
         assert not mock_save.called
         mock_create_pdf_task.assert_called_once_with([str(json_resp["id"])], queue="create-letters-pdf-tasks")
+
+
+@pytest.mark.parametrize(
+    "notification_type, key_send_to, send_to",
+    [("sms", "phone_number", "+447700900855"), ("email", "email_address", "sample@email.com")],
+)
+def test_post_notification_batch_persists_all_notifications_and_queues_them_in_chunks(
+    api_client_request, sample_service, mocker, notification_type, key_send_to, send_to
+):
+    template = create_template(service=sample_service, template_type=notification_type)
+    mock_deliver = mocker.patch(f"app.celery.provider_tasks.deliver_{notification_type}_batch.apply_async")
+    mocker.patch.dict(current_app.config, {"NOTIFICATION_BATCH_DELIVERY_CHUNK_SIZE": 2})
+    data = {
+        "notifications": [
+            {key_send_to: send_to, "template_id": str(template.id), "reference": f"ref-{i}"} for i in range(3)
+        ]
+    }
+
+    resp_json = api_client_request.post(
+        sample_service.id,
+        "v2_notifications.post_notification_batch",
+        notification_type=notification_type,
+        _data=data,
+    )
+
+    notifications = Notification.query.order_by(Notification.client_reference).all()
+    assert [n.client_reference for n in notifications] == ["ref-0", "ref-1", "ref-2"]
+    assert {n.status for n in notifications} == {NOTIFICATION_CREATED}
+    assert [r["id"] for r in resp_json["notifications"]] == [str(n.id) for n in notifications]
+    assert [r["reference"] for r in resp_json["notifications"]] == ["ref-0", "ref-1", "ref-2"]
+
+    queue = "send-sms-tasks" if notification_type == SMS_TYPE else "send-email-tasks"
+    assert mock_deliver.call_args_list == [
+        call([[str(notifications[0].id), str(notifications[1].id)]], queue=queue),
+        call([[str(notifications[2].id)]], queue=queue),
+    ]
+
+
+def test_post_notification_batch_says_which_notifications_were_accepted_if_queueing_fails_part_way(
+    api_client_request, sample_template, mocker
+):
+    mocker.patch(
+        "app.celery.provider_tasks.deliver_sms_batch.apply_async", side_effect=[None, Exception("EXPECTED"), None]
+    )
+    mocker.patch.dict(current_app.config, {"NOTIFICATION_BATCH_DELIVERY_CHUNK_SIZE": 2})
+    data = {
+        "notifications": [
+            {"phone_number": "+447700900855", "template_id": str(sample_template.id), "reference": f"ref-{i}"}
+            for i in range(5)
+        ]
+    }
+
+    resp_json = api_client_request.post(
+        sample_template.service_id,
+        "v2_notifications.post_notification_batch",
+        notification_type=SMS_TYPE,
+        _data=data,
+        _expected_status=500,
+    )
+
+    assert resp_json["errors"][0]["error"] == "BatchPartlyAcceptedError"
+    assert [r["reference"] for r in resp_json["notifications"]] == ["ref-0", "ref-1"]
+    notifications = Notification.query.order_by(Notification.client_reference).all()
+    assert [str(n.id) for n in notifications] == [r["id"] for r in resp_json["notifications"]]
+
+
+def test_post_notification_batch_checks_rate_limits_once_for_the_whole_batch(
+    api_client_request, sample_template, mocker
+):
+    mocker.patch("app.celery.provider_tasks.deliver_sms_batch.apply_async")
+    mock_check_rate_limiting = mocker.patch("app.v2.notifications.post_notifications.check_rate_limiting")
+    data = {
+        "notifications": [
+            {"phone_number": "+447700900855", "template_id": str(sample_template.id)},
+            {"phone_number": "+447700900856", "template_id": str(sample_template.id)},
+        ]
+    }
+
+    api_client_request.post(
+        sample_template.service_id,
+        "v2_notifications.post_notification_batch",
+        notification_type=SMS_TYPE,
+        _data=data,
+    )
+
+    mock_check_rate_limiting.assert_called_once_with(
+        mocker.ANY, mocker.ANY, notification_type=SMS_TYPE, num_notifications=2
+    )
+
+
+def test_post_notification_batch_rejects_whole_batch_if_one_notification_is_invalid(
+    api_client_request, sample_template, mocker
+):
+    mock_deliver = mocker.patch("app.celery.provider_tasks.deliver_sms_batch.apply_async")
+    data = {
+        "notifications": [
+            {"phone_number": "+447700900855", "template_id": str(sample_template.id)},
+            {"phone_number": "+447700900856", "template_id": str(uuid.uuid4())},
+        ]
+    }
+
+    resp_json = api_client_request.post(
+        sample_template.service_id,
+        "v2_notifications.post_notification_batch",
+        notification_type=SMS_TYPE,
+        _data=data,
+        _expected_status=400,
+    )
+
+    assert resp_json["errors"] == [{"error": "BadRequestError", "message": "Template not found"}]
+    assert Notification.query.count() == 0
+    assert not mock_deliver.called
+
+
+def test_post_notification_batch_uploads_no_documents_if_a_later_notification_is_too_long(
+    api_client_request, notify_db_session, mocker
+):
+    service = create_service(service_permissions=[EMAIL_TYPE])
+    service.contact_link = "contact.me@gov.uk"
+    template = create_template(service=service, template_type=EMAIL_TYPE, content="((link)) ((text))")
+    mock_deliver = mocker.patch("app.celery.provider_tasks.deliver_email_batch.apply_async")
+    document_download_mock = mocker.patch("app.v2.notifications.post_notifications.document_download_client")
+    document_download_mock.get_upload_url_for_simulated_email.return_value = "https://document-url"
+    data = {
+        "notifications": [
+            {
+                "email_address": "sample@email.com",
+                "template_id": str(template.id),
+                "personalisation": {"link": {"file": "abababab"}, "text": "short"},
+            },
+            {
+                "email_address": "sample@email.com",
+                "template_id": str(template.id),
+                "personalisation": {"link": "no file", "text": "a" * 2_000_001},
+            },
+        ]
+    }
+
+    resp_json = api_client_request.post(
+        service.id,
+        "v2_notifications.post_notification_batch",
+        notification_type=EMAIL_TYPE,
+        _data=data,
+        _expected_status=400,
+    )
+
+    assert resp_json["errors"][0]["message"].startswith("Your message is too long.")
+    assert not document_download_mock.upload_document.called
+    assert Notification.query.count() == 0
+    assert not mock_deliver.called
+
+
+def test_post_notification_batch_returns_400_if_batch_is_too_large(api_client_request, sample_template):
+    data = {
+        "notifications": [
+            {"phone_number": "+447700900855", "template_id": str(sample_template.id)} for _ in range(1_001)
+        ]
+    }
+
+    resp_json = api_client_request.post(
+        sample_template.service_id,
+        "v2_notifications.post_notification_batch",
+        notification_type=SMS_TYPE,
+        _data=data,
+        _expected_status=400,
+    )
+
+    assert resp_json["errors"][0]["error"] == "ValidationError"
+    assert "is too long" in resp_json["errors"][0]["message"]
+
+
+def test_post_notification_batch_returns_404_for_letters(api_client_request, sample_letter_template):
+    api_client_request.post(
+        sample_letter_template.service_id,
+        "v2_notifications.post_notification_batch",
+        notification_type=LETTER_TYPE,
+        _data={"notifications": []},
+        _expected_status=404,
+    )
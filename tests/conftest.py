@@ -11,6 +11,7 @@ import sqlalchemy
 from app import create_app, db
 from app.authentication.auth import requires_admin_auth, requires_no_auth
 from app.dao.provider_details_dao import get_provider_details_by_identifier
+from app.memory_cache import caches
 from app.notify_api_flask_app import NotifyApiFlaskApp
 from tests.routes import test_admin_auth_blueprint, test_no_auth_blueprint
 
@@ -162,6 +163,10 @@ def notify_db_session(_notify_db, sms_providers):
             _notify_db.engine.execute(tbl.delete())
     _notify_db.session.commit()
 
+    # anything cached in memory came from rows that no longer exist
+    for cache in caches.values():
+        cache.clear()
+
 
 @pytest.fixture
 def os_environ():